@@ -3,12 +3,11 @@ from models.school_term import SchoolTerm
 from models.subject import Subject
 from models.section import Section
 from models import Permission
-from models.school import School
 from models.class_room import ClassRoom
-from models.user import User
 from datetime import date, timedelta
 from flask import Flask, jsonify, render_template, session, send_from_directory, request
 import json
+import multiprocessing
 import os
 import ssl
 import logging
@@ -20,6 +19,13 @@ from routes.admin_action_routes import admin_action_route
 from routes.staff_routes import staff_routes
 from routes.student_routes import student_route
 from routes.session_monitor_routes import session_monitor_routes
+from routes.question_image_routes import question_image_routes
+from services.session_store import exam_session_buffer
+from services.report_cache import report_cache
+from services.report_jobs import report_job_queue
+from services.school_info import DEFAULT_SCHOOL_INFO, get_school_info
+from utils.current_user import get_current_user
+from utils.query_profiler import query_profiler
 
 # Conditionally import report routes and initialize Celery based on availability
 use_fakeredis = os.environ.get('USE_FAKEREDIS', '').lower() == 'true'
@@ -52,6 +58,12 @@ app.config['SESSION_REFRESH_EACH_REQUEST'] = True
 
 db.init_app(app)
 bcrypt.init_app(app)
+# Spawned PDF workers import this module too; they need no background threads
+if multiprocessing.current_process().name == "MainProcess":
+    exam_session_buffer.init_app(app)
+    report_job_queue.init_app(app)
+report_cache.init_app(app)
+query_profiler.init_app(app)
 
 
 # Custom logging filter to suppress SSL-related bad request errors
@@ -126,7 +138,7 @@ def debug_session():
 @app.route("/current_user")
 def current_user():
     # Get the current logged-in user
-    current_user = User.query.get(session.get("user_id"))
+    current_user = get_current_user()
 
     if current_user is None:
         return jsonify({"error": "User not found"}), 404
@@ -140,6 +152,7 @@ admin_action_route(app)
 staff_routes(app)
 student_route(app)
 session_monitor_routes(app)
+question_image_routes(app)
 if report_bp:
     app.register_blueprint(report_bp)
 # Initialize the database
@@ -163,27 +176,9 @@ def index():
 @app.context_processor
 def inject_school_info():
     try:
-        school = School.query.first()
-        school_name = school.school_name if school and school.school_name else "Your School"
-        # Build logo URL if saved; else None to use template fallback
-        logo_url = None
-        if school and school.logo:
-            # school.logo is stored as a relative path like uploads/school_logos/filename
-            logo_url = f"/{school.logo.replace('static/', '')}"
-        return {
-            "school_info": {
-                "name": school_name,
-                "address": getattr(school, "address", ""),
-                "phone": getattr(school, "phone", ""),
-                "email": getattr(school, "email", ""),
-                "website": getattr(school, "website", ""),
-                "logo_url": logo_url,
-                "session": getattr(school, "current_session", ""),
-                "term": getattr(school, "current_term", ""),
-            }
-        }
+        return {"school_info": get_school_info()}
     except Exception:
-        return {"school_info": {"name": "Your School", "logo_url": None}}
+        return {"school_info": dict(DEFAULT_SCHOOL_INFO)}
 
 
 # Error handlers to render custom templates for HTML requests
@@ -24,5 +24,42 @@ class Config:
     # File Upload Configuration
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "static", "uploads")
     SCHOOL_LOGO_FOLDER = os.path.join(UPLOAD_FOLDER, "school_logos")
+    # Question and option images, one file per unique image named by its hash
+    QUESTION_IMAGE_FOLDER = os.path.join(UPLOAD_FOLDER, "questions")
+    # Threads storing the images of an uploaded Word document
+    DOCX_IMAGE_WORKERS = 4
+    # Seconds a previewed question upload is kept for its import
+    QUESTION_PREVIEW_TTL = int(os.environ.get("QUESTION_PREVIEW_TTL", 1800))
     MAX_CONTENT_LENGTH = 2 * 1024 * 1024  # 2MB max file size
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
+
+    # Exam autosave: seconds between batched writes of buffered session saves
+    # (0 writes every save straight through)
+    EXAM_SESSION_FLUSH_INTERVAL = int(os.environ.get("EXAM_SESSION_FLUSH_INTERVAL", 5))
+
+    # Class report PDFs: rendered in chunks by a process pool (0 workers =
+    # one per CPU), each chunk with its own timeout in seconds and retries
+    REPORT_PDF_WORKERS = int(os.environ.get("REPORT_PDF_WORKERS", 0))
+    REPORT_PDF_CHUNK_SIZE = int(os.environ.get("REPORT_PDF_CHUNK_SIZE", 4))
+    REPORT_PDF_CHUNK_TIMEOUT = int(os.environ.get("REPORT_PDF_CHUNK_TIMEOUT", 60))
+    REPORT_PDF_RETRIES = int(os.environ.get("REPORT_PDF_RETRIES", 1))
+
+    # Background report jobs: worker threads (0 runs jobs inline), where
+    # finished files are kept and for how many seconds
+    REPORT_JOB_WORKERS = int(os.environ.get("REPORT_JOB_WORKERS", 2))
+    REPORT_JOB_FOLDER = os.path.join(BASE_DIR, "instance", "report_jobs")
+    REPORT_JOB_TTL = int(os.environ.get("REPORT_JOB_TTL", 3600))
+
+    # Rendered report PDFs, keyed by a hash of their content; least recently
+    # used files are evicted beyond the size limit (0 disables the cache)
+    REPORT_CACHE_FOLDER = os.path.join(BASE_DIR, "instance", "report_cache")
+    REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+    # Scale logos and photos embedded in report PDFs down to their printed size
+    REPORT_IMAGE_DOWNSCALE = os.environ.get("REPORT_IMAGE_DOWNSCALE", "true").lower() == "true"
+
+    # Per-request SQL profiling (off by default): query counts and DB time per
+    # endpoint at /admin/perf, Server-Timing headers, and a warning when one
+    # statement runs this many times in a request (a likely N+1)
+    QUERY_PROFILER = os.environ.get("QUERY_PROFILER", "false").lower() == "true"
+    QUERY_PROFILER_N1_THRESHOLD = int(os.environ.get("QUERY_PROFILER_N1_THRESHOLD", 5))
@@ -0,0 +1,54 @@
+"""
+Migration: Add option_order column to exam_sessions
+- option_order: JSON map of question id -> option ids in the order served
+  to the student. Together with question_order it forms the manifest of
+  what the student was actually shown.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db
+
+
+def upgrade():
+    """Add option_order column to exam_sessions table"""
+    try:
+        inspector = db.inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('exam_sessions')]
+        if 'option_order' in columns:
+            return
+
+        db.session.execute(db.text(
+            "ALTER TABLE exam_sessions ADD COLUMN option_order TEXT"
+        ))
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+
+def downgrade():
+    """Remove option_order column from exam_sessions table"""
+    try:
+        db.session.execute(db.text("ALTER TABLE exam_sessions DROP COLUMN option_order"))
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+
+if __name__ == "__main__":
+    from flask import Flask
+
+    app = Flask(__name__)
+    BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + os.path.join(BASE_DIR, "instance", "users.db")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
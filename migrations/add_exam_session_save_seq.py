@@ -0,0 +1,53 @@
+"""
+Migration: Add save_seq column to exam_sessions
+- save_seq: sequence number of the last autosave delta applied, used to
+  reject deltas that arrive out of order
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db
+
+
+def upgrade():
+    """Add save_seq column to exam_sessions table"""
+    try:
+        inspector = db.inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('exam_sessions')]
+        if 'save_seq' in columns:
+            return
+
+        db.session.execute(db.text(
+            "ALTER TABLE exam_sessions ADD COLUMN save_seq INTEGER NOT NULL DEFAULT 0"
+        ))
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+
+def downgrade():
+    """Remove save_seq column from exam_sessions table"""
+    try:
+        db.session.execute(db.text("ALTER TABLE exam_sessions DROP COLUMN save_seq"))
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+
+if __name__ == "__main__":
+    from flask import Flask
+
+    app = Flask(__name__)
+    BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + os.path.join(BASE_DIR, "instance", "users.db")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
@@ -0,0 +1,80 @@
+"""
+Migration: Add composite indexes to the most queried tables
+- grade: (student_id, term_id, class_room_id) for student reports and
+  (class_room_id, term_id, subject_id) for score sheets and class reports
+- questions: (subject_id, class_room_id) for question banks and counts
+- exam_sessions: (student_id, exam_id, is_active) for the active session lookup
+- exam_records: (subject_id, class_room_id, school_term_id) for CBT scores
+- attendance: (class_room_id, attendance_date, student_id) for class registers
+
+Without them every one of these lookups is a full table scan on SQLite.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db
+
+
+# (index name, table, columns) - kept in step with the models' __table_args__
+INDEXES = [
+    ("ix_grade_student_term_class", "grade", ("student_id", "term_id", "class_room_id")),
+    ("ix_grade_class_term_subject", "grade", ("class_room_id", "term_id", "subject_id")),
+    ("ix_questions_subject_class", "questions", ("subject_id", "class_room_id")),
+    ("ix_exam_sessions_student_exam_active", "exam_sessions",
+     ("student_id", "exam_id", "is_active")),
+    ("ix_exam_records_subject_class_term", "exam_records",
+     ("subject_id", "class_room_id", "school_term_id")),
+    ("ix_attendance_class_date_student", "attendance",
+     ("class_room_id", "attendance_date", "student_id")),
+]
+
+
+def upgrade():
+    """Create the composite indexes that do not exist yet"""
+    try:
+        inspector = db.inspect(db.engine)
+        tables = set(inspector.get_table_names())
+        for name, table, columns in INDEXES:
+            if table not in tables:
+                continue
+            existing = [index['name'] for index in inspector.get_indexes(table)]
+            if name in existing:
+                continue
+
+            db.session.execute(db.text(
+                f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"
+            ))
+        # Give the query planner row counts for the new indexes
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+
+def downgrade():
+    """Drop the composite indexes"""
+    try:
+        for name, _, _ in INDEXES:
+            db.session.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+
+if __name__ == "__main__":
+    from flask import Flask
+
+    app = Flask(__name__)
+    BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + os.path.join(BASE_DIR, "instance", "users.db")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
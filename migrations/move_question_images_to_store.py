@@ -0,0 +1,104 @@
+"""
+Migration: Move inline question images to the image store
+- questions.question_image / options.option_image values that are base64
+  data URIs are written to static/uploads/questions/<sha256>.<ext> (once per
+  unique image) and replaced by the image URL
+- rows are read and updated in batches, so the whole image set is never
+  held in memory; running it again only touches rows still inline
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import base64
+
+from models import db
+from services.image_store import (
+    IMAGE_URL_PREFIX, EXTENSIONS, image_folder, is_image_name, store_data_uri
+)
+
+# (table, image column)
+IMAGE_COLUMNS = [("questions", "question_image"), ("options", "option_image")]
+
+BATCH_SIZE = 200
+
+
+def _rewrite(table, column, select_where, convert):
+    """Apply convert to each matching value, a batch at a time"""
+    changed = 0
+    last_id = ""
+    while True:
+        rows = db.session.execute(db.text(
+            f"SELECT id, {column} FROM {table} "
+            f"WHERE {select_where} AND id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+        if not rows:
+            return changed
+
+        for row_id, value in rows:
+            new_value = convert(value)
+            if new_value != value:
+                db.session.execute(
+                    db.text(f"UPDATE {table} SET {column} = :value WHERE id = :id"),
+                    {"value": new_value, "id": row_id},
+                )
+                changed += 1
+        db.session.commit()
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    """Replace inline data URIs with image store URLs"""
+    try:
+        return {
+            f"{table}.{column}": _rewrite(
+                table, column, f"{column} LIKE 'data:image/%'", store_data_uri
+            )
+            for table, column in IMAGE_COLUMNS
+        }
+
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+
+def _inline(value):
+    filename = value[len(IMAGE_URL_PREFIX):]
+    path = os.path.join(image_folder(), filename)
+    if not is_image_name(filename) or not os.path.exists(path):
+        return value
+    extension = filename.rsplit(".", 1)[1]
+    content_type = next(t for t, ext in EXTENSIONS.items() if ext == extension)
+    with open(path, "rb") as image:
+        data = base64.b64encode(image.read()).decode("utf-8")
+    return f"data:{content_type};base64,{data}"
+
+
+def downgrade():
+    """Put the stored images back inline (the files are left in place)"""
+    try:
+        return {
+            f"{table}.{column}": _rewrite(
+                table, column, f"{column} LIKE '{IMAGE_URL_PREFIX}%'", _inline
+            )
+            for table, column in IMAGE_COLUMNS
+        }
+
+    except Exception as e:
+        db.session.rollback()
+        raise
+
+
+if __name__ == "__main__":
+    from flask import Flask
+
+    app = Flask(__name__)
+    BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + os.path.join(BASE_DIR, "instance", "users.db")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['QUESTION_IMAGE_FOLDER'] = os.path.join(BASE_DIR, "static", "uploads", "questions")
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
@@ -7,6 +7,11 @@ class Attendance(db.Model):
     """Model for tracking student attendance"""
 
     __tablename__ = "attendance"
+    __table_args__ = (
+        # A class's register for a day, and one student's mark within it
+        db.Index("ix_attendance_class_date_student",
+                 "class_room_id", "attendance_date", "student_id"),
+    )
 
     attendance_id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
 
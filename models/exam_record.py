@@ -7,6 +7,11 @@ import json
 class ExamRecord(db.Model):
     """Model to store detailed exam records including student answers and exam metadata"""
     __tablename__ = "exam_records"
+    __table_args__ = (
+        # CBT scores per subject, class and term (score sheets, moderation)
+        db.Index("ix_exam_records_subject_class_term",
+                 "subject_id", "class_room_id", "school_term_id"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
 
@@ -7,6 +7,10 @@ import json
 class ExamSession(db.Model):
     """Model to track ongoing exam sessions and save student progress"""
     __tablename__ = "exam_sessions"
+    __table_args__ = (
+        # A student's active session for an exam
+        db.Index("ix_exam_sessions_student_exam_active", "student_id", "exam_id", "is_active"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
 
@@ -28,6 +32,13 @@ class ExamSession(db.Model):
     # This ensures the student sees the same question order when resuming
     question_order = db.Column(db.Text, nullable=True)  # JSON array
 
+    # Option order - stored as JSON object of question ID -> option IDs
+    # Together with question_order this is the manifest of what was served
+    option_order = db.Column(db.Text, nullable=True)  # JSON object
+
+    # Sequence number of the last autosave delta applied to this session
+    save_seq = db.Column(db.Integer, nullable=False, default=0)
+
     # Session status
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     is_completed = db.Column(db.Boolean, nullable=False, default=False)
@@ -71,6 +82,21 @@ class ExamSession(db.Model):
         except:
             return []
 
+    def set_option_order(self, option_order):
+        """Store option order as JSON object"""
+        self.option_order = json.dumps(option_order)
+
+    def get_option_order(self):
+        """Retrieve option order from JSON object"""
+        try:
+            return json.loads(self.option_order) if self.option_order else {}
+        except:
+            return {}
+
+    def has_manifest(self):
+        """Whether the server recorded the served questions for this session"""
+        return bool(self.get_option_order()) and bool(self.get_question_order())
+
     def to_dict(self):
         """Convert ExamSession object to a serializable dictionary."""
         return {
@@ -81,6 +107,8 @@ class ExamSession(db.Model):
             "time_remaining": self.time_remaining,
             "answers": self.get_answers(),
             "question_order": self.get_question_order(),
+            "option_order": self.get_option_order(),
+            "save_seq": self.save_seq or 0,
             "is_active": self.is_active,
             "is_completed": self.is_completed,
             "started_at": self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
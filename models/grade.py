@@ -7,6 +7,12 @@ class Grade(db.Model):
     """Model for tracking student grades and results"""
 
     __tablename__ = "grade"
+    __table_args__ = (
+        # A student's report: student, term and class
+        db.Index("ix_grade_student_term_class", "student_id", "term_id", "class_room_id"),
+        # Score sheets (subject, class, term) and class reports (class, term)
+        db.Index("ix_grade_class_term_subject", "class_room_id", "term_id", "subject_id"),
+    )
 
     grade_id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
 
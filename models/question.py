@@ -5,12 +5,16 @@ from services.generate_uuid import generate_uuid
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    __table_args__ = (
+        # Question banks and counts per subject and class
+        db.Index("ix_questions_subject_class", "subject_id", "class_room_id"),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     question_text = db.Column(db.String(500), nullable=False)
     question_type = db.Column(db.String(50), nullable=False)  # mcq, true_false, short_answer, etc.
     correct_answer = db.Column(db.Text, nullable=True)  # For short answer questions
-    question_image = db.Column(db.Text, nullable=True)  # Base64 encoded image or image URL
+    question_image = db.Column(db.Text, nullable=True)  # Image URL (see services/image_store.py)
     has_math = db.Column(db.Boolean, default=False)  # Flag to indicate LaTeX/MathJax content
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -41,7 +45,7 @@ class Option(db.Model):
     text = db.Column(db.String(500), nullable=False)
     is_correct = db.Column(db.Boolean, nullable=False, default=False)
     order = db.Column(db.Integer, nullable=False, default=0)  # For ordering options
-    option_image = db.Column(db.Text, nullable=True)  # Base64 encoded image or image URL
+    option_image = db.Column(db.Text, nullable=True)  # Image URL (see services/image_store.py)
     has_math = db.Column(db.Boolean, default=False)  # Flag to indicate LaTeX/MathJax content
     
     # Foreign Key
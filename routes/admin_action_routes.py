@@ -14,6 +14,22 @@ import os
 import random
 from models.associations import teacher_classroom
 from models.grade import Grade
+from services.question_bank import invalidate_question_bank, warm_question_bank
+from services.exam_scoring import rescore_exam_records
+from services.question_import import import_questions
+from services.question_preview import (
+    question_preview_store,
+    page_response,
+    primed,
+    upload_response,
+)
+from services.exam_access import clear_exam_access, invalidate_exam_access
+from services.school_info import invalidate_school_info
+from services.session_store import exam_session_buffer
+from utils.grade_sync import remove_exam_record_grades
+from utils.query_profiler import query_profiler
+from utils.current_user import get_current_user
+from utils.question_parser import detect_file_type, iter_questions_file
 
 from typing import List
 
@@ -27,12 +43,31 @@ def admin_action_route(app):
             in current_app.config["ALLOWED_EXTENSIONS"]
         )
 
+    @app.route("/admin/perf", methods=["GET"])
+    @admin_required
+    def query_performance():
+        """Query counts and DB time per endpoint (needs QUERY_PROFILER on)
+
+        ?sort=queries (default), db_time or avg_queries
+        """
+        return jsonify({
+            "success": True,
+            **query_profiler.report(request.args.get("sort", "queries"))
+        })
+
+    @app.route("/admin/perf", methods=["DELETE"])
+    @admin_required
+    def reset_query_performance():
+        """Start the per-endpoint query totals afresh"""
+        query_profiler.reset()
+        return jsonify({"success": True, "message": "Query statistics cleared"})
+
     @app.route("/admin/user_management", methods=["GET", "POST"])
     @admin_required
     def user_management():
         users = db.session.query(User).all()
         class_rooms = db.session.query(ClassRoom).all()
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         return render_template(
             "admin/user_management.html",
             users=users,
@@ -250,6 +285,8 @@ def admin_action_route(app):
                 user.register_number = str(data["register_number"])
 
             db.session.commit()
+            # A class change can change which exams the student may take
+            invalidate_exam_access(student_id=user.id)
 
             return jsonify({"success": True, "message": "User updated successfully"}), 200
 
@@ -329,7 +366,7 @@ def admin_action_route(app):
                     )
 
                 # Get current admin user from session
-                current_user = User.query.get(session["user_id"])
+                current_user = get_current_user()
                 if not current_user:
                     return (
                         jsonify(
@@ -532,6 +569,7 @@ def admin_action_route(app):
                             db.session.add(option)
 
                 db.session.commit()
+                invalidate_question_bank(subject_id, class_room_id)
 
                 return (
                     jsonify(
@@ -558,7 +596,7 @@ def admin_action_route(app):
                 )
 
         # GET request - render the upload questions page
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         classes = db.session.query(ClassRoom).all()
         subjects = db.session.query(Subject).all()
         school_terms = db.session.query(SchoolTerm).all()
@@ -640,6 +678,64 @@ def admin_action_route(app):
                 "message": "Error fetching questions preview"
             }), 500
 
+    @app.route("/admin/questions_preview/upload", methods=["POST"])
+    @admin_required
+    def admin_upload_questions_preview():
+        """Dry run of a bulk upload: parse and check a file without saving it
+
+        Takes a JSON, CSV or DOCX file (or a JSON body with "questions") and
+        the subject_id, class_room_id, term_id and exam_type_id defaults.
+        ?format=ndjson streams the results as the file is parsed; otherwise
+        the summary and the first ?limit= questions are returned. The token
+        in either response is then passed to /admin/bulk_upload_questions
+        as preview_token to import the checked questions.
+        """
+        try:
+            if 'file' in request.files:
+                file = request.files['file']
+                form_data = request.form
+                filename = file.filename
+                # Read now: the upload is closed before a streamed response ends
+                rows = iter_questions_file(file.read(), detect_file_type(filename or ''))
+            else:
+                form_data = request.get_json(silent=True) or {}
+                filename = None
+                rows = (
+                    (number, question_data, None)
+                    for number, question_data in enumerate(form_data.get("questions") or [], 1)
+                )
+            rows = primed(rows)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        preview = question_preview_store.create(
+            session.get("user_id"),
+            defaults={
+                field: form_data.get(field)
+                for field in ("subject_id", "class_room_id", "term_id", "exam_type_id")
+            },
+            filename=filename,
+        )
+        return upload_response(
+            preview, rows,
+            stream=request.args.get("format") == "ndjson",
+            limit=request.args.get("limit", 50, type=int),
+        )
+
+    @app.route("/admin/questions_preview/<token>")
+    @admin_required
+    def admin_questions_preview_page(token):
+        """A page (?offset=&limit=) of a previewed upload, or ?format=ndjson for the rest"""
+        preview = question_preview_store.get(token, session.get("user_id"))
+        if not preview:
+            return jsonify({"success": False, "message": "Preview not found or expired"}), 404
+        return page_response(
+            preview,
+            offset=request.args.get("offset", 0, type=int),
+            limit=request.args.get("limit", 50, type=int),
+            stream=request.args.get("format") == "ndjson",
+        )
+
     @app.route("/admin/bulk_upload_questions", methods=["GET", "POST"])
     @admin_required
     def bulk_upload_questions():
@@ -649,13 +745,15 @@ def admin_action_route(app):
                 if 'file' in request.files:
                     file = request.files['file']
                     if file and hasattr(file, 'filename') and file.filename and file.filename.endswith('.docx'):
-                        # Handle Word document upload
-                        from utils.docx_parser import parse_docx_questions
-
-                        file_content = file.read()
-                        questions_data = parse_docx_questions(file_content)
-
-                        if not questions_data:
+                        # Handle Word document upload, with the parser the preview uses;
+                        # Word documents are parsed whole, so nothing is lost by listing them
+                        try:
+                            rows = list(iter_questions_file(file.read(), 'word'))
+                        except ValueError as e:
+                            return jsonify({"success": False, "message": str(e)}), 400
+                        form_data = request.form
+
+                        if not rows:
                             return (
                                 jsonify(
                                     {"success": False, "message": "No questions found in the document"}),
@@ -677,17 +775,39 @@ def admin_action_route(app):
                             400,
                         )
 
+                    # Questions already parsed and checked by the preview
+                    if data.get("preview_token"):
+                        preview = question_preview_store.claim(
+                            data["preview_token"], session.get("user_id"))
+                        if not preview:
+                            return (
+                                jsonify(
+                                    {"success": False, "message": "Preview not found or expired"}),
+                                404,
+                            )
+                        try:
+                            result = import_questions(preview.rows, defaults=preview.defaults)
+                        except Exception:
+                            question_preview_store.restore(preview)
+                            raise
+                        return jsonify(result.to_dict()), 200
+
                     # Extract bulk questions data
                     questions_data = data.get("questions", [])
+                    form_data = data
                     if not questions_data:
                         return (
                             jsonify(
                                 {"success": False, "message": "No questions provided"}),
                             400,
                         )
+                    rows = (
+                        (number, question_data, None)
+                        for number, question_data in enumerate(questions_data, 1)
+                    )
 
                 # Get current admin user from session
-                current_user = User.query.get(session["user_id"])
+                current_user = get_current_user()
                 if not current_user:
                     return (
                         jsonify(
@@ -695,171 +815,15 @@ def admin_action_route(app):
                         403,
                     )
 
-                created_questions = []
-                errors = []
-
-                # Process each question
-                for i, question_data in enumerate(questions_data):
-                    try:
-                        # Extract question data
-                        question_text = question_data.get(
-                            "question_text", "").strip()
-                        question_type = question_data.get(
-                            "question_type", "").strip()
-                        subject_id = question_data.get("subject_id")
-                        class_room_id = question_data.get("class_room_id")
-                        options_data = question_data.get("options", [])
-                        correct_answer = question_data.get(
-                            "correct_answer", "")
-
-                        # Validation
-                        if not question_text:
-                            errors.append(
-                                f"Question {i+1}: Question text is required")
-                            continue
-
-                        if not question_type:
-                            errors.append(
-                                f"Question {i+1}: Question type is required")
-                            continue
-
-                        if not subject_id:
-                            errors.append(
-                                f"Question {i+1}: Subject is required")
-                            continue
-
-                        if not class_room_id:
-                            errors.append(f"Question {i+1}: Class is required")
-                            continue
-
-                        # Validate subject exists
-                        subject = Subject.query.get(subject_id)
-                        if not subject:
-                            errors.append(f"Question {i+1}: Invalid subject")
-                            continue
-
-                        # Check if subject has a teacher assigned (mandatory requirement)
-                        if not subject.subject_head_id:
-                            errors.append(
-                                f"Question {i+1}: No teacher assigned to this subject. Please assign a teacher to the subject first before uploading questions.")
-                            continue
-
-                        # Validate that the assigned teacher exists and is a staff member
-                        teacher = User.query.get(subject.subject_head_id)
-                        if not teacher or teacher.role != "staff":
-                            errors.append(
-                                f"Question {i+1}: Assigned teacher is invalid or not a staff member. Please reassign a valid teacher to the subject.")
-                            continue
-
-                        # Validate class exists
-                        class_room = ClassRoom.query.get(class_room_id)
-                        if not class_room:
-                            errors.append(f"Question {i+1}: Invalid class")
-                            continue
-
-                        # Validate that the subject is offered in the selected class
-                        if subject not in class_room.subjects:
-                            errors.append(
-                                f"Question {i+1}: Subject '{subject.subject_name}' is not offered in class '{class_room.class_room_name}'. Please select a valid subject-class combination.")
-                            continue
-
-                        # Validate question type
-                        valid_types = ["mcq", "true_false", "short_answer"]
-                        if question_type not in valid_types:
-                            errors.append(
-                                f"Question {i+1}: Invalid question type")
-                            continue
-
-                        # For MCQ and True/False questions, validate options
-                        if question_type in ["mcq", "true_false"]:
-                            if not options_data:
-                                errors.append(
-                                    f"Question {i+1}: Options are required for this question type")
-                                continue
-
-                            # Check that there's at least one correct answer
-                            correct_options = [
-                                opt for opt in options_data if opt.get("is_correct", False)
-                            ]
-                            if not correct_options:
-                                errors.append(
-                                    f"Question {i+1}: At least one correct option is required")
-                                continue
-
-                            # For true_false, ensure exactly 2 options (True and False)
-                            if question_type == "true_false":
-                                if len(options_data) != 2:
-                                    errors.append(
-                                        f"Question {i+1}: True/False questions must have exactly 2 options")
-                                    continue
-
-                        # Create the question using the assigned teacher
-                        from models.question import Question, Option
-
-                        new_question = Question()
-                        new_question.question_text = question_text
-                        new_question.question_type = question_type
-                        new_question.subject_id = subject_id
-                        new_question.teacher_id = subject.subject_head_id  # Use the assigned teacher
-                        new_question.class_room_id = class_room_id
-
-                        # Save math and image data if present
-                        new_question.has_math = question_data.get(
-                            "has_math", False)
-                        new_question.question_image = question_data.get(
-                            "question_image")
-
-                        # For short answer questions, save the correct answer
-                        if question_type == "short_answer":
-                            new_question.correct_answer = correct_answer
-
-                        db.session.add(new_question)
-                        db.session.flush()  # Get the question ID without committing
-
-                        # Create options if this is an MCQ or True/False question
-                        if question_type in ["mcq", "true_false"]:
-                            for j, option_data in enumerate(options_data):
-                                option_text = option_data.get(
-                                    "text", "").strip()
-                                is_correct = option_data.get(
-                                    "is_correct", False)
-
-                                if option_text:  # Only create option if text is provided
-                                    option = Option()
-                                    option.text = option_text
-                                    option.is_correct = is_correct
-                                    option.order = j
-                                    option.question_id = new_question.id
-
-                                    # Save math and image data for options
-                                    option.has_math = option_data.get(
-                                        "has_math", False)
-                                    option.option_image = option_data.get(
-                                        "option_image")
-
-                                    db.session.add(option)
-
-                        db.session.commit()
-                        created_questions.append(new_question.id)
-
-                    except Exception as e:
-                        db.session.rollback()
-                        errors.append(
-                            f"Question {i+1}: Error creating question - {str(e)}")
-
-                # Prepare response
-                response_data = {
-                    "success": True,
-                    "message": f"Successfully created {len(created_questions)} questions",
-                    "created_count": len(created_questions),
-                    "error_count": len(errors),
+                # Subject, class, term and exam chosen on the upload form
+                # apply to questions that do not name their own
+                defaults = {
+                    field: form_data.get(field)
+                    for field in ("subject_id", "class_room_id", "term_id", "exam_type_id")
                 }
+                result = import_questions(rows, defaults=defaults)
 
-                if errors:
-                    response_data["message"] += f" with {len(errors)} errors"
-                    response_data["errors"] = errors
-
-                return jsonify(response_data), 200
+                return jsonify(result.to_dict()), 200
 
             except Exception as e:
                 db.session.rollback()
@@ -875,7 +839,7 @@ def admin_action_route(app):
                 )
 
         # GET request - render the bulk upload questions page
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         classes = db.session.query(ClassRoom).all()
         subjects = db.session.query(Subject).all()
         return render_template(
@@ -998,7 +962,7 @@ def admin_action_route(app):
     @app.route("/admin/report_generation", methods=["GET", "POST"])
     @admin_required
     def report_generation():
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         return render_template(
             "admin/report_generation.html", current_user=current_user
         )
@@ -1160,7 +1124,7 @@ def admin_action_route(app):
                 )
 
         # GET request
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         exams = Exam.query.all()
         subjects = Subject.query.all()
         school_terms = SchoolTerm.query.all()
@@ -1338,7 +1302,7 @@ def admin_action_route(app):
         try:
             # Debug: Print session info
             # print(f"Session user_id: {session.get('user_id')}")
-            user = User.query.get(session["user_id"])
+            user = get_current_user()
             # # print(f"User: {user}, Role: {user.role if user else 'None'}")
 
             exam = Exam.query.get(exam_id)
@@ -1375,7 +1339,7 @@ def admin_action_route(app):
         try:
             # Debug: Print session info
             # print(f"Session user_id: {session.get('user_id')}")
-            user = User.query.get(session["user_id"])
+            user = get_current_user()
             # print(f"User: {user}, Role: {user.role if user else 'None'}")
 
             data = request.get_json()
@@ -1456,7 +1420,7 @@ def admin_action_route(app):
         try:
             # Debug: Print session info
             # print(f"Session user_id: {session.get('user_id')}")
-            user = User.query.get(session["user_id"])
+            user = get_current_user()
             # print(f"User: {user}, Role: {user.role if user else 'None'}")
 
             exam = Exam.query.get(exam_id)
@@ -1584,6 +1548,8 @@ def admin_action_route(app):
                         exam_id=exam_id
                     ).first()
                     if exam_record:
+                        # Remove the grade the submission created with it
+                        remove_exam_record_grades(exam_record.id)
                         db.session.delete(exam_record)
 
                     # 3. Delete from exam_sessions table (if exists)
@@ -1596,6 +1562,8 @@ def admin_action_route(app):
                         db.session.delete(session)
 
                     db.session.commit()
+                    exam_session_buffer.discard(user_id, exam_id)
+                    invalidate_exam_access(user_id, exam_id)
                     return jsonify({"success": True, "message": "Exam reset successfully"}), 200
             else:
                 print('None')
@@ -1632,7 +1600,7 @@ def admin_action_route(app):
     @app.route("/admin/classes", methods=["GET", "POST"])
     @admin_required
     def class_management():
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         class_rooms = db.session.query(ClassRoom).all()
         teachers = db.session.query(User).filter_by(role="staff").all()
         students = db.session.query(Student).all()
@@ -1946,7 +1914,7 @@ def admin_action_route(app):
     @app.route("/admin/teachers", methods=["GET", "POST"])
     @admin_required
     def teacher_management():
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         teachers = db.session.query(User).filter_by(role="staff").all()
         active_classes = db.session.query(
             ClassRoom).filter_by(is_active=True).all()
@@ -1994,7 +1962,7 @@ def admin_action_route(app):
           Accepts: first_name, last_name, email, gender, dob (YYYY-MM-DD), image (url/path), password.
           Returns JSON with updated user data on success.
         """
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         # print(current_user)
 
         # POST: update profile
@@ -2101,7 +2069,7 @@ def admin_action_route(app):
     @app.route("/admin/students", methods=["GET", "POST"])
     @admin_required
     def student_management():
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
 
         # Fetch all students with their associated user and class data
         # Using a different approach to ensure we get all students even if some joins fail
@@ -2287,6 +2255,7 @@ def admin_action_route(app):
             student.address = data.get("address", student.address)
 
             db.session.commit()
+            invalidate_exam_access(student_id=user.id)
 
             return jsonify({"success": True, "message": "Student updated successfully"}), 200
 
@@ -2338,6 +2307,7 @@ def admin_action_route(app):
                 if student and student.user:
                     student.user.class_room_id = class_id
                     success_count += 1
+                    invalidate_exam_access(student_id=student.user.id)
 
             db.session.commit()
 
@@ -2445,7 +2415,7 @@ def admin_action_route(app):
                     ),
                     500,
                 )
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         subjects = db.session.query(Subject).all()
         classes = db.session.query(ClassRoom).all()
         users = db.session.query(User).filter_by(role="staff").all()
@@ -2613,6 +2583,9 @@ def admin_action_route(app):
                 subject.category_colors = data.get("category_colors")
 
             db.session.commit()
+            if data.get("grade_levels"):
+                # The subject's classes changed, and with them who may sit its exams
+                clear_exam_access()
             return (
                 jsonify(
                     {"success": True, "message": "Subject updated successfully"}),
@@ -3061,7 +3034,7 @@ def admin_action_route(app):
     @app.route("/admin/settings", methods=["GET", "POST"])
     @admin_required
     def settings():
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         # Get school information if it exists
         school = School.query.first()
         return render_template(
@@ -3214,6 +3187,7 @@ def admin_action_route(app):
                     school.logo = logo_path
 
                 db.session.commit()
+                invalidate_school_info()
                 message = "School information updated successfully"
             else:
                 # Create new school
@@ -3233,6 +3207,7 @@ def admin_action_route(app):
                 )
                 db.session.add(school)
                 db.session.commit()
+                invalidate_school_info()
                 message = "School information created successfully"
 
             return (
@@ -3917,6 +3892,10 @@ def admin_action_route(app):
             exam.is_active = not exam.is_active
             db.session.commit()
 
+            # Build the question bank snapshot before students start arriving
+            if exam.is_active:
+                warm_question_bank(exam)
+
             status = "activated" if exam.is_active else "deactivated"
 
             return jsonify({
@@ -3983,6 +3962,27 @@ def admin_action_route(app):
             # print(f"Error unfinishing exam: {str(e)}")
             return jsonify({"success": False, "message": str(e)}), 500
 
+    @app.route("/admin/exam/<exam_id>/rescore", methods=["POST"])
+    @admin_required
+    def rescore_exam(exam_id):
+        """Re-score all submitted records for an exam against the current answer key"""
+        try:
+            exam = Exam.query.get(exam_id)
+            if not exam:
+                return jsonify({"success": False, "message": "Exam not found"}), 404
+
+            stats = rescore_exam_records(exam)
+
+            return jsonify({
+                "success": True,
+                "message": f"Re-scored {stats['total_records']} records, {stats['changed']} changed",
+                "stats": stats
+            }), 200
+
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"success": False, "message": str(e)}), 500
+
     # ===============================
     # QUESTION MANAGEMENT
     # ===============================
@@ -3991,7 +3991,7 @@ def admin_action_route(app):
     @admin_required
     def questions_management():
         """Question management page"""
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         subjects = Subject.query.all()
         class_rooms = ClassRoom.query.all()
         school_terms = SchoolTerm.query.all()
@@ -4070,6 +4070,7 @@ def admin_action_route(app):
                         option.is_correct = option_data['is_correct']
 
             db.session.commit()
+            invalidate_question_bank(question.subject_id, question.class_room_id)
 
             return jsonify({
                 "success": True,
@@ -4090,8 +4091,10 @@ def admin_action_route(app):
             if not question:
                 return jsonify({"success": False, "message": "Question not found"}), 404
 
+            subject_id, class_room_id = question.subject_id, question.class_room_id
             db.session.delete(question)
             db.session.commit()
+            invalidate_question_bank(subject_id, class_room_id)
 
             return jsonify({
                 "success": True,
@@ -4128,6 +4131,7 @@ def admin_action_route(app):
                 db.session.delete(question)
 
             db.session.commit()
+            invalidate_question_bank(subject_id, class_id)
 
             return jsonify({
                 "success": True,
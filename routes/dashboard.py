@@ -6,6 +6,7 @@ from models.associations import student_subject, student_exam
 from datetime import datetime
 from functools import wraps
 from sqlalchemy import and_
+from utils.current_user import get_current_user
 
 
 def admin_required(f):
@@ -16,7 +17,7 @@ def admin_required(f):
         if "user_id" not in session:
             return redirect(url_for("login"))
 
-        user = User.query.get(session["user_id"])
+        user = get_current_user()
         if not user or user.role != "admin":
             flash("Access denied. Admin privileges required.", "error")
             return redirect(url_for("login"))
@@ -34,7 +35,7 @@ def staff_required(f):
         if "user_id" not in session:
             return redirect(url_for("login"))
 
-        user = User.query.get(session["user_id"])
+        user = get_current_user()
         if not user or user.role != "staff":
             flash("Access denied. Staff privileges required.", "error")
             return redirect(url_for("login"))
@@ -51,7 +52,7 @@ def student_required(f):
         if "user_id" not in session:
             return redirect(url_for("login"))
 
-        user = User.query.get(session["user_id"])
+        user = get_current_user()
         if not user or user.role != "student":
             flash("Access denied. Student privileges required.", "error")
             return redirect(url_for("login"))
@@ -67,7 +68,7 @@ def dashboard_route(app):
     def admin_dashboard(user_id=None):
         total_users = db.session.query(User).count()
         current_date = datetime.now().strftime("%B %d, %Y")
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         return render_template(
             "admin/dashboard.html",
             total_users=total_users,
@@ -82,7 +83,7 @@ def dashboard_route(app):
         if "user_id" not in session:
             return redirect(url_for("login"))
         current_date = datetime.now().strftime("%B %d, %Y")
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         # Fetch users with role 'student'
         students = User.query.filter_by(role="student").all()
         # print(students)
@@ -99,7 +100,7 @@ def dashboard_route(app):
         # Basic session check - add proper authentication later
         if "user_id" not in session:
             return redirect(url_for("login"))
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         
         # Check if students can write exams permission is active
         from models import is_permission_active
@@ -0,0 +1,16 @@
+from flask import abort, send_from_directory
+
+from services.image_store import IMMUTABLE_MAX_AGE, image_folder, is_image_name
+
+
+def question_image_routes(app):
+    """Serve images from the content-addressed question image store"""
+
+    @app.route("/question-images/<filename>")
+    def question_image(filename):
+        """A stored image; its name is its hash, so it can be cached forever"""
+        if not is_image_name(filename):
+            abort(404)
+        response = send_from_directory(image_folder(), filename, max_age=IMMUTABLE_MAX_AGE)
+        response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        return response
@@ -1,5 +1,5 @@
 """Routes for report generation and management"""
-from flask import Blueprint, render_template, request, jsonify, session, send_file
+from flask import Blueprint, render_template, request, jsonify, session, send_file, url_for
 from models import db
 from models.report_config import ReportConfig
 from models.assessment_type import AssessmentType
@@ -7,6 +7,9 @@ from models.class_room import ClassRoom
 from models.school_term import SchoolTerm
 from models.user import User
 from services.report_generator import ReportGenerator
+from services.report_cache import report_cache, report_key
+from services.report_jobs import report_job_queue
+from utils.current_user import get_current_user
 from functools import wraps
 import io
 from datetime import datetime, date
@@ -55,7 +58,7 @@ def admin_or_staff_required(f):
         if "user_id" not in session:
             return jsonify({"error": "Unauthorized"}), 401
 
-        user = User.query.get(session["user_id"])
+        user = get_current_user()
         if not user or user.role not in ["admin", "staff"]:
             return jsonify({"error": "Forbidden"}), 403
 
@@ -67,7 +70,7 @@ def admin_or_staff_required(f):
 @admin_or_staff_required
 def report_config_page():
     """Report configuration page"""
-    user = User.query.get(session["user_id"])
+    user = get_current_user()
     return render_template("admin/report_config.html", user=user, current_user=user)
 
 
@@ -353,7 +356,7 @@ def get_students():
 @admin_or_staff_required
 def generate_report_page():
     """Report generation page"""
-    user = User.query.get(session["user_id"])
+    user = get_current_user()
     return render_template("admin/generate_report.html", user=user, current_user=user)
 
 
@@ -437,7 +440,7 @@ def preview_class_reports():
 @login_required
 def preview_student_report(student_id):
     """Preview page for a single student report"""
-    user = User.query.get(session["user_id"])
+    user = get_current_user()
 
     # Check permissions
     if user.role == "student" and user.id != student_id:
@@ -450,7 +453,7 @@ def preview_student_report(student_id):
 @login_required
 def improved_preview_student_report(student_id):
     """Improved preview page for a single student report"""
-    user = User.query.get(session["user_id"])
+    user = get_current_user()
 
     # Check permissions
     if user.role == "student" and user.id != student_id:
@@ -484,7 +487,7 @@ def get_student_report(student_id):
             }), 400
 
         # Check permissions
-        user = User.query.get(session["user_id"])
+        user = get_current_user()
         if user.role == "student" and user.id != student_id:
             return jsonify({
                 "success": False,
@@ -515,209 +518,164 @@ def get_student_report(student_id):
             "message": f"Error generating report: {str(e)}"
         }), 500
 
+PDF_UNAVAILABLE = "PDF generation not available. Install WeasyPrint or xhtml2pdf."
+
+
+def _pdf_engine():
+    """Return (engine, report template variant) for the installed PDF library, or None"""
+    if WEASYPRINT_AVAILABLE:
+        return "weasyprint", "full"
+    if XHTML2PDF_AVAILABLE:
+        # xhtml2pdf needs the simplified template (no flexbox/grid)
+        return "xhtml2pdf", "simple"
+    return None
+
+
+def _render_reports_pdf(reports, job=None):
+    """
+    Render report dicts to one PDF, reporting per-student progress to a job.
+
+    Returns (pdf bytes, ids of students whose report could not be rendered).
+    Complete files are kept in the report cache, so downloading the same
+    reports again is a file read.
+    """
+    from services.pdf_renderer import render_documents
+    from services.report_renderer import document_frame, render_cards
+
+    engine, variant = _pdf_engine()
+    cache_key = report_key(reports, engine)
+    cached = report_cache.get(cache_key, "pdf")
+    if cached is not None:
+        if job:
+            job.update(completed=len(reports), phase="cached")
+        return cached, []
+
+    if job:
+        job.update(phase="preparing")
+    # Per-student cards; the stylesheet is added once per rendered chunk
+    cards = render_cards(reports, variant)
+
+    if job:
+        job.update(completed=0, phase="rendering")
+    result = render_documents(
+        cards, engine=engine, frame=document_frame(variant),
+        progress=(lambda done: job.update(completed=done)) if job else None
+    )
+    failed = [reports[index]['student']['id'] for index in result.failed]
+    if job:
+        job.update(failed=failed)
+    if not failed:
+        report_cache.put(cache_key, "pdf", result.pdf)
+    return result.pdf, failed
+
+
+def build_student_pdf(student_id, term_id, class_room_id, config_id=None, job=None):
+    """Render one student's report; returns (pdf, failed student ids, filename)"""
+    student = User.query.get(student_id)
+    term = SchoolTerm.query.get(term_id)
+    student_name = f"{student.first_name}_{student.last_name}".replace(' ', '_') if student else 'Unknown'
+    term_name = term.term_name.replace(' ', '_') if term else 'Unknown'
+    filename = f"Report_{student_name}_{term_name}.pdf"
+
+    report_data = ReportGenerator.get_student_scores(
+        student_id, term_id, class_room_id, config_id
+    )
+    if not report_data:
+        raise LookupError("Could not generate report data")
+
+    return (*_render_reports_pdf([report_data], job), filename)
+
+
+def build_class_pdf(class_room_id, term_id, config_id=None, job=None):
+    """Render every report of a class into one PDF; returns (pdf, failed student ids, filename)"""
+    reports = ReportGenerator.get_class_report_data(
+        class_room_id, term_id, config_id
+    )
+    if not reports:
+        raise LookupError("No reports found for this class")
+
+    class_room = ClassRoom.query.get(class_room_id)
+    term = SchoolTerm.query.get(term_id)
+    class_name = class_room.class_room_name.replace(
+        ' ', '_') if class_room else 'Class'
+    term_name = term.term_name.replace(' ', '_') if term else 'Term'
+    filename = f"Reports_{class_name}_{term_name}.pdf"
+
+    if job:
+        job.update(total=len(reports))
+    return (*_render_reports_pdf(reports, job), filename)
+
+
+def render_student_pdf_job(job, **params):
+    pdf, failed, filename = build_student_pdf(job=job, **params)
+    return pdf, filename, 'application/pdf'
+
+
+def render_class_pdf_job(job, **params):
+    pdf, failed, filename = build_class_pdf(job=job, **params)
+    return pdf, filename, 'application/pdf'
+
+
+def _job_accepted(job):
+    """202 response pointing the client at a queued job"""
+    return jsonify({
+        "success": True,
+        "job": job.to_dict(),
+        "status_url": url_for("report.get_report_job", job_id=job.job_id),
+        "download_url": url_for("report.download_report_job", job_id=job.job_id),
+    }), 202
+
+
 @report_bp.route("/api/download-pdf", methods=["POST"])
 @admin_or_staff_required
 def download_single_pdf():
-    """Download a single student report as PDF"""
+    """Download a single student report as PDF
+
+    With "background": true the report is rendered as a job and 202 is
+    returned with the job id.
+    """
     try:
-        # print("DEBUG: Starting download_single_pdf")
         data = request.get_json()
         student_id = data.get("student_id")
         term_id = data.get("term_id")
         class_room_id = data.get("class_room_id")
         config_id = data.get("config_id")
-        
-        # print(f"DEBUG: Received data - student_id: {student_id}, term_id: {term_id}, class_room_id: {class_room_id}, config_id: {config_id}")
 
         if not all([student_id, term_id, class_room_id]):
-            # print("DEBUG: Missing required parameters")
             return jsonify({
                 "success": False,
                 "error": "Missing required parameters"
             }), 400
 
-        # Create filename
-        # Get student name and term name for filename (simplified approach)
-        from models.user import User
-        from models.school_term import SchoolTerm
-        student = User.query.get(student_id)
-        term = SchoolTerm.query.get(term_id)
-        student_name = f"{student.first_name}_{student.last_name}".replace(' ', '_') if student else 'Unknown'
-        term_name = term.term_name.replace(' ', '_') if term else 'Unknown'
-        filename = f"Report_{student_name}_{term_name}.pdf"
-        # print(f"DEBUG: Generated filename: {filename}")
-
-        # Get report data with performance optimization
-        # print("DEBUG: Calling ReportGenerator.get_student_scores")
-        report_data = ReportGenerator.get_student_scores(
-            student_id, term_id, class_room_id, config_id
-        )
-        # print(f"DEBUG: Received data from client: {data}")
-        if not report_data:
-            # print("DEBUG: Could not generate report data")
-            return jsonify({
-                "success": False,
-                "error": "Could not generate report data"
-            }), 404
+        if not _pdf_engine():
+            return jsonify({"success": False, "error": PDF_UNAVAILABLE}), 500
 
-        if WEASYPRINT_AVAILABLE:
-            # print(f"Generating report using WeasyPrint for {report_data['student']['name']}...")
-            # Generate HTML with caching to avoid recomputation
-            import time
-            start_time = time.time()
-            # print(f"Generating report for {report_data['student']['name']}...")
-            
-            html_content = ReportGenerator.generate_report_html(report_data)
-            html_time = time.time() - start_time
-            # print(f"  HTML generated in {html_time:.2f}s")
-            
-            # Clear image cache periodically to prevent memory buildup
-            if hasattr(ReportGenerator, '_image_cache') and len(ReportGenerator._image_cache) > 100:
-                ReportGenerator._image_cache.clear()
-                
-            # Clear HTML cache periodically to prevent memory buildup
-            if hasattr(ReportGenerator, '_html_cache') and len(ReportGenerator._html_cache) > 50:
-                ReportGenerator._html_cache.clear()
-
-            # Convert to PDF with optimized settings
-            pdf_start = time.time()
-            # Use optimized WeasyPrint settings for faster rendering
-            from weasyprint import HTML, CSS
-            # Add timeout to prevent infinite waits (cross-platform approach)
-            import threading
-            import queue
-            
-            def generate_pdf(q, html_string):
-                try:
-                    import time
-                    pdf_start_time = time.time()
-                    # print(f"  Starting WeasyPrint PDF generation...")
-                    pdf_bytes = HTML(string=html_string).write_pdf(
-                        optimize_size=('fonts', 'images'),  # Compress fonts & images
-                        presentational_hints=True,  # Use CSS efficiently
-                        uncompressed_pdf=False,  # Compress PDF output
-                        # Disable JavaScript for faster rendering (not needed for static reports)
-                        javascript=False,
-                        # Reduce DPI for faster rendering
-                        resolution=60,  # Even lower DPI for faster rendering
-                        # Disable embedded fonts for faster processing
-                        embed_fonts=False,
-                        # Disable smart anchors for faster processing
-                        smart_quotes=False,
-                        # Disable attachments for faster processing
-                        attachments=False,
-                        # Disable PDF/UA for faster processing
-                        pdfua=False,
-                        # Disable tagged PDF for faster processing
-                        tagged=False,
-                        # Disable PDF forms for faster processing
-                        forms=False,
-                        # Disable PDF outlines for faster processing
-                        outline=False
-                    )
-                    pdf_end_time = time.time()
-                    # print(f"  WeasyPrint PDF generation completed in {pdf_end_time - pdf_start_time:.2f}s")
-                    q.put(('success', pdf_bytes))
-                except Exception as e:
-                    q.put(('error', e))
-            
-            # Create a queue and thread for PDF generation
-            q = queue.Queue()
-            t = threading.Thread(target=generate_pdf, args=(q, html_content))
-            t.daemon = True
-            t.start()
-            
-            try:
-                # Wait for the result with a timeout of 45 seconds (increased for complex PDFs)
-                result_type, pdf_bytes_or_error = q.get(timeout=45)
-                if result_type == 'error':
-                    raise pdf_bytes_or_error
-                pdf_bytes = pdf_bytes_or_error
-            except queue.Empty:
-                # print("ERROR: PDF generation timed out after 45 seconds")
-                return jsonify({
-                    "success": False,
-                    "error": "PDF generation timed out. Please try again."
-                }), 500
-            pdf_time = time.time() - pdf_start
-            total_time = time.time() - start_time
-            # print(f"  PDF generated in {pdf_time:.2f}s")
-            # print(f"  Total time: {total_time:.2f}s")
-            
-            # Log performance metrics for monitoring
-            if pdf_time > 10:  # If PDF generation takes more than 10 seconds, log details
-                # print(f"  WARNING: Slow PDF generation detected for {report_data['student']['name']}")
-                # print(f"    HTML size: {len(html_content)} characters")
-                # Count images in HTML
-                import re
-                img_count = len(re.findall(r'<img[^>]+>', html_content))
-                # print(f"    Images embedded: {img_count}")
-
-            return send_file(
-                io.BytesIO(pdf_bytes),
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
+        params = dict(student_id=student_id, term_id=term_id,
+                      class_room_id=class_room_id, config_id=config_id)
+        if data.get("background"):
+            job = report_job_queue.submit(
+                "student_pdf", render_student_pdf_job, session["user_id"], total=1, **params
             )
-        elif XHTML2PDF_AVAILABLE:
-            # Use simplified HTML for xhtml2pdf with performance optimizations
-            html_content = ReportGenerator.generate_simple_report_html(
-                report_data)
-
-            # Convert to PDF using xhtml2pdf with optimized settings
-            pdf_buffer = io.BytesIO()
-            # Optimize xhtml2pdf generation
-            from xhtml2pdf import pisa
-            # Add timeout to prevent infinite waits (cross-platform approach)
-            import threading
-            import queue
-            
-            def generate_pdf(q, html_string, buffer):
-                try:
-                    pisa_status = pisa.CreatePDF(
-                        html_string, 
-                        dest=buffer,
-                        show_error_as_pdf=True  # Show errors in PDF for debugging
-                    )
-                    q.put(('success', pisa_status))
-                except Exception as e:
-                    q.put(('error', e))
-            
-            # Create a queue and thread for PDF generation
-            q = queue.Queue()
-            t = threading.Thread(target=generate_pdf, args=(q, html_content, pdf_buffer))
-            t.daemon = True
-            t.start()
-            
-            try:
-                # Wait for the result with a timeout of 30 seconds
-                result_type, pisa_status_or_error = q.get(timeout=30)
-                if result_type == 'error':
-                    raise pisa_status_or_error
-                pisa_status = pisa_status_or_error
-            except queue.Empty:
-                # print("ERROR: PDF generation timed out after 30 seconds")
-                return jsonify({
-                    "success": False,
-                    "error": "PDF generation timed out. Please try again."
-                }), 500
-
-            if pisa_status.err:
-                return jsonify({"success": False, "error": "PDF generation failed"}), 500
-
-            pdf_buffer.seek(0)
-            return send_file(
-                pdf_buffer,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
-            )
-        else:
+            return _job_accepted(job)
+
+        from services.pdf_renderer import PDFRenderError
+        try:
+            pdf, failed, filename = build_student_pdf(**params)
+        except LookupError as e:
+            return jsonify({"success": False, "error": str(e)}), 404
+        except PDFRenderError:
             return jsonify({
                 "success": False,
-                "error": "PDF generation not available. Install WeasyPrint or xhtml2pdf."
+                "error": "PDF generation failed. Please try again."
             }), 500
 
+        return send_file(
+            io.BytesIO(pdf),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=filename
+        )
+
     except Exception as e:
         # print(f"Error generating PDF: {str(e)}")
         import traceback
@@ -728,7 +686,11 @@ def download_single_pdf():
 @report_bp.route("/api/download-class-pdf", methods=["POST"])
 @admin_or_staff_required
 def download_class_pdf():
-    """Download all student reports for a class as a single PDF with performance optimizations"""
+    """Download all student reports for a class as a single PDF rendered in parallel
+
+    With "background": true the reports are rendered as a job and 202 is
+    returned with the job id.
+    """
     try:
         data = request.get_json()
         class_room_id = data.get("class_room_id")
@@ -741,211 +703,38 @@ def download_class_pdf():
                 "error": "Missing required parameters"
             }), 400
 
-        # Batch process reports with optimizations
-        if WEASYPRINT_AVAILABLE:
-            # For WeasyPrint, generate all HTML first, then combine for better performance
-            import time
-            start_time = time.time()
-            
-            # Get all reports for the class with batch optimization
-            reports = ReportGenerator.get_class_report_data(
-                class_room_id, term_id, config_id
-            )
-
-            if not reports:
-                return jsonify({
-                    "success": False,
-                    "error": "No reports found for this class"
-                }), 404
-
-            # Create filename
-            class_room = ClassRoom.query.get(class_room_id)
-            term = SchoolTerm.query.get(term_id)
-            class_name = class_room.class_room_name.replace(
-                ' ', '_') if class_room else 'Class'
-            term_name = term.term_name.replace(' ', '_') if term else 'Term'
-            filename = f"Reports_{class_name}_{term_name}.pdf"
-
-            # Generate all HTML content first (batch processing)
-            html_parts = []
-            for i, report_data in enumerate(reports):
-                student_name = report_data['student']['name']
-                html_content = ReportGenerator.generate_report_html(report_data)
-                html_parts.append(html_content)
-                
-                # Clear image cache periodically during bulk operations
-                if hasattr(ReportGenerator, '_image_cache') and len(ReportGenerator._image_cache) > 100:
-                    ReportGenerator._image_cache.clear()
-                                
-                # Clear HTML cache periodically during bulk operations
-                if hasattr(ReportGenerator, '_html_cache') and len(ReportGenerator._html_cache) > 50:
-                    ReportGenerator._html_cache.clear()
-
-            # print(f"All HTML generated in {time.time() - start_time:.2f}s")
-
-            # Combine with page breaks for single PDF generation
-            combined_html = '<div style="page-break-after: always;"></div>'.join(html_parts)
-
-            # Convert to PDF with optimized settings
-            pdf_start = time.time()
-            from weasyprint import HTML
-            # Add timeout to prevent infinite waits (cross-platform approach)
-            import threading
-            import queue
-            
-            def generate_pdf(q, html_string):
-                try:
-                    pdf_bytes = HTML(string=html_string).write_pdf(
-                        optimize_size=('fonts', 'images'),  # Compress fonts & images
-                        presentational_hints=True,  # Use CSS efficiently
-                        uncompressed_pdf=False,  # Compress PDF output
-                        # Disable JavaScript for faster rendering (not needed for static reports)
-                        javascript=False,
-                        # Reduce DPI for faster rendering
-                        resolution=60,  # Even lower DPI for faster rendering
-                        # Disable embedded fonts for faster processing
-                        embed_fonts=False,
-                        # Disable smart anchors for faster processing
-                        smart_quotes=False,
-                        # Disable attachments for faster processing
-                        attachments=False,
-                        # Disable PDF/UA for faster processing
-                        pdfua=False,
-                        # Disable tagged PDF for faster processing
-                        tagged=False,
-                        # Disable PDF forms for faster processing
-                        forms=False,
-                        # Disable PDF outlines for faster processing
-                        outline=False
-                    )
-                    q.put(('success', pdf_bytes))
-                except Exception as e:
-                    q.put(('error', e))
-            
-            # Create a queue and thread for PDF generation
-            q = queue.Queue()
-            t = threading.Thread(target=generate_pdf, args=(q, combined_html))
-            t.daemon = True
-            t.start()
-            
-            try:
-                # Wait for the result with a timeout of 90 seconds (increased for bulk PDFs)
-                result_type, pdf_bytes_or_error = q.get(timeout=90)
-                if result_type == 'error':
-                    raise pdf_bytes_or_error
-                pdf_bytes = pdf_bytes_or_error
-            except queue.Empty:
-                # print("ERROR: Bulk PDF generation timed out after 90 seconds")
-                return jsonify({
-                    "success": False,
-                    "error": "Bulk PDF generation timed out. Please try generating fewer reports at once."
-                }), 500
-            pdf_time = time.time() - pdf_start
-            total_time = time.time() - start_time
-            # print(f"PDF conversion took {pdf_time:.2f}s")
-            # print(f"Total processing time: {total_time:.2f}s")
-            
-            # Log performance metrics for monitoring
-            if pdf_time > 30:  # If PDF generation takes more than 30 seconds, log details
-                # print(f"  WARNING: Slow PDF generation detected for class report")
-                # print(f"    HTML size: {len(combined_html)} characters")
-                # Count images in HTML
-                import re
-                img_count = len(re.findall(r'<img[^>]+>', combined_html))
-                # print(f"    Images embedded: {img_count}")
-                # print(f"    Number of students: {len(reports)}")
-
-            return send_file(
-                io.BytesIO(pdf_bytes),
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
-            )
-        elif XHTML2PDF_AVAILABLE:
-            # Get all reports for the class
-            reports = ReportGenerator.get_class_report_data(
-                class_room_id, term_id, config_id
-            )
-
-            if not reports:
-                return jsonify({
-                    "success": False,
-                    "error": "No reports found for this class"
-                }), 404
+        if not _pdf_engine():
+            return jsonify({"success": False, "error": PDF_UNAVAILABLE}), 500
 
-            # Create filename
-            class_room = ClassRoom.query.get(class_room_id)
-            term = SchoolTerm.query.get(term_id)
-            class_name = class_room.class_room_name.replace(
-                ' ', '_') if class_room else 'Class'
-            term_name = term.term_name.replace(' ', '_') if term else 'Term'
-            filename = f"Reports_{class_name}_{term_name}.pdf"
-
-            # Generate combined HTML using simplified template with optimizations
-            html_parts = []
-            for i, report_data in enumerate(reports):
-                student_name = report_data['student']['name']
-                # print(f"DEBUG: Generating simple HTML for student {i+1}/{len(reports)}: {student_name}")
-                html_content = ReportGenerator.generate_simple_report_html(report_data)
-                html_parts.append(html_content)
-                
-            # Combine with page breaks (xhtml2pdf uses <pdf:nextpage /> or CSS page-break)
-            # xhtml2pdf supports standard CSS page-break-after: always
-            combined_html = '<div style="page-break-after: always;"></div>'.join(html_parts)
-
-            # Convert to PDF using xhtml2pdf with optimized settings
-            pdf_buffer = io.BytesIO()
-            from xhtml2pdf import pisa
-            # Add timeout to prevent infinite waits (cross-platform approach)
-            import threading
-            import queue
-            
-            def generate_pdf(q, html_string, buffer):
-                try:
-                    pisa_status = pisa.CreatePDF(
-                        html_string, 
-                        dest=buffer,
-                        show_error_as_pdf=True
-                    )
-                    q.put(('success', pisa_status))
-                except Exception as e:
-                    q.put(('error', e))
-            
-            # Create a queue and thread for PDF generation
-            q = queue.Queue()
-            t = threading.Thread(target=generate_pdf, args=(q, combined_html, pdf_buffer))
-            t.daemon = True
-            t.start()
-            
-            try:
-                # Wait for the result with a timeout of 60 seconds
-                result_type, pisa_status_or_error = q.get(timeout=60)
-                if result_type == 'error':
-                    raise pisa_status_or_error
-                pisa_status = pisa_status_or_error
-            except queue.Empty:
-                # print("ERROR: Bulk PDF generation timed out after 60 seconds")
-                return jsonify({
-                    "success": False,
-                    "error": "Bulk PDF generation timed out. Please try generating fewer reports at once."
-                }), 500
-
-            if pisa_status.err:
-                return jsonify({"success": False, "error": "PDF generation failed"}), 500
-
-            pdf_buffer.seek(0)
-            return send_file(
-                pdf_buffer,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=filename
+        params = dict(class_room_id=class_room_id, term_id=term_id, config_id=config_id)
+        if data.get("background"):
+            job = report_job_queue.submit(
+                "class_pdf", render_class_pdf_job, session["user_id"], **params
             )
-        else:
+            return _job_accepted(job)
+
+        from services.pdf_renderer import PDFRenderError
+        try:
+            pdf, failed, filename = build_class_pdf(**params)
+        except LookupError as e:
+            return jsonify({"success": False, "error": str(e)}), 404
+        except PDFRenderError:
             return jsonify({
                 "success": False,
-                "error": "PDF generation not available. Install WeasyPrint or xhtml2pdf."
+                "error": "Bulk PDF generation failed. Please try generating fewer reports at once."
             }), 500
 
+        response = send_file(
+            io.BytesIO(pdf),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=filename
+        )
+        if failed:
+            # Reports that could not be rendered are left out of the file
+            response.headers["X-Failed-Reports"] = ",".join(failed)
+        return response
+
     except Exception as e:
         # Log the full error for debugging
         import traceback
@@ -955,6 +744,71 @@ def download_class_pdf():
         return jsonify({"success": False, "error": error_msg}), 500
 
 
+def _own_job_or_404(job_id):
+    """The job if the current user submitted it (or is an admin), else None"""
+    job = report_job_queue.get(job_id)
+    if not job:
+        return None
+    user = get_current_user()
+    if job.user_id != user.id and user.role != "admin":
+        return None
+    return job
+
+
+@report_bp.route("/api/jobs/<job_id>", methods=["GET"])
+@admin_or_staff_required
+def get_report_job(job_id):
+    """Status and progress of a background report job"""
+    job = _own_job_or_404(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+
+@report_bp.route("/api/jobs/<job_id>/download", methods=["GET"])
+@admin_or_staff_required
+def download_report_job(job_id):
+    """Stream the file a finished report job produced"""
+    job = _own_job_or_404(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    if job.state != "done":
+        return jsonify({
+            "success": False,
+            "error": job.error or "Job has not finished yet",
+            "job": job.to_dict()
+        }), 409
+
+    response = send_file(
+        job.path,
+        mimetype=job.mimetype,
+        as_attachment=True,
+        download_name=job.filename
+    )
+    if job.failed:
+        response.headers["X-Failed-Reports"] = ",".join(job.failed)
+    return response
+
+
+@report_bp.route("/api/report-cache", methods=["GET"])
+@admin_or_staff_required
+def get_report_cache_stats():
+    """Hit/miss counters and size of the rendered report cache"""
+    return jsonify({"success": True, "stats": report_cache.stats()})
+
+
+@report_bp.route("/api/report-cache", methods=["DELETE"])
+@admin_or_staff_required
+def clear_report_cache():
+    """Drop every cached report file (admins only)"""
+    user = get_current_user()
+    if user.role != "admin":
+        return jsonify({"success": False, "error": "Unauthorized"}), 403
+    report_cache.clear()
+    report_cache.reset_stats()
+    return jsonify({"success": True, "message": "Report cache cleared"})
+
+
 @report_bp.route("/api/grade-scales", methods=["GET"])
 @admin_or_staff_required
 def get_grade_scales():
@@ -1132,7 +986,7 @@ def delete_grade_scale(scale_id):
 @admin_or_staff_required
 def grade_scales_page():
     """Grade scales management page"""
-    user = User.query.get(session["user_id"])
+    user = get_current_user()
     return render_template("admin/grade_scales.html", user=user, current_user=user)
 
 
@@ -1207,525 +1061,297 @@ def get_grade_from_score(score, term_id):
         # print(f"Error getting grade from score: {str(e)}")
         return "N/A"
 
-def get_grade(percentage):
-    if percentage >= 70: return 'A'
-    if percentage >= 60: return 'B'
-    if percentage >= 50: return 'C'
-    if percentage >= 45: return 'D'
-    if percentage >= 40: return 'E'
-    return 'F'
 def get_broad_sheet_data_logic(class_room_id, term_id, exam_type="all", config_id=None):
     """Core logic for getting broad sheet data, extracted for reuse"""
-    from models.subject import Subject
-    from models.assessment_type import AssessmentType
-    from models.class_room import ClassRoom
-    from models.school_term import SchoolTerm
-    from models.user import User
-    from models.grade import Grade  # Import Grade model
-    from models.school import School  # Import School model
-    
-    def format_assessment_name(code):
-        """Format assessment code to display name with special handling for common types"""
-        # Special handling for common assessment types
-        special_cases = {
-            'cbt': 'Computer Based Test',
-            'ca': 'Continuous Assessment',
-            'exam': 'Terminal Examination',
-            'mid_term': 'Mid-Term Exam',
-            'final': 'Final Exam',
-            'quiz': 'Quiz',
-            'assignment': 'Assignment',
-            'project': 'Project',
-            'first_ca': 'First CA',
-            'second_ca': 'Second CA',
-            'third_ca': 'Third CA',
-            'fourth_ca': 'Fourth CA',
-        }
-    
-        if code.lower() in special_cases:
-            return special_cases[code.lower()]
-    
-        return ' '.join(word.capitalize() for word in code.split('_'))
-    
-    # Get all students in the class
-    students = User.query.filter_by(
-        class_room_id=class_room_id,
-        role="student",
-        is_active=True
-    ).order_by(User.first_name, User.last_name).all()
-    
-    # Get all subjects offered by the class
-    subjects = db.session.query(Subject).join(
-        Subject.classes
-    ).filter(
-        ClassRoom.class_room_id == class_room_id
-    ).order_by(Subject.subject_name).all()
-    
-    # Get the school to filter assessment types
-    school = School.query.first()
-    
-    # Get all assessment types for this school (these are the possible assessment types)
-    all_assessment_types = AssessmentType.query.filter_by(
-        school_id=school.school_id if school else None,
-        is_active=True
-    ).order_by(AssessmentType.order).all()
-    # # print("ALL ASSESMENTS: ", all_assessment_types)
-    # Auto-sync CBT exam records to grades before retrieving
-    from utils.grade_sync import sync_all_exam_records
-    sync_all_exam_records(None, class_room_id, term_id)  # Sync all subjects for this class/term
-    
-    # Get all grades for the class and term (instead of exams)
-    grades_query = Grade.query.filter_by(
-        class_room_id=class_room_id,
-        term_id=term_id
-    )
+    from services.broad_sheet import build_broad_sheet
+    return build_broad_sheet(class_room_id, term_id, exam_type, config_id)
 
-    # Filter by assessment type if specified and not "all"
-    if exam_type != "all":
-        # Handle comma-separated assessment types
-        assessment_types = exam_type.split(',') if ',' in exam_type else [exam_type]
-        
-        # Build filter conditions for multiple assessment types
-        from sqlalchemy import or_
-        conditions = []
-        
-        for single_type in assessment_types:
-            single_type = single_type.strip().lower()
-            if single_type == "ca":
-                conditions.append(Grade.assessment_type.ilike("%ca%"))
-            elif single_type == "exam":
-                # Match 'exam', 'terminal examination', 'terminal', 'examination', etc.
-                conditions.append(db.or_(
-                    Grade.assessment_type.ilike("%exam%"),
-                    Grade.assessment_type.ilike("%examination%"),
-                    Grade.assessment_type.ilike("%terminal%")
-                ))
-            else:
-                conditions.append(Grade.assessment_type.ilike(f"%{single_type}%"))
-        
-        if conditions:
-            grades_query = grades_query.filter(or_(*conditions))
-        else:
-            # If no conditions, return empty result or all results based on requirements
-            pass
-        
-    all_grades = grades_query.all()
-    # print("DEBUG GRADES: ", all_grades)
-    for grade in all_grades:
-        # print(grade.to_dict())
-        continue
-    
-    # Debug: Print all unique assessment types found
-    unique_assessment_types = set(grade.assessment_type for grade in all_grades)
-    # # print("DEBUG UNIQUE ASSESSMENT TYPES: ", unique_assessment_types)
-    # Get all subjects for this class
-    from models.associations import class_subject
-    class_subjects = db.session.query(Subject).join(
-        class_subject, class_subject.c.subject_id == Subject.subject_id
-    ).filter(
-        class_subject.c.class_room_id == class_room_id
-    ).all()
-    
-    # Get active assessment types
-    all_assessment_types = AssessmentType.query.filter_by(
-        school_id=school.school_id,
-        is_active=True
-    ).order_by(AssessmentType.order).all()
-    
-    # Process Config for Merging
-    merge_config = None
-    active_assessments = []
-    
-    from models.report_config import ReportConfig
-    if config_id:
-        config = ReportConfig.query.get(config_id)
-        if config:
-            merge_config = config.get_merge_config()
-            active_assessments = config.get_active_assessments()
 
-    subjects = [s.subject_name for s in class_subjects]
-    
-    broad_sheet_data = []
-
-    for student in students:
-        student_data = {
-            "student_id": student.id,
-            "student_name": f"{student.first_name} {student.last_name}",
-            "admission_number": student.student.admission_number if student.student else "N/A",
-            "subjects": {}
-        }
-        
-        # Get all grades for this student
-        student_grades = Grade.query.filter_by(
-            student_id=student.id,
-            term_id=term_id,
-            class_room_id=class_room_id
-        ).all()
-        
-        # Organize grades by subject
-        subject_grade_map = {}
-        for grade in student_grades:
-            if grade.subject_id not in subject_grade_map:
-                subject_grade_map[grade.subject_id] = []
-            subject_grade_map[grade.subject_id].append(grade)
-            
-        for subject in class_subjects:
-            subject_grades = subject_grade_map.get(subject.subject_id, [])
-            
-            # Initialize subject scores structure for merging logic
-            subject_assessments = {}
-            for grade in subject_grades:
-                assess_type = 'cbt' if grade.is_from_cbt else grade.assessment_type
-                subject_assessments[assess_type] = {
-                    "score": grade.score,
-                    "max_score": grade.max_score,
-                    "assessment_type": assess_type,
-                    "is_cbt": grade.is_from_cbt,
-                    "formatted_type": format_assessment_name(assess_type),
-                    "grade_id": grade.grade_id,
-                    "assessment_name": grade.assessment_name
-                }
-                
-            # Apply Merging Logic if Configured
-            if merge_config:
-                merged_assessments_data = {}
-                
-                # Process merged exams
-                for merge_rule in merge_config.get('merged_exams', []):
-                    merge_name = merge_rule['name']
-                    components = merge_rule['components']
-                    display_as = merge_rule.get('display_as', merge_name)
-                    
-                    total_score = 0
-                    total_max = 0
-                    
-                    for component in components:
-                        if component in subject_assessments:
-                            total_score += subject_assessments[component]['score']
-                            total_max += subject_assessments[component]['max_score']
-                            
-                    if total_max > 0:
-                        merged_assessments_data[display_as] = {
-                            "score": total_score,
-                            "max_score": total_max,
-                            "assessment_type": display_as,
-                            "is_cbt": False, # Merged scores aren't purely CBT
-                            "formatted_type": format_assessment_name(display_as),
-                            "is_merged": True
-                        }
-                        
-                        # Remove components
-                        for component in components:
-                            subject_assessments.pop(component, None)
-                            
-                # Add merged assessments back
-                subject_assessments.update(merged_assessments_data)
-                
-                # Filter by active assessments if configured
-                # Identify display names that should be forced active (merged ones)
-                merged_display_names = [rule.get('display_as', rule['name']) for rule in merge_config.get('merged_exams', [])]
-                effective_active = set(active_assessments) | set(merged_display_names)
-                
-                if active_assessments:
-                     subject_assessments = {
-                        k: v for k, v in subject_assessments.items()
-                        if k in effective_active
-                    }
-
-            # Convert back to list for broadsheet structure
-            subject_scores = []
-            for assess_type, data in subject_assessments.items():
-                subject_scores.append({
-                    "exam_id": data.get("grade_id"),
-                    "exam_name": data.get("assessment_name") or data.get("formatted_type", assess_type),
-                    "assessment_type": assess_type,
-                    "formatted_type": data.get("formatted_type", format_assessment_name(assess_type)),
-                    "score": data["score"],
-                    "max_score": data["max_score"],
-                    "percentage": round((data["score"] / data["max_score"]) * 100, 1) if data["max_score"] and data["max_score"] > 0 else 0,
-                    "is_cbt": data.get("is_cbt", False)
-                })
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def build_broad_sheet_export(fmt, class_room_id, term_id, exam_type="all", config_id=None,
+                             subjects_per_page=5, students_per_page=25, font_size=9, job=None):
+    """Build a broad sheet file; returns (data, filename, mimetype)
+
+    Excel sheets are streamed to a temporary file, whose path is returned as
+    data; the caller moves or deletes it.
+    """
+    if fmt == 'excel':
+        path, filename = build_broad_sheet_excel(class_room_id, term_id, exam_type, config_id, job)
+        return path, filename, XLSX_MIMETYPE
 
-            
-            # Calculate total and average for the subject
-            total_score = sum(item["score"] for item in subject_scores)
-            max_possible = sum(item["max_score"] for item in subject_scores)
-            subject_total = {
-                "total_score": total_score,
-                "max_possible": max_possible,
-                "percentage": round((total_score / max_possible) * 100, 1) if max_possible and max_possible > 0 else 0,
-                "grade": get_grade((total_score / max_possible) * 100) if max_possible and max_possible > 0 else "N/A",
-                "scores": subject_scores
-            }
-            
-            student_data["subjects"][subject.subject_name] = subject_total
-        
-        broad_sheet_data.append(student_data)
-    print(broad_sheet_data)
-    # Get class room object to access form teacher
-    class_room = ClassRoom.query.get(class_room_id)
-    
-    # Get school information
     from models.school import School
     school = School.query.first()
-    
-    # Get assessment types that exist in the grades for this class/term based on the filter (for metadata)
-    # Use the already filtered all_grades from the main logic above
-    unique_assessment_types = set()
-    for grade in all_grades:
-        if grade.is_from_cbt:
-            unique_assessment_types.add('cbt')
-        else:
-            unique_assessment_types.add(grade.assessment_type)
-    
-    assessment_types_list = list(unique_assessment_types) if unique_assessment_types else []
-    
-    # Get assessment type orders from the AssessmentType model
-    from models.assessment_type import AssessmentType
-    # Get school_id through the section relationship
-    school_id = class_room.section.school_id if class_room.section else None
-    school_assessment_types = AssessmentType.query.filter_by(school_id=school_id).all()
-    assessment_type_orders = {at.code: at.order for at in school_assessment_types}
-    
-    # Get sections for this school
-    from models.section import Section
-    all_sections = Section.query.filter_by(
-        school_id=school.school_id if school else None,
-        is_active=True
-    ).order_by(Section.level).all()
-    
-    # Group similar sections (matching ReportGenerator)
-    grouped_sections = []
-    secondary_added = False
-    for section in all_sections:
-        if section.level in [3, 4]:
-            if not secondary_added:
-                # Create a simple object with a name attribute for the formatter
-                class SimpleSection:
-                    def __init__(self, name):
-                        self.name = name
-                grouped_sections.append(SimpleSection("Secondary"))
-                secondary_added = True
-            continue
-        grouped_sections.append(section)
-    
-    # Format sections with commas and 'and' for display (matching ReportGenerator)
-    def format_sections_for_display(sections_list):
-        if not sections_list:
-            return ''
-        if len(sections_list) == 1:
-            return sections_list[0].name
-        elif len(sections_list) == 2:
-            return f"{sections_list[0].name} and {sections_list[1].name}"
-        else:
-            names = [s.name for s in sections_list]
-            last = names.pop()
-            # Use Oxford comma: include a comma before the 'and' for clarity
-            return f"{', '.join(names)}, and {last}"
-    
-    # Clean school logo path (handle Windows slashes and strip static/)
-    logo_path = school.logo if school and school.logo else None
-    if logo_path:
-        logo_path = logo_path.replace("\\", "/").replace("static/", "", 1).lstrip("/")
-
-    # Prepare metadata
-    metadata = {
-        "class_name": class_room.class_room_name,
-        "term_name": SchoolTerm.query.get(term_id).term_name,
-        "exam_type": exam_type,
-        "total_students": len(students),
-        "total_subjects": len(subjects),
-        "assessment_types": assessment_types_list,
-        "assessment_type_orders": assessment_type_orders,
-        "school_name": school.school_name if school else "N/A",
-        "school_address": school.address if school else "N/A",
-        "school_logo": logo_path,
-        "school_motto": school.motto if school else "N/A",
-        "school_phone": school.phone if school else "N/A",
-        "formatted_sections": format_sections_for_display(grouped_sections),
-        "form_master": f"{class_room.form_teacher.first_name} {class_room.form_teacher.last_name}" if class_room.form_teacher else "N/A",
-        "academic_session": SchoolTerm.query.get(term_id).academic_session if term_id else "N/A"
-    }
-    
-    return broad_sheet_data, metadata
+
+    if job:
+        job.update(phase="loading")
+    broad_sheet_data, metadata = get_broad_sheet_data_logic(class_room_id, term_id, exam_type, config_id)
+
+    data, filename = build_broad_sheet_pdf(
+        broad_sheet_data, metadata, school, subjects_per_page, students_per_page, font_size, job)
+    return data, filename, 'application/pdf'
+
+
+def render_broad_sheet_job(job, **params):
+    return build_broad_sheet_export(job=job, **params)
+
+
+def _send_temporary_file(path, mimetype, filename):
+    """Stream a file from disk and delete it once the response is done"""
+    response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=filename)
+    # Passed-through file wrappers skip the response's close callbacks
+    response.direct_passthrough = False
+    response.call_on_close(lambda: os.path.exists(path) and os.remove(path))
+    return response
 
 
 @report_bp.route("/api/broad-sheet/export/<format>", methods=["POST"])
 @admin_or_staff_required
 def export_broad_sheet(format):
-    """Export broad sheet data in specified format"""
+    """Export broad sheet data in specified format
+
+    With "background": true the file is built as a job and 202 is returned
+    with the job id.
+    """
     try:
         if format.lower() not in ['pdf', 'excel']:
             return jsonify({"success": False, "error": "Invalid format. Use 'pdf' or 'excel'"}), 400
-        
-        from models.school import School
-        school = School.query.first()
-        
+
         data = request.json
         class_room_id = data.get('class_room_id')
         term_id = data.get('term_id')
-        exam_type = data.get('exam_type', 'all')
-        fmt = format.lower()
-        config_id = data.get('config_id')
-        subjects_per_page = data.get('subjects_per_page', 5)  # Default 5 subjects per page
-        students_per_page = data.get('students_per_page', 25) # Default 25 students per page
-        font_size = data.get('font_size', 9) # Default font size 9px
-        
+
         if not class_room_id or not term_id:
             return jsonify({"success": False, "error": "Missing required fields"}), 400
-            
-        print(f"EXPORTING BROAD SHEET: class={class_room_id}, term={term_id}, type={exam_type}, format={fmt}")
-        broad_sheet_data, metadata = get_broad_sheet_data_logic(class_room_id, term_id, exam_type, config_id)
-        
-        if format.lower() == 'pdf':
-            return export_broad_sheet_pdf(broad_sheet_data, metadata, school, subjects_per_page, students_per_page, font_size)
-        elif format.lower() == 'excel':
-            return export_broad_sheet_excel(broad_sheet_data, metadata, school, subjects_per_page, students_per_page)
-            
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({"success": False, "error": str(e)}), 500
 
+        params = dict(
+            fmt=format.lower(),
+            class_room_id=class_room_id,
+            term_id=term_id,
+            exam_type=data.get('exam_type', 'all'),
+            config_id=data.get('config_id'),
+            subjects_per_page=data.get('subjects_per_page', 5),  # Default 5 subjects per page
+            students_per_page=data.get('students_per_page', 25),  # Default 25 students per page
+            font_size=data.get('font_size', 9),  # Default font size 9px
+        )
 
-def export_broad_sheet_pdf(broad_sheet_data, metadata, school, subjects_per_page=5, students_per_page=25, font_size=9):
-    """Export broad sheet as PDF"""
-    try:
-        from weasyprint import HTML
-        import tempfile
-        import os
-        
-        # Generate HTML for the broad sheet with pagination
-        html_content = generate_broad_sheet_html(broad_sheet_data, metadata, school, subjects_per_page, students_per_page, font_size)
-        
-        # Convert to PDF
-        pdf_bytes = HTML(string=html_content).write_pdf()
-        
-        # Create filename
-        class_name = metadata["class_name"].replace(" ", "_")
-        term_name = metadata["term_name"].replace(" ", "_")
-        filename = f"Broad_Sheet_{class_name}_{term_name}.pdf"
-        
+        if data.get('background'):
+            job = report_job_queue.submit(
+                "broad_sheet", render_broad_sheet_job, session["user_id"], **params
+            )
+            return _job_accepted(job)
+
+        content, filename, mimetype = build_broad_sheet_export(**params)
+        if isinstance(content, str):
+            return _send_temporary_file(content, mimetype, filename)
         return send_file(
-            io.BytesIO(pdf_bytes),
-            mimetype='application/pdf',
+            io.BytesIO(content),
+            mimetype=mimetype,
             as_attachment=True,
             download_name=filename
         )
-    
+
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-def export_broad_sheet_excel(broad_sheet_data, metadata, school, subjects_per_page=5, students_per_page=25):
-    """Export broad sheet as Excel (Note: Excel export shows all subjects in one sheet)"""
+def build_broad_sheet_workbook(class_room_ids, term_id, exam_type="all", config_id=None,
+                               job=None, single_sheet_title=None):
+    """Stream the broad sheets of several classes into one workbook, one sheet per class
+
+    Students are written as they are read, so memory use stays flat however
+    many classes and students there are.
+
+    Returns:
+        path of the temporary .xlsx file
+    """
+    from services.broad_sheet import (
+        broad_sheet_metadata, class_subject_names, iter_broad_sheet_rows
+    )
+    from services.broad_sheet_excel import BroadSheetWorkbook, new_workbook_path
+    from utils.grade_sync import sync_class_term_if_stale
+
+    path = new_workbook_path()
     try:
-        import xlsxwriter
-        
-        # Create in-memory workbook
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-        worksheet = workbook.add_worksheet('Broad Sheet')
-        
-        # Define formats
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#D3D3D3',
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter'
-        })
-        
-        cell_format = workbook.add_format({
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter'
-        })
-        
-        # Write comprehensive header information
-        worksheet.write('A1', 'BROAD SHEET', 
-                       workbook.add_format({'bold': True, 'font_size': 16, 'align': 'center'}))
-        worksheet.write('A2', f'School: {metadata.get("school_name", "N/A")}', 
-                       workbook.add_format({'bold': True, 'align': 'center'}))
-        worksheet.write('A3', f'Address: {metadata.get("school_address", "N/A")}', 
-                       workbook.add_format({'bold': True, 'align': 'center'}))
-        worksheet.write('A4', f'Class: {metadata["class_name"]}', 
-                       workbook.add_format({'bold': True, 'align': 'center'}))
-        worksheet.write('A5', f'Form Master: {metadata.get("form_master", "N/A")}', 
-                       workbook.add_format({'bold': True, 'align': 'center'}))
-        worksheet.write('A6', f'Term: {metadata["term_name"]}', 
-                       workbook.add_format({'bold': True, 'align': 'center'}))
-        worksheet.write('A7', f'Session: {metadata.get("academic_session", "N/A")}', 
-                       workbook.add_format({'bold': True, 'align': 'center'}))
-        
-        # Add some spacing before the table
-        row = 8
-        
-        # Write headers
-        col = 0
-        
-        worksheet.write(row, col, 'S/N', header_format)
-        worksheet.write(row, col + 1, 'Admission No.', header_format)
-        worksheet.write(row, col + 2, 'Student Name', header_format)
-        
-        col_offset = 3
-        
-        # Get all unique subjects
-        subjects = set()
-        for student in broad_sheet_data:
-            subjects.update(student["subjects"].keys())
-        subjects = sorted(list(subjects))
-        
-        # Write subject headers
-        current_col = col_offset
-        subject_cols = {}
-        for subject in subjects:
-            subject_cols[subject] = current_col
-            worksheet.write(row, current_col, subject, header_format)
-            current_col += 1
-        
-        # Write student data
-        row = 4
-        for idx, student in enumerate(broad_sheet_data, 1):
-            worksheet.write(row, 0, idx, cell_format)
-            worksheet.write(row, 1, student["admission_number"], cell_format)
-            worksheet.write(row, 2, student["student_name"], cell_format)
-            
-            # Write subject scores
-            for subject, data in student["subjects"].items():
-                if subject in subject_cols:
-                    col_pos = subject_cols[subject]
-                    # Show total score
-                    score_text = f'{data["total_score"]}/{data["max_possible"]} ({data["percentage"]}%)'
-                    worksheet.write(row, col_pos, score_text, cell_format)
-            
-            row += 1
-        
+        workbook = BroadSheetWorkbook(path)
+        written = 0
+        if job:
+            job.update(phase="rendering")
+        for class_room_id in class_room_ids:
+            sync_class_term_if_stale(class_room_id, term_id)
+            metadata = broad_sheet_metadata(class_room_id, term_id, exam_type)
+            if job:
+                job.update(total=job.total + metadata["total_students"])
+
+            def on_row(count, done_before=written):
+                if job:
+                    job.update(completed=done_before + count)
+
+            written += workbook.add_sheet(
+                metadata,
+                class_subject_names(class_room_id),
+                iter_broad_sheet_rows(class_room_id, term_id, exam_type, config_id),
+                title=single_sheet_title,
+                on_row=on_row,
+            )
         workbook.close()
-        
-        # Create filename
-        class_name = metadata["class_name"].replace(" ", "_")
-        term_name = metadata["term_name"].replace(" ", "_")
-        filename = f"Broad_Sheet_{class_name}_{term_name}.xlsx"
-        
-        output.seek(0)
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def build_broad_sheet_excel(class_room_id, term_id, exam_type="all", config_id=None, job=None):
+    """Build a broad sheet workbook (all subjects in one sheet); returns (xlsx path, filename)"""
+    class_room = ClassRoom.query.get(class_room_id)
+    term = SchoolTerm.query.get(term_id)
+    if not class_room or not term:
+        raise ValueError("Class or term not found")
+
+    path = build_broad_sheet_workbook(
+        [class_room_id], term_id, exam_type, config_id, job, single_sheet_title='Broad Sheet'
+    )
+
+    # Create filename
+    class_name = class_room.class_room_name.replace(" ", "_")
+    term_name = term.term_name.replace(" ", "_")
+    filename = f"Broad_Sheet_{class_name}_{term_name}.xlsx"
+
+    return path, filename
+
+
+def render_broad_sheet_workbook_job(job, class_room_ids, term_id, exam_type="all", config_id=None):
+    term = SchoolTerm.query.get(term_id)
+    path = build_broad_sheet_workbook(class_room_ids, term_id, exam_type, config_id, job)
+    parts = ["Broad_Sheets", term.term_name.replace(' ', '_')]
+    if term.academic_session:
+        parts.append(term.academic_session.replace('/', '-'))
+    filename = "_".join(parts) + ".xlsx"
+    return path, filename, XLSX_MIMETYPE
+
+
+@report_bp.route("/api/broad-sheet/export/workbook", methods=["POST"])
+@admin_or_staff_required
+def export_broad_sheet_workbook():
+    """Export the broad sheets of several classes as one Excel workbook
+
+    Body: term_id, and optionally class_room_ids (every class when omitted),
+    exam_type, config_id and background. Each class gets its own sheet.
+    """
+    try:
+        data = request.json or {}
+        term_id = data.get('term_id')
+        if not term_id:
+            return jsonify({"success": False, "error": "Missing required fields"}), 400
+        if not SchoolTerm.query.get(term_id):
+            return jsonify({"success": False, "error": "Term not found"}), 404
+
+        class_room_ids = data.get('class_room_ids')
+        if class_room_ids:
+            found = {
+                class_room_id for (class_room_id,) in db.session.query(
+                    ClassRoom.class_room_id
+                ).filter(ClassRoom.class_room_id.in_(class_room_ids))
+            }
+            missing = [c for c in class_room_ids if c not in found]
+            if missing:
+                return jsonify({
+                    "success": False,
+                    "error": f"Class not found: {', '.join(missing)}"
+                }), 404
+        else:
+            class_room_ids = [
+                class_room_id for (class_room_id,) in db.session.query(
+                    ClassRoom.class_room_id
+                ).order_by(ClassRoom.class_room_name)
+            ]
+            if not class_room_ids:
+                return jsonify({"success": False, "error": "No classes to export"}), 404
+
+        params = dict(
+            class_room_ids=class_room_ids,
+            term_id=term_id,
+            exam_type=data.get('exam_type', 'all'),
+            config_id=data.get('config_id'),
         )
-    
+
+        if data.get('background'):
+            job = report_job_queue.submit(
+                "broad_sheet_workbook", render_broad_sheet_workbook_job, session["user_id"],
+                **params
+            )
+            return _job_accepted(job)
+
+        path, filename, mimetype = render_broad_sheet_workbook_job(None, **params)
+        return _send_temporary_file(path, mimetype, filename)
+
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+BROAD_SHEET_PAGE_BREAK = '<div style="page-break-before: always;"></div>'
+
+
+def build_broad_sheet_pdf(broad_sheet_data, metadata, school, subjects_per_page=5, students_per_page=25, font_size=9, job=None):
+    """Render a broad sheet to PDF; returns (pdf bytes, filename)
+
+    Pages (one block of subjects x students each) are built and rendered a
+    few at a time in the PDF worker pool and merged, so a large sheet is
+    neither one long render call nor all in memory; job progress counts pages.
+    """
+    from services.pdf_renderer import render_documents
+
+    engine = _pdf_engine()
+    if not engine:
+        raise RuntimeError("No PDF generation library available")
+
+    # Generate HTML for the broad sheet with pagination
+    frame, page_count, pages = generate_broad_sheet_pages(
+        broad_sheet_data, metadata, school, subjects_per_page, students_per_page, font_size)
+    if job:
+        job.update(total=page_count, completed=0, phase="rendering")
+
+    result = render_documents(
+        pages,
+        engine=engine[0],
+        frame=frame,
+        progress=(lambda done: job.update(completed=done)) if job else None,
+    )
+    if result.failed:
+        # A broad sheet with pages missing would silently drop students
+        raise RuntimeError(
+            "Could not render broad sheet page(s) "
+            + ", ".join(str(index + 1) for index in result.failed)
+        )
+
+    # Create filename
+    class_name = metadata["class_name"].replace(" ", "_")
+    term_name = metadata["term_name"].replace(" ", "_")
+    filename = f"Broad_Sheet_{class_name}_{term_name}.pdf"
+
+    return result.pdf, filename
+
+
 def generate_broad_sheet_html(broad_sheet_data, metadata, school, subjects_per_page=5, students_per_page=25, font_size=9):
     """Generate HTML for broad sheet with subject and student pagination and dynamic font size"""
+    (prefix, suffix), _, pages = generate_broad_sheet_pages(
+        broad_sheet_data, metadata, school, subjects_per_page, students_per_page, font_size)
+    return prefix + BROAD_SHEET_PAGE_BREAK.join(pages) + suffix
+
+
+def generate_broad_sheet_pages(broad_sheet_data, metadata, school, subjects_per_page=5, students_per_page=25, font_size=9):
+    """Broad sheet HTML split into pages (one block of subjects x students each)
+
+    Returns:
+        ((prefix, suffix), page count, pages): the pages are body fragments
+        that go between prefix and suffix, so they can be rendered in chunks;
+        they are generated as they are read
+    """
     from datetime import datetime
     import math
     
@@ -1770,11 +1396,12 @@ def generate_broad_sheet_html(broad_sheet_data, metadata, school, subjects_per_p
 
     # Resolve school logo path to a data URI or safe URL using ReportGenerator helpers
     try:
-        from services.report_generator import ReportGenerator
+        from services.report_generator import ReportGenerator, IMAGE_RENDER_SCALE
         logo_src = ''
         if metadata.get('school_logo'):
-            # Prefer embedding the image as data URI so PDF renderer always finds it
-            logo_src = ReportGenerator._embed_image(metadata.get('school_logo'))
+            # Prefer embedding the image as data URI so PDF renderer always finds it,
+            # scaled for the 18mm (about 68px) logo box
+            logo_src = ReportGenerator._embed_image(metadata.get('school_logo'), max_px=68 * IMAGE_RENDER_SCALE)
             # If embedding didn't produce a data URI, fall back to URL path
             if not logo_src.startswith('data:') and not logo_src.startswith('http'):
                 logo_src = '/' + str(metadata.get('school_logo')).lstrip('/')
@@ -1797,8 +1424,19 @@ def generate_broad_sheet_html(broad_sheet_data, metadata, school, subjects_per_p
         student_chunks = [broad_sheet_data[i:i + students_per_page] for i in range(0, total_students, students_per_page)]
         
     total_pages = len(subject_chunks) * len(student_chunks)
-    
-    html = f"""
+
+    # Assessment columns of each subject, from every student so that all
+    # pages of a subject share the same header
+    subject_assessment_map = {}
+    for subject in subjects:
+        atype_set = set()
+        for student in broad_sheet_data:
+            if subject in student["subjects"] and 'scores' in student["subjects"][subject]:
+                for s in student["subjects"][subject]['scores']:
+                    atype_set.add(s['assessment_type'])
+        subject_assessment_map[subject] = sorted(atype_set)
+
+    prefix = f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -1962,121 +1600,113 @@ def generate_broad_sheet_html(broad_sheet_data, metadata, school, subjects_per_p
     </head>
     <body>
     """
-
-    current_page = 0
-    # Outer loop: Student Groups (usually people want to see Page 1, Page 2 for first group of subjects first)
-    # Actually, let's do: For each set of subjects, show all students.
-    for s_idx, chunk_subjects in enumerate(subject_chunks):
-        for st_idx, chunk_students in enumerate(student_chunks):
-            current_page += 1
-            if current_page > 1:
-                html += '<div style="page-break-before: always;"></div>'
-
-            html += f"""
-            <div class="header">
-                <div class="header-banner">
-                    <div class="logo-placeholder">
-                        { f'<img src="{logo_src}" class="logo-img">' if logo_src else '<span style="color:#4f46e5; font-weight:bold; font-size:24pt;">🏫</span>' }
-                    </div>
-                    <div class="school-text">
-                        <h1 class="school-name">{school_name}</h1>
-                        <div class="school-motto">Motto: {metadata.get("school_motto", "N/A")}</div>
-                        <div style="margin-top: 1mm; font-size: {font_size + 0}px; color: #eef2ff;">
-                            { metadata.get("formatted_sections") if metadata.get("formatted_sections") else "" }
+    def iter_pages():
+        # Built as they are rendered, so a large sheet is never all in memory
+        current_page = 0
+        # Outer loop: Student Groups (usually people want to see Page 1, Page 2 for first group of subjects first)
+        # Actually, let's do: For each set of subjects, show all students.
+        for s_idx, chunk_subjects in enumerate(subject_chunks):
+            for st_idx, chunk_students in enumerate(student_chunks):
+                current_page += 1
+
+                html = f"""
+                <div class="header">
+                    <div class="header-banner">
+                        <div class="logo-placeholder">
+                            { f'<img src="{logo_src}" class="logo-img">' if logo_src else '<span style="color:#4f46e5; font-weight:bold; font-size:24pt;">🏫</span>' }
+                        </div>
+                        <div class="school-text">
+                            <h1 class="school-name">{school_name}</h1>
+                            <div class="school-motto">Motto: {metadata.get("school_motto", "N/A")}</div>
+                            <div style="margin-top: 1mm; font-size: {font_size + 0}px; color: #eef2ff;">
+                                { metadata.get("formatted_sections") if metadata.get("formatted_sections") else "" }
+                            </div>
                         </div>
                     </div>
+                    <div class="report-title">OFFICIAL BROAD SHEET</div>
+                    <div class="meta-info">
+                        <div><strong>CLASS:</strong> {metadata_class_name}</div>
+                        <div><strong>TERM:</strong> {term_name}</div>
+                        <div><strong>SESSION:</strong> {academic_session}</div>
+                        <div><strong>PAGE {current_page} OF {total_pages}</strong></div>
+                    </div>
                 </div>
-                <div class="report-title">OFFICIAL BROAD SHEET</div>
-                <div class="meta-info">
-                    <div><strong>CLASS:</strong> {metadata_class_name}</div>
-                    <div><strong>TERM:</strong> {term_name}</div>
-                    <div><strong>SESSION:</strong> {academic_session}</div>
-                    <div><strong>PAGE {current_page} OF {total_pages}</strong></div>
-                </div>
-            </div>
                 
-            <table>
-                <thead>
-                    <tr>
-                        <th rowspan="2" class="sn-col">S/N</th>
-                        <th rowspan="2" class="adm-col">Adm No.</th>
-                        <th rowspan="2" class="student-name">Student Name</th>"""
-
-            # Pre-calculate assessment mapping for this chunk of subjects
-            subject_assessment_map = {}
-            for subject in chunk_subjects:
-                atype_set = set()
-                for student in broad_sheet_data: # Check ALL students to ensure header consistency
-                    if subject in student["subjects"] and 'scores' in student["subjects"][subject]:
-                        for s in student["subjects"][subject]['scores']:
-                            atype_set.add(s['assessment_type'])
-                
-                sorted_types = sorted(list(atype_set))
-                subject_assessment_map[subject] = sorted_types
-                colspan = len(sorted_types) + 1 # +1 for Total
-                html += f'<th class="subject-header" colspan="{colspan}">{subject.upper()}</th>'
-
-            html += """
-                    </tr>
-                    <tr>"""
-
-            for subject in chunk_subjects:
-                for atype in subject_assessment_map[subject]:
-                    html += f'<th class="assessment-header">{format_assess(atype)}</th>'
-                html += '<th class="assessment-header total-col">TOTAL</th>'
-
-            html += """
-                    </tr>
-                </thead>
-                <tbody>"""
-
-            for idx, student in enumerate(chunk_students, 1 + st_idx * students_per_page):
-                html += f"""
-                    <tr>
-                        <td class="sn-col">{idx}</td>
-                        <td class="adm-col">{student['admission_number'] or ''}</td>
-                        <td class="student-name text-left">{student['student_name'].upper()}</td>"""
+                <table>
+                    <thead>
+                        <tr>
+                            <th rowspan="2" class="sn-col">S/N</th>
+                            <th rowspan="2" class="adm-col">Adm No.</th>
+                            <th rowspan="2" class="student-name">Student Name</th>"""
 
                 for subject in chunk_subjects:
-                    if subject in student["subjects"]:
-                        s_data = student["subjects"][subject]
-                        score_lookup = {s['assessment_type']: s for s in s_data.get('scores', [])}
+                    colspan = len(subject_assessment_map[subject]) + 1 # +1 for Total
+                    html += f'<th class="subject-header" colspan="{colspan}">{subject.upper()}</th>'
+
+                html += """
+                        </tr>
+                        <tr>"""
+
+                for subject in chunk_subjects:
+                    for atype in subject_assessment_map[subject]:
+                        html += f'<th class="assessment-header">{format_assess(atype)}</th>'
+                    html += '<th class="assessment-header total-col">TOTAL</th>'
+
+                html += """
+                        </tr>
+                    </thead>
+                    <tbody>"""
+
+                for idx, student in enumerate(chunk_students, 1 + st_idx * students_per_page):
+                    html += f"""
+                        <tr>
+                            <td class="sn-col">{idx}</td>
+                            <td class="adm-col">{student['admission_number'] or ''}</td>
+                            <td class="student-name text-left">{student['student_name'].upper()}</td>"""
+
+                    for subject in chunk_subjects:
+                        if subject in student["subjects"]:
+                            s_data = student["subjects"][subject]
+                            score_lookup = {s['assessment_type']: s for s in s_data.get('scores', [])}
                         
-                        for atype in subject_assessment_map[subject]:
-                            if atype in score_lookup:
-                                score_val = score_lookup[atype]['score']
-                                # Format as integer if possible
-                                try:
-                                    if float(score_val) == int(float(score_val)):
-                                        score_val = int(float(score_val))
-                                except: pass
-                                html += f'<td class="score-val">{score_val}</td>'
-                            else:
-                                html += "<td>-</td>"
+                            for atype in subject_assessment_map[subject]:
+                                if atype in score_lookup:
+                                    score_val = score_lookup[atype]['score']
+                                    # Format as integer if possible
+                                    try:
+                                        if float(score_val) == int(float(score_val)):
+                                            score_val = int(float(score_val))
+                                    except: pass
+                                    html += f'<td class="score-val">{score_val}</td>'
+                                else:
+                                    html += "<td>-</td>"
                         
-                        total_score = s_data['total_score']
-                        try:
-                            if float(total_score) == int(float(total_score)):
-                                total_score = int(float(total_score))
-                        except: pass
-                        html += f'<td class="total-val total-col">{total_score}</td>'
-                    else:
-                        for _ in range(len(subject_assessment_map[subject]) + 1):
-                            html += "<td>-</td>"
+                            total_score = s_data['total_score']
+                            try:
+                                if float(total_score) == int(float(total_score)):
+                                    total_score = int(float(total_score))
+                            except: pass
+                            html += f'<td class="total-val total-col">{total_score}</td>'
+                        else:
+                            for _ in range(len(subject_assessment_map[subject]) + 1):
+                                html += "<td>-</td>"
                 
-                html += "</tr>"
-
-            html += """
-                </tbody>
-            </table>
-            """
-
-    html += f"""
-        <div class="footer-strip">
-            <div>&copy; {datetime.now().year} CBT Mini School System</div>
-            <div>Generated on: {datetime_str}</div>
-        </div>
+                    html += "</tr>"
+
+                html += """
+                    </tbody>
+                </table>
+                """
+                if current_page == total_pages:
+                    html += f"""
+                    <div class="footer-strip">
+                        <div>&copy; {datetime.now().year} CBT Mini School System</div>
+                        <div>Generated on: {datetime_str}</div>
+                    </div>"""
+                yield html
+
+    suffix = """
     </body>
     </html>"""
-    return html
+    return (prefix, suffix), total_pages, iter_pages()
 
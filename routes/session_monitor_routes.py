@@ -2,6 +2,10 @@ from flask import render_template, redirect, url_for, session, jsonify
 from models import db, User
 from models.exam_session import ExamSession
 from models.exam import Exam
+from services.question_bank import get_exam_question_bank
+from services.exam_manifest import manifest_questions, filter_served_answers
+from services.session_store import exam_session_buffer
+from utils.current_user import get_current_user
 from functools import wraps
 
 
@@ -12,7 +16,7 @@ def require_admin(f):
         if 'user_id' not in session:
             return redirect(url_for('login'))
         
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user or current_user.role != 'admin':
             return redirect(url_for('dashboard'))
         
@@ -27,7 +31,7 @@ def session_monitor_routes(app):
     @require_admin
     def exam_sessions_monitor():
         """View all active exam sessions"""
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         
         # Get all active sessions
         active_sessions = ExamSession.query.filter_by(is_active=True).order_by(
@@ -62,8 +66,14 @@ def session_monitor_routes(app):
             exam = Exam.query.get(exam_session.exam_id)
             
             if student and exam:
-                answered_count = len(exam_session.get_answers())
-                time_remaining_minutes = exam_session.time_remaining // 60
+                # Overlay autosaves that have not been flushed yet
+                session_data = exam_session_buffer.session_dict(exam_session)
+                answers = session_data['answers']
+                question_order = session_data['question_order']
+                if exam_session.has_manifest():
+                    answers = filter_served_answers(answers, question_order)
+                answered_count = len(answers)
+                time_remaining_minutes = session_data['time_remaining'] // 60
                 
                 sessions_data.append({
                     'id': exam_session.id,
@@ -71,9 +81,10 @@ def session_monitor_routes(app):
                     'exam_name': exam.name,
                     'subject': exam.subject.subject_name,
                     'answered_questions': answered_count,
-                    'current_question': exam_session.current_question_index + 1,
+                    'total_questions': len(question_order),
+                    'current_question': session_data['current_question_index'] + 1,
                     'time_remaining': f"{time_remaining_minutes} min",
-                    'last_activity': exam_session.last_activity.strftime("%Y-%m-%d %H:%M:%S"),
+                    'last_activity': session_data['last_activity'],
                     'started_at': exam_session.started_at.strftime("%Y-%m-%d %H:%M:%S")
                 })
         
@@ -83,6 +94,59 @@ def session_monitor_routes(app):
             'total_active': len(sessions_data)
         })
     
+    @app.route('/admin/exam-sessions/<session_id>/review')
+    @require_admin
+    def exam_session_review(session_id):
+        """Questions served in a session, in the order the student saw them"""
+        exam_session = ExamSession.query.get(session_id)
+        if not exam_session:
+            return jsonify({'success': False, 'message': 'Session not found'}), 404
+
+        if not exam_session.has_manifest():
+            return jsonify({
+                'success': False,
+                'message': 'No record of served questions for this session'
+            }), 404
+
+        answers = exam_session_buffer.session_dict(exam_session)['answers']
+        questions = manifest_questions(
+            get_exam_question_bank(exam_session.exam),
+            exam_session.get_question_order(),
+            exam_session.get_option_order()
+        )
+
+        questions_data = []
+        for question in questions:
+            answer = answers.get(question.id)
+            questions_data.append({
+                'id': question.id,
+                'question_text': question.question_text,
+                'question_type': question.question_type,
+                'correct_answer': question.correct_answer,
+                'student_answer': answer,
+                'options': [
+                    {
+                        'id': option.id,
+                        'text': option.text,
+                        'is_correct': option.is_correct,
+                        'selected': option.id == answer
+                    }
+                    for option in question.options
+                ]
+            })
+
+        return jsonify({
+            'success': True,
+            'session': {
+                'id': exam_session.id,
+                'student_id': exam_session.student_id,
+                'exam_id': exam_session.exam_id,
+                'is_completed': exam_session.is_completed
+            },
+            'questions': questions_data,
+            'total_questions': len(questions_data)
+        })
+
     @app.route('/admin/exam-sessions/stats')
     @require_admin
     def exam_sessions_stats():
@@ -9,6 +9,63 @@ from models.subject import Subject
 from models.class_room import ClassRoom
 from models.school_term import SchoolTerm
 from routes.dashboard import staff_required
+from utils.current_user import get_current_user
+from services.question_bank import invalidate_question_bank
+from services.question_import import import_questions
+from services.question_preview import (
+    question_preview_store,
+    page_response,
+    primed,
+    upload_response,
+)
+
+
+def _upload_target_error(current_user, subject_id, class_room_id, term_id, exam_type_id):
+    """
+    Check the subject, class and term a staff upload goes to.
+
+    Returns:
+        an error response, or None when the teacher may upload there
+    """
+    from models.associations import teacher_subject
+
+    # Validate required fields
+    if not subject_id or not class_room_id or not term_id or not exam_type_id:
+        return jsonify({
+            "success": False,
+            "message": "Subject, Class, Term, and Exam Type are required"
+        }), 400
+
+    # Validate subject-class combination is assigned to this teacher
+    assignment = (
+        db.session.query(teacher_subject)
+        .filter_by(
+            teacher_id=current_user.id,
+            subject_id=subject_id,
+            class_room_id=class_room_id
+        )
+        .first()
+    )
+    if not assignment:
+        return jsonify({
+            "success": False,
+            "message": "You are not assigned to this subject-class combination"
+        }), 403
+
+    subject = Subject.query.get(subject_id)
+    if not subject:
+        return jsonify({"success": False, "message": "Invalid subject"}), 400
+
+    class_room = ClassRoom.query.get(class_room_id)
+    if not class_room:
+        return jsonify({"success": False, "message": "Invalid class"}), 400
+
+    # Validate term exists
+    term = SchoolTerm.query.get(term_id)
+    if not term:
+        return jsonify({"success": False, "message": "Invalid term"}), 400
+    return None
+
 
 
 def staff_routes(app):
@@ -31,7 +88,7 @@ def staff_routes(app):
             flash("Access denied. You can only access your own pages.", "error")
             return redirect(url_for("login"))
 
-        current_user = User.query.get(user_id)
+        current_user = get_current_user()
         if not current_user:
             flash("User not found.", "error")
             return redirect(url_for("login"))
@@ -316,45 +373,15 @@ def staff_routes(app):
 
                 # Get existing grades for these students if term is selected
                 if current_term:
-                    # Auto-sync CBT scores if not already synced
-                    from utils.grade_sync import sync_all_exam_records
-                    from models.exam_record import ExamRecord
-                    
-                    # Check for ALL exam records for this combination
-                    all_exam_records = ExamRecord.query.filter_by(
-                        subject_id=subject_id,
-                        class_room_id=class_id,
-                        school_term_id=current_term.term_id
-                    ).all()
-                    
-                    # print(f"Found {len(all_exam_records)} exam records for subject/class/term")
-                    
-                    if all_exam_records:
-                        # Check if there are unsynced exam records
-                        unsynced_records = ExamRecord.query.filter_by(
-                            subject_id=subject_id,
-                            class_room_id=class_id,
-                            school_term_id=current_term.term_id
-                        ).filter(
-                            ~ExamRecord.id.in_(
-                                db.session.query(Grade.exam_record_id).filter(
-                                    Grade.exam_record_id.isnot(None)
-                                )
-                            )
-                        ).all()
-                        
-                        # print(f"Found {len(unsynced_records)} unsynced exam records")
-                        
-                        if unsynced_records:
-                            # print(f"Auto-syncing {len(unsynced_records)} CBT exam records...")
-                            try:
-                                sync_result = sync_all_exam_records(subject_id, class_id, current_term.term_id)
-                                # print(f"Sync result: {sync_result}")
-                            except Exception as e:
-                                # print(f"Error during auto-sync: {str(e)}")
-                                import traceback
-                                traceback.print_exc()
-                    
+                    # Sync CBT scores only if exam records changed since the last sync
+                    from utils.grade_sync import sync_class_term_if_stale
+                    try:
+                        sync_class_term_if_stale(class_id, current_term.term_id)
+                    except Exception as e:
+                        # print(f"Error during auto-sync: {str(e)}")
+                        import traceback
+                        traceback.print_exc()
+
                     grades = Grade.query.filter_by(
                         subject_id=subject_id,
                         class_room_id=class_id,
@@ -836,7 +863,7 @@ def staff_routes(app):
         if session.get("user_id") != user_id:
             return jsonify({"success": False, "message": "Access denied"}), 403
 
-        user = User.query.get(user_id)
+        user = get_current_user()
         if not user:
             return jsonify({"success": False, "message": "User not found"}), 404
 
@@ -882,7 +909,7 @@ def staff_routes(app):
             flash("Access denied. You can only access your own pages.", "error")
             return redirect(url_for("login"))
 
-        current_user = User.query.get(user_id)
+        current_user = get_current_user()
         if not current_user:
             flash("User not found.", "error")
             return redirect(url_for("login"))
@@ -1195,7 +1222,7 @@ def staff_routes(app):
             flash("Access denied. You can only access your own pages.", "error")
             return redirect(url_for("login"))
 
-        current_user = User.query.get(user_id)
+        current_user = get_current_user()
         if not current_user:
             flash("User not found.", "error")
             return redirect(url_for("login"))
@@ -1265,7 +1292,7 @@ def staff_routes(app):
                 )
 
             # Get current staff user from session
-            current_user = User.query.get(session["user_id"])
+            current_user = get_current_user()
             if not current_user:
                 return (
                     jsonify({"success": False, "message": "Unauthorized access"}),
@@ -1454,6 +1481,7 @@ def staff_routes(app):
                         db.session.add(option)
 
             db.session.commit()
+            invalidate_question_bank(subject_id, class_room_id)
 
             return (
                 jsonify(
@@ -1663,6 +1691,64 @@ def staff_routes(app):
                 500,
             )
 
+    @app.route("/staff/questions_preview/upload", methods=["POST"])
+    @staff_required
+    def staff_upload_questions_preview():
+        """Dry run of a bulk upload: parse and check a file without saving it
+
+        Same form as /staff/bulk_upload_questions. ?format=ndjson streams the
+        results as the file is parsed; otherwise the summary and the first
+        ?limit= questions are returned. The token in either response is then
+        posted to /staff/bulk_upload_questions as preview_token.
+        """
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({"success": False, "message": "Unauthorized access"}), 403
+
+        defaults = {
+            field: request.form.get(field)
+            for field in ("subject_id", "class_room_id", "term_id", "exam_type_id")
+        }
+        error = _upload_target_error(current_user, **defaults)
+        if error:
+            return error
+
+        file = request.files.get("file")
+        if not file or file.filename == '':
+            return jsonify({"success": False, "message": "No file uploaded"}), 400
+
+        from utils.question_parser import detect_file_type, iter_questions_file
+
+        try:
+            # Read now: the upload is closed before a streamed response ends
+            rows = primed(iter_questions_file(file.read(), detect_file_type(file.filename)))
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        preview = question_preview_store.create(
+            current_user.id, defaults=defaults, teacher_id=current_user.id,
+            filename=file.filename,
+        )
+        return upload_response(
+            preview, rows,
+            stream=request.args.get("format") == "ndjson",
+            limit=request.args.get("limit", 50, type=int),
+        )
+
+    @app.route("/staff/questions_preview/<token>")
+    @staff_required
+    def staff_questions_preview_page(token):
+        """A page (?offset=&limit=) of a previewed upload, or ?format=ndjson for the rest"""
+        preview = question_preview_store.get(token, session.get("user_id"))
+        if not preview:
+            return jsonify({"success": False, "message": "Preview not found or expired"}), 404
+        return page_response(
+            preview,
+            offset=request.args.get("offset", 0, type=int),
+            limit=request.args.get("limit", 50, type=int),
+            stream=request.args.get("format") == "ndjson",
+        )
+
     @app.route("/staff/bulk_upload_questions/<user_id>", methods=["GET", "POST"])
     @staff_required
     def staff_bulk_upload_questions(user_id):
@@ -1672,14 +1758,12 @@ def staff_routes(app):
             return jsonify({"success": False, "message": "Access denied"}), 403
 
         if request.method == "POST":
+            preview = None
             try:
-                from utils.question_parser import parse_questions_file
-                from models.question import Question, Option
-                from models.associations import teacher_subject, teacher_classroom
-                from models.school_term import SchoolTerm
+                from utils.question_parser import iter_questions_file
                 
                 # Get current staff user from session
-                current_user = User.query.get(session["user_id"])
+                current_user = get_current_user()
                 if not current_user:
                     return jsonify({"success": False, "message": "Unauthorized access"}), 403
                 
@@ -1689,176 +1773,72 @@ def staff_routes(app):
                 term_id = request.form.get("term_id")
                 exam_type_id = request.form.get("exam_type_id")
                 
-                # Validate required fields
-                if not subject_id or not class_room_id or not term_id or not exam_type_id:
-                    return jsonify({
-                        "success": False,
-                        "message": "Subject, Class, Term, and Exam Type are required"
-                    }), 400
-                
-                # Check if file was uploaded
-                if "file" not in request.files:
-                    return jsonify({
-                        "success": False,
-                        "message": "No file uploaded"
-                    }), 400
-                
-                file = request.files["file"]
-                if not file or file.filename == '':
-                    return jsonify({
-                        "success": False,
-                        "message": "No file selected"
-                    }), 400
-                
-                # Validate subject-class combination is assigned to this teacher
-                assignment = (
-                    db.session.query(teacher_subject)
-                    .filter_by(
+                # Questions already parsed and checked by the preview
+                preview_token = request.form.get("preview_token") or \
+                    (request.get_json(silent=True) or {}).get("preview_token")
+                if preview_token:
+                    preview = question_preview_store.claim(preview_token, current_user.id)
+                    if not preview:
+                        return jsonify({
+                            "success": False,
+                            "message": "Preview not found or expired"
+                        }), 404
+                    subject_id = preview.defaults["subject_id"]
+                    class_room_id = preview.defaults["class_room_id"]
+                    term_id = preview.defaults["term_id"]
+                    exam_type_id = preview.defaults["exam_type_id"]
+
+                error = _upload_target_error(
+                    current_user, subject_id, class_room_id, term_id, exam_type_id)
+                if error:
+                    if preview:
+                        question_preview_store.restore(preview)
+                    return error
+
+                if not preview_token:
+                    # Check if file was uploaded
+                    if "file" not in request.files:
+                        return jsonify({
+                            "success": False,
+                            "message": "No file uploaded"
+                        }), 400
+
+                    file = request.files["file"]
+                    if not file or file.filename == '':
+                        return jsonify({
+                            "success": False,
+                            "message": "No file selected"
+                        }), 400
+
+                # Parse and import the file a batch of questions at a time
+                try:
+                    result = import_questions(
+                        preview.rows if preview else iter_questions_file(file),
+                        defaults={
+                            "subject_id": subject_id,
+                            "class_room_id": class_room_id,
+                            "term_id": term_id,
+                            "exam_type_id": exam_type_id,
+                        },
                         teacher_id=current_user.id,
-                        subject_id=subject_id,
-                        class_room_id=class_room_id
                     )
-                    .first()
-                )
-                if not assignment:
-                    return jsonify({
-                        "success": False,
-                        "message": "You are not assigned to this subject-class combination"
-                    }), 403
-
-                subject = Subject.query.get(subject_id)
-                if not subject:
-                    return jsonify({"success": False, "message": "Invalid subject"}), 400
-
-                class_room = ClassRoom.query.get(class_room_id)
-                if not class_room:
-                    return jsonify({"success": False, "message": "Invalid class"}), 400
+                except ValueError as e:
+                    if preview:
+                        question_preview_store.restore(preview)
+                    return jsonify({"success": False, "message": str(e)}), 400
 
-                # Validate term exists
-                term = SchoolTerm.query.get(term_id)
-                if not term:
-                    return jsonify({"success": False, "message": "Invalid term"}), 400
-                
-                # Parse the file using our universal parser
-                questions_data, error = parse_questions_file(file)
-                
-                if error:
-                    return jsonify({"success": False, "message": error}), 400
-                
-                if not questions_data:
+                if not result.rows:
                     return jsonify({
                         "success": False,
                         "message": "No valid questions found in the file"
                     }), 400
 
-                created_questions = []
-                errors = []
-
-                # Process each question
-                for i, question_data in enumerate(questions_data, 1):
-                    try:
-                        # Extract question data
-                        question_text = question_data.get("question_text", "").strip()
-                        question_type = question_data.get("question_type", "").strip().lower()
-                        options_data = question_data.get("options", [])
-                        correct_answer = question_data.get("correct_answer", "")
-
-                        # Validation
-                        if not question_text:
-                            errors.append(f"Question {i}: Question text is required")
-                            continue
-
-                        if not question_type:
-                            errors.append(f"Question {i}: Question type is required")
-                            continue
-
-                        # Validate question type
-                        valid_types = ["mcq", "true_false", "short_answer"]
-                        if question_type not in valid_types:
-                            errors.append(f"Question {i}: Invalid question type '{question_type}'. Must be one of: {', '.join(valid_types)}")
-                            continue
-
-                        # For MCQ and True/False questions, validate options
-                        if question_type in ["mcq", "true_false"]:
-                            if not options_data or len(options_data) == 0:
-                                errors.append(f"Question {i}: Options are required for {question_type} questions")
-                                continue
-
-                            # Check that there's at least one correct answer
-                            correct_options = [opt for opt in options_data if opt.get("is_correct", False)]
-                            if not correct_options:
-                                errors.append(f"Question {i}: At least one correct option is required")
-                                continue
-
-                            # For true_false, ensure exactly 2 options
-                            if question_type == "true_false" and len(options_data) != 2:
-                                errors.append(f"Question {i}: True/False questions must have exactly 2 options")
-                                continue
-
-                        # Create the question
-                        new_question = Question()
-                        new_question.question_text = question_text
-                        new_question.question_type = question_type
-                        new_question.subject_id = subject_id
-                        new_question.teacher_id = current_user.id
-                        new_question.class_room_id = class_room_id
-                        new_question.term_id = term_id
-                        new_question.exam_type_id = exam_type_id
-                        
-                        # Save math and image data if present
-                        new_question.has_math = question_data.get("has_math", False)
-                        new_question.question_image = question_data.get("question_image")
-
-                        # For short answer questions, save the correct answer
-                        if question_type == "short_answer":
-                            new_question.correct_answer = correct_answer
-
-                        db.session.add(new_question)
-                        db.session.flush()  # Get the question ID
-
-                        # Create options if this is an MCQ or True/False question
-                        if question_type in ["mcq", "true_false"]:
-                            for j, option_data in enumerate(options_data):
-                                option_text = option_data.get("text", "").strip()
-                                is_correct = option_data.get("is_correct", False)
-
-                                if option_text:
-                                    option = Option()
-                                    option.text = option_text
-                                    option.is_correct = is_correct
-                                    option.order = j
-                                    option.question_id = new_question.id
-                                    
-                                    # Save math and image data for options
-                                    option.has_math = option_data.get("has_math", False)
-                                    option.option_image = option_data.get("option_image")
-                                    
-                                    db.session.add(option)
-
-                        db.session.commit()
-                        created_questions.append(new_question.id)
-
-                    except Exception as e:
-                        db.session.rollback()
-                        errors.append(f"Question {i}: Error creating question - {str(e)}")
-                        continue
-
-                # Prepare response
-                response_data = {
-                    "success": True,
-                    "message": f"Successfully created {len(created_questions)} questions",
-                    "created_count": len(created_questions),
-                    "error_count": len(errors),
-                }
-
-                if errors:
-                    response_data["message"] += f" with {len(errors)} errors"
-                    response_data["errors"] = errors
-
-                return jsonify(response_data), 200
+                return jsonify(result.to_dict()), 200
 
             except Exception as e:
                 db.session.rollback()
+                if preview:
+                    question_preview_store.restore(preview)
                 # print(f"Error processing bulk upload: {str(e)}")
                 import traceback
                 traceback.print_exc()
@@ -1868,7 +1848,7 @@ def staff_routes(app):
                 }), 500
 
         # GET request - render the bulk upload questions page
-        current_user = User.query.get(session["user_id"])
+        current_user = get_current_user()
         if not current_user:
             return redirect(url_for("login"))
 
@@ -1932,7 +1912,7 @@ def staff_routes(app):
             flash("Access denied. You can only access your own pages.", "error")
             return redirect(url_for("login"))
 
-        current_user = User.query.get(user_id)
+        current_user = get_current_user()
         if not current_user:
             flash("User not found.", "error")
             return redirect(url_for("login"))
@@ -1947,7 +1927,7 @@ def staff_routes(app):
             flash("Access denied. You can only access your own pages.", "error")
             return redirect(url_for("login"))
 
-        current_user = User.query.get(user_id)
+        current_user = get_current_user()
         if not current_user:
             flash("User not found.", "error")
             return redirect(url_for("login"))
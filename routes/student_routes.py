@@ -6,11 +6,25 @@ from models.question import Question
 from models.subject import Subject
 from models.school_term import SchoolTerm
 from models.permissions import Permission
-from models.associations import student_subject, student_exam, class_subject
+from models.associations import student_exam
+from services.question_bank import get_exam_question_bank
+from services.exam_manifest import get_or_create_manifest, serialize_manifest, filter_served_answers
+from services.session_store import exam_session_buffer
+from services.exam_scoring import score_submission
+from services.exam_access import MESSAGES, check_exam_access, mark_exam_completed
+from utils.grade_sync import sync_exam_record_to_grade
+from utils.current_user import get_current_user
 from datetime import datetime
 import random
 
 
+# Exam access refusals shown on the instruction and test pages
+PAGE_MESSAGES = {
+    "not_enrolled": "You are not enrolled in this subject",
+    "completed": "You have already completed this exam",
+}
+
+
 def student_route(app):
     @app.route('/student/profile')
     def student_profile():
@@ -28,7 +42,7 @@ def student_route(app):
         if 'user_id' not in session:
             return redirect(url_for('login'))
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return redirect(url_for('login'))
 
@@ -37,58 +51,10 @@ def student_route(app):
             flash('Exam not found', 'error')
             return redirect(url_for('student_dashboard'))
 
-        # Check if this is a demo user
-        is_demo_user = "demo" in current_user.username.lower()
-
-        if not is_demo_user:
-            # Regular students - apply normal checks
-            # Check if student is enrolled in the exam's subject
-            enrollment = db.session.execute(
-                db.select(student_subject).where(
-                    student_subject.c.student_id == current_user.id,
-                    student_subject.c.subject_id == exam.subject_id
-                )
-            ).fetchone()
-            # print("Enrollment: ", enrollment)
-
-            if not enrollment:
-                # Check if subject is assigned to student's class
-                is_class_subject = db.session.execute(
-                    db.select(class_subject).where(
-                        class_subject.c.class_room_id == current_user.class_room_id,
-                        class_subject.c.subject_id == exam.subject_id
-                    )
-                ).fetchone()
-
-                if is_class_subject:
-                    # Auto-enroll student
-                    print(
-                        f"DEBUG: Auto-enrolling student {current_user.username} in subject {exam.subject_id}")
-                    stmt = student_subject.insert().values(
-                        student_id=current_user.id,
-                        subject_id=exam.subject_id
-                    )
-                    db.session.execute(stmt)
-                    db.session.commit()
-                else:
-                    flash('You are not enrolled in this subject', 'error')
-                    return redirect(url_for('student_dashboard'))
-
-            # Check if student has already completed this exam
-            completion = db.session.execute(
-                db.select(student_exam).where(
-                    student_exam.c.student_id == current_user.id,
-                    student_exam.c.exam_id == exam_id
-                )
-            ).fetchone()
-
-            if completion:
-                flash('You have already completed this exam', 'error')
-                return redirect(url_for('student_dashboard'))
-        else:
-            # Demo users bypass all checks
-            print(
-                f"DEBUG: Demo user '{current_user.username}' accessing exam details for {exam_id}")
+        access = check_exam_access(current_user, exam)
+        if not access.allowed:
+            flash(PAGE_MESSAGES[access.reason], 'error')
+            return redirect(url_for('student_dashboard'))
 
         # Get question count for this exam
         # Note: Questions are linked to subject and class_room, not directly to exams
@@ -119,7 +85,7 @@ def student_route(app):
             return redirect(url_for('login'))
 
         # Get current user
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return redirect(url_for('login'))
 
@@ -130,57 +96,10 @@ def student_route(app):
             flash('Exam not found', 'error')
             return redirect(url_for('student_dashboard'))
 
-        # Check if this is a demo user
-        is_demo_user = "demo" in current_user.username.lower()
-
-        if not is_demo_user:
-            # Regular students - apply normal checks
-            # Check if student is enrolled in the exam's subject
-            enrollment = db.session.execute(
-                db.select(student_subject).where(
-                    student_subject.c.student_id == current_user.id,
-                    student_subject.c.subject_id == exam.subject_id
-                )
-            ).fetchone()
-
-            if not enrollment:
-                # Check if subject is assigned to student's class
-                is_class_subject = db.session.execute(
-                    db.select(class_subject).where(
-                        class_subject.c.class_room_id == current_user.class_room_id,
-                        class_subject.c.subject_id == exam.subject_id
-                    )
-                ).fetchone()
-
-                if is_class_subject:
-                    # Auto-enroll student
-                    print(
-                        f"DEBUG: Auto-enrolling student {current_user.username} in subject {exam.subject_id}")
-                    stmt = student_subject.insert().values(
-                        student_id=current_user.id,
-                        subject_id=exam.subject_id
-                    )
-                    db.session.execute(stmt)
-                    db.session.commit()
-                else:
-                    flash('You are not enrolled in this subject', 'error')
-                    return redirect(url_for('student_dashboard'))
-
-            # Check if student has already completed this exam
-            completion = db.session.execute(
-                db.select(student_exam).where(
-                    student_exam.c.student_id == current_user.id,
-                    student_exam.c.exam_id == exam_id
-                )
-            ).fetchone()
-
-            if completion:
-                flash('You have already completed this exam', 'error')
-                return redirect(url_for('student_dashboard'))
-        else:
-            # Demo users bypass all checks
-            print(
-                f"DEBUG: Demo user '{current_user.username}' starting exam {exam_id}")
+        access = check_exam_access(current_user, exam)
+        if not access.allowed:
+            flash(PAGE_MESSAGES[access.reason], 'error')
+            return redirect(url_for('student_dashboard'))
 
         # Check if exam has ended
         if exam.time_ended and exam.time_ended < datetime.utcnow():
@@ -202,7 +121,7 @@ def student_route(app):
         if 'user_id' not in session:
             return jsonify({"success": False, "message": "Authentication required"}), 401
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return jsonify({"success": False, "message": "User not found"}), 404
 
@@ -210,64 +129,13 @@ def student_route(app):
         if not exam:
             return jsonify({"success": False, "message": "Exam not found"}), 404
 
-        # Check if this is a demo user
-        is_demo_user = "demo" in current_user.username.lower()
-
-        if not is_demo_user:
-            # Regular students - apply normal checks
-            # Check if student is enrolled in the exam's subject
-            enrollment = db.session.execute(
-                db.select(student_subject).where(
-                    student_subject.c.student_id == current_user.id,
-                    student_subject.c.subject_id == exam.subject_id
-                )
-            ).fetchone()
-
-            if not enrollment:
-                # Check if subject is assigned to student's class
-                is_class_subject = db.session.execute(
-                    db.select(class_subject).where(
-                        class_subject.c.class_room_id == current_user.class_room_id,
-                        class_subject.c.subject_id == exam.subject_id
-                    )
-                ).fetchone()
+        access = check_exam_access(current_user, exam)
+        if not access.allowed:
+            return jsonify({"success": False, "message": MESSAGES[access.reason]}), 403
 
-                if is_class_subject:
-                    # Auto-enroll student
-                    print(
-                        f"DEBUG: Auto-enrolling student {current_user.username} in subject {exam.subject_id}")
-                    stmt = student_subject.insert().values(
-                        student_id=current_user.id,
-                        subject_id=exam.subject_id
-                    )
-                    db.session.execute(stmt)
-                    db.session.commit()
-                else:
-                    return jsonify({"success": False, "message": "Not enrolled in this subject"}), 403
-
-            # Check if student has already completed this exam
-            completion = db.session.execute(
-                db.select(student_exam).where(
-                    student_exam.c.student_id == current_user.id,
-                    student_exam.c.exam_id == exam_id
-                )
-            ).fetchone()
-
-            if completion:
-                return jsonify({"success": False, "message": "You have already completed this exam"}), 403
-        else:
-            # Demo users bypass all checks
-            print(
-                f"DEBUG: Demo user '{current_user.username}' accessing exam {exam_id} - bypassing enrollment and completion checks")
-
-        # Get questions for this exam (matching subject and class_room)
-        questions_query = Question.query.filter_by(
-            subject_id=exam.subject_id,
-            class_room_id=exam.class_room_id
-        )
-
-        # Get all available questions first
-        all_questions = questions_query.all()
+        # Questions come from the cached bank snapshot for this subject/class,
+        # so shuffling and sampling below never hit the database
+        all_questions = get_exam_question_bank(exam)
 
         # If no questions, return helpful message
         if not all_questions:
@@ -281,46 +149,11 @@ def student_route(app):
                 }
             }), 404
 
-        # Apply number_of_questions limit if specified
-        if exam.number_of_questions and exam.number_of_questions < len(all_questions):
-            # Randomly select the specified number of questions
-            questions = random.sample(all_questions, exam.number_of_questions)
-        else:
-            # Use all available questions
-            questions = all_questions
-            # print(f"DEBUG: Using all {len(questions)} questions")
-
-        # IMPORTANT: Shuffle the questions so each student gets them in different order
-        random.shuffle(questions)
-        # print(f"DEBUG: Questions shuffled - each student will see different question order")
-
-        # Prepare questions data with randomized options
-        questions_data = []
-        for question in questions:
-            # Get options and randomize their order
-            options = list(question.options)
-            random.shuffle(options)
-
-            # Create option data with new order indices
-            options_data = []
-            for i, option in enumerate(options):
-                options_data.append({
-                    'id': option.id,
-                    'text': option.text,
-                    'is_correct': option.is_correct,
-                    'order': i,  # New randomized order
-                    'has_math': getattr(option, 'has_math', False),
-                    'option_image': getattr(option, 'option_image', None)
-                })
-
-            questions_data.append({
-                'id': question.id,
-                'question_text': question.question_text,
-                'question_type': question.question_type,
-                'options': options_data,
-                'has_math': getattr(question, 'has_math', False),
-                'question_image': getattr(question, 'question_image', None)
-            })
+        # The random selection and question/option order are drawn once per
+        # student and recorded on their exam session, so refetching or
+        # resuming serves the same paper
+        exam_session = get_or_create_manifest(exam, current_user.id, all_questions)
+        questions_data = serialize_manifest(all_questions, exam_session)
 
         return jsonify({
             "success": True,
@@ -334,7 +167,7 @@ def student_route(app):
         if 'user_id' not in session:
             return jsonify({"success": False, "message": "Authentication required"}), 401
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return jsonify({"success": False, "message": "User not found"}), 404
 
@@ -342,115 +175,42 @@ def student_route(app):
         if not exam:
             return jsonify({"success": False, "message": "Exam not found"}), 404
 
-        # Check if this is a demo user
-        is_demo_user = "demo" in current_user.username.lower()
-
-        if not is_demo_user:
-            # Regular students - apply normal checks
-            # Check if student is enrolled in the exam's subject
-            enrollment = db.session.execute(
-                db.select(student_subject).where(
-                    student_subject.c.student_id == current_user.id,
-                    student_subject.c.subject_id == exam.subject_id
-                )
-            ).fetchone()
-
-            if not enrollment:
-                # Check if subject is assigned to student's class
-                is_class_subject = db.session.execute(
-                    db.select(class_subject).where(
-                        class_subject.c.class_room_id == current_user.class_room_id,
-                        class_subject.c.subject_id == exam.subject_id
-                    )
-                ).fetchone()
-
-                if is_class_subject:
-                    # Auto-enroll student
-                    print(
-                        f"DEBUG: Auto-enrolling student {current_user.username} in subject {exam.subject_id}")
-                    stmt = student_subject.insert().values(
-                        student_id=current_user.id,
-                        subject_id=exam.subject_id
-                    )
-                    db.session.execute(stmt)
-                    db.session.commit()
-                else:
-                    return jsonify({"success": False, "message": "Not enrolled in this subject"}), 403
-
-            # Check if student has already completed this exam
-            completion = db.session.execute(
-                db.select(student_exam).where(
-                    student_exam.c.student_id == current_user.id,
-                    student_exam.c.exam_id == exam_id
-                )
-            ).fetchone()
-
-            if completion:
-                return jsonify({"success": False, "message": "You have already completed this exam"}), 403
-        else:
-            # Demo users bypass checks
-            print(
-                f"DEBUG: Demo user '{current_user.username}' submitting exam {exam_id} - scores will not be recorded")
+        access = check_exam_access(current_user, exam)
+        if not access.allowed:
+            return jsonify({"success": False, "message": MESSAGES[access.reason]}), 403
 
         try:
             data = request.get_json()
             answers = data.get('answers', {})
 
-            # Get questions for this exam - use same logic as get_exam_questions
-            from models.question import Option
-            all_questions = Question.query.filter_by(
-                subject_id=exam.subject_id,
-                class_room_id=exam.class_room_id
-            ).all()
+            # Persist the latest buffered autosave before the session is closed
+            exam_session_buffer.flush((current_user.id, exam_id))
 
-            if not all_questions:
+            # Only questions recorded in the student's manifest are marked;
+            # sessions without one (older clients) fall back to the full bank
+            active_session = ExamSession.query.filter_by(
+                student_id=current_user.id,
+                exam_id=exam_id,
+                is_active=True
+            ).first()
+            served_question_ids = (
+                active_session.get_question_order()
+                if active_session and active_session.has_manifest() else []
+            )
+            if served_question_ids:
+                answers = filter_served_answers(answers, served_question_ids)
+
+            # Score against the cached answer key for this exam's question bank
+            result = score_submission(
+                exam, answers, served_question_ids=served_question_ids)
+            if result is None:
                 return jsonify({"success": False, "message": "No questions found for this exam"}), 404
 
-            # Apply number_of_questions limit if specified (same as get_exam_questions)
-            if exam.number_of_questions and exam.number_of_questions < len(all_questions):
-                # Use the number_of_questions setting for scoring
-                # Note: We score based on submitted answers, not a specific subset
-                questions_to_score = all_questions  # Score any answered questions
-                total_questions = exam.number_of_questions  # But total is based on exam setting
-            else:
-                questions_to_score = all_questions
-                total_questions = len(all_questions)
-
-            # Calculate score - only count answers that were submitted
-            correct_answers = 0
-
-            for question in questions_to_score:
-                question_id = question.id
-                student_answer = answers.get(question_id)
-
-                if student_answer:
-                    # For MCQ and True/False, check if the selected option is correct
-                    if question.question_type in ['mcq', 'true_false']:
-                        selected_option = Option.query.get(student_answer)
-                        if selected_option and selected_option.is_correct:
-                            correct_answers += 1
-                    # For short answer, check if the answer matches (case insensitive)
-                    elif question.question_type == 'short_answer':
-                        if student_answer.lower().strip() == question.correct_answer.lower().strip():
-                            correct_answers += 1
-
-            # Calculate percentage and letter grade
-            score_percentage = (
-                correct_answers / total_questions * 100) if total_questions > 0 else 0
-            raw_score = (correct_answers / total_questions *
-                         exam.max_score) if total_questions > 0 else 0
-
-            # Determine letter grade using configurable grading system
-            if score_percentage >= 70:
-                letter_grade = 'A'
-            elif score_percentage >= 59:
-                letter_grade = 'B'
-            elif score_percentage >= 49:
-                letter_grade = 'C'
-            elif score_percentage >= 40:
-                letter_grade = 'D'
-            else:
-                letter_grade = 'F'
+            correct_answers = result.correct_answers
+            total_questions = result.total_questions
+            score_percentage = result.score_percentage
+            raw_score = result.raw_score
+            letter_grade = result.letter_grade
 
             # Get exam metadata
             school_term = SchoolTerm.query.get(exam.school_term_id)
@@ -481,9 +241,18 @@ def student_route(app):
             exam_record.set_answers(answers)  # Store answers as JSON
 
             # Only save records for non-demo users
-            if not is_demo_user:
+            if not access.is_demo:
                 db.session.add(exam_record)
 
+                # Write the student's grade in the same transaction; if that
+                # fails the submission still goes through and the read-path
+                # sync picks the record up later
+                try:
+                    with db.session.begin_nested():
+                        sync_exam_record_to_grade(exam_record)
+                except Exception as e:
+                    print(f"Error syncing exam record to grade: {str(e)}")
+
                 # Mark exam as completed by adding student to student_exam relationship
                 # This prevents retaking the exam
                 existing = db.session.execute(
@@ -534,6 +303,7 @@ def student_route(app):
                     db.session.execute(stmt)
 
                 db.session.commit()
+                mark_exam_completed(current_user.id, exam_id)
             else:
                 print(
                     f"DEBUG: Skipping exam record save for demo user '{current_user.username}'")
@@ -550,13 +320,14 @@ def student_route(app):
                 exam_session.is_completed = True
                 exam_session.completed_at = datetime.utcnow()
                 db.session.commit()
+            exam_session_buffer.discard(current_user.id, exam_id)
 
             # Clear exam session
             session.pop('current_exam_id', None)
 
             # Check if students can see results immediately
             show_results = False
-            if not is_demo_user:
+            if not access.is_demo:
                 # Check permission for regular students
                 show_results_permission = Permission.query.filter_by(
                     permission_name="show_results_immediately",
@@ -605,7 +376,7 @@ def student_route(app):
         if 'user_id' not in session:
             return jsonify({"success": False, "message": "Authentication required"}), 401
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return jsonify({"success": False, "message": "User not found"}), 404
 
@@ -616,38 +387,70 @@ def student_route(app):
             answers = data.get('answers', {})
             question_order = data.get('question_order', [])
 
-            # Find or create exam session
-            exam_session = ExamSession.query.filter_by(
-                student_id=current_user.id,
-                exam_id=exam_id,
-                is_active=True
-            ).first()
+            # Saves are buffered and written in batches by the flusher
+            session_id = exam_session_buffer.save(
+                current_user.id,
+                exam_id,
+                current_question_index,
+                time_remaining,
+                answers,
+                question_order
+            )
 
-            if not exam_session:
-                from services.generate_uuid import generate_uuid
-                exam_session = ExamSession()
-                exam_session.id = generate_uuid()
-                exam_session.student_id = current_user.id
-                exam_session.exam_id = exam_id
-                db.session.add(exam_session)
+            return jsonify({
+                "success": True,
+                "message": "Progress saved",
+                "session_id": session_id
+            })
 
-            # Update session data
-            exam_session.current_question_index = current_question_index
-            exam_session.time_remaining = time_remaining
-            exam_session.set_answers(answers)
-            exam_session.set_question_order(question_order)
-            exam_session.last_activity = datetime.utcnow()
+        except Exception as e:
+            # print(f"Error saving exam session: {str(e)}")
+            db.session.rollback()
+            return jsonify({"success": False, "message": "Error saving progress"}), 500
 
-            db.session.commit()
+    @app.route('/student/exam/<exam_id>/session/delta', methods=['POST'])
+    def save_exam_session_delta(exam_id):
+        """Save only the answers changed since the client's last save"""
+        if 'user_id' not in session:
+            return jsonify({"success": False, "message": "Authentication required"}), 401
+
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({"success": False, "message": "User not found"}), 404
+
+        data = request.get_json(silent=True) or {}
+        seq = data.get('seq')
+        changes = data.get('changes', {})
+        if not isinstance(seq, int) or isinstance(seq, bool) or not isinstance(changes, dict):
+            return jsonify({"success": False, "message": "Invalid save data"}), 400
+
+        try:
+            result = exam_session_buffer.apply_delta(
+                current_user.id,
+                exam_id,
+                seq,
+                changes,
+                data.get('current_question_index', 0),
+                data.get('time_remaining', 0)
+            )
+
+            if result is None:
+                return jsonify({"success": False, "message": "No active exam session"}), 404
+
+            if not result.applied:
+                return jsonify({
+                    "success": False,
+                    "message": "Out-of-order save rejected",
+                    "last_seq": result.last_seq
+                }), 409
 
             return jsonify({
                 "success": True,
                 "message": "Progress saved",
-                "session_id": exam_session.id
+                "seq": result.last_seq
             })
 
         except Exception as e:
-            # print(f"Error saving exam session: {str(e)}")
             db.session.rollback()
             return jsonify({"success": False, "message": "Error saving progress"}), 500
 
@@ -657,11 +460,14 @@ def student_route(app):
         if 'user_id' not in session:
             return jsonify({"success": False, "message": "Authentication required"}), 401
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return jsonify({"success": False, "message": "User not found"}), 404
 
         try:
+            # Write any buffered save first so the restored state is current
+            exam_session_buffer.flush((current_user.id, exam_id))
+
             # Find active exam session
             exam_session = ExamSession.query.filter_by(
                 student_id=current_user.id,
@@ -692,11 +498,13 @@ def student_route(app):
         if 'user_id' not in session:
             return jsonify({"success": False, "message": "Authentication required"}), 401
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return jsonify({"success": False, "message": "User not found"}), 404
 
         try:
+            exam_session_buffer.flush((current_user.id, exam_id))
+
             # Find active exam session
             exam_session = ExamSession.query.filter_by(
                 student_id=current_user.id,
@@ -709,6 +517,7 @@ def student_route(app):
                 exam_session.is_completed = True
                 exam_session.completed_at = datetime.utcnow()
                 db.session.commit()
+            exam_session_buffer.discard(current_user.id, exam_id)
 
             return jsonify({"success": True, "message": "Session completed"})
 
@@ -728,7 +537,7 @@ def student_route(app):
         if 'user_id' not in session:
             return redirect(url_for('login'))
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return redirect(url_for('login'))
 
@@ -764,7 +573,7 @@ def student_route(app):
         if 'user_id' not in session:
             return redirect(url_for('login'))
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return redirect(url_for('login'))
 
@@ -807,7 +616,7 @@ def student_route(app):
         if 'user_id' not in session:
             return jsonify({"success": False, "message": "Authentication required"}), 401
 
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return jsonify({"success": False, "message": "User not found"}), 404
 
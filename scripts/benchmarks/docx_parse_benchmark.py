@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark Word question parsing on a synthetic document.
+
+Builds a .docx (default 200 MCQ questions, 50 of them with a picture, plus
+pictures the questions never use) and parses it:
+
+- the way parse_word_questions used to: python-docx loads the package, every
+  image is stored up front and each paragraph goes through the full text,
+  math and image processing;
+- with utils.docx_reader, cold (empty cache), warm (the same file again) and
+  after a correction to one question.
+
+    python scripts/benchmarks/docx_parse_benchmark.py --questions 200 --images 50
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from docx import Document  # noqa: E402
+from docx.shared import Inches  # noqa: E402
+from flask import Flask  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from utils.docx_reader import clear_word_parse_cache, parse_word_document  # noqa: E402
+from utils.math_content_parser import (  # noqa: E402
+    extract_images_from_docx,
+    process_question_text
+)
+
+
+def picture(i, size):
+    """The same noisy (barely compressible) image for the same i"""
+    pixels = random.Random(i).randbytes(size * size * 3)
+    out = io.BytesIO()
+    Image.frombytes("RGB", (size, size), pixels).save(out, format="PNG")
+    out.seek(0)
+    return out
+
+
+def make_docx(questions, images, unused, size, corrected=None):
+    doc = Document()
+    every = max(questions // images, 1) if images else 0
+    for i in range(questions):
+        text = f"Question: Synthetic question {i + 1}, solve x^2 + {i}x = 0"
+        doc.add_paragraph(text + (" (corrected)" if i == corrected else ""))
+        if every and i % every == 0 and i // every < images:
+            doc.add_paragraph().add_run().add_picture(picture(i, size), width=Inches(1))
+        doc.add_paragraph("Type: MCQ")
+        doc.add_paragraph("Options:")
+        for j in range(4):
+            doc.add_paragraph(f"- {'*' if j == i % 4 else ''}Answer {i}-{j}")
+    for i in range(unused):
+        doc.part.get_or_add_image(picture(1000 + i, size))
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def parse_legacy(content):
+    """The previous parser's work: load everything, process every paragraph"""
+    doc = Document(io.BytesIO(content))
+    images_dict = extract_images_from_docx(doc)
+    count = 0
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        process_question_text(para, images_dict)
+        count += text.lower().startswith("question:")
+    return count
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--unused-images", type=int, default=10,
+                        help="pictures in the package that no question uses")
+    parser.add_argument("--image-size", type=int, default=400, help="pixels per side")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    content = make_docx(args.questions, args.images, args.unused_images, args.image_size)
+    corrected = make_docx(args.questions, args.images, args.unused_images, args.image_size,
+                          corrected=args.questions // 2)
+    print(f"{args.questions} questions, {args.images} images "
+          f"(+{args.unused_images} unused), {len(content) / 1024:.0f} KB")
+
+    with tempfile.TemporaryDirectory() as folder:
+        app = Flask(__name__)
+        app.config.update(QUESTION_IMAGE_FOLDER=folder, DOCX_IMAGE_WORKERS=args.workers)
+        with app.app_context():
+            rows = []
+            elapsed, count = timed(parse_legacy, content)
+            rows.append(("previous", elapsed, count))
+            for name, workers in (("inline images", 0), (f"{args.workers} workers", args.workers)):
+                clear_word_parse_cache()
+                elapsed, questions = timed(parse_word_document, content, image_workers=workers)
+                rows.append((f"cold, {name}", elapsed, len(questions)))
+            elapsed, questions = timed(parse_word_document, content)
+            rows.append(("same file again", elapsed, len(questions)))
+            elapsed, questions = timed(parse_word_document, corrected)
+            rows.append(("one question fixed", elapsed, len(questions)))
+
+    print(f"{'parse':<20} {'time (ms)':>10} {'questions':>10}")
+    for name, elapsed, count in rows:
+        print(f"{name:<20} {elapsed * 1000:>10.1f} {count:>10}")
+
+
+if __name__ == "__main__":
+    main()
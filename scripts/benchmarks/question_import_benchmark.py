@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk question import on a synthetic question file.
+
+Imports the same generated CSV (default 5,000 MCQ questions with four
+options each) into a fresh SQLite file twice: once the way the upload routes
+used to - looking up the subject, teacher and class and committing for every
+question - and once with services.question_import, which validates and
+inserts a batch at a time.
+
+    python scripts/benchmarks/question_import_benchmark.py --questions 5000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from models import db  # noqa: E402
+from models.associations import class_subject  # noqa: E402
+from models.class_room import ClassRoom  # noqa: E402
+from models.exam import Exam  # noqa: E402
+from models.question import Question, Option  # noqa: E402
+from models.school import School  # noqa: E402
+from models.school_term import SchoolTerm  # noqa: E402
+from models.subject import Subject  # noqa: E402
+from models.user import User  # noqa: E402
+from services.question_import import import_questions  # noqa: E402
+from utils.question_parser import iter_questions_file  # noqa: E402
+
+
+def make_csv(count):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["question_text", "question_type", "options", "correct_answer"])
+    for i in range(count):
+        options = [f"Answer {i}-{j}" for j in range(4)]
+        writer.writerow([f"Synthetic question {i + 1}?", "mcq", json.dumps(options), i % 4])
+    return out.getvalue().encode("utf-8")
+
+
+def seed():
+    school = School(school_name="Benchmark School", address="1 Road", phone="0", email="b@b.b")
+    db.session.add(school)
+    db.session.flush()
+    term = SchoolTerm(term_name="First Term", start_date=date(2025, 9, 1),
+                      end_date=date(2025, 12, 15), academic_session="2025-2026",
+                      school_id=school.school_id, is_current=True)
+    class_room = ClassRoom(class_room_name="JSS 1")
+    subject = Subject(subject_name="Mathematics")
+    teacher = User(username="teacher", first_name="T", last_name="T", gender="male",
+                   dob=date(1990, 1, 1), role="staff", password="x")
+    db.session.add_all([term, class_room, subject, teacher])
+    db.session.flush()
+    subject.subject_head_id = teacher.id
+    db.session.execute(class_subject.insert().values(
+        class_room_id=class_room.class_room_id, subject_id=subject.subject_id))
+    exam = Exam(name="Maths", exam_type="Exam", duration=timedelta(minutes=30),
+                subject_id=subject.subject_id, school_term_id=term.term_id,
+                class_room_id=class_room.class_room_id, max_score=60)
+    db.session.add(exam)
+    db.session.commit()
+    return {"subject_id": subject.subject_id, "class_room_id": class_room.class_room_id,
+            "term_id": term.term_id, "exam_type_id": exam.id}
+
+
+def import_one_by_one(content, defaults):
+    """The previous upload loop: lookups, flush and commit per question"""
+    for _, question_data, _ in iter_questions_file(content, "csv"):
+        subject = Subject.query.get(defaults["subject_id"])
+        teacher = User.query.get(subject.subject_head_id)
+        class_room = ClassRoom.query.get(defaults["class_room_id"])
+        if not teacher or subject not in class_room.subjects:
+            continue
+        question = Question(
+            question_text=question_data["question_text"],
+            question_type=question_data["question_type"],
+            subject_id=subject.subject_id, teacher_id=teacher.id,
+            class_room_id=class_room.class_room_id, term_id=defaults["term_id"],
+            exam_type_id=defaults["exam_type_id"],
+        )
+        db.session.add(question)
+        db.session.flush()
+        for order, option_data in enumerate(question_data["options"]):
+            db.session.add(Option(text=option_data["text"], is_correct=option_data["is_correct"],
+                                  order=order, question_id=question.id))
+        db.session.commit()
+        # The session is expired by each commit, as in a request
+        db.session.expire_all()
+
+
+def run(name, func, content, folder):
+    path = os.path.join(folder, f"{name}.db")
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite:///" + path,
+                      SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        defaults = seed()
+        statements = [0]
+
+        def count(*args):
+            statements[0] += 1
+
+        event.listen(db.engine, "before_cursor_execute", count)
+        start = time.perf_counter()
+        func(content, defaults)
+        elapsed = time.perf_counter() - start
+        event.remove(db.engine, "before_cursor_execute", count)
+        created = Question.query.count()
+        db.session.remove()
+        db.engine.dispose()
+    return elapsed, statements[0], created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--skip-legacy", action="store_true",
+                        help="only time the batched import")
+    args = parser.parse_args()
+
+    content = make_csv(args.questions)
+    variants = [("batched", lambda c, d: import_questions(
+        iter_questions_file(c, "csv"), defaults=d, batch_size=args.batch_size))]
+    if not args.skip_legacy:
+        variants.insert(0, ("one by one", import_one_by_one))
+
+    print(f"{args.questions} questions ({len(content) / 1024:.0f} KB CSV), "
+          f"batch size {args.batch_size}")
+    print(f"{'import':<12} {'time (s)':>9} {'questions/s':>12} {'statements':>11} {'created':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, func in variants:
+            elapsed, statements, created = run(name.replace(" ", "_"), func, content, folder)
+            print(f"{name:<12} {elapsed:>9.2f} {created / elapsed:>12.0f} "
+                  f"{statements:>11} {created:>8}")
+
+
+if __name__ == "__main__":
+    main()
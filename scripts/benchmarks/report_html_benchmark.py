@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark report card HTML generation for one class.
+
+Compares building a complete HTML document per student (what a class PDF
+used to join together) with one class document that carries the stylesheet
+once and shares the rendered school header. Uses synthetic report data, so
+no database is needed.
+
+    python scripts/benchmarks/report_html_benchmark.py --students 60
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from services.pdf_renderer import PAGE_BREAK  # noqa: E402
+from services.report_renderer import render_document, render_report  # noqa: E402
+
+
+ASSESSMENT_TYPES = [
+    {'code': 'first_ca', 'name': 'First CA', 'max_score': 20, 'order': 1},
+    {'code': 'second_ca', 'name': 'Second CA', 'max_score': 20, 'order': 2},
+    {'code': 'exam', 'name': 'Examination', 'max_score': 60, 'order': 3},
+]
+
+
+def make_report(index, subjects):
+    scores = {}
+    for s in range(subjects):
+        assessments = {
+            'first_ca': {'score': 8 + (index + s) % 12, 'max_score': 20, 'percentage': 0},
+            'second_ca': {'score': 6 + (index * s) % 14, 'max_score': 20, 'percentage': 0,
+                          'is_cbt': s % 3 == 0},
+            'exam': {'score': 20 + (index * 7 + s) % 40, 'max_score': 60, 'percentage': 0},
+        }
+        scores[f'subject-{s}'] = {
+            'subject_name': f'Subject {s + 1}',
+            'assessments': assessments,
+            'total': sum(a['score'] for a in assessments.values()),
+            'max_total': 100.0,
+        }
+    overall_total = sum(subject['total'] for subject in scores.values())
+    return {
+        'student': {
+            'id': f'student-{index}', 'name': f'STUDENT {index}',
+            'admission_number': f'ADM{index:04d}', 'image': None, 'gender': None,
+            'class_name': 'JSS 1', 'class_id': 'class-1',
+        },
+        'school': {'name': 'Benchmark School', 'logo': None, 'address': '1 School Road',
+                   'phone': '000', 'motto': None},
+        'sections': [],
+        'formatted_sections': 'Primary and Secondary',
+        'term': {'name': 'First Term', 'session': '2025-2026',
+                 'start_date': '2025-09-01', 'end_date': '2025-12-15'},
+        'assessment_types': ASSESSMENT_TYPES,
+        'scores': scores,
+        'position': index + 1,
+        'total_students': None,
+        'overall_total': overall_total,
+        'overall_max': 100.0 * subjects,
+        'config': None,
+        'grade_scale': None,
+    }
+
+
+def measure(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        html = func()
+        best = min(best, time.perf_counter() - start)
+    return best, len(html.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--students', type=int, default=60)
+    parser.add_argument('--subjects', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    reports = [make_report(i, args.subjects) for i in range(args.students)]
+    for report in reports:
+        report['total_students'] = args.students
+
+    print(f"{args.students} students, {args.subjects} subjects, best of {args.repeat}")
+    print(f"{'variant':<8} {'layout':<24} {'time (ms)':>10} {'size (KB)':>10}")
+    for variant in ('full', 'simple'):
+        per_student = measure(
+            lambda: PAGE_BREAK.join(render_report(r, variant) for r in reports), args.repeat)
+        shared = measure(lambda: render_document(reports, variant), args.repeat)
+        for layout, (seconds, size) in (('document per student', per_student),
+                                        ('shared class document', shared)):
+            print(f"{variant:<8} {layout:<24} {seconds * 1000:>10.1f} {size / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
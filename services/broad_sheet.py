@@ -0,0 +1,354 @@
+"""
+Broad sheet data for a class and term, built from one streamed query.
+
+The class's students are read joined to their grades, as plain column
+tuples ordered by student, and pivoted in a single pass into a row of
+subject cells per student. Merge rules and the active-assessment filter
+from the report config are resolved once up front, and each cell's total,
+percentage and grade are computed as the student's row is finished.
+
+iter_broad_sheet_rows yields the rows one at a time, so an export can write
+a class of any size with only one student's grades in memory;
+build_broad_sheet collects them for the broad sheet page. Either way the
+number of queries does not depend on the class size.
+
+Rows are dicts with the student's name, admission number and a dict of
+subjects; broad_sheet_metadata holds the class, term and school details.
+Neither syncs CBT grades itself: build_broad_sheet syncs the class once
+before reading both, and other callers do the same.
+"""
+from models import db
+from models.associations import class_subject
+from models.assessment_type import AssessmentType
+from models.class_room import ClassRoom
+from models.grade import Grade
+from models.report_config import ReportConfig
+from models.school import School
+from models.school_term import SchoolTerm
+from models.section import Section
+from models.student import Student
+from models.subject import Subject
+from models.user import User
+from services.report_generator import ReportGenerator
+
+
+def _exam_type_filter(exam_type):
+    """SQL condition for an exam_type filter ("all", "ca", "exam" or codes, comma separated)"""
+    if exam_type == "all":
+        return None
+
+    conditions = []
+    for single_type in exam_type.split(','):
+        single_type = single_type.strip().lower()
+        if single_type == "ca":
+            conditions.append(Grade.assessment_type.ilike("%ca%"))
+        elif single_type == "exam":
+            # Match 'exam', 'terminal examination', 'terminal', 'examination', etc.
+            conditions.append(db.or_(
+                Grade.assessment_type.ilike("%exam%"),
+                Grade.assessment_type.ilike("%terminal%")
+            ))
+        else:
+            conditions.append(Grade.assessment_type.ilike(f"%{single_type}%"))
+    return db.or_(*conditions) if conditions else None
+
+
+class MergePlan:
+    """Merge rules and active assessments of a report config, resolved once"""
+
+    def __init__(self, config):
+        merge_config = config.get_merge_config() if config else None
+        self.enabled = bool(merge_config)
+        self.rules = []
+        self.active = None
+        if not self.enabled:
+            return
+
+        for rule in merge_config.get('merged_exams', []):
+            display_as = rule.get('display_as', rule['name'])
+            self.rules.append((display_as, rule['components'],
+                               ReportGenerator.format_assessment_name(display_as)))
+
+        active_assessments = config.get_active_assessments()
+        if active_assessments:
+            # Merged assessments stay visible even when not listed as active
+            self.active = set(active_assessments) | {rule[0] for rule in self.rules}
+
+    def apply(self, assessments):
+        merged = {}
+        for display_as, components, formatted in self.rules:
+            total_score = 0
+            total_max = 0
+            for component in components:
+                if component in assessments:
+                    total_score += assessments[component]['score']
+                    total_max += assessments[component]['max_score']
+
+            if total_max > 0:
+                merged[display_as] = {
+                    "score": total_score,
+                    "max_score": total_max,
+                    "is_cbt": False,  # Merged scores aren't purely CBT
+                    "formatted_type": formatted,
+                    "grade_id": None,
+                    "assessment_name": None,
+                }
+                for component in components:
+                    assessments.pop(component, None)
+
+        assessments.update(merged)
+        if self.active is not None:
+            assessments = {k: v for k, v in assessments.items() if k in self.active}
+        return assessments
+
+
+def _subject_cell(assessments):
+    """A student's scores and totals in one subject"""
+    scores = []
+    total_score = 0
+    max_possible = 0
+    for assess_type, data in assessments.items():
+        score = data["score"]
+        max_score = data["max_score"]
+        total_score += score
+        max_possible += max_score
+        scores.append({
+            "exam_id": data["grade_id"],
+            "exam_name": data["assessment_name"] or data["formatted_type"],
+            "assessment_type": assess_type,
+            "formatted_type": data["formatted_type"],
+            "score": score,
+            "max_score": max_score,
+            "percentage": round((score / max_score) * 100, 1) if max_score and max_score > 0 else 0,
+            "is_cbt": data["is_cbt"],
+        })
+
+    has_max = max_possible and max_possible > 0
+    return {
+        "total_score": total_score,
+        "max_possible": max_possible,
+        "percentage": round((total_score / max_possible) * 100, 1) if has_max else 0,
+        "grade": ReportGenerator.get_grade((total_score / max_possible) * 100) if has_max else "N/A",
+        "scores": scores,
+    }
+
+
+def _format_sections_for_display(sections_list):
+    """Section names joined with commas and 'and', Junior/Senior Secondary as one"""
+    names = []
+    for section in sections_list:
+        if section.level in [3, 4]:
+            if "Secondary" not in names:
+                names.append("Secondary")
+            continue
+        names.append(section.name)
+
+    if not names:
+        return ''
+    if len(names) == 1:
+        return names[0]
+    if len(names) == 2:
+        return f"{names[0]} and {names[1]}"
+    # Oxford comma before the 'and' for clarity
+    return f"{', '.join(names[:-1])}, and {names[-1]}"
+
+
+def _class_subjects(class_room_id):
+    """(subject_id, subject_name) of the subjects taught in a class, by name"""
+    return db.session.query(Subject.subject_id, Subject.subject_name).join(
+        class_subject, class_subject.c.subject_id == Subject.subject_id
+    ).filter(
+        class_subject.c.class_room_id == class_room_id
+    ).order_by(Subject.subject_name).all()
+
+
+def class_subject_names(class_room_id):
+    """Names of the subjects taught in a class, in broad sheet column order"""
+    return [name for _, name in _class_subjects(class_room_id)]
+
+
+def _student_grade_records(class_room_id, term_id, exam_type, batch_size):
+    """
+    The class's active students joined to their grades, one record per grade
+    (or one with empty grade columns for a student without grades), grouped
+    by student. Records are fetched batch_size at a time.
+    """
+    grade_join = [
+        Grade.student_id == User.id,
+        Grade.class_room_id == class_room_id,
+        Grade.term_id == term_id,
+    ]
+    condition = _exam_type_filter(exam_type)
+    if condition is not None:
+        grade_join.append(condition)
+
+    return db.session.query(
+        User.id, User.first_name, User.last_name, Student.user_id, Student.admission_number,
+        Grade.subject_id, Grade.grade_id, Grade.assessment_type, Grade.assessment_name,
+        Grade.score, Grade.max_score, Grade.is_from_cbt,
+    ).outerjoin(
+        Student, Student.user_id == User.id
+    ).outerjoin(
+        Grade, db.and_(*grade_join)
+    ).filter(
+        User.class_room_id == class_room_id,
+        User.role == "student",
+        User.is_active == True,
+    ).order_by(
+        # User.id keeps namesakes apart; created_at lets a later grade of the
+        # same assessment replace an earlier one
+        User.first_name, User.last_name, User.id, Grade.created_at
+    ).yield_per(batch_size)
+
+
+def iter_broad_sheet_rows(class_room_id, term_id, exam_type="all", config_id=None,
+                          batch_size=500):
+    """
+    Yield the broad sheet rows of a class one student at a time.
+
+    Only the current student's grades are held while the records stream in,
+    so memory use does not grow with the class size. Sync the class's CBT
+    grades first (sync_class_term_if_stale).
+    """
+    subjects = _class_subjects(class_room_id)
+    config = db.session.get(ReportConfig, config_id) if config_id else None
+    merge_plan = MergePlan(config)
+    formatted_names = {}
+
+    def finish(student_id, student_name, admission_number, cells):
+        student_subjects = {}
+        for subject_id, subject_name in subjects:
+            assessments = cells.get(subject_id, {})
+            if merge_plan.enabled:
+                assessments = merge_plan.apply(dict(assessments))
+            student_subjects[subject_name] = _subject_cell(assessments)
+        return {
+            "student_id": student_id,
+            "student_name": student_name,
+            "admission_number": admission_number,
+            "subjects": student_subjects,
+        }
+
+    current = None
+    cells = {}
+    for (student_id, first_name, last_name, has_student, admission_number,
+         subject_id, grade_id, assessment_type, assessment_name,
+         score, max_score, is_from_cbt) in _student_grade_records(
+            class_room_id, term_id, exam_type, batch_size):
+        if current is None or current[0] != student_id:
+            if current is not None:
+                yield finish(*current, cells)
+            current = (student_id, f"{first_name} {last_name}",
+                       admission_number if has_student else "N/A")
+            cells = {}
+
+        if grade_id is None:
+            continue
+        assess_type = 'cbt' if is_from_cbt else assessment_type
+        formatted = formatted_names.get(assess_type)
+        if formatted is None:
+            formatted = formatted_names[assess_type] = ReportGenerator.format_assessment_name(
+                assess_type)
+        cells.setdefault(subject_id, {})[assess_type] = {
+            "score": score,
+            "max_score": max_score,
+            "is_cbt": is_from_cbt,
+            "formatted_type": formatted,
+            "grade_id": grade_id,
+            "assessment_name": assessment_name,
+        }
+
+    if current is not None:
+        yield finish(*current, cells)
+
+
+def _found_assessment_types(class_room_id, term_id, exam_type):
+    """Assessment codes (CBT grades as 'cbt') graded in the class this term"""
+    query = db.session.query(Grade.assessment_type, Grade.is_from_cbt).filter(
+        Grade.class_room_id == class_room_id,
+        Grade.term_id == term_id,
+    )
+    condition = _exam_type_filter(exam_type)
+    if condition is not None:
+        query = query.filter(condition)
+    return {
+        'cbt' if is_from_cbt else assessment_type
+        for assessment_type, is_from_cbt in query.distinct()
+    }
+
+
+def broad_sheet_metadata(class_room_id, term_id, exam_type="all", total_students=None):
+    """
+    Class, term and school details shown above a broad sheet.
+
+    total_students is counted with a query when not given.
+    """
+    if total_students is None:
+        total_students = db.session.query(db.func.count(User.id)).filter(
+            User.class_room_id == class_room_id,
+            User.role == "student",
+            User.is_active == True,
+        ).scalar()
+    found_types = _found_assessment_types(class_room_id, term_id, exam_type)
+
+    class_room = db.session.get(ClassRoom, class_room_id)
+    term = db.session.get(SchoolTerm, term_id)
+    school = School.query.first()
+
+    # Assessment orders of the class's school (inactive types included)
+    school_id = class_room.section.school_id if class_room.section else None
+    assessment_type_orders = {
+        code: order for code, order in db.session.query(
+            AssessmentType.code, AssessmentType.order
+        ).filter(AssessmentType.school_id == school_id)
+    }
+
+    sections = Section.query.filter_by(
+        school_id=school.school_id if school else None,
+        is_active=True
+    ).order_by(Section.level).all()
+
+    # Clean school logo path (handle Windows slashes and strip static/)
+    logo_path = school.logo if school and school.logo else None
+    if logo_path:
+        logo_path = logo_path.replace("\\", "/").replace("static/", "", 1).lstrip("/")
+
+    metadata = {
+        "class_name": class_room.class_room_name,
+        "term_name": term.term_name,
+        "exam_type": exam_type,
+        "total_students": total_students,
+        "total_subjects": len(_class_subjects(class_room_id)),
+        "assessment_types": sorted(
+            found_types, key=lambda code: (assessment_type_orders.get(code, 0), code)
+        ),
+        "assessment_type_orders": assessment_type_orders,
+        "school_name": school.school_name if school else "N/A",
+        "school_address": school.address if school else "N/A",
+        "school_logo": logo_path,
+        "school_motto": school.motto if school else "N/A",
+        "school_phone": school.phone if school else "N/A",
+        "formatted_sections": _format_sections_for_display(sections),
+        "form_master": f"{class_room.form_teacher.first_name} {class_room.form_teacher.last_name}" if class_room.form_teacher else "N/A",
+        "academic_session": term.academic_session if term_id else "N/A"
+    }
+
+    return metadata
+
+
+def build_broad_sheet(class_room_id, term_id, exam_type="all", config_id=None):
+    """
+    Broad sheet rows and metadata for a class and term.
+
+    Args:
+        exam_type: "all", "ca", "exam" or assessment codes, comma separated
+        config_id: report config whose merge rules and active assessments apply
+
+    Returns:
+        (rows, metadata)
+    """
+    from utils.grade_sync import sync_class_term_if_stale
+    sync_class_term_if_stale(class_room_id, term_id)
+
+    rows = list(iter_broad_sheet_rows(class_room_id, term_id, exam_type, config_id))
+    return rows, broad_sheet_metadata(class_room_id, term_id, exam_type, len(rows))
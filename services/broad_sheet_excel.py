@@ -0,0 +1,125 @@
+"""
+Broad sheet workbooks written in xlsxwriter's constant_memory mode.
+
+xlsxwriter normally keeps every cell of a workbook in memory until it is
+closed; in constant_memory mode each row is flushed to a temporary file as
+soon as the next one is started. Fed from iter_broad_sheet_rows, which
+yields one student at a time, a workbook of any size is written with only a
+row's worth of data in memory. Rows must then be written top to bottom, so
+the header block is written first.
+
+A workbook holds one sheet per class, which is how a whole term is archived.
+"""
+import os
+import re
+import tempfile
+
+import xlsxwriter
+
+
+# Characters Excel does not allow in sheet names, and its length limit
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+MAX_SHEET_TITLE = 31
+
+# Row of the table header, below the title block
+TABLE_HEADER_ROW = 8
+
+
+def sheet_title(name, used):
+    """A valid sheet name for name, unique among the titles in used"""
+    title = INVALID_SHEET_CHARS.sub('-', name or 'Sheet').strip("' ") or 'Sheet'
+    title = title[:MAX_SHEET_TITLE]
+    candidate = title
+    n = 2
+    while candidate.lower() in used:
+        suffix = f' ({n})'
+        candidate = title[:MAX_SHEET_TITLE - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+class BroadSheetWorkbook:
+    """A broad sheet workbook being written to a file, one class per sheet"""
+
+    def __init__(self, path, tmpdir=None):
+        self.path = path
+        options = {'constant_memory': True}
+        if tmpdir:
+            options['tmpdir'] = tmpdir
+        self.workbook = xlsxwriter.Workbook(path, options)
+        self._titles = set()
+
+        self.title_format = self.workbook.add_format(
+            {'bold': True, 'font_size': 16, 'align': 'center'})
+        self.info_format = self.workbook.add_format({'bold': True, 'align': 'center'})
+        self.header_format = self.workbook.add_format({
+            'bold': True,
+            'bg_color': '#D3D3D3',
+            'border': 1,
+            'align': 'center',
+            'valign': 'vcenter'
+        })
+        self.cell_format = self.workbook.add_format({
+            'border': 1,
+            'align': 'center',
+            'valign': 'vcenter'
+        })
+
+    def add_sheet(self, metadata, subject_names, rows, title=None, on_row=None):
+        """
+        Write one class's broad sheet.
+
+        Args:
+            metadata: broad_sheet_metadata of the class
+            subject_names: subject columns, in order
+            rows: broad sheet rows, consumed once
+            title: sheet name; the class name if not given
+            on_row: called with the number of students written after each one
+
+        Returns:
+            the number of students written
+        """
+        worksheet = self.workbook.add_worksheet(
+            sheet_title(title or metadata["class_name"], self._titles))
+
+        info = [
+            f'School: {metadata.get("school_name", "N/A")}',
+            f'Address: {metadata.get("school_address", "N/A")}',
+            f'Class: {metadata["class_name"]}',
+            f'Form Master: {metadata.get("form_master", "N/A")}',
+            f'Term: {metadata["term_name"]}',
+            f'Session: {metadata.get("academic_session", "N/A")}',
+        ]
+        worksheet.write(0, 0, 'BROAD SHEET', self.title_format)
+        for row, text in enumerate(info, 1):
+            worksheet.write(row, 0, text, self.info_format)
+
+        header = ['S/N', 'Admission No.', 'Student Name', *subject_names]
+        worksheet.write_row(TABLE_HEADER_ROW, 0, header, self.header_format)
+
+        row = TABLE_HEADER_ROW + 1
+        count = 0
+        for count, student in enumerate(rows, 1):
+            values = [count, student["admission_number"], student["student_name"]]
+            for subject in subject_names:
+                data = student["subjects"].get(subject)
+                values.append(
+                    f'{data["total_score"]}/{data["max_possible"]} ({data["percentage"]}%)'
+                    if data else ''
+                )
+            worksheet.write_row(row, 0, values, self.cell_format)
+            row += 1
+            if on_row:
+                on_row(count)
+        return count
+
+    def close(self):
+        self.workbook.close()
+
+
+def new_workbook_path(prefix="broad_sheet_"):
+    """A fresh temporary .xlsx path; the caller deletes the file"""
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".xlsx")
+    os.close(fd)
+    return path
@@ -0,0 +1,133 @@
+"""
+Class positions computed from grade totals in a single query.
+
+The totals for every student in a class and term (optionally for one
+subject) are read with one GROUP BY and ranked in Python. Results are
+memoized per (class, term, subject) together with a grade version, a cheap
+fingerprint of the grades and students in that class and term, so a whole
+class report and any single-student preview share one computation until a
+grade changes.
+
+Only published grades and CBT grades count towards totals, as on the
+report card.
+"""
+import threading
+from collections import namedtuple
+
+from models import db, User
+from models.grade import Grade
+
+
+RANKING_METHODS = ("competition", "dense", "ordinal")
+
+RankEntry = namedtuple("RankEntry", ["student_id", "total", "position"])
+
+_totals = {}
+_lock = threading.Lock()
+
+
+def _counted_grades(term_id, class_room_id, subject_id=None):
+    criteria = [
+        Grade.term_id == term_id,
+        Grade.class_room_id == class_room_id,
+        db.or_(Grade.is_published == True, Grade.is_from_cbt == True),
+    ]
+    if subject_id:
+        criteria.append(Grade.subject_id == subject_id)
+    return criteria
+
+
+def grade_version(class_room_id, term_id):
+    """Fingerprint of the grades and students of a class for a term."""
+    grades = db.select(
+        db.func.count(Grade.grade_id),
+        db.func.max(Grade.updated_at),
+        db.func.sum(Grade.score),
+    ).where(
+        Grade.term_id == term_id,
+        Grade.class_room_id == class_room_id,
+    ).subquery()
+    students = db.select(db.func.count(User.id)).where(
+        User.class_room_id == class_room_id,
+        User.role == "student",
+    ).scalar_subquery()
+    return tuple(db.session.execute(db.select(grades, students)).one())
+
+
+def _load_totals(class_room_id, term_id, subject_id=None):
+    """Every student's total, highest first, with students without grades at 0."""
+    total = db.func.coalesce(db.func.sum(Grade.score), 0)
+    rows = db.session.execute(
+        db.select(User.id, total)
+        .outerjoin(
+            Grade,
+            db.and_(Grade.student_id == User.id,
+                    *_counted_grades(term_id, class_room_id, subject_id)),
+        )
+        .where(User.class_room_id == class_room_id, User.role == "student")
+        .group_by(User.id)
+        .order_by(total.desc(), User.id)
+    ).all()
+    return tuple((student_id, float(student_total)) for student_id, student_total in rows)
+
+
+def rank_totals(totals, method="competition"):
+    """
+    Assign positions to (student_id, total) pairs sorted highest first.
+
+    competition: ties share a position and the next one is skipped (1, 2, 2, 4)
+    dense: ties share a position and none is skipped (1, 2, 2, 3)
+    ordinal: every student gets a distinct position (1, 2, 3, 4)
+    """
+    if method not in RANKING_METHODS:
+        raise ValueError(f"Unknown ranking method: {method}")
+
+    entries = []
+    position = 0
+    previous = None
+    for index, (student_id, total) in enumerate(totals, start=1):
+        if method == "ordinal" or total != previous:
+            position = position + 1 if method == "dense" else index
+        previous = total
+        entries.append(RankEntry(student_id, total, position))
+    return entries
+
+
+def get_class_totals(class_room_id, term_id, subject_id=None):
+    """Memoized totals for a class and term, recomputed when grades change."""
+    key = (class_room_id, term_id, subject_id)
+    version = grade_version(class_room_id, term_id)
+    with _lock:
+        cached = _totals.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    totals = _load_totals(class_room_id, term_id, subject_id)
+    with _lock:
+        _totals[key] = (version, totals)
+    return totals
+
+
+def get_class_ranking(class_room_id, term_id, subject_id=None, method="competition"):
+    """
+    Rank every student in a class for a term.
+
+    Returns:
+        list of RankEntry, highest total first
+    """
+    return rank_totals(get_class_totals(class_room_id, term_id, subject_id), method)
+
+
+def get_student_position(student_id, class_room_id, term_id, subject_id=None,
+                         method="competition"):
+    """A student's position in the class ranking, or None if not in the class."""
+    for entry in get_class_ranking(class_room_id, term_id, subject_id, method):
+        if entry.student_id == student_id:
+            return entry.position
+    return None
+
+
+def clear_class_rankings():
+    """Forget every memoized ranking."""
+    with _lock:
+        _totals.clear()
@@ -0,0 +1,140 @@
+"""
+Cached answer to "may this student take this exam?".
+
+Every step of an exam attempt (instructions, start, questions, submit) has
+to check that the student is enrolled in the exam's subject - enrolling
+them on the spot when the subject is taught in their class - and has not
+already completed the exam. The three lookups are made together in one
+query, and the verdict is kept in memory for the rest of the attempt, so
+after the first page the check costs nothing.
+
+Verdicts are dropped when they can change: submitting marks the exam as
+completed, and any route that resets an attempt, moves a student to another
+class or changes which subjects a class or student takes must call
+``invalidate_exam_access`` (or ``clear_exam_access`` for changes that touch
+many students). Verdicts also expire after ACCESS_TTL seconds as a backstop.
+
+Like the other in-process caches, this assumes a single app process.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from models import db
+from models.associations import class_subject, student_exam, student_subject
+
+
+ExamAccess = namedtuple("ExamAccess", ["allowed", "reason", "is_demo"])
+
+ALLOWED = ExamAccess(True, None, False)
+DEMO = ExamAccess(True, None, True)
+NOT_ENROLLED = ExamAccess(False, "not_enrolled", False)
+COMPLETED = ExamAccess(False, "completed", False)
+
+MESSAGES = {
+    "not_enrolled": "Not enrolled in this subject",
+    "completed": "You have already completed this exam",
+}
+
+# Seconds a verdict is trusted without being re-read
+ACCESS_TTL = 2 * 60 * 60
+
+_verdicts = {}
+_generation = 0
+_lock = threading.Lock()
+
+
+def is_demo_user(user):
+    """Demo accounts may take any exam, any number of times"""
+    return "demo" in user.username.lower()
+
+
+def _read_access(user, exam):
+    """Enrollment, class subject and completion in one round trip"""
+    enrolled = db.select(student_subject.c.student_id).where(
+        student_subject.c.student_id == user.id,
+        student_subject.c.subject_id == exam.subject_id,
+    ).exists()
+    class_subject_exists = db.select(class_subject.c.subject_id).where(
+        class_subject.c.class_room_id == user.class_room_id,
+        class_subject.c.subject_id == exam.subject_id,
+    ).exists()
+    completed = db.select(student_exam.c.student_id).where(
+        student_exam.c.student_id == user.id,
+        student_exam.c.exam_id == exam.id,
+    ).exists()
+    return db.session.execute(
+        db.select(enrolled, class_subject_exists, completed)
+    ).one()
+
+
+def check_exam_access(user, exam):
+    """
+    Whether a student may take an exam.
+
+    A student who is not enrolled in the exam's subject but whose class takes
+    it is enrolled (and committed) here, as the exam routes always did.
+
+    Returns:
+        ExamAccess(allowed, reason, is_demo); reason is "not_enrolled" or
+        "completed" when access is refused
+    """
+    if is_demo_user(user):
+        return DEMO
+
+    key = (user.id, exam.id)
+    now = time.monotonic()
+    with _lock:
+        cached = _verdicts.get(key)
+        generation = _generation
+    if cached and cached[1] > now:
+        return cached[0]
+
+    enrolled, in_class_subjects, completed = _read_access(user, exam)
+    if not enrolled and in_class_subjects:
+        db.session.execute(student_subject.insert().values(
+            student_id=user.id,
+            subject_id=exam.subject_id
+        ))
+        db.session.commit()
+        enrolled = True
+
+    if not enrolled:
+        verdict = NOT_ENROLLED
+    elif completed:
+        verdict = COMPLETED
+    else:
+        verdict = ALLOWED
+
+    # Don't keep a verdict read while something invalidated the cache
+    with _lock:
+        if _generation == generation:
+            _verdicts[key] = (verdict, now + ACCESS_TTL)
+    return verdict
+
+
+def mark_exam_completed(student_id, exam_id):
+    """Record that a student's submission closed the exam to them"""
+    with _lock:
+        _verdicts[(student_id, exam_id)] = (COMPLETED, time.monotonic() + ACCESS_TTL)
+
+
+def invalidate_exam_access(student_id=None, exam_id=None):
+    """Drop cached verdicts of a student, an exam, or one student's exam"""
+    global _generation
+    with _lock:
+        _generation += 1
+        for key in [
+            key for key in _verdicts
+            if (student_id is None or key[0] == student_id)
+            and (exam_id is None or key[1] == exam_id)
+        ]:
+            del _verdicts[key]
+
+
+def clear_exam_access():
+    """Drop every cached verdict (after class/subject assignments change)"""
+    global _generation
+    with _lock:
+        _generation += 1
+        _verdicts.clear()
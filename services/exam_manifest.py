@@ -0,0 +1,110 @@
+"""
+Per-student manifest of the questions served in an exam.
+
+The first time a student fetches an exam's questions, the random selection
+and the order of questions and options are recorded on their ExamSession
+(question_order / option_order). Every later fetch, resume, submission and
+admin review reads that manifest instead of re-sampling, so a student always
+sees the same paper and is only marked on what they were shown.
+"""
+import random
+from datetime import datetime
+
+from models import db
+from models.exam_session import ExamSession
+from services.question_bank import select_exam_questions, serialize_question
+
+
+def build_manifest(bank, number_of_questions=None):
+    """
+    Choose the questions and option order for one student.
+
+    Returns:
+        (question_ids, option_order) where option_order maps each question id
+        to its option ids in display order
+    """
+    questions = select_exam_questions(bank, number_of_questions)
+    option_order = {}
+    for question in questions:
+        option_ids = [option.id for option in question.options]
+        random.shuffle(option_ids)
+        option_order[question.id] = option_ids
+    return [question.id for question in questions], option_order
+
+
+def get_active_session(student_id, exam_id):
+    """Return the student's in-progress session for an exam, if any."""
+    return ExamSession.query.filter_by(
+        student_id=student_id,
+        exam_id=exam_id,
+        is_active=True,
+        is_completed=False
+    ).first()
+
+
+def get_or_create_manifest(exam, student_id, bank):
+    """
+    Return the student's active ExamSession, recording a manifest on it if it
+    does not have one yet. A session is created when none is in progress.
+    """
+    exam_session = get_active_session(student_id, exam.id)
+    if exam_session and exam_session.has_manifest():
+        return exam_session
+
+    question_ids, option_order = build_manifest(bank, exam.number_of_questions)
+
+    if not exam_session:
+        exam_session = ExamSession()
+        exam_session.student_id = student_id
+        exam_session.exam_id = exam.id
+        exam_session.current_question_index = 0
+        exam_session.time_remaining = int(exam.duration.total_seconds()) if exam.duration else 0
+        exam_session.set_answers({})
+        db.session.add(exam_session)
+
+    exam_session.set_question_order(question_ids)
+    exam_session.set_option_order(option_order)
+    exam_session.last_activity = datetime.utcnow()
+    db.session.commit()
+    return exam_session
+
+
+def manifest_questions(bank, question_ids, option_order):
+    """
+    Resolve a manifest against the question bank snapshot.
+
+    Questions deleted since the manifest was recorded are skipped; options
+    added since are appended after the recorded ones.
+    """
+    by_id = {question.id: question for question in bank}
+    served = []
+    for question_id in question_ids:
+        question = by_id.get(question_id)
+        if question is None:
+            continue
+
+        options_by_id = {option.id: option for option in question.options}
+        recorded = [options_by_id.pop(option_id)
+                    for option_id in option_order.get(question_id, [])
+                    if option_id in options_by_id]
+        ordered = recorded + [o for o in question.options if o.id in options_by_id]
+        served.append(question._replace(options=tuple(ordered)))
+    return served
+
+
+def serialize_manifest(bank, exam_session):
+    """Serialize the questions recorded on a session in their served order."""
+    return [
+        serialize_question(question, shuffle_options=False)
+        for question in manifest_questions(
+            bank,
+            exam_session.get_question_order(),
+            exam_session.get_option_order()
+        )
+    ]
+
+
+def filter_served_answers(answers, question_ids):
+    """Keep only answers to questions that were actually served."""
+    served = set(question_ids)
+    return {qid: answer for qid, answer in (answers or {}).items() if qid in served}
@@ -0,0 +1,216 @@
+"""
+Server-side scoring for CBT exams.
+
+An answer key (question id -> correct option ids or normalized short answer)
+is derived once from the cached question bank snapshot, so scoring a
+submission is a single pass over the submitted answers with no database
+lookups. ``rescore_exam_records`` reuses the same key to re-score every
+stored ExamRecord for an exam, e.g. after a question's correct option is
+fixed.
+"""
+import threading
+from collections import namedtuple
+
+from models import db
+from models.associations import student_exam
+from services.question_bank import get_exam_question_bank
+
+
+CHOICE_QUESTION_TYPES = ("mcq", "true_false")
+
+AnswerKeyEntry = namedtuple("AnswerKeyEntry", ["question_type", "correct"])
+
+ScoreResult = namedtuple(
+    "ScoreResult",
+    ["correct_answers", "total_questions", "score_percentage", "raw_score", "letter_grade"],
+)
+
+_answer_keys = {}
+_lock = threading.Lock()
+
+
+def normalize_short_answer(answer):
+    """Normalize a short answer for case-insensitive comparison."""
+    return str(answer).lower().strip()
+
+
+def letter_grade_for(score_percentage):
+    """Letter grade used for CBT exam records."""
+    if score_percentage >= 70:
+        return 'A'
+    elif score_percentage >= 59:
+        return 'B'
+    elif score_percentage >= 49:
+        return 'C'
+    elif score_percentage >= 40:
+        return 'D'
+    return 'F'
+
+
+def build_answer_key(bank):
+    """
+    Build an answer key from a question bank snapshot.
+
+    Choice questions map to a frozenset of correct option ids, short answer
+    questions to their normalized expected answer (None if not set).
+    """
+    key = {}
+    for question in bank:
+        if question.question_type in CHOICE_QUESTION_TYPES:
+            correct = frozenset(o.id for o in question.options if o.is_correct)
+        elif question.question_type == "short_answer":
+            correct = (
+                normalize_short_answer(question.correct_answer)
+                if question.correct_answer is not None
+                else None
+            )
+        else:
+            correct = None
+        key[question.id] = AnswerKeyEntry(question.question_type, correct)
+    return key
+
+
+def get_answer_key(exam):
+    """Return the answer key for an exam, rebuilt only when its bank changes."""
+    bank = get_exam_question_bank(exam)
+    cache_key = (exam.subject_id, exam.class_room_id)
+    with _lock:
+        cached = _answer_keys.get(cache_key)
+    if cached and cached[0] is bank:
+        return cached[1]
+
+    answer_key = build_answer_key(bank)
+    with _lock:
+        _answer_keys[cache_key] = (bank, answer_key)
+    return answer_key
+
+
+def count_correct(answer_key, answers):
+    """Count correct answers in a {question_id: answer} mapping."""
+    correct_answers = 0
+    for question_id, student_answer in answers.items():
+        entry = answer_key.get(question_id)
+        if entry is None or not student_answer:
+            continue
+        if entry.question_type in CHOICE_QUESTION_TYPES:
+            if str(student_answer) in entry.correct:
+                correct_answers += 1
+        elif entry.question_type == "short_answer":
+            if entry.correct is not None and normalize_short_answer(student_answer) == entry.correct:
+                correct_answers += 1
+    return correct_answers
+
+
+def exam_total_questions(exam, bank_size):
+    """Number of questions a submission is marked out of."""
+    if exam.number_of_questions and exam.number_of_questions < bank_size:
+        return exam.number_of_questions
+    return bank_size
+
+
+def compute_score(correct_answers, total_questions, max_score):
+    """Turn a correct-answer count into a ScoreResult."""
+    score_percentage = (
+        correct_answers / total_questions * 100) if total_questions > 0 else 0
+    raw_score = (correct_answers / total_questions *
+                 max_score) if total_questions > 0 else 0
+    return ScoreResult(
+        correct_answers=correct_answers,
+        total_questions=total_questions,
+        score_percentage=score_percentage,
+        raw_score=raw_score,
+        letter_grade=letter_grade_for(score_percentage),
+    )
+
+
+def score_submission(exam, answers, answer_key=None, served_question_ids=None):
+    """
+    Score a submitted answer sheet against the exam's answer key.
+
+    Args:
+        exam: Exam instance
+        answers: dict of {question_id: option_id or answer_text}
+        answer_key: optional key from get_answer_key (looked up if omitted)
+        served_question_ids: question ids from the student's manifest; when
+            given, only these are marked and the total is their count
+
+    Returns:
+        ScoreResult, or None when the exam has no questions
+    """
+    if answer_key is None:
+        answer_key = get_answer_key(exam)
+    if not answer_key:
+        return None
+
+    if served_question_ids:
+        served_key = {
+            qid: answer_key[qid] for qid in served_question_ids if qid in answer_key
+        }
+        return compute_score(
+            count_correct(served_key, answers or {}),
+            len(served_question_ids),
+            exam.max_score,
+        )
+
+    return compute_score(
+        count_correct(answer_key, answers or {}),
+        exam_total_questions(exam, len(answer_key)),
+        exam.max_score,
+    )
+
+
+def rescore_exam_records(exam, commit=True):
+    """
+    Re-score every stored ExamRecord for an exam against the current key.
+
+    Each record keeps the number of questions it was marked out of and its
+    max score; only the correct-answer count and derived fields change. The
+    student_exam scores and CBT grades are updated to match in the same
+    transaction.
+
+    Returns:
+        dict with total_records, changed and unchanged counts
+    """
+    from models.exam_record import ExamRecord
+    from utils.grade_sync import sync_exam_records
+
+    answer_key = get_answer_key(exam)
+    records = ExamRecord.query.filter_by(exam_id=exam.id).all()
+
+    stats = {"total_records": len(records), "changed": 0, "unchanged": 0}
+    score_updates = []
+    for record in records:
+        result = compute_score(
+            count_correct(answer_key, record.get_answers() or {}),
+            record.total_questions,
+            record.max_score,
+        )
+        raw_score = float(round(result.raw_score, 2))
+        if (record.correct_answers == result.correct_answers
+                and record.raw_score == raw_score):
+            stats["unchanged"] += 1
+            continue
+
+        record.correct_answers = int(result.correct_answers)
+        record.score_percentage = float(round(result.score_percentage, 2))
+        record.raw_score = raw_score
+        record.letter_grade = result.letter_grade
+        score_updates.append({"sid": record.student_id, "new_score": raw_score})
+        stats["changed"] += 1
+
+    if score_updates:
+        db.session.execute(
+            student_exam.update()
+            .where(
+                (student_exam.c.student_id == db.bindparam("sid")) &
+                (student_exam.c.exam_id == exam.id)
+            )
+            .values(score=db.bindparam("new_score")),
+            score_updates,
+        )
+        db.session.flush()
+        sync_exam_records([ExamRecord.exam_id == exam.id], commit=False)
+
+    if commit:
+        db.session.commit()
+    return stats
@@ -0,0 +1,108 @@
+"""
+Content-addressed store for question and option images.
+
+Images used to be kept in Question.question_image / Option.option_image as
+base64 data URIs, so every exam payload re-sent them inline. Now each image
+is written once to QUESTION_IMAGE_FOLDER as ``<sha256>.<ext>`` and the rows
+hold only its URL (``/question-images/<sha256>.<ext>``). The same picture
+uploaded twice - in two documents, or twice in one - is stored once, and
+since a file name never changes content the files are served with
+far-future immutable caching headers.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import current_app, has_app_context
+
+
+IMAGE_URL_PREFIX = "/question-images/"
+
+# Seconds browsers may keep an image without revalidating (one year)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Content types stored as files, and their extensions. Anything else (SVG,
+# which could carry script, or an unknown type) is left as it was.
+EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/bmp": "bmp",
+}
+
+_DATA_URI = re.compile(r"^data:(image/[\w.+-]+);base64,(.*)$", re.DOTALL)
+_IMAGE_NAME = re.compile(r"^[0-9a-f]{64}\.(?:%s)$" % "|".join(sorted(set(EXTENSIONS.values()))))
+
+_DEFAULT_FOLDER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "uploads", "questions"
+)
+
+
+def image_folder():
+    """Directory the images are written to"""
+    if has_app_context():
+        return current_app.config.get("QUESTION_IMAGE_FOLDER", _DEFAULT_FOLDER)
+    return _DEFAULT_FOLDER
+
+
+def is_image_name(filename):
+    """Whether a file name is one this store could have written"""
+    return bool(_IMAGE_NAME.match(filename or ""))
+
+
+def is_data_uri(value):
+    return isinstance(value, str) and value.startswith("data:image/")
+
+
+def store_image(data, content_type):
+    """
+    Write image bytes once and return their URL.
+
+    Returns:
+        "/question-images/<sha256>.<ext>", or None when the content type is
+        not one the store keeps
+    """
+    extension = EXTENSIONS.get(content_type.lower())
+    if extension is None:
+        return None
+
+    filename = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    folder = image_folder()
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        # Write aside and rename so a reader never sees half a file
+        fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                temp.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return IMAGE_URL_PREFIX + filename
+
+
+def store_data_uri(value):
+    """
+    The stored URL for an inline base64 image; any other value unchanged.
+
+    Used wherever an image reaches a Question or Option row, so data URIs
+    from uploads, previews or API clients never end up in the database.
+    """
+    if not is_data_uri(value):
+        return value
+    match = _DATA_URI.match(value)
+    if not match:
+        return value
+    try:
+        data = base64.b64decode(match.group(2), validate=False)
+    except (binascii.Error, ValueError):
+        return value
+    return store_image(data, match.group(1)) or value
@@ -0,0 +1,313 @@
+"""
+Parallel HTML-to-PDF rendering for multi-report downloads.
+
+Documents are split into chunks that are rendered to PDF in a bounded
+process pool, so a class download uses every core instead of one WeasyPrint
+call on one thread. The chunk PDFs are merged in order with pypdf.
+
+The pool is started once, on first use, and shared by every download; it is
+only replaced after a worker dies or a stuck one has to be terminated.
+Chunks of other downloads lost with a terminated pool are resubmitted
+without using up their retries.
+Workers are spawned rather than forked from the (threaded) web process, so
+each one imports the app once when the pool starts.
+
+Each chunk has its own timeout, counted from when it is handed to the pool,
+and is retried; a chunk that keeps failing is split and its documents are
+rendered one by one, so a single bad report is left out (and reported back)
+instead of failing the whole download. Documents are read a chunk at a time,
+so a generator of pages is never held in memory all at once.
+
+Pool settings come from the app config when there is an app context:
+REPORT_PDF_WORKERS (0 = one per CPU), REPORT_PDF_CHUNK_SIZE,
+REPORT_PDF_CHUNK_TIMEOUT (seconds) and REPORT_PDF_RETRIES.
+"""
+import io
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from collections import deque, namedtuple
+from concurrent.futures import CancelledError, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+
+
+logger = logging.getLogger(__name__)
+
+PAGE_BREAK = '<div style="page-break-after: always;"></div>'
+
+# Same settings the single-report download uses
+WEASYPRINT_OPTIONS = {
+    "optimize_size": ("fonts", "images"),
+    "presentational_hints": True,
+    "uncompressed_pdf": False,
+    "javascript": False,
+    "resolution": 60,
+    "embed_fonts": False,
+    "smart_quotes": False,
+    "attachments": False,
+    "pdfua": False,
+    "tagged": False,
+    "forms": False,
+    "outline": False,
+}
+
+DEFAULTS = {
+    "REPORT_PDF_WORKERS": 0,
+    "REPORT_PDF_CHUNK_SIZE": 4,
+    "REPORT_PDF_CHUNK_TIMEOUT": 60,
+    "REPORT_PDF_RETRIES": 1,
+}
+
+RenderResult = namedtuple("RenderResult", ["pdf", "failed"])
+
+# Shared by every download; see _get_pool
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+# Pools terminated over a stuck chunk; other downloads' chunks on them are resubmitted
+_terminated = weakref.WeakSet()
+
+
+class PDFRenderError(Exception):
+    """Raised when no document could be rendered."""
+
+
+def render_weasyprint(html_documents):
+    from weasyprint import HTML
+    return HTML(string=PAGE_BREAK.join(html_documents)).write_pdf(**WEASYPRINT_OPTIONS)
+
+
+def render_xhtml2pdf(html_documents):
+    from xhtml2pdf import pisa
+    buffer = io.BytesIO()
+    status = pisa.CreatePDF(
+        PAGE_BREAK.join(html_documents), dest=buffer, show_error_as_pdf=True
+    )
+    if status.err:
+        raise RuntimeError("xhtml2pdf could not render the document")
+    return buffer.getvalue()
+
+
+ENGINES = {
+    "weasyprint": render_weasyprint,
+    "xhtml2pdf": render_xhtml2pdf,
+}
+
+
+def _render_chunk(render, html_documents, frame=None):
+    """Pool entry point; module-level so it can be pickled."""
+    if frame:
+        # Fragments share one document (and one stylesheet) per chunk
+        prefix, suffix = frame
+        html_documents = [prefix + PAGE_BREAK.join(html_documents) + suffix]
+    return render(html_documents)
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config.get(name, DEFAULTS[name])
+    return DEFAULTS[name]
+
+
+def _terminate(executor):
+    """Stop a pool without waiting for workers stuck past their timeout."""
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def _pool_context():
+    # Never fork the web process: a forked worker would inherit its threads'
+    # locks (request handlers, the autosave flusher, report jobs) mid-use
+    return multiprocessing.get_context("spawn")
+
+
+def _get_pool(workers):
+    """The shared worker pool, started on first use."""
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None and _pool_size < workers:
+            # Chunks already handed to the smaller pool still finish
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+            _pool_size = workers
+        return _pool
+
+
+def _discard_pool(pool, terminate=False):
+    """Drop a broken or stuck pool; the next chunk starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+        if terminate:
+            _terminated.add(pool)
+    if terminate:
+        _terminate(pool)
+    else:
+        pool.shutdown(wait=False)
+
+
+def _submit(workers, *args):
+    """Hand a chunk to the shared pool as (pool, future)."""
+    for _ in range(2):
+        pool = _get_pool(workers)
+        try:
+            return pool, pool.submit(_render_chunk, *args)
+        except (BrokenProcessPool, RuntimeError):
+            # Broken, or stopped by another download since we got it
+            _discard_pool(pool)
+    raise PDFRenderError("The PDF worker pool could not be started")
+
+
+def merge_pdfs(pdf_parts):
+    """Concatenate PDF documents (bytes) into one."""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for part in pdf_parts:
+        writer.append(io.BytesIO(part))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def render_documents(html_documents, engine="weasyprint", chunk_size=None,
+                     max_workers=None, timeout=None, retries=None, progress=None,
+                     frame=None):
+    """
+    Render HTML documents to one PDF, one or more pages per document.
+
+    Args:
+        html_documents: complete HTML documents in page order; any iterable,
+            read one chunk at a time
+        engine: "weasyprint", "xhtml2pdf", or a module-level render function
+            taking a list of HTML strings
+        chunk_size: documents rendered together by one worker
+        max_workers: pool size (0 = one per CPU)
+        timeout: seconds a worker may spend on one chunk
+        retries: extra attempts for a failed chunk before splitting it
+        progress: optional callback, called with the number of documents
+            finished (rendered or given up on) whenever it changes
+        frame: optional (prefix, suffix) HTML; html_documents are then body
+            fragments, and each chunk is rendered as prefix + fragments + suffix
+
+    Returns:
+        RenderResult(pdf bytes, indexes of documents that could not be rendered)
+
+    Raises:
+        PDFRenderError: if nothing could be rendered
+    """
+    render = ENGINES.get(engine) if isinstance(engine, str) else engine
+    if render is None:
+        raise ValueError(f"Unknown PDF engine: {engine}")
+
+    chunk_size = max(1, chunk_size or _setting("REPORT_PDF_CHUNK_SIZE"))
+    max_workers = max_workers if max_workers is not None else _setting("REPORT_PDF_WORKERS")
+    timeout = timeout or _setting("REPORT_PDF_CHUNK_TIMEOUT")
+    retries = retries if retries is not None else _setting("REPORT_PDF_RETRIES")
+    workers = max_workers or os.cpu_count() or 1
+
+    documents = iter(html_documents)
+    pending = {}      # document index -> HTML, until its chunk is finished
+    jobs = deque()    # (document indexes, attempts left) waiting for a worker
+    running = {}      # future -> (pool, document indexes, attempts left, deadline)
+    rendered = {}
+    failed = []
+    read = 0
+    done = 0
+
+    def finished(indexes):
+        nonlocal done
+        for index in indexes:
+            del pending[index]
+        done += len(indexes)
+        if progress:
+            progress(done)
+
+    def retry(indexes, attempts):
+        if attempts > 0:
+            jobs.append((indexes, attempts - 1))
+        elif len(indexes) > 1:
+            # Find the bad document(s) by rendering the chunk one by one
+            jobs.extend(([index], 0) for index in indexes)
+        else:
+            failed.append(indexes[0])
+            finished(indexes)
+
+    try:
+        while True:
+            # At most one chunk per worker: the rest of the documents stay
+            # unread, and no chunk's deadline runs while it waits behind
+            # this download's other chunks
+            while len(running) < workers:
+                if not jobs:
+                    chunk = list(itertools.islice(documents, chunk_size))
+                    if not chunk:
+                        break
+                    indexes = list(range(read, read + len(chunk)))
+                    pending.update(zip(indexes, chunk))
+                    read += len(chunk)
+                    jobs.append((indexes, retries))
+                indexes, attempts = jobs.popleft()
+                pool, future = _submit(
+                    workers, render, [pending[i] for i in indexes], frame)
+                running[future] = (pool, indexes, attempts, time.monotonic() + timeout)
+            if not running:
+                break
+
+            next_deadline = min(deadline for _, _, _, deadline in running.values())
+            wait(running, timeout=max(0, next_deadline - time.monotonic()),
+                 return_when=FIRST_COMPLETED)
+
+            for future in [future for future in running if future.done()]:
+                pool, indexes, attempts, _ = running.pop(future)
+                try:
+                    rendered[indexes[0]] = future.result()
+                    finished(indexes)
+                    continue
+                except (BrokenProcessPool, CancelledError):
+                    if pool in _terminated:
+                        # Another download stopped the pool over its own
+                        # stuck chunk; this one is not to blame
+                        jobs.append((indexes, attempts))
+                        continue
+                    logger.warning("PDF worker died while rendering chunk %s", indexes)
+                    _discard_pool(pool)
+                except Exception:
+                    logger.exception("PDF chunk %s failed", indexes)
+                retry(indexes, attempts)
+
+            now = time.monotonic()
+            stuck = [future for future, (_, _, _, deadline) in running.items()
+                     if deadline <= now]
+            if stuck:
+                for future in stuck:
+                    pool, indexes, attempts, _ = running.pop(future)
+                    logger.warning("PDF chunk %s timed out after %ss", indexes, timeout)
+                    retry(indexes, attempts)
+                    # A stuck worker can only be stopped with its pool
+                    _discard_pool(pool, terminate=True)
+                # Chunks that were sharing the terminated pool start again
+                for _, indexes, attempts, _ in running.values():
+                    jobs.appendleft((indexes, attempts))
+                running.clear()
+    finally:
+        for future in running:
+            future.cancel()
+
+    if not rendered:
+        raise PDFRenderError("None of the documents could be rendered")
+
+    pdf = merge_pdfs([rendered[start] for start in sorted(rendered)])
+    return RenderResult(pdf, sorted(failed))
@@ -0,0 +1,171 @@
+"""
+In-memory question bank snapshots used to serve exam questions.
+
+A snapshot is an immutable copy of every question (and its options) for a
+subject/class pair. It is built with a single batched query the first time an
+exam for that pair is served (or when the exam is activated) and reused by
+every student afterwards, so per-student shuffling and sampling never touch
+the database. Any route that creates, edits or deletes questions must call
+``invalidate_question_bank`` for the subject/class it touched.
+"""
+import random
+import threading
+from collections import namedtuple
+
+from sqlalchemy.orm import selectinload
+
+from models.question import Question
+
+
+OptionSnapshot = namedtuple(
+    "OptionSnapshot", ["id", "text", "is_correct", "has_math", "option_image"]
+)
+
+QuestionSnapshot = namedtuple(
+    "QuestionSnapshot",
+    [
+        "id",
+        "question_text",
+        "question_type",
+        "correct_answer",
+        "has_math",
+        "question_image",
+        "options",
+    ],
+)
+
+_banks = {}
+_versions = {}
+_lock = threading.Lock()
+
+
+def _bank_key(subject_id, class_room_id):
+    return (subject_id, class_room_id)
+
+
+def _load_question_bank(subject_id, class_room_id):
+    """Read the questions and options for a subject/class in one round trip."""
+    questions = (
+        Question.query.options(selectinload(Question.options))
+        .filter_by(subject_id=subject_id, class_room_id=class_room_id)
+        .order_by(Question.id)
+        .all()
+    )
+
+    snapshot = []
+    for question in questions:
+        options = tuple(
+            OptionSnapshot(
+                id=option.id,
+                text=option.text,
+                is_correct=bool(option.is_correct),
+                has_math=bool(getattr(option, "has_math", False)),
+                option_image=getattr(option, "option_image", None),
+            )
+            for option in sorted(question.options, key=lambda o: (o.order or 0, o.id))
+        )
+        snapshot.append(
+            QuestionSnapshot(
+                id=question.id,
+                question_text=question.question_text,
+                question_type=question.question_type,
+                correct_answer=question.correct_answer,
+                has_math=bool(getattr(question, "has_math", False)),
+                question_image=getattr(question, "question_image", None),
+                options=options,
+            )
+        )
+    return tuple(snapshot)
+
+
+def get_question_bank(subject_id, class_room_id):
+    """
+    Return the cached snapshot for a subject/class, building it if needed.
+
+    Returns:
+        tuple of QuestionSnapshot (empty if the bank has no questions)
+    """
+    key = _bank_key(subject_id, class_room_id)
+    with _lock:
+        bank = _banks.get(key)
+        version = _versions.get(key, 0)
+    if bank is not None:
+        return bank
+
+    bank = _load_question_bank(subject_id, class_room_id)
+
+    # Only keep the snapshot if nothing invalidated the bank while we were
+    # reading it, otherwise the next request rebuilds from fresh data.
+    # Empty banks are not cached so newly added questions show up at once.
+    if bank:
+        with _lock:
+            if _versions.get(key, 0) == version:
+                _banks[key] = bank
+    return bank
+
+
+def get_exam_question_bank(exam):
+    """Return the question bank snapshot for an exam's subject and class."""
+    return get_question_bank(exam.subject_id, exam.class_room_id)
+
+
+def warm_question_bank(exam):
+    """Build the snapshot for an exam ahead of the first student request."""
+    return len(get_exam_question_bank(exam))
+
+
+def invalidate_question_bank(subject_id, class_room_id):
+    """Drop the cached snapshot for a subject/class after its questions change."""
+    key = _bank_key(subject_id, class_room_id)
+    with _lock:
+        _banks.pop(key, None)
+        _versions[key] = _versions.get(key, 0) + 1
+
+
+def clear_question_banks():
+    """Drop every cached snapshot."""
+    with _lock:
+        for key in list(_banks):
+            _versions[key] = _versions.get(key, 0) + 1
+        _banks.clear()
+
+
+def select_exam_questions(bank, number_of_questions=None):
+    """
+    Pick and order the questions a student will see.
+
+    Applies the exam's question limit with ``random.sample`` and shuffles the
+    result so every student gets a different order.
+    """
+    if number_of_questions and number_of_questions < len(bank):
+        questions = random.sample(bank, number_of_questions)
+    else:
+        questions = list(bank)
+    random.shuffle(questions)
+    return questions
+
+
+def serialize_question(question, shuffle_options=True):
+    """Convert a QuestionSnapshot to the JSON shape used by the exam page."""
+    options = list(question.options)
+    if shuffle_options:
+        random.shuffle(options)
+
+    return {
+        "id": question.id,
+        "question_text": question.question_text,
+        "question_type": question.question_type,
+        "options": [
+            {
+                "id": option.id,
+                "text": option.text,
+                "is_correct": option.is_correct,
+                "order": i,
+                "has_math": option.has_math,
+                "option_image": option.option_image,
+            }
+            for i, option in enumerate(options)
+        ],
+        "has_math": question.has_math,
+        "question_image": question.question_image,
+    }
@@ -0,0 +1,408 @@
+"""
+Bulk question import.
+
+Uploads used to be saved one question at a time: each question looked up its
+subject, teacher and class again and was flushed and committed on its own, so
+a 500-question bank cost thousands of queries and 500 commits.
+``import_questions`` consumes the parsed questions as a stream, a batch at a
+time:
+
+- the subjects, classes, teachers, terms and exams a batch refers to are read
+  with one query each, and remembered for the following batches;
+- the valid questions and their options are written with one bulk INSERT
+  each and a single commit per batch;
+- invalid questions are reported with their number and the reason, and the
+  rest of the file is still imported.
+
+If a batch fails to insert as a whole it is retried question by question, so
+one bad row cannot take the other questions of its batch down with it.
+
+``validate_questions`` runs the same checks without writing anything, for
+upload previews.
+"""
+import logging
+import time
+
+from sqlalchemy import insert
+
+from models import db
+from models.associations import class_subject
+from models.class_room import ClassRoom
+from models.exam import Exam
+from models.question import Question, Option
+from models.school_term import SchoolTerm
+from models.subject import Subject
+from models.user import User
+from services.generate_uuid import generate_uuid
+from services.image_store import store_data_uri
+from services.question_bank import invalidate_question_bank
+
+
+logger = logging.getLogger(__name__)
+
+VALID_TYPES = ["mcq", "true_false", "short_answer"]
+
+# Questions validated, inserted and committed together
+DEFAULT_BATCH_SIZE = 500
+
+REFERENCE_FIELDS = ("subject_id", "class_room_id", "term_id", "exam_type_id")
+
+
+class ImportRowError(Exception):
+    """A question that cannot be imported, with the reason shown to the user"""
+
+
+class ImportResult:
+    """Outcome of an import: questions created, per-question errors, timing"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.created_ids = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, number, message):
+        self.errors.append((number, message))
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else None
+
+    def to_dict(self):
+        """The JSON body the upload routes return"""
+        response_data = {
+            "success": True,
+            "message": f"Successfully created {self.created} questions",
+            "created_count": self.created,
+            "error_count": len(self.errors),
+            "throughput": {
+                "rows": self.rows,
+                "seconds": round(self.elapsed, 3),
+                "rows_per_second": self.rows_per_second,
+            },
+        }
+        if self.errors:
+            self.errors.sort()
+            response_data["message"] += f" with {len(self.errors)} errors"
+            response_data["errors"] = [
+                f"Question {number}: {message}" for number, message in self.errors
+            ]
+            response_data["row_errors"] = [
+                {"row": number, "message": message} for number, message in self.errors
+            ]
+        return response_data
+
+
+class _References:
+    """The rows questions point at, read once per batch and kept for the next"""
+
+    def __init__(self):
+        self.subjects = {}        # subject_id -> (subject_name, subject_head_id) or None
+        self.classes = {}         # class_room_id -> class_room_name or None
+        self.class_subjects = set()
+        self.roles = {}           # user id -> role or None
+        self.terms = {}           # term_id -> exists
+        self.exams = {}           # exam id -> exists
+
+    def _missing(self, known, ids):
+        return {value for value in ids if value and value not in known}
+
+    def load(self, questions, teacher_id=None):
+        """Read everything a batch of questions refers to that is not known yet"""
+        subject_ids = self._missing(self.subjects, (q["subject_id"] for q in questions))
+        if subject_ids:
+            self.subjects.update(dict.fromkeys(subject_ids))
+            for subject_id, name, head_id in db.session.query(
+                Subject.subject_id, Subject.subject_name, Subject.subject_head_id
+            ).filter(Subject.subject_id.in_(subject_ids)):
+                self.subjects[subject_id] = (name, head_id)
+
+        class_ids = self._missing(self.classes, (q["class_room_id"] for q in questions))
+        if class_ids:
+            self.classes.update(dict.fromkeys(class_ids))
+            for class_room_id, name in db.session.query(
+                ClassRoom.class_room_id, ClassRoom.class_room_name
+            ).filter(ClassRoom.class_room_id.in_(class_ids)):
+                self.classes[class_room_id] = name
+            self.class_subjects.update(
+                tuple(pair) for pair in db.session.query(
+                    class_subject.c.class_room_id, class_subject.c.subject_id
+                ).filter(class_subject.c.class_room_id.in_(class_ids))
+            )
+
+        # Head teachers own admin uploads; staff uploads name their teacher
+        user_ids = set() if teacher_id else self._missing(
+            self.roles, (subject[1] for subject in self.subjects.values() if subject)
+        )
+        if user_ids:
+            self.roles.update(dict.fromkeys(user_ids))
+            self.roles.update(
+                db.session.query(User.id, User.role).filter(User.id.in_(user_ids))
+            )
+
+        for known, column, key in (
+            (self.terms, SchoolTerm.term_id, "term_id"),
+            (self.exams, Exam.id, "exam_type_id"),
+        ):
+            ids = self._missing(known, (q[key] for q in questions))
+            if ids:
+                known.update(dict.fromkeys(ids, False))
+                known.update(
+                    (row[0], True) for row in db.session.query(column).filter(column.in_(ids))
+                )
+
+
+def _with_defaults(question_data, defaults):
+    question = dict(question_data)
+    for field in REFERENCE_FIELDS:
+        question[field] = question.get(field) or defaults.get(field)
+    return question
+
+
+def validate_question(question, references, teacher_id=None):
+    """
+    Check one question against the batch's references.
+
+    Returns:
+        the id of the teacher who will own the question
+
+    Raises:
+        ImportRowError: with the reason the question cannot be imported
+    """
+    question_text = (question.get("question_text") or "").strip()
+    question_type = (question.get("question_type") or "").strip().lower()
+    options_data = question.get("options") or []
+
+    if not question_text:
+        raise ImportRowError("Question text is required")
+    if not question_type:
+        raise ImportRowError("Question type is required")
+    if not question["subject_id"]:
+        raise ImportRowError("Subject is required")
+    if not question["class_room_id"]:
+        raise ImportRowError("Class is required")
+
+    subject = references.subjects.get(question["subject_id"])
+    if not subject:
+        raise ImportRowError("Invalid subject")
+    subject_name, subject_head_id = subject
+
+    admin_upload = teacher_id is None
+    if admin_upload:
+        # Admin uploads: questions belong to the subject's head teacher
+        if not subject_head_id:
+            raise ImportRowError(
+                "No teacher assigned to this subject. Please assign a teacher to the "
+                "subject first before uploading questions.")
+        if references.roles.get(subject_head_id) != "staff":
+            raise ImportRowError(
+                "Assigned teacher is invalid or not a staff member. Please reassign a "
+                "valid teacher to the subject.")
+        teacher_id = subject_head_id
+
+    class_name = references.classes.get(question["class_room_id"])
+    if not class_name:
+        raise ImportRowError("Invalid class")
+    if admin_upload and \
+            (question["class_room_id"], question["subject_id"]) not in references.class_subjects:
+        raise ImportRowError(
+            f"Subject '{subject_name}' is not offered in class '{class_name}'. "
+            f"Please select a valid subject-class combination.")
+
+    if question_type not in VALID_TYPES:
+        raise ImportRowError(
+            f"Invalid question type '{question_type}'. Must be one of: {', '.join(VALID_TYPES)}")
+
+    if question_type in ["mcq", "true_false"]:
+        if not options_data:
+            raise ImportRowError(f"Options are required for {question_type} questions")
+        if not any(option.get("is_correct", False) for option in options_data):
+            raise ImportRowError("At least one correct option is required")
+        if question_type == "true_false" and len(options_data) != 2:
+            raise ImportRowError("True/False questions must have exactly 2 options")
+
+    if not question["term_id"]:
+        raise ImportRowError("Term is required")
+    if not references.terms.get(question["term_id"]):
+        raise ImportRowError("Invalid term")
+    if not question["exam_type_id"]:
+        raise ImportRowError("Exam is required")
+    if not references.exams.get(question["exam_type_id"]):
+        raise ImportRowError("Invalid exam")
+
+    return teacher_id
+
+
+def _question_rows(question, teacher_id):
+    """The questions and options table rows for one validated question"""
+    question_type = question["question_type"].strip().lower()
+    question_id = generate_uuid()
+    question_row = {
+        "id": question_id,
+        "question_text": question["question_text"].strip(),
+        "question_type": question_type,
+        "subject_id": question["subject_id"],
+        "teacher_id": teacher_id,
+        "class_room_id": question["class_room_id"],
+        "term_id": question["term_id"],
+        "exam_type_id": question["exam_type_id"],
+        "has_math": bool(question.get("has_math", False)),
+        "question_image": store_data_uri(question.get("question_image")),
+        # For short answer questions, save the correct answer
+        "correct_answer": (
+            question.get("correct_answer", "") if question_type == "short_answer" else None
+        ),
+    }
+
+    option_rows = []
+    if question_type in ["mcq", "true_false"]:
+        for order, option_data in enumerate(question.get("options") or []):
+            option_text = str(option_data.get("text", "")).strip()
+            if not option_text:  # Only create option if text is provided
+                continue
+            option_rows.append({
+                "id": generate_uuid(),
+                "text": option_text,
+                "is_correct": bool(option_data.get("is_correct", False)),
+                "order": order,
+                "question_id": question_id,
+                "has_math": bool(option_data.get("has_math", False)),
+                "option_image": store_data_uri(option_data.get("option_image")),
+            })
+    return question_row, option_rows
+
+
+def _insert(entries):
+    question_rows = [question_row for _, question_row, _ in entries]
+    option_rows = [row for _, _, rows in entries for row in rows]
+    db.session.execute(insert(Question), question_rows)
+    if option_rows:
+        db.session.execute(insert(Option), option_rows)
+    db.session.commit()
+
+
+def _write_batch(entries, result):
+    """Insert a batch together, or one question at a time if that fails"""
+    try:
+        _insert(entries)
+        written = entries
+    except Exception:
+        db.session.rollback()
+        written = []
+        for entry in entries:
+            try:
+                _insert([entry])
+                written.append(entry)
+            except Exception as e:
+                db.session.rollback()
+                result.add_error(entry[0], f"Error creating question - {str(e)}")
+
+    for _, question_row, _ in written:
+        result.created_ids.append(question_row["id"])
+    result.created += len(written)
+    for subject_id, class_room_id in {
+        (row["subject_id"], row["class_room_id"]) for _, row, _ in written
+    }:
+        invalidate_question_bank(subject_id, class_room_id)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _checked_batches(rows, defaults, teacher_id, batch_size):
+    """
+    Validate rows a batch at a time.
+
+    Yields:
+        list of (number, question, owner, error) per batch - question has the
+        defaults applied, owner is the teacher who will own it, error the
+        reason it cannot be imported (None if it can)
+    """
+    defaults = defaults or {}
+    references = _References()
+
+    for batch in _batches(rows, batch_size):
+        parsed = [
+            (number, _with_defaults(question_data, defaults) if not error else question_data, error)
+            for number, question_data, error in batch
+        ]
+        references.load([question for _, question, error in parsed if not error], teacher_id)
+
+        checked = []
+        for number, question, error in parsed:
+            owner = None
+            if not error:
+                try:
+                    owner = validate_question(question, references, teacher_id)
+                except ImportRowError as e:
+                    error = str(e)
+            checked.append((number, question, owner, error))
+        yield checked
+
+
+def validate_questions(rows, defaults=None, teacher_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Dry run of import_questions: check every row and write nothing.
+
+    Takes the same arguments as import_questions.
+
+    Yields:
+        (number, question, error) for each row, in order - error is None for
+        questions that would be imported
+    """
+    for checked in _checked_batches(rows, defaults, teacher_id, batch_size):
+        for number, question, _, error in checked:
+            yield number, question, error
+
+
+def import_questions(rows, defaults=None, teacher_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Validate and insert a stream of parsed questions.
+
+    Args:
+        rows: iterable of (number, question_data, error) as produced by
+            utils.question_parser.iter_questions_file; error is a message
+            for entries the parser could not read
+        defaults: subject_id, class_room_id, term_id and exam_type_id for
+            questions that do not name their own
+        teacher_id: owner of the questions (staff uploads). None gives each
+            question to its subject's head teacher, who must be a staff
+            member, and requires the subject to be offered in the class
+        batch_size: questions validated, inserted and committed together
+
+    Returns:
+        ImportResult
+    """
+    result = ImportResult()
+
+    for checked in _checked_batches(rows, defaults, teacher_id, batch_size):
+        entries = []
+        for number, question, owner, error in checked:
+            result.rows += 1
+            if error:
+                result.add_error(number, error)
+            else:
+                entries.append((number, *_question_rows(question, owner)))
+        if entries:
+            _write_batch(entries, result)
+
+    result.finish()
+    logger.info(
+        "Imported %d of %d questions in %.2fs (%s rows/s, %d errors)",
+        result.created, result.rows, result.elapsed, result.rows_per_second, len(result.errors)
+    )
+    return result
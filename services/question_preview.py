@@ -0,0 +1,265 @@
+"""
+Parsed question uploads, kept for preview and import.
+
+Checking a large question file meant uploading it, waiting for the whole
+file to be parsed and imported, and reading one large response. Instead a
+file can be previewed first:
+
+- the upload is parsed once and its questions are kept under a token;
+- validation results are sent back as the file is parsed (NDJSON), or as a
+  summary plus pages of questions fetched by offset;
+- the import then reads the kept questions by token, so the file is neither
+  uploaded nor parsed a second time.
+
+Like the report jobs, previews live in the web process, so the app must run
+as a single process. They expire QUESTION_PREVIEW_TTL seconds after they are
+created and are taken out of the store by the import that claims them, so a
+double-submitted import runs once.
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+
+from flask import Response, current_app, has_app_context, jsonify, stream_with_context
+
+from services.generate_uuid import generate_uuid
+from services.question_import import validate_questions
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a preview is kept for its import
+DEFAULT_TTL = 1800
+
+# Rows parsed before their validation results are sent
+PREVIEW_BATCH_SIZE = 100
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class QuestionPreview:
+    """One parsed upload: its rows and the settings they were checked with"""
+
+    def __init__(self, user_id, defaults=None, teacher_id=None, filename=None):
+        self.token = generate_uuid()
+        self.user_id = user_id
+        self.defaults = dict(defaults or {})
+        self.teacher_id = teacher_id
+        self.filename = filename
+        self.rows = []
+        self.complete = False
+        self.valid_count = 0
+        self.error_count = 0
+        self.created_at = time.time()
+
+    def summary(self):
+        return {
+            "token": self.token,
+            "filename": self.filename,
+            "complete": self.complete,
+            "total": len(self.rows),
+            "valid_count": self.valid_count,
+            "error_count": self.error_count,
+        }
+
+
+class QuestionPreviewStore:
+    """In-process previews by token, readable only by the user who uploaded"""
+
+    def __init__(self):
+        self._previews = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if has_app_context():
+            return current_app.config.get("QUESTION_PREVIEW_TTL", DEFAULT_TTL)
+        return DEFAULT_TTL
+
+    def create(self, user_id, defaults=None, teacher_id=None, filename=None):
+        self.purge_expired()
+        preview = QuestionPreview(user_id, defaults, teacher_id, filename)
+        with self._lock:
+            self._previews[preview.token] = preview
+        return preview
+
+    def get(self, token, user_id):
+        """The user's preview, or None if it is unknown, expired or not theirs"""
+        with self._lock:
+            preview = self._previews.get(token)
+        if preview is None or preview.user_id != user_id:
+            return None
+        if preview.created_at < time.time() - self.ttl:
+            self.discard(token)
+            return None
+        return preview
+
+    def claim(self, token, user_id):
+        """
+        Take the user's complete preview out of the store for its import, or
+        None. Only one request can claim a preview; restore() it if the
+        import fails.
+        """
+        with self._lock:
+            preview = self._previews.get(token)
+            if preview is None or preview.user_id != user_id or not preview.complete:
+                return None
+            del self._previews[token]
+        if preview.created_at < time.time() - self.ttl:
+            return None
+        return preview
+
+    def restore(self, preview):
+        """Put back a claimed preview whose import failed"""
+        with self._lock:
+            self._previews.setdefault(preview.token, preview)
+
+    def discard(self, token):
+        with self._lock:
+            self._previews.pop(token, None)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for token in [t for t, p in self._previews.items() if p.created_at < cutoff]:
+                del self._previews[token]
+
+
+question_preview_store = QuestionPreviewStore()
+
+
+def preview_item(number, question, error):
+    """What the preview shows for one row"""
+    item = {"row": number, "valid": error is None, "error": error, "question": None}
+    if question is not None:
+        item["question"] = {
+            "question_text": question.get("question_text"),
+            "question_type": question.get("question_type"),
+            "options": [
+                {
+                    "text": option.get("text"),
+                    "is_correct": bool(option.get("is_correct", False)),
+                    "option_image": option.get("option_image"),
+                }
+                for option in question.get("options") or []
+            ],
+            "correct_answer": question.get("correct_answer"),
+            "question_image": question.get("question_image"),
+            "has_math": bool(question.get("has_math", False)),
+        }
+    return item
+
+
+def parse_into(preview, rows):
+    """
+    Keep a file's rows in the preview while checking them.
+
+    Args:
+        rows: (number, question_data, error) rows from the parser, read as
+            the results are consumed
+
+    Yields:
+        preview_item dicts, a batch at a time as the file is parsed
+    """
+    def kept():
+        for row in rows:
+            preview.rows.append(row)
+            yield row
+
+    for number, question, error in validate_questions(
+        kept(), preview.defaults, preview.teacher_id, batch_size=PREVIEW_BATCH_SIZE
+    ):
+        if error:
+            preview.error_count += 1
+        else:
+            preview.valid_count += 1
+        yield preview_item(number, question, error)
+    preview.complete = True
+
+
+def preview_page(preview, offset=0, limit=DEFAULT_PAGE_SIZE):
+    """Rows offset..offset + limit of a preview, checked again against the database"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = preview.rows[max(offset, 0):max(offset, 0) + limit]
+    return [
+        preview_item(number, question, error)
+        for number, question, error in validate_questions(
+            rows, preview.defaults, preview.teacher_id, batch_size=limit
+        )
+    ]
+
+
+def primed(rows):
+    """
+    The rows with the first one already read, so a file that cannot be read
+    at all fails (ValueError) before a streamed response has started
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    return rows if first is None else itertools.chain([first], rows)
+
+
+def _ndjson(lines):
+    def encoded():
+        try:
+            for line in lines:
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            logger.exception("Question preview stream failed")
+            yield json.dumps({"success": False, "message": f"Error previewing questions: {str(e)}"}) + "\n"
+
+    return Response(stream_with_context(encoded()), mimetype="application/x-ndjson")
+
+
+def upload_response(preview, rows, stream=False, limit=DEFAULT_PAGE_SIZE):
+    """
+    Parse an upload into its preview and answer the upload request.
+
+    stream=True answers with NDJSON: a line with the token, one line per
+    question as the file is parsed, and a closing summary line. Otherwise
+    the whole file is checked and the summary comes back with the first page.
+    """
+    if stream:
+        def lines():
+            yield {"success": True, "preview": preview.summary()}
+            yield from parse_into(preview, rows)
+            yield {"success": True, "summary": preview.summary()}
+        return _ndjson(lines())
+
+    items = list(parse_into(preview, rows))
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return jsonify({
+        "success": True,
+        **preview.summary(),
+        "offset": 0,
+        "limit": limit,
+        "next_offset": limit if limit < len(items) else None,
+        "questions": items[:limit],
+    })
+
+
+def page_response(preview, offset=0, limit=DEFAULT_PAGE_SIZE, stream=False):
+    """
+    A page of a kept preview as JSON, or with stream=True every row from
+    offset on as NDJSON, checked a page at a time
+    """
+    offset = max(offset, 0)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if stream:
+        def lines():
+            for start in range(offset, len(preview.rows), limit):
+                yield from preview_page(preview, start, limit)
+            yield {"success": True, "summary": preview.summary()}
+        return _ndjson(lines())
+
+    return jsonify({
+        "success": True,
+        **preview.summary(),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if offset + limit < len(preview.rows) else None,
+        "questions": preview_page(preview, offset, limit),
+    })
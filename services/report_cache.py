@@ -0,0 +1,186 @@
+"""
+On-disk cache of rendered report files.
+
+During report week the same report cards are downloaded again and again,
+and every download used to rebuild the HTML and run the PDF engine from
+scratch. Rendered files are now kept under REPORT_CACHE_FOLDER, named by a
+hash of everything that goes into them:
+
+- the report data dicts (scores, position, config, grade scale and school
+  details are all part of them)
+- the PDF engine
+- the size and mtime of the student photos and school logo they embed
+- CACHE_FORMAT, bumped whenever the report card templates change
+
+So there is nothing to invalidate by hand: once a grade, the report config,
+the grade scale or the school branding changes, the report hashes to a new
+key and the old file is never asked for again. Stale files age out of the
+cache, which is kept under REPORT_CACHE_MAX_BYTES by evicting the least
+recently used files (a hit touches the file's mtime). 0 turns caching off.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from services.generate_uuid import generate_uuid
+
+
+# Bump when the report card templates (templates/reports/pdf) change output
+CACHE_FORMAT = 3
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _image_fingerprints(reports):
+    """(path, size, mtime) of the local images the reports embed"""
+    from services.report_generator import ReportGenerator
+
+    paths = set()
+    for report in reports:
+        paths.add(report.get('student', {}).get('image'))
+        paths.add(report.get('school', {}).get('logo'))
+
+    fingerprints = []
+    for path in sorted(p for p in paths if p):
+        resolved = ReportGenerator._resolve_image_path(path)
+        if resolved:
+            stat = os.stat(resolved)
+            fingerprints.append((path, stat.st_size, stat.st_mtime_ns))
+    return fingerprints
+
+
+def report_key(reports, engine):
+    """Content hash identifying the file rendered from these report dicts"""
+    payload = {
+        "format": CACHE_FORMAT,
+        "engine": engine,
+        "reports": reports,
+        "images": _image_fingerprints(reports),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ReportCache:
+    """Size-bounded LRU of rendered report files on disk."""
+
+    def __init__(self):
+        self.folder = None
+        self.max_bytes = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def init_app(self, app):
+        self.folder = app.config.get("REPORT_CACHE_FOLDER") or os.path.join(
+            app.instance_path, "report_cache"
+        )
+        self.max_bytes = app.config.get("REPORT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+        app.extensions["report_cache"] = self
+
+    @property
+    def enabled(self):
+        return bool(self.folder and self.max_bytes)
+
+    def _path(self, key, ext):
+        return os.path.join(self.folder, f"{key}.{ext}")
+
+    def get(self, key, ext):
+        """Return the cached file's bytes, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        path = self._path(key, ext)
+        try:
+            with open(path, "rb") as cached:
+                data = cached.read()
+            # Mark as recently used
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, ext, data):
+        """Store a rendered file, then evict old files beyond the size limit."""
+        if not self.enabled:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = os.path.join(self.folder, f".{generate_uuid()}.tmp")
+        with open(tmp_path, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, self._path(key, ext))
+
+        with self._lock:
+            self.stores += 1
+        self._evict()
+
+    def _entries(self):
+        """(mtime, size, path) of every cached file"""
+        entries = []
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        """Delete every cached file."""
+        for mtime, size, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.stores = 0
+            self.evictions = 0
+            self.started_at = time.time()
+
+    def stats(self):
+        entries = self._entries() if self.enabled else []
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "files": len(entries),
+                "bytes": sum(entry[1] for entry in entries),
+                "max_bytes": self.max_bytes,
+                "since": self.started_at,
+            }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,194 @@
+"""
+Background jobs for report downloads.
+
+Rendering a class's report cards or a broad sheet can take a minute, which
+used to pin a request thread for the whole time. Instead the request submits
+a job and gets its id back straight away; a small in-process worker pool
+renders it, recording progress (how many students are done) as it goes, and
+writes the finished file under REPORT_JOB_FOLDER. The client polls the job's
+status and then downloads the file, which is streamed from disk.
+
+Job functions are called as ``func(job, **params)`` inside an app context and
+return ``(data, filename, mimetype)``; they report progress with
+``job.update(...)``. ``data`` is either the file's bytes or the path of a
+file the job wrote itself (such as a streamed workbook), which is moved into
+place rather than read back into memory.
+
+Like the autosave buffer, jobs live in the web process, so the app must run
+as a single process. With REPORT_JOB_WORKERS = 0 jobs run inline when they
+are submitted.
+"""
+import atexit
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.generate_uuid import generate_uuid
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ReportJob:
+    """State of one background report job."""
+
+    def __init__(self, kind, user_id, total=0):
+        self.job_id = generate_uuid()
+        self.kind = kind
+        self.user_id = user_id
+        self.state = QUEUED
+        self.phase = None
+        self.total = total
+        self.completed = 0
+        self.failed = []
+        self.error = None
+        self.filename = None
+        self.mimetype = None
+        self.path = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, completed=None, total=None, phase=None, failed=None):
+        """Record progress from inside a running job."""
+        with self._lock:
+            if completed is not None:
+                self.completed = completed
+            if total is not None:
+                self.total = total
+            if phase is not None:
+                self.phase = phase
+            if failed is not None:
+                self.failed = list(failed)
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "state": self.state,
+                "phase": self.phase,
+                "total": self.total,
+                "completed": self.completed,
+                "failed": list(self.failed),
+                "error": self.error,
+                "filename": self.filename,
+            }
+
+
+class ReportJobQueue:
+    """In-process queue that renders report jobs on worker threads."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._app = None
+        self._atexit_registered = False
+        self.folder = None
+        self.ttl = 3600
+
+    def init_app(self, app):
+        """Start the worker pool for an application."""
+        self.shutdown()
+        self._app = app
+        self.folder = app.config.get("REPORT_JOB_FOLDER") or os.path.join(
+            app.instance_path, "report_jobs"
+        )
+        self.ttl = app.config.get("REPORT_JOB_TTL", 3600)
+        app.extensions["report_job_queue"] = self
+
+        workers = app.config.get("REPORT_JOB_WORKERS", 2)
+        if workers and workers > 0:
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="report-job"
+            )
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def shutdown(self):
+        """Stop the worker pool, letting running jobs finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, kind, func, user_id, total=0, **params):
+        """
+        Queue a job.
+
+        Returns:
+            the ReportJob, already finished if jobs run inline
+        """
+        if self._app is None:
+            raise RuntimeError("ReportJobQueue.init_app() has not been called")
+
+        self.purge_expired()
+        job = ReportJob(kind, user_id, total)
+        with self._lock:
+            self._jobs[job.job_id] = job
+
+        if self._executor is not None:
+            self._executor.submit(self._run, job, func, params)
+        else:
+            self._run(job, func, params)
+        return job
+
+    def _run(self, job, func, params):
+        job.state = RUNNING
+        try:
+            with self._app.app_context():
+                data, filename, mimetype = func(job, **params)
+
+            job_folder = os.path.join(self.folder, job.job_id)
+            os.makedirs(job_folder, exist_ok=True)
+            path = os.path.join(job_folder, "artifact")
+            if isinstance(data, str):
+                shutil.move(data, path)
+            else:
+                with open(path, "wb") as artifact:
+                    artifact.write(data)
+
+            job.path = path
+            job.filename = filename
+            job.mimetype = mimetype
+            job.state = DONE
+        except Exception as e:
+            logger.exception("Report job %s failed", job.job_id)
+            job.error = str(e)
+            job.state = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def purge_expired(self):
+        """Forget finished jobs older than REPORT_JOB_TTL and delete their files."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.finished and job.finished_at < cutoff
+            ]
+            for job in expired:
+                del self._jobs[job.job_id]
+
+        for job in expired:
+            shutil.rmtree(os.path.join(self.folder, job.job_id), ignore_errors=True)
+
+
+report_job_queue = ReportJobQueue()
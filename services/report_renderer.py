@@ -0,0 +1,256 @@
+"""
+Report card HTML from precompiled Jinja templates.
+
+The templates live in templates/reports/pdf and come in two variants: "full"
+(the purple landscape card, for WeasyPrint) and "simple" (plain tables that
+xhtml2pdf can lay out). Each variant is split into a stylesheet, a school
+header and the per-student card, so a class document carries the stylesheet
+once and renders the header once. The assessment columns and grading legend
+(report_card_parts.html) are also rendered once per class, so only the
+student's own values are rendered per card. Cards are not autoescaped:
+escaping every number cost more than the rest of the card, so text values
+are escaped explicitly, the subject rows' once per class.
+
+The Jinja environment is built once per process and keeps its compiled
+templates, so rendering a report is a template call rather than a few
+hundred lines of string assembly.
+"""
+import os
+import re
+import threading
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
+
+from services.pdf_renderer import PAGE_BREAK
+from services.report_generator import ReportGenerator
+
+
+TEMPLATE_FOLDER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "templates", "reports", "pdf",
+)
+
+VARIANTS = {
+    "full": {
+        "styles": "report_card.css",
+        "header": "report_card_header.html",
+        "card": "report_card.html",
+        "columns": "full_columns",
+        "legend": "full_legend",
+        "logo_px": 50,
+    },
+    "simple": {
+        "styles": "report_card_simple.css",
+        "header": "report_card_simple_header.html",
+        "card": "report_card_simple.html",
+        "columns": "simple_columns",
+        "legend": "simple_legend",
+        "logo_px": 100,
+    },
+}
+
+DEFAULT_GRADE_SCALE = {
+    'grade_ranges': [
+        {'grade': 'A', 'min_score': 70, 'max_score': 100, 'remark': 'Excellent'},
+        {'grade': 'B', 'min_score': 60, 'max_score': 69, 'remark': 'Very Good'},
+        {'grade': 'C', 'min_score': 50, 'max_score': 59, 'remark': 'Good'},
+        {'grade': 'D', 'min_score': 45, 'max_score': 49, 'remark': 'Fair'},
+        {'grade': 'E', 'min_score': 40, 'max_score': 44, 'remark': 'Pass'},
+        {'grade': 'F', 'min_score': 0, 'max_score': 39, 'remark': 'Fail'},
+    ]
+}
+
+# Marks where the body goes when the document shell is split in two
+_BODY_MARKER = "\x00report-body\x00"
+
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def get_environment():
+    """The process-wide Jinja environment for report templates"""
+    global _environment
+    with _environment_lock:
+        if _environment is None:
+            env = Environment(
+                loader=FileSystemLoader(TEMPLATE_FOLDER),
+                autoescape=select_autoescape(["html"]),
+                # Templates only change on deploy; skip the mtime check per render
+                auto_reload=False,
+                cache_size=-1,
+            )
+            env.filters["ordinal"] = ReportGenerator.format_position
+            env.filters["assessment_name"] = ReportGenerator.format_assessment_name
+            _environment = env
+    return _environment
+
+
+def _styles(variant):
+    env = get_environment()
+    source, _, _ = env.loader.get_source(env, VARIANTS[variant]["styles"])
+    return Markup(source)
+
+
+def document_frame(variant):
+    """(prefix, suffix) of a complete document around a body of report cards"""
+    shell = get_environment().get_template("document.html").render(
+        styles=_styles(variant), body=_BODY_MARKER
+    )
+    prefix, suffix = shell.split(_BODY_MARKER)
+    return prefix, suffix
+
+
+def _header(report_data, variant):
+    school = report_data['school']
+    logo_src = ReportGenerator._report_image_src(
+        school.get('logo'), VARIANTS[variant]["logo_px"]
+    ) if school.get('logo') else ''
+    return Markup(get_environment().get_template(VARIANTS[variant]["header"]).render(
+        school=school,
+        term=report_data['term'],
+        logo_src=logo_src,
+        section_parts=re.split(r'(, | and )', report_data.get('formatted_sections') or ''),
+    ))
+
+
+def _header_key(report_data):
+    """Reports of one class share these, and so share one rendered header"""
+    school = report_data['school']
+    term = report_data['term']
+    return (
+        school.get('name'), school.get('logo'), school.get('address'), school.get('phone'),
+        term.get('name'), term.get('session'), report_data.get('formatted_sections'),
+    )
+
+
+def _class_key(report_data):
+    """Reports of one class share these, and so share one set of class parts"""
+    grade_scale = report_data.get('grade_scale') or {}
+    return (
+        _header_key(report_data),
+        tuple(
+            (at['code'], at['name'], at['max_score'], at.get('order', 0))
+            for at in report_data.get('assessment_types', [])
+        ),
+        tuple(tuple(sorted(r.items())) for r in grade_scale.get('grade_ranges') or ()),
+    )
+
+
+def _class_parts(report_data, variant):
+    """The parts of a card that are the same for every student of a class"""
+    assessment_types = report_data.get('assessment_types', [])
+    grade_scale = report_data.get('grade_scale')
+    if not grade_scale or 'grade_ranges' not in grade_scale:
+        grade_scale = DEFAULT_GRADE_SCALE
+
+    # Assessment columns of the simple card, in configured order
+    columns = [
+        {
+            'code': at['code'],
+            'label': f"{ReportGenerator.format_assessment_name(at['name'])} ({at['max_score']})",
+        }
+        for at in sorted(assessment_types, key=lambda at: at.get('order', 0))
+    ]
+    parts = get_environment().get_template("report_card_parts.html").module
+    return {
+        'header': _header(report_data, variant),
+        'column_headers': getattr(parts, VARIANTS[variant]["columns"])(assessment_types, columns),
+        'legend': getattr(parts, VARIANTS[variant]["legend"])(grade_scale),
+        # Assessment codes in the order of the card's columns
+        'codes': [column['code'] for column in columns] if variant == "simple"
+        else [at['code'] for at in assessment_types],
+        'grade_scale': grade_scale,
+        # Escaped subject names, grades and remarks, which repeat on every card
+        'escaped': {},
+    }
+
+
+def _escaped(parts, text):
+    escaped = parts['escaped'].get(text)
+    if escaped is None:
+        escaped = parts['escaped'][text] = str(escape(text))
+    return escaped
+
+
+def _card_context(report_data, parts):
+    """Template variables for one student's card"""
+    grade_scale = parts['grade_scale']
+    codes = parts['codes']
+
+    # Rows are plain tuples, unpacked by the card's loops
+    rows = []
+    for number, subject_data in enumerate(report_data['scores'].values(), 1):
+        percentage = (subject_data['total'] / subject_data['max_total']
+                      * 100) if subject_data['max_total'] > 0 else 0
+        remark = ReportGenerator.get_remark(percentage, grade_scale)
+        cells = []
+        for code in codes:
+            assessment = subject_data['assessments'].get(code)
+            cells.append(
+                (True, assessment['score'], assessment.get('is_cbt'), assessment['max_score'])
+                if assessment else (False, None, None, None)
+            )
+        rows.append((
+            number,
+            _escaped(parts, subject_data['subject_name']),
+            cells,
+            subject_data['total'],
+            _escaped(parts, ReportGenerator.get_grade(percentage, grade_scale)),
+            _escaped(parts, remark),
+            _escaped(parts, remark.lower().replace(' ', '-')),
+        ))
+
+    overall_total = report_data['overall_total']
+    overall_max = report_data['overall_max']
+    overall_percentage = (overall_total / overall_max *
+                          100) if overall_max > 0 else 0
+    student = report_data['student']
+
+    return {
+        'student': student,
+        'student_image_src': ReportGenerator._report_image_src(student.get('image'), 64)
+        if student.get('image') else '',
+        'school': report_data['school'],
+        'position': report_data['position'],
+        'total_students': report_data['total_students'],
+        'overall_total': overall_total,
+        'overall_max': overall_max,
+        'overall_percentage': overall_percentage,
+        'overall_grade': ReportGenerator.get_grade(overall_percentage, grade_scale),
+        'assessment_types': report_data.get('assessment_types', []),
+        'header': parts['header'],
+        'column_headers': parts['column_headers'],
+        'legend': parts['legend'],
+        'rows': rows,
+    }
+
+
+def render_cards(reports, variant="full"):
+    """
+    Render the per-student cards of a class.
+
+    Returns:
+        list of HTML fragments, one per report, to be placed inside
+        document_frame(variant)
+    """
+    card = get_environment().get_template(VARIANTS[variant]["card"])
+    classes = {}
+    fragments = []
+    for report_data in reports:
+        key = _class_key(report_data)
+        if key not in classes:
+            classes[key] = _class_parts(report_data, variant)
+        fragments.append(card.render(_card_context(report_data, classes[key])))
+    return fragments
+
+
+def render_document(reports, variant="full"):
+    """One HTML document holding every report, one page (or more) per student"""
+    prefix, suffix = document_frame(variant)
+    return prefix + PAGE_BREAK.join(render_cards(reports, variant)) + suffix
+
+
+def render_report(report_data, variant="full"):
+    """A complete HTML document for a single student's report"""
+    return render_document([report_data], variant)
@@ -0,0 +1,63 @@
+"""
+Cached school branding shown on every page.
+
+The ``school_info`` template variable (name, contact details, logo URL,
+session and term) is built from the School row once and kept in memory, so
+rendering a page no longer queries the school table. Anything that saves the
+school must call ``invalidate_school_info``.
+
+Like the other in-process caches, this assumes a single app process.
+"""
+import threading
+
+from models.school import School
+
+
+DEFAULT_SCHOOL_INFO = {"name": "Your School", "logo_url": None}
+
+_school_info = None
+_generation = 0
+_lock = threading.Lock()
+
+
+def _load_school_info():
+    school = School.query.first()
+    school_name = school.school_name if school and school.school_name else "Your School"
+    # Build logo URL if saved; else None to use template fallback
+    logo_url = None
+    if school and school.logo:
+        # school.logo is stored as a relative path like uploads/school_logos/filename
+        logo_url = f"/{school.logo.replace('static/', '')}"
+    return {
+        "name": school_name,
+        "address": getattr(school, "address", ""),
+        "phone": getattr(school, "phone", ""),
+        "email": getattr(school, "email", ""),
+        "website": getattr(school, "website", ""),
+        "logo_url": logo_url,
+        "session": getattr(school, "current_session", ""),
+        "term": getattr(school, "current_term", ""),
+    }
+
+
+def get_school_info():
+    """Branding of the school as a plain dict (a copy; safe to modify)"""
+    global _school_info
+    with _lock:
+        cached = _school_info
+        generation = _generation
+    if cached is None:
+        cached = _load_school_info()
+        # Don't keep a copy read while the school was being saved
+        with _lock:
+            if _generation == generation:
+                _school_info = cached
+    return dict(cached)
+
+
+def invalidate_school_info():
+    """Drop the cached branding after the school has been saved"""
+    global _school_info, _generation
+    with _lock:
+        _generation += 1
+        _school_info = None
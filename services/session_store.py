@@ -0,0 +1,366 @@
+"""
+Write-behind buffer for exam session autosaves.
+
+The exam page autosaves every few seconds per student. Instead of a lookup
+and a full commit per save, saves are kept in memory keyed by
+(student_id, exam_id); only the latest save per key is kept. A background
+thread flushes everything pending in one transaction every
+EXAM_SESSION_FLUSH_INTERVAL seconds (batched UPDATEs for existing sessions,
+one INSERT for new ones).
+
+Readers go through the buffer so they never see stale progress: submit and
+restore flush the student's key first, and the admin monitor overlays
+pending saves on what is in the database.
+
+The buffer lives in the web process, so the app must run as a single
+process (as app.py does) for reads to see every pending save. When the
+flusher is not running (interval 0, or init_app not called) saves are
+written straight through.
+"""
+import atexit
+import json
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from models import db
+from models.exam_session import ExamSession
+from services.generate_uuid import generate_uuid
+
+
+logger = logging.getLogger(__name__)
+
+PendingSave = namedtuple(
+    "PendingSave",
+    ["current_question_index", "time_remaining", "answers", "question_order", "saved_at",
+     "save_seq"],
+)
+
+DeltaResult = namedtuple("DeltaResult", ["applied", "last_seq"])
+
+
+def _has_manifest(option_order, question_order):
+    return option_order not in (None, "", "{}") and question_order not in (None, "", "[]")
+
+
+class ExamSessionBuffer:
+    """In-process store of pending exam session saves."""
+
+    def __init__(self):
+        self._pending = {}
+        self._session_ids = {}
+        self._lock = threading.Lock()
+        # Keys being written by a flush, and those discarded meanwhile
+        self._in_flight = set()
+        self._discarded = set()
+        self._written = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+        self._app = None
+        self._atexit_registered = False
+        self.interval = 0
+
+    def init_app(self, app):
+        """Start the background flusher for an application."""
+        self._app = app
+        self.interval = app.config.get("EXAM_SESSION_FLUSH_INTERVAL", 5)
+        app.extensions["exam_session_buffer"] = self
+
+        if self.interval and self.interval > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="exam-session-flusher", daemon=True
+            )
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self._app.app_context():
+                    self.flush()
+            except Exception:
+                logger.exception("Failed to flush exam session saves")
+
+    def shutdown(self):
+        """Stop the flusher and write anything still pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        if self._app is not None and self._pending:
+            with self._app.app_context():
+                self.flush()
+
+    def save(self, student_id, exam_id, current_question_index, time_remaining,
+             answers, question_order=None):
+        """
+        Record the latest progress for a student's exam.
+
+        Returns:
+            the session id if it is already known, else None
+        """
+        key = (student_id, exam_id)
+        with self._lock:
+            previous = self._pending.get(key)
+            self._pending[key] = PendingSave(
+                current_question_index=current_question_index,
+                time_remaining=time_remaining,
+                answers=answers,
+                question_order=question_order,
+                saved_at=datetime.utcnow(),
+                save_seq=previous.save_seq if previous else None,
+            )
+
+        if not self.running:
+            self.flush(key)
+
+        return self._session_ids.get(key)
+
+    def apply_delta(self, student_id, exam_id, seq, changes,
+                    current_question_index, time_remaining):
+        """
+        Merge the answers changed since the client's last save.
+
+        Args:
+            seq: client sequence number; must be greater than the last one applied
+            changes: {question_id: answer}, where an empty answer clears it
+
+        Returns:
+            DeltaResult, or None if the student has no active session
+        """
+        key = (student_id, exam_id)
+        # Two attempts: a flush can take the pending save away between the
+        # check and the merge, in which case the stored state is re-read
+        for _ in range(2):
+            with self._lock:
+                base = self._pending.get(key)
+
+            stored = None
+            if base is None or base.save_seq is None:
+                stored = self._load_stored(student_id, exam_id)
+                if stored is None:
+                    return None
+
+            with self._lock:
+                base = self._pending.get(key)
+                if base is None:
+                    base = stored
+                elif base.save_seq is None and stored is not None:
+                    base = base._replace(save_seq=stored.save_seq)
+                if base is None or base.save_seq is None:
+                    continue
+
+                if seq <= base.save_seq:
+                    return DeltaResult(False, base.save_seq)
+
+                answers = dict(base.answers)
+                for question_id, answer in changes.items():
+                    if answer in (None, ""):
+                        answers.pop(question_id, None)
+                    else:
+                        answers[question_id] = answer
+
+                self._pending[key] = PendingSave(
+                    current_question_index=current_question_index,
+                    time_remaining=time_remaining,
+                    answers=answers,
+                    question_order=base.question_order,
+                    saved_at=datetime.utcnow(),
+                    save_seq=seq,
+                )
+                break
+        else:
+            return None
+
+        if not self.running:
+            self.flush(key)
+        return DeltaResult(True, seq)
+
+    def _load_stored(self, student_id, exam_id):
+        """Read the stored answers and sequence number of an active session."""
+        row = db.session.execute(
+            db.select(ExamSession.answers, ExamSession.save_seq).where(
+                ExamSession.student_id == student_id,
+                ExamSession.exam_id == exam_id,
+                ExamSession.is_active == True,
+            ).order_by(ExamSession.created_at)
+        ).first()
+        if row is None:
+            return None
+        return PendingSave(
+            current_question_index=None,
+            time_remaining=None,
+            answers=json.loads(row.answers) if row.answers else {},
+            question_order=None,
+            saved_at=None,
+            save_seq=row.save_seq or 0,
+        )
+
+    def get_pending(self, student_id, exam_id):
+        """Return the unflushed save for a student's exam, if any."""
+        with self._lock:
+            return self._pending.get((student_id, exam_id))
+
+    def discard(self, student_id, exam_id):
+        """Forget any unflushed save for a student's exam."""
+        key = (student_id, exam_id)
+        with self._lock:
+            self._pending.pop(key, None)
+            self._session_ids.pop(key, None)
+            # A flush already writing this key must not create a new session
+            if key in self._in_flight:
+                self._discarded.add(key)
+
+    def session_dict(self, exam_session):
+        """ExamSession.to_dict() with any pending save applied on top."""
+        data = exam_session.to_dict()
+        pending = self.get_pending(exam_session.student_id, exam_session.exam_id)
+        if pending and exam_session.is_active:
+            data["current_question_index"] = pending.current_question_index
+            data["time_remaining"] = pending.time_remaining
+            data["answers"] = pending.answers
+            data["last_activity"] = pending.saved_at.strftime("%Y-%m-%d %H:%M:%S")
+            if pending.save_seq is not None:
+                data["save_seq"] = pending.save_seq
+            if pending.question_order and not exam_session.has_manifest():
+                data["question_order"] = pending.question_order
+        return data
+
+    def flush(self, key=None):
+        """
+        Write pending saves to the database in one transaction.
+
+        Args:
+            key: optional (student_id, exam_id) to flush just that student
+
+        Returns:
+            number of sessions written
+        """
+        with self._lock:
+            if key is None:
+                # A key another flush is writing stays pending for the next run
+                items = {
+                    item_key: item for item_key, item in self._pending.items()
+                    if item_key not in self._in_flight
+                }
+                for item_key in items:
+                    del self._pending[item_key]
+            else:
+                # Wait for a flush already writing this key, so a reader that
+                # flushes first sees what it wrote
+                while key in self._in_flight:
+                    self._written.wait()
+                item = self._pending.pop(key, None)
+                items = {key: item} if item else {}
+            self._in_flight.update(items)
+
+        if not items:
+            return 0
+
+        try:
+            self._write(items)
+        except Exception:
+            db.session.rollback()
+            # Put the saves back unless a newer one arrived or the key was discarded
+            with self._lock:
+                for item_key, item in items.items():
+                    if item_key not in self._discarded:
+                        self._pending.setdefault(item_key, item)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(items)
+                self._discarded.difference_update(items)
+                self._written.notify_all()
+        return len(items)
+
+    def _write(self, items):
+        student_ids = {student_id for student_id, _ in items}
+        exam_ids = {exam_id for _, exam_id in items}
+
+        rows = db.session.execute(
+            db.select(
+                ExamSession.id,
+                ExamSession.student_id,
+                ExamSession.exam_id,
+                ExamSession.option_order,
+                ExamSession.question_order,
+                ExamSession.is_active,
+            ).where(
+                ExamSession.student_id.in_(student_ids),
+                ExamSession.exam_id.in_(exam_ids),
+                db.or_(ExamSession.is_active == True, ExamSession.is_completed == True),
+            ).order_by(ExamSession.created_at)
+        ).all()
+
+        existing = {}
+        completed = set()
+        for row in rows:
+            if row.is_active:
+                existing.setdefault((row.student_id, row.exam_id), row)
+            else:
+                completed.add((row.student_id, row.exam_id))
+
+        now = datetime.utcnow()
+        updates = []
+        inserts = []
+        for (student_id, exam_id), pending in items.items():
+            values = {
+                "current_question_index": pending.current_question_index,
+                "time_remaining": pending.time_remaining,
+                "answers": json.dumps(pending.answers),
+                "last_activity": pending.saved_at,
+                "updated_at": now,
+            }
+            if pending.save_seq is not None:
+                values["save_seq"] = pending.save_seq
+            row = existing.get((student_id, exam_id))
+            if row is not None:
+                # The manifest recorded when questions were served is authoritative
+                if pending.question_order is not None and not _has_manifest(
+                        row.option_order, row.question_order):
+                    values["question_order"] = json.dumps(pending.question_order)
+                updates.append(dict(values, id=row.id))
+            elif (student_id, exam_id) not in completed:
+                # A late save for a submitted exam does not reopen it
+                values.update({
+                    "id": generate_uuid(),
+                    "student_id": student_id,
+                    "exam_id": exam_id,
+                    "question_order": json.dumps(pending.question_order or []),
+                    "is_active": True,
+                    "is_completed": False,
+                    "started_at": now,
+                    "created_at": now,
+                })
+                inserts.append(values)
+
+        with self._lock:
+            inserts = [
+                values for values in inserts
+                if (values["student_id"], values["exam_id"]) not in self._discarded
+            ]
+
+        if updates:
+            db.session.execute(db.update(ExamSession), updates)
+        if inserts:
+            db.session.execute(db.insert(ExamSession), inserts)
+        db.session.commit()
+
+        with self._lock:
+            for item_key, row in existing.items():
+                if item_key in items:
+                    self._session_ids[item_key] = row.id
+            for values in inserts:
+                self._session_ids[(values["student_id"], values["exam_id"])] = values["id"]
+
+
+exam_session_buffer = ExamSessionBuffer()
@@ -295,39 +295,19 @@ document.addEventListener('DOMContentLoaded', function () {
 
             const configId = document.getElementById('broad-sheet-config')?.value;
 
-            const response = await fetch(`/reports/api/broad-sheet/export/${format}`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    class_room_id: classId,
-                    term_id: termId,
-                    exam_type: examType,
-                    show_exams: showExams,
-                    show_totals: showTotals,
-                    config_id: configId
-                })
+            // Rendered as a background job; poll until the file is ready
+            const { blob, filename } = await runReportJob(`/reports/api/broad-sheet/export/${format}`, {
+                class_room_id: classId,
+                term_id: termId,
+                exam_type: examType,
+                show_exams: showExams,
+                show_totals: showTotals,
+                config_id: configId
             });
-
-            if (response.ok) {
-                // Create a temporary link to download the file
-                const blob = await response.blob();
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = response.headers.get('Content-Disposition')?.split('filename=')[1] || `broad_sheet.${format}`;
-                document.body.appendChild(a);
-                a.click();
-                window.URL.revokeObjectURL(url);
-                document.body.removeChild(a);
-            } else {
-                const errorData = await response.json();
-                showAlert('Error', errorData.error || 'Failed to export broad sheet', 'error');
-            }
+            saveReportBlob(blob, filename || `broad_sheet.${format}`);
         } catch (error) {
             console.error('Error exporting broad sheet:', error);
-            showAlert('Error', 'Failed to export broad sheet', 'error');
+            showAlert('Error', error.message || 'Failed to export broad sheet', 'error');
         } finally {
             showLoading(false);
         }
@@ -467,48 +447,28 @@ document.addEventListener('DOMContentLoaded', function () {
             const studentsPerPage = document.getElementById('students-per-page')?.value || 25;
             const fontSize = document.getElementById('broadsheet-font-size')?.value || 9;
 
-            const response = await fetch(`/reports/api/broad-sheet/export/${format}`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    class_room_id: classId,
-                    term_id: termId,
-                    exam_type: examType,
-                    show_exams: showExams,
-                    show_totals: showTotals,
-                    config_id: configId,
-                    subjects_per_page: parseInt(subjectsPerPage),
-                    students_per_page: parseInt(studentsPerPage),
-                    font_size: parseInt(fontSize)
-                })
+            // Rendered as a background job; poll until the file is ready
+            const { blob, filename } = await runReportJob(`/reports/api/broad-sheet/export/${format}`, {
+                class_room_id: classId,
+                term_id: termId,
+                exam_type: examType,
+                show_exams: showExams,
+                show_totals: showTotals,
+                config_id: configId,
+                subjects_per_page: parseInt(subjectsPerPage),
+                students_per_page: parseInt(studentsPerPage),
+                font_size: parseInt(fontSize)
+            }, (job) => {
+                if (job.total) {
+                    showLoadingState(buttonId, `Exporting... ${job.completed}/${job.total}`);
+                }
             });
-
-            if (response.ok) {
-                // Create a temporary link to download the file
-                const blob = await response.blob();
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = response.headers.get('Content-Disposition')?.split('filename=')[1] || `broad_sheet.${format}`;
-                document.body.appendChild(a);
-                a.click();
-                window.URL.revokeObjectURL(url);
-                document.body.removeChild(a);
-            } else {
-                const errorData = await response.json();
-                showAlert({
-                    title: 'Error',
-                    message: errorData.error || 'Failed to export broad sheet',
-                    type: 'error',
-                });
-            }
+            saveReportBlob(blob, filename || `broad_sheet.${format}`);
         } catch (error) {
             console.error('Error exporting broad sheet:', error);
             showAlert({
                 title: 'Error',
-                message: 'Failed to export broad sheet',
+                message: error.message || 'Failed to export broad sheet',
                 type: 'error',
             });
         } finally {
@@ -290,46 +290,23 @@ async function exportBroadSheet(format) {
     showNotification(`Exporting broad sheet as ${format.toUpperCase()}...`, 'info');
 
     // Fetch export data from backend
-    const response = await fetch(`/reports/api/broad-sheet/export/${format}`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        term_id: termId,
-        class_room_id: classId,
-        exam_type: examType,
-        show_exams: true,
-        show_totals: true
-      })
+    // Rendered as a background job; poll until the file is ready
+    const { blob } = await runReportJob(`/reports/api/broad-sheet/export/${format}`, {
+      term_id: termId,
+      class_room_id: classId,
+      exam_type: examType,
+      show_exams: true,
+      show_totals: true
     });
 
-    if (response.ok) {
-      // Create a temporary link to download the file
-      const blob = await response.blob();
-      const url = window.URL.createObjectURL(blob);
-      const a = document.createElement('a');
-      a.href = url;
-
-      // Generate filename based on class and term
-      const termSelect = document.getElementById('broadSheetTermFilter');
-      const classSelect = document.getElementById('broadSheetClassFilter');
-      const termText = termSelect.options[termSelect.selectedIndex].text;
-      const classText = classSelect.options[classSelect.selectedIndex].text;
-      a.download = `BroadSheet_${classText.replace(/\s+/g, '_')}_${termText.replace(/\s+/g, '_').replace('(', '').replace(')', '')}.${format}`;
-
-      document.body.appendChild(a);
-      a.click();
-
-      // Clean up
-      window.URL.revokeObjectURL(url);
-      document.body.removeChild(a);
+    // Generate filename based on class and term
+    const termSelect = document.getElementById('broadSheetTermFilter');
+    const classSelect = document.getElementById('broadSheetClassFilter');
+    const termText = termSelect.options[termSelect.selectedIndex].text;
+    const classText = classSelect.options[classSelect.selectedIndex].text;
+    saveReportBlob(blob, `BroadSheet_${classText.replace(/\s+/g, '_')}_${termText.replace(/\s+/g, '_').replace('(', '').replace(')', '')}.${format}`);
 
-      showNotification('Broad sheet exported successfully!', 'success');
-    } else {
-      const errorData = await response.json();
-      throw new Error(errorData.error || 'Export failed');
-    }
+    showNotification('Broad sheet exported successfully!', 'success');
   } catch (error) {
     console.error('Export error:', error);
     showNotification(`Export failed: ${error.message}`, 'error');
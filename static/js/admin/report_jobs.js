@@ -0,0 +1,52 @@
+// Background report exports: submit the export as a job, poll its progress
+// and download the finished file, so no request waits on the rendering.
+
+async function runReportJob(url, body, onProgress) {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ ...body, background: true }),
+  });
+  const submitted = await response.json();
+  if (!response.ok || !submitted.success) {
+    throw new Error(submitted.error || "Failed to start export");
+  }
+
+  let job = submitted.job;
+  while (job.state === "queued" || job.state === "running") {
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+    const statusResponse = await fetch(submitted.status_url);
+    const status = await statusResponse.json();
+    if (!statusResponse.ok || !status.success) {
+      throw new Error(status.error || "Export status unavailable");
+    }
+    job = status.job;
+    if (onProgress) {
+      onProgress(job);
+    }
+  }
+
+  if (job.state !== "done") {
+    throw new Error(job.error || "Export failed");
+  }
+
+  const fileResponse = await fetch(submitted.download_url);
+  if (!fileResponse.ok) {
+    const errorData = await fileResponse.json();
+    throw new Error(errorData.error || "Failed to download export");
+  }
+  return { blob: await fileResponse.blob(), filename: job.filename, job };
+}
+
+function saveReportBlob(blob, filename) {
+  const url = window.URL.createObjectURL(blob);
+  const a = document.createElement("a");
+  a.href = url;
+  a.download = filename;
+  document.body.appendChild(a);
+  a.click();
+  window.URL.revokeObjectURL(url);
+  document.body.removeChild(a);
+}
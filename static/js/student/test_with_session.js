@@ -13,6 +13,8 @@ document.addEventListener("DOMContentLoaded", function () {
   let timerInterval = null;
   let autoSaveInterval = null;
   let hasRestoredSession = false;
+  let saveSeq = 0; // Sequence number of the last autosave sent
+  let pendingChanges = {}; // Answers changed since the last acknowledged save
 
   // DOM elements
   const loadingMessage = document.getElementById("loading-message");
@@ -148,7 +150,7 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     const option = question.options[index];
-    studentAnswers[question.id] = option.id;
+    setAnswer(question.id, option.id);
 
     // Update UI
     displayQuestion(currentQuestionIndex);
@@ -162,11 +164,18 @@ document.addEventListener("DOMContentLoaded", function () {
       const data = await response.json();
 
       if (data.success && data.has_session) {
+        // Continue the server's save sequence whether or not we resume
+        saveSeq = data.session.save_seq || 0;
+
         const shouldResume = await showResumeModal(data.session);
 
         if (shouldResume) {
           await restoreSession(data.session);
           hasRestoredSession = true;
+        } else {
+          // Starting fresh: replace the stored answers once in full
+          studentAnswers = {};
+          await saveFullProgress();
         }
       }
     } catch (error) {
@@ -389,7 +398,7 @@ document.addEventListener("DOMContentLoaded", function () {
       optionElement.appendChild(optionContainer);
 
       optionElement.addEventListener("click", function () {
-        studentAnswers[question.id] = option.id;
+        setAnswer(question.id, option.id);
         displayQuestion(index);
         saveProgress();
       });
@@ -502,8 +511,57 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   }
 
-  // Save progress to server
+  // Record an answer and queue it for the next autosave
+  function setAnswer(questionId, answer) {
+    studentAnswers[questionId] = answer;
+    pendingChanges[questionId] = answer;
+  }
+
+  // Save progress to server: only answers changed since the last
+  // acknowledged save are sent, tagged with an increasing sequence number
   async function saveProgress() {
+    const changes = { ...pendingChanges };
+    const seq = ++saveSeq;
+
+    try {
+      const response = await fetch(`/student/exam/${examId}/session/delta`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        keepalive: true,
+        body: JSON.stringify({
+          seq: seq,
+          changes: changes,
+          current_question_index: currentQuestionIndex,
+          time_remaining: timeLeft,
+        }),
+      });
+
+      const result = await response.json();
+
+      if (result.success) {
+        // Keep anything the student changed again while this save was in flight
+        for (const [questionId, answer] of Object.entries(changes)) {
+          if (pendingChanges[questionId] === answer) {
+            delete pendingChanges[questionId];
+          }
+        }
+        showSaveIndicator();
+      } else if (response.status === 409) {
+        // A newer save already landed; catch up and resend with the next save
+        saveSeq = Math.max(saveSeq, result.last_seq || 0);
+      } else if (response.status === 404) {
+        // No server session yet (older session data): fall back to a full save
+        await saveFullProgress();
+      }
+    } catch (error) {
+      console.error("Error saving progress:", error);
+    }
+  }
+
+  // Save the complete answer set (used when starting fresh)
+  async function saveFullProgress() {
     try {
       const questionOrder = questions.map((q) => q.id);
 
@@ -523,7 +581,7 @@ document.addEventListener("DOMContentLoaded", function () {
       const result = await response.json();
 
       if (result.success) {
-        console.log("Progress saved successfully");
+        pendingChanges = {};
         showSaveIndicator();
       }
     } catch (error) {
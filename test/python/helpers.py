@@ -0,0 +1,183 @@
+"""
+Shared fixtures for the Python tests.
+
+Builds a throwaway Flask app bound to an in-memory SQLite database so tests
+never touch instance/users.db, plus small factories for the records most
+tests need (school, term, class, subject, users, exams and questions).
+"""
+import os
+import shutil
+import tempfile
+import weakref
+from datetime import date, timedelta
+
+from flask import Flask
+
+from models import db
+from models.user import User
+from models.school import School
+from models.school_term import SchoolTerm
+from models.class_room import ClassRoom
+from models.subject import Subject
+from models.exam import Exam
+from models.question import Question, Option
+from models.associations import class_subject, student_subject
+from services.report_cache import report_cache
+from services.session_store import exam_session_buffer
+
+
+def create_test_app(*route_registrars, **config):
+    """Create an isolated app with the given route registration functions."""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    app = Flask(__name__, root_path=root)
+    app.config.update(
+        TESTING=True,
+        SECRET_KEY="test-secret",
+        SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        EXAM_SESSION_FLUSH_INTERVAL=0,
+    )
+    app.config.update(config)
+    if "REPORT_CACHE_FOLDER" not in config:
+        # Never the real instance/report_cache, which app.py points it at
+        cache_folder = tempfile.mkdtemp(prefix="report-cache-")
+        app.config["REPORT_CACHE_FOLDER"] = cache_folder
+        weakref.finalize(app, shutil.rmtree, cache_folder, True)
+    db.init_app(app)
+
+    # Detach the autosave buffer from any previously created app (importing
+    # app.py starts its flusher) so saves go to this app's database
+    exam_session_buffer.shutdown()
+    exam_session_buffer.init_app(app)
+    report_cache.init_app(app)
+    for register in route_registrars:
+        register(app)
+    # Some templates/redirects expect a login endpoint to exist
+    if "login" not in app.view_functions:
+        app.add_url_rule("/login", "login", lambda: "login")
+    return app
+
+
+def login(client, user):
+    """Put a user id in the test client's session."""
+    with client.session_transaction() as sess:
+        sess["user_id"] = user.id
+        sess["role"] = user.role
+
+
+def make_user(username, role="student", class_room=None, **fields):
+    user = User(
+        username=username,
+        first_name=fields.pop("first_name", username.title()),
+        last_name=fields.pop("last_name", "Test"),
+        gender=fields.pop("gender", "male"),
+        dob=fields.pop("dob", date(2010, 1, 1)),
+        role=role,
+        password="x",
+        class_room_id=class_room.class_room_id if class_room else None,
+        **fields,
+    )
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def seed_school(class_name="JSS 1"):
+    """Create a school, current term, class, subject and admin/teacher users."""
+    school = School(
+        school_name="Test School",
+        address="1 Test Road",
+        phone="000",
+        email="school@test.com",
+    )
+    db.session.add(school)
+    db.session.flush()
+
+    term = SchoolTerm(
+        term_name="First Term",
+        start_date=date(2025, 9, 1),
+        end_date=date(2025, 12, 15),
+        academic_session="2025-2026",
+        school_id=school.school_id,
+        is_current=True,
+    )
+    class_room = ClassRoom(class_room_name=class_name)
+    subject = Subject(subject_name="Mathematics")
+    db.session.add_all([term, class_room, subject])
+    db.session.flush()
+
+    db.session.execute(
+        class_subject.insert().values(
+            class_room_id=class_room.class_room_id, subject_id=subject.subject_id
+        )
+    )
+
+    admin = make_user("admin", role="admin")
+    teacher = make_user("teacher", role="staff")
+    subject.subject_head_id = teacher.id
+    db.session.commit()
+
+    return {
+        "school": school,
+        "term": term,
+        "class_room": class_room,
+        "subject": subject,
+        "admin": admin,
+        "teacher": teacher,
+    }
+
+
+def make_student(seed, username):
+    student = make_user(username, class_room=seed["class_room"])
+    db.session.execute(
+        student_subject.insert().values(
+            student_id=student.id, subject_id=seed["subject"].subject_id
+        )
+    )
+    db.session.commit()
+    return student
+
+
+def make_exam(seed, exam_type="Exam", number_of_questions=None, max_score=60):
+    exam = Exam(
+        name="Mathematics Exam",
+        exam_type=exam_type,
+        duration=timedelta(minutes=30),
+        subject_id=seed["subject"].subject_id,
+        school_term_id=seed["term"].term_id,
+        class_room_id=seed["class_room"].class_room_id,
+        max_score=max_score,
+        number_of_questions=number_of_questions,
+    )
+    db.session.add(exam)
+    db.session.commit()
+    return exam
+
+
+def make_questions(seed, exam, count, options_per_question=4):
+    """Create MCQ questions whose first option is the correct one."""
+    questions = []
+    for i in range(count):
+        question = Question(
+            question_text=f"Question {i + 1}",
+            question_type="mcq",
+            subject_id=seed["subject"].subject_id,
+            teacher_id=seed["teacher"].id,
+            class_room_id=seed["class_room"].class_room_id,
+            term_id=seed["term"].term_id,
+            exam_type_id=exam.id,
+        )
+        db.session.add(question)
+        db.session.flush()
+        for j in range(options_per_question):
+            db.session.add(
+                Option(
+                    text=f"Q{i + 1} option {j + 1}",
+                    is_correct=(j == 0),
+                    order=j,
+                    question_id=question.id,
+                )
+            )
+        questions.append(question)
+    db.session.commit()
+    return questions
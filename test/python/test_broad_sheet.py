@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test cases for the pivoted broad sheet builder
+"""
+
+import unittest
+from unittest import mock
+
+from sqlalchemy import event
+
+from helpers import create_test_app, seed_school, make_student
+from models import db
+from models.grade import Grade
+from models.report_config import ReportConfig
+from models.student import Student
+from services.broad_sheet import build_broad_sheet
+from services.report_generator import ReportGenerator
+from utils.grade_sync import clear_sync_watermarks
+
+
+class TestBroadSheet(unittest.TestCase):
+    """Test cases for services.broad_sheet.build_broad_sheet"""
+
+    def setUp(self):
+        clear_sync_watermarks()
+        self.app = create_test_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.class_room_id = self.seed["class_room"].class_room_id
+        self.term_id = self.seed["term"].term_id
+
+    def tearDown(self):
+        clear_sync_watermarks()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_student(self, username, scores, admission_number=None):
+        student = make_student(self.seed, username)
+        if admission_number:
+            db.session.add(Student(user_id=student.id, admission_number=admission_number))
+        for assessment_type, score, max_score, is_cbt in scores:
+            db.session.add(Grade(
+                student_id=student.id,
+                subject_id=self.seed["subject"].subject_id,
+                class_room_id=self.class_room_id,
+                term_id=self.term_id,
+                assessment_type=assessment_type,
+                max_score=max_score,
+                score=score,
+                academic_session="2025-2026",
+                is_from_cbt=is_cbt,
+            ))
+        db.session.commit()
+        return student
+
+    def sheet(self, exam_type="all", config_id=None):
+        return build_broad_sheet(self.class_room_id, self.term_id, exam_type, config_id)
+
+    def test_rows_and_metadata(self):
+        self.add_student("amina", [("first_ca", 15, 20, False), ("exam", 50, 60, False)],
+                         admission_number="ADM1")
+        self.add_student("bola", [("second_ca", 12, 20, True)])
+
+        rows, metadata = self.sheet()
+
+        self.assertEqual([r["student_name"] for r in rows], ["Amina Test", "Bola Test"])
+        self.assertEqual(rows[0]["admission_number"], "ADM1")
+        self.assertEqual(rows[1]["admission_number"], "N/A")
+
+        maths = rows[0]["subjects"]["Mathematics"]
+        self.assertEqual((maths["total_score"], maths["max_possible"]), (65, 80))
+        self.assertEqual(maths["percentage"], 81.2)
+        self.assertEqual(maths["grade"], "A")
+        self.assertEqual([s["assessment_type"] for s in maths["scores"]], ["first_ca", "exam"])
+
+        # CBT grades are reported under their own column
+        self.assertEqual(rows[1]["subjects"]["Mathematics"]["scores"][0]["assessment_type"], "cbt")
+
+        self.assertEqual(metadata["total_students"], 2)
+        self.assertEqual(metadata["total_subjects"], 1)
+        self.assertEqual(sorted(metadata["assessment_types"]), ["cbt", "exam", "first_ca"])
+
+    def test_student_without_grades_gets_empty_cells(self):
+        self.add_student("amina", [])
+
+        rows, _ = self.sheet()
+        maths = rows[0]["subjects"]["Mathematics"]
+        self.assertEqual(maths["scores"], [])
+        self.assertEqual(maths["grade"], "N/A")
+
+    def test_exam_type_filters_scores(self):
+        self.add_student("amina", [("first_ca", 15, 20, False), ("exam", 30, 60, False)])
+
+        rows, metadata = self.sheet("exam")
+        maths = rows[0]["subjects"]["Mathematics"]
+        self.assertEqual([s["assessment_type"] for s in maths["scores"]], ["exam"])
+        self.assertEqual((maths["total_score"], maths["max_possible"]), (30, 60))
+        self.assertEqual(metadata["assessment_types"], ["exam"])
+
+    def test_merge_config_is_applied(self):
+        self.add_student("amina", [
+            ("first_ca", 15, 20, False), ("second_ca", 10, 20, False), ("exam", 40, 60, False),
+        ])
+        config = ReportConfig(school_id=self.seed["school"].school_id, term_id=self.term_id,
+                              config_name="Merged CA")
+        config.set_merge_config({"merged_exams": [
+            {"name": "ca", "components": ["first_ca", "second_ca"], "display_as": "total_ca"},
+        ]})
+        db.session.add(config)
+        db.session.commit()
+
+        rows, _ = self.sheet(config_id=config.config_id)
+        scores = {s["assessment_type"]: s for s in rows[0]["subjects"]["Mathematics"]["scores"]}
+        self.assertEqual(set(scores), {"total_ca", "exam"})
+        self.assertEqual((scores["total_ca"]["score"], scores["total_ca"]["max_score"]), (25, 40))
+        self.assertEqual(scores["total_ca"]["formatted_type"], "Total Ca")
+
+    def count_statements(self):
+        # Start from a cold identity map so both runs do the same work
+        db.session.expire_all()
+        clear_sync_watermarks()
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_execute)
+        try:
+            self.sheet()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_execute)
+        return len(statements)
+
+    def test_query_count_does_not_grow_with_class_size(self):
+        self.add_student("amina", [("exam", 40, 60, False)], admission_number="ADM1")
+        small = self.count_statements()
+
+        for i in range(10):
+            self.add_student(f"student{i}", [("first_ca", 10, 20, False), ("exam", 40, 60, False)],
+                             admission_number=f"ADM{i + 2}")
+        self.assertEqual(self.count_statements(), small)
+
+    def test_grades_are_synced_once(self):
+        with mock.patch("utils.grade_sync.sync_class_term_if_stale") as sync:
+            self.sheet()
+        sync.assert_called_once_with(self.class_room_id, self.term_id)
+
+    def test_grade_boundaries(self):
+        self.assertEqual(
+            [ReportGenerator.get_grade(p) for p in (100, 70, 69.9, 60, 50, 45, 40, 39.9)],
+            ["A", "A", "B", "B", "C", "D", "E", "F"],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
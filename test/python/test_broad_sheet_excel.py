@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test cases for streamed broad sheet workbooks
+"""
+
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+from xml.etree import ElementTree
+
+from helpers import create_test_app, login, make_user, seed_school, make_student
+from models import db
+from models.class_room import ClassRoom
+from models.grade import Grade
+from models.student import Student
+from models.associations import class_subject
+from routes import report_routes
+from services.broad_sheet import build_broad_sheet, iter_broad_sheet_rows
+from services.broad_sheet_excel import sheet_title
+from services.report_jobs import report_job_queue, DONE
+from utils.grade_sync import clear_sync_watermarks
+
+
+NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def read_workbook(data):
+    """{sheet name: {cell ref: text}} of an xlsx file"""
+    with zipfile.ZipFile(io.BytesIO(data)) as xlsx:
+        names = [
+            sheet.get("name") for sheet in
+            ElementTree.fromstring(xlsx.read("xl/workbook.xml")).iterfind(".//x:sheet", NS)
+        ]
+        sheets = {}
+        for index, name in enumerate(names, 1):
+            root = ElementTree.fromstring(xlsx.read(f"xl/worksheets/sheet{index}.xml"))
+            cells = {}
+            for cell in root.iterfind(".//x:c", NS):
+                text = cell.find("x:is/x:t", NS)
+                value = cell.find("x:v", NS)
+                cells[cell.get("r")] = (text if text is not None else value).text
+            sheets[name] = cells
+    return sheets
+
+
+class TestSheetTitle(unittest.TestCase):
+    """Test cases for services.broad_sheet_excel.sheet_title"""
+
+    def test_titles_are_valid_and_unique(self):
+        used = set()
+        self.assertEqual(sheet_title("JSS 1/A", used), "JSS 1-A")
+        self.assertEqual(sheet_title("jss 1/a", used), "jss 1-a (2)")
+        self.assertEqual(len(sheet_title("x" * 40, used)), 31)
+        self.assertEqual(sheet_title("x" * 40, used), "x" * 27 + " (2)")
+
+
+class TestBroadSheetExcel(unittest.TestCase):
+    """Test cases for the streamed Excel broad sheet exports"""
+
+    def setUp(self):
+        clear_sync_watermarks()
+        self.folder = tempfile.TemporaryDirectory()
+        self.app = create_test_app(
+            lambda app: app.register_blueprint(report_routes.report_bp),
+            REPORT_JOB_WORKERS=0,
+            REPORT_JOB_FOLDER=self.folder.name,
+        )
+        report_job_queue.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.class_room_id = self.seed["class_room"].class_room_id
+        self.term_id = self.seed["term"].term_id
+        for i, score in enumerate([50, 35]):
+            user = make_student(self.seed, f"student{i}")
+            db.session.add(Student(user_id=user.id, admission_number=f"ADM{i}"))
+            db.session.add(Grade(
+                student_id=user.id,
+                subject_id=self.seed["subject"].subject_id,
+                class_room_id=self.class_room_id,
+                term_id=self.term_id,
+                assessment_type="exam",
+                max_score=60,
+                score=score,
+                academic_session="2025-2026",
+            ))
+
+        other = ClassRoom(class_room_name="JSS 2")
+        db.session.add(other)
+        db.session.flush()
+        db.session.execute(class_subject.insert().values(
+            class_room_id=other.class_room_id, subject_id=self.seed["subject"].subject_id))
+        make_user("pupil", class_room=other)
+        db.session.commit()
+        self.other_class_id = other.class_room_id
+
+        self.client = self.app.test_client()
+        login(self.client, self.seed["admin"])
+
+    def tearDown(self):
+        clear_sync_watermarks()
+        report_job_queue.shutdown()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.folder.cleanup()
+
+    def test_rows_are_streamed(self):
+        rows = iter_broad_sheet_rows(self.class_room_id, self.term_id)
+        self.assertFalse(isinstance(rows, list))
+        self.assertEqual(list(rows), build_broad_sheet(self.class_room_id, self.term_id)[0])
+
+    def test_class_sheet_keeps_header_block(self):
+        temp = os.path.join(self.folder.name, "tmp")
+        os.makedirs(temp)
+        with mock.patch.object(tempfile, "tempdir", temp):
+            response = self.client.post("/reports/api/broad-sheet/export/excel", json={
+                "class_room_id": self.class_room_id, "term_id": self.term_id,
+            }, buffered=True)
+        # The streamed file is removed once it has been sent
+        self.assertEqual(os.listdir(temp), [])
+
+        self.assertEqual(response.status_code, 200)
+        cells = read_workbook(response.data)["Broad Sheet"]
+        self.assertEqual(cells["A1"], "BROAD SHEET")
+        self.assertEqual(cells["A4"], "Class: JSS 1")
+        self.assertEqual([cells["A9"], cells["C9"], cells["D9"]],
+                         ["S/N", "Student Name", "Mathematics"])
+        self.assertEqual([cells["B10"], cells["C10"], cells["D10"]],
+                         ["ADM0", "Student0 Test", "50.0/60.0 (83.3%)"])
+        self.assertEqual(cells["D11"], "35.0/60.0 (58.3%)")
+
+    def test_workbook_has_a_sheet_per_class(self):
+        response = self.client.post("/reports/api/broad-sheet/export/workbook", json={
+            "term_id": self.term_id, "background": True,
+        })
+        self.assertEqual(response.status_code, 202)
+        submitted = response.get_json()
+
+        status = self.client.get(submitted["status_url"]).get_json()["job"]
+        self.assertEqual(status["state"], DONE)
+        self.assertEqual((status["completed"], status["total"]), (3, 3))
+
+        download = self.client.get(submitted["download_url"])
+        sheets = read_workbook(download.data)
+        self.assertEqual(list(sheets), ["JSS 1", "JSS 2"])
+        self.assertEqual(sheets["JSS 2"]["C10"], "Pupil Test")
+        self.assertEqual(sheets["JSS 2"]["D10"], "0/0 (0%)")
+        self.assertIn("Broad_Sheets_First_Term_2025-2026.xlsx",
+                      download.headers["Content-Disposition"])
+
+    def test_workbook_name_without_session(self):
+        self.seed["term"].academic_session = None
+        with db.session.no_autoflush:
+            path, filename, _ = report_routes.render_broad_sheet_workbook_job(
+                None, [self.class_room_id], self.term_id)
+        os.remove(path)
+        self.assertEqual(filename, "Broad_Sheets_First_Term.xlsx")
+
+    def test_workbook_rejects_unknown_class(self):
+        response = self.client.post("/reports/api/broad-sheet/export/workbook", json={
+            "term_id": self.term_id, "class_room_ids": [self.class_room_id, "missing"],
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("missing", response.get_json()["error"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test cases for the page-by-page broad sheet PDF
+"""
+
+import io
+import tempfile
+import unittest
+from unittest import mock
+
+from pypdf import PdfReader
+
+from helpers import create_test_app, login, seed_school, make_student
+from models import db
+from models.grade import Grade
+from models.student import Student
+from routes import report_routes
+from services.pdf_renderer import RenderResult
+from services.report_jobs import report_job_queue, DONE
+from utils.grade_sync import clear_sync_watermarks
+
+
+class TestBroadSheetPdf(unittest.TestCase):
+    """Test cases for generate_broad_sheet_pages and build_broad_sheet_pdf"""
+
+    def setUp(self):
+        clear_sync_watermarks()
+        self.folder = tempfile.TemporaryDirectory()
+        self.app = create_test_app(
+            lambda app: app.register_blueprint(report_routes.report_bp),
+            REPORT_JOB_WORKERS=0,
+            REPORT_JOB_FOLDER=self.folder.name,
+            REPORT_PDF_WORKERS=2,
+            REPORT_PDF_CHUNK_SIZE=2,
+        )
+        report_job_queue.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        for i in range(5):
+            user = make_student(self.seed, f"student{i}")
+            db.session.add(Student(user_id=user.id, admission_number=f"ADM{i}"))
+            db.session.add(Grade(
+                student_id=user.id,
+                subject_id=self.seed["subject"].subject_id,
+                class_room_id=self.seed["class_room"].class_room_id,
+                term_id=self.seed["term"].term_id,
+                assessment_type="exam",
+                max_score=60,
+                score=30 + i,
+                academic_session="2025-2026",
+            ))
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        login(self.client, self.seed["admin"])
+
+    def tearDown(self):
+        clear_sync_watermarks()
+        report_job_queue.shutdown()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.folder.cleanup()
+
+    def sheet(self):
+        return report_routes.get_broad_sheet_data_logic(
+            self.seed["class_room"].class_room_id, self.seed["term"].term_id)
+
+    def test_pages_split_students(self):
+        rows, metadata = self.sheet()
+        (prefix, suffix), page_count, pages = report_routes.generate_broad_sheet_pages(
+            rows, metadata, self.seed["school"], students_per_page=2)
+        # Pages are built as the renderer reads them
+        self.assertFalse(isinstance(pages, list))
+        pages = list(pages)
+
+        self.assertEqual(page_count, 3)
+        self.assertEqual(len(pages), 3)
+        self.assertIn("PAGE 1 OF 3", pages[0])
+        self.assertIn("<style>", prefix)
+        self.assertNotIn("<style>", pages[1])
+        self.assertIn("STUDENT2 TEST", pages[1])
+        self.assertEqual(sum("footer-strip" in page for page in pages), 1)
+        self.assertIn("footer-strip", pages[-1])
+
+        html = report_routes.generate_broad_sheet_html(
+            rows, metadata, self.seed["school"], students_per_page=2)
+        self.assertTrue(html.startswith(prefix))
+        self.assertEqual(html.count(report_routes.BROAD_SHEET_PAGE_BREAK), 2)
+
+    @unittest.skipUnless(report_routes.XHTML2PDF_AVAILABLE or report_routes.WEASYPRINT_AVAILABLE,
+                         "no PDF library installed")
+    def test_pdf_job_reports_pages(self):
+        response = self.client.post("/reports/api/broad-sheet/export/pdf", json={
+            "class_room_id": self.seed["class_room"].class_room_id,
+            "term_id": self.seed["term"].term_id,
+            "students_per_page": 2,
+            "background": True,
+        })
+        self.assertEqual(response.status_code, 202)
+        submitted = response.get_json()
+
+        status = self.client.get(submitted["status_url"]).get_json()["job"]
+        self.assertEqual(status["state"], DONE)
+        self.assertEqual((status["completed"], status["total"]), (3, 3))
+
+        download = self.client.get(submitted["download_url"])
+        self.assertEqual(download.mimetype, "application/pdf")
+        self.assertGreaterEqual(len(PdfReader(io.BytesIO(download.data)).pages), 3)
+
+    def test_missing_page_fails_the_export(self):
+        rows, metadata = self.sheet()
+        with mock.patch("services.pdf_renderer.render_documents",
+                        return_value=RenderResult(b"%PDF", [1])), \
+                mock.patch.object(report_routes, "_pdf_engine",
+                                  return_value=("xhtml2pdf", "simple")):
+            with self.assertRaisesRegex(RuntimeError, "page\\(s\\) 2"):
+                report_routes.build_broad_sheet_pdf(
+                    rows, metadata, self.seed["school"], students_per_page=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test cases for single-query class positions
+"""
+
+import unittest
+
+from sqlalchemy import event
+
+from helpers import create_test_app, seed_school, make_student
+from models import db
+from models.grade import Grade
+from models.subject import Subject
+from services.class_ranking import (
+    get_class_ranking, get_student_position, rank_totals, clear_class_rankings
+)
+from services.report_generator import ReportGenerator
+
+
+class TestClassRanking(unittest.TestCase):
+    """Test cases for services.class_ranking"""
+
+    def setUp(self):
+        clear_class_rankings()
+        self.app = create_test_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.students = [make_student(self.seed, f"student{i}") for i in range(5)]
+
+    def tearDown(self):
+        clear_class_rankings()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_grade(self, student, score, subject=None, published=True, from_cbt=False):
+        grade = Grade(
+            student_id=student.id,
+            subject_id=(subject or self.seed["subject"]).subject_id,
+            class_room_id=self.seed["class_room"].class_room_id,
+            term_id=self.seed["term"].term_id,
+            assessment_type="exam",
+            assessment_name="Examination",
+            max_score=100,
+            score=score,
+            academic_session="2025-2026",
+            is_published=published,
+            is_from_cbt=from_cbt,
+        )
+        db.session.add(grade)
+        db.session.commit()
+        return grade
+
+    def ranking(self, **kwargs):
+        return [
+            (entry.student_id, entry.position)
+            for entry in get_class_ranking(
+                self.seed["class_room"].class_room_id, self.seed["term"].term_id, **kwargs
+            )
+        ]
+
+    def test_rank_methods_handle_ties(self):
+        totals = [("a", 90), ("b", 80), ("c", 80), ("d", 70)]
+        self.assertEqual([e.position for e in rank_totals(totals)], [1, 2, 2, 4])
+        self.assertEqual([e.position for e in rank_totals(totals, "dense")], [1, 2, 2, 3])
+        self.assertEqual([e.position for e in rank_totals(totals, "ordinal")], [1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            rank_totals(totals, "fractional")
+
+    def test_counts_published_and_cbt_grades_only(self):
+        s = self.students
+        self.add_grade(s[0], 50)
+        self.add_grade(s[0], 30, from_cbt=True, published=False)
+        self.add_grade(s[1], 90)
+        self.add_grade(s[2], 95, published=False)
+
+        ranking = dict(self.ranking())
+        self.assertEqual(ranking[s[1].id], 1)
+        self.assertEqual(ranking[s[0].id], 2)
+        # Students without counted grades share the last place at 0
+        self.assertEqual(ranking[s[2].id], 3)
+        self.assertEqual(ranking[s[4].id], 3)
+
+    def test_per_subject_ranking(self):
+        english = Subject(subject_name="English")
+        db.session.add(english)
+        db.session.commit()
+
+        self.add_grade(self.students[0], 80)
+        self.add_grade(self.students[1], 60)
+        self.add_grade(self.students[1], 70, subject=english)
+
+        self.assertEqual(self.ranking()[0], (self.students[1].id, 1))
+        self.assertEqual(
+            self.ranking(subject_id=self.seed["subject"].subject_id)[0],
+            (self.students[0].id, 1),
+        )
+
+    def test_class_report_shares_one_totals_query(self):
+        """Positions for a whole class reuse one GROUP BY until a grade changes"""
+        for index, student in enumerate(self.students):
+            self.add_grade(student, 10 * index)
+
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_execute)
+        try:
+            positions = [
+                ReportGenerator.calculate_class_position(
+                    student.id, self.seed["term"].term_id,
+                    self.seed["class_room"].class_room_id
+                )
+                for student in self.students
+            ]
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_execute)
+
+        self.assertEqual(positions, [5, 4, 3, 2, 1])
+        self.assertEqual(len([s for s in statements if "GROUP BY" in s]), 1)
+
+        grade = Grade.query.filter_by(student_id=self.students[0].id).one()
+        grade.score = 100
+        db.session.commit()
+        self.assertEqual(
+            get_student_position(
+                self.students[0].id, self.seed["class_room"].class_room_id,
+                self.seed["term"].term_id
+            ),
+            1,
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
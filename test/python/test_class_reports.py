@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test cases for the batched class report assembler
+"""
+
+import unittest
+
+from sqlalchemy import event
+
+from helpers import create_test_app, seed_school, make_student
+from models import db
+from models.grade import Grade
+from models.student import Student
+from models.class_room import ClassRoom
+from models.subject import Subject
+from models.assessment_type import AssessmentType
+from services.class_ranking import clear_class_rankings
+from services.report_generator import ReportGenerator
+from utils.grade_sync import clear_sync_watermarks
+
+
+class TestClassReports(unittest.TestCase):
+    """Test cases for ReportGenerator.get_class_report_data"""
+
+    def setUp(self):
+        clear_class_rankings()
+        clear_sync_watermarks()
+        self.app = create_test_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        school_id = self.seed["school"].school_id
+        db.session.add_all([
+            AssessmentType(name="First CA", code="first_ca", max_score=40, order=1,
+                           school_id=school_id),
+            AssessmentType(name="Examination", code="exam", max_score=60, order=2,
+                           school_id=school_id),
+        ])
+        db.session.commit()
+        self.class_room_id = self.seed["class_room"].class_room_id
+        self.term_id = self.seed["term"].term_id
+        self.subject_id = self.seed["subject"].subject_id
+
+    def tearDown(self):
+        clear_class_rankings()
+        clear_sync_watermarks()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_students(self, count, start=0):
+        # Re-read the class and subject in case an earlier run closed the session
+        seed = {
+            "class_room": db.session.get(ClassRoom, self.class_room_id),
+            "subject": db.session.get(Subject, self.subject_id),
+        }
+        students = []
+        for i in range(start, start + count):
+            user = make_student(seed, f"student{i}")
+            db.session.add(Student(user_id=user.id, admission_number=f"ADM{i}"))
+            for code, score in (("first_ca", 10 + i), ("exam", 30 + 2 * i)):
+                db.session.add(Grade(
+                    student_id=user.id,
+                    subject_id=self.subject_id,
+                    class_room_id=self.class_room_id,
+                    term_id=self.term_id,
+                    assessment_type=code,
+                    max_score=40 if code == "first_ca" else 60,
+                    score=score,
+                    academic_session="2025-2026",
+                    is_published=True,
+                ))
+            students.append(user)
+        db.session.commit()
+        return students
+
+    def class_reports(self):
+        return ReportGenerator.get_class_report_data(
+            self.class_room_id, self.term_id
+        )
+
+    def count_statements(self, func):
+        # Start from a cold session and caches so both runs do the same work
+        db.session.remove()
+        clear_class_rankings()
+        clear_sync_watermarks()
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_execute)
+        try:
+            result = func()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_execute)
+        return result, len(statements)
+
+    def test_matches_single_student_reports(self):
+        """Every class report equals the student's own report"""
+        students = self.add_students(4)
+        reports = self.class_reports()
+
+        self.assertEqual([r["student"]["id"] for r in reports],
+                         [s.id for s in reversed(students)])
+        for report in reports:
+            single = ReportGenerator.get_student_scores(
+                report["student"]["id"], self.term_id, self.class_room_id
+            )
+            self.assertEqual(report, single)
+
+        top = reports[0]
+        self.assertEqual(top["position"], 1)
+        self.assertEqual(top["total_students"], 4)
+        self.assertEqual(top["overall_total"], 13 + 36)
+
+    def test_query_count_does_not_grow_with_class_size(self):
+        self.add_students(3)
+        reports, small = self.count_statements(self.class_reports)
+        self.assertEqual(len(reports), 3)
+
+        self.add_students(12, start=3)
+        reports, large = self.count_statements(self.class_reports)
+        self.assertEqual(len(reports), 15)
+        self.assertEqual(small, large)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test cases for the per-request current user and the cached school branding
+"""
+
+import unittest
+
+from flask import jsonify
+from sqlalchemy import event
+
+from helpers import create_test_app, login, seed_school, make_student
+from models import db
+from routes.admin_action_routes import admin_action_route
+from routes.dashboard import admin_required
+from services.school_info import get_school_info, invalidate_school_info
+from utils.current_user import get_current_user
+
+
+def demo_routes(app):
+    @app.route("/demo/whoami")
+    @admin_required
+    def whoami():
+        user = get_current_user()
+        return jsonify(username=user.username, same=user is get_current_user())
+
+    @app.route("/demo/class")
+    def my_class():
+        user = get_current_user()
+        return jsonify(class_room=user.class_room.class_room_name,
+                       has_student_record=user.student is not None)
+
+
+class TestCurrentUser(unittest.TestCase):
+    """Test cases for utils.current_user and services.school_info"""
+
+    def setUp(self):
+        invalidate_school_info()
+        self.app = create_test_app(admin_action_route, demo_routes)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.student = make_student(self.seed, "student1")
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        invalidate_school_info()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_statements(self, func):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            result = func()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        return result, statements
+
+    def test_decorator_and_handler_share_one_load(self):
+        login(self.client, self.seed["admin"])
+        db.session.expunge_all()
+        response, statements = self.count_statements(lambda: self.client.get("/demo/whoami"))
+        self.assertEqual(response.get_json(), {"username": "admin", "same": True})
+        self.assertEqual(len(statements), 1)
+
+    def test_relationships_are_joined(self):
+        login(self.client, self.student)
+        db.session.expunge_all()
+        response, statements = self.count_statements(lambda: self.client.get("/demo/class"))
+        self.assertEqual(response.get_json(),
+                         {"class_room": "JSS 1", "has_student_record": False})
+        self.assertEqual(len(statements), 1)
+        self.assertIn("JOIN class_room", statements[0])
+
+    def test_new_login_is_not_served_stale_user(self):
+        login(self.client, self.seed["admin"])
+        self.assertEqual(self.client.get("/demo/whoami").status_code, 200)
+        login(self.client, self.student)
+        # admin_required re-reads the user and turns the student away
+        self.assertEqual(self.client.get("/demo/whoami").status_code, 302)
+
+    def test_school_info_is_cached(self):
+        info, statements = self.count_statements(get_school_info)
+        self.assertEqual(info["name"], "Test School")
+        self.assertEqual(len(statements), 1)
+        _, statements = self.count_statements(get_school_info)
+        self.assertEqual(statements, [])
+
+    def test_saving_school_refreshes_branding(self):
+        self.assertEqual(get_school_info()["name"], "Test School")
+        login(self.client, self.seed["admin"])
+        response = self.client.post("/admin/settings/school", data={
+            "school_name": "Renamed School",
+            "address": "1 School Road",
+            "phone": "0800",
+            "email": "office@example.com",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_school_info()["name"], "Renamed School")
+
+
+if __name__ == '__main__':
+    unittest.main()
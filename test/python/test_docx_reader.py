@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test cases for the single-pass, cached Word question reader
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from docx import Document
+from PIL import Image
+
+from helpers import create_test_app
+from utils import docx_reader
+from utils.docx_reader import clear_word_parse_cache, parse_word_document
+from utils.question_parser import parse_word_questions
+
+
+def png(colour):
+    out = io.BytesIO()
+    Image.new("RGB", (4, 4), colour).save(out, format="PNG")
+    out.seek(0)
+    return out
+
+
+def make_docx(capital="Paris"):
+    doc = Document()
+    doc.add_paragraph("Answer every question.")
+
+    doc.add_paragraph("Question: Which shape is shown?")
+    doc.add_paragraph().add_run().add_picture(png("red"))
+    doc.add_paragraph("Type: MCQ")
+    doc.add_paragraph("Options:")
+    doc.add_paragraph("- Circle")
+    doc.add_paragraph("- *Square")
+    doc.add_paragraph().add_run().add_picture(png("blue"))
+
+    doc.add_paragraph("Question: Capital of France?")
+    doc.add_paragraph("Type: Short Answer")
+    doc.add_paragraph(f"Answer: {capital}")
+
+    doc.add_paragraph("Question: The Earth is flat.")
+    doc.add_paragraph("Type: True/False")
+    doc.add_paragraph("Options:")
+    doc.add_paragraph("- True")
+    doc.add_paragraph("- *False")
+
+    # In the package but never drawn in the document
+    doc.part.get_or_add_image(png("green"))
+
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+class TestDocxReader(unittest.TestCase):
+    """Test cases for utils.docx_reader"""
+
+    def setUp(self):
+        clear_word_parse_cache()
+        self.folder = tempfile.TemporaryDirectory()
+        self.app = create_test_app(QUESTION_IMAGE_FOLDER=self.folder.name)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        self.app_context.pop()
+        self.folder.cleanup()
+        clear_word_parse_cache()
+
+    def test_questions_are_parsed(self):
+        questions, error = parse_word_questions(make_docx())
+        self.assertIsNone(error)
+        self.assertEqual(len(questions), 3)
+
+        shape, capital, flat = questions
+        self.assertEqual(shape["question_text"], "Which shape is shown?")
+        self.assertEqual(shape["question_type"], "mcq")
+        self.assertTrue(shape["question_image"].startswith("/question-images/"))
+        self.assertEqual([(o["text"], o["is_correct"]) for o in shape["options"]],
+                         [("Circle", False), ("Square", True)])
+        self.assertNotIn("option_image", shape["options"][0])
+        self.assertTrue(shape["options"][1]["option_image"].startswith("/question-images/"))
+
+        self.assertEqual(capital["question_type"], "short_answer")
+        self.assertEqual(capital["correct_answer"], "Paris")
+        self.assertEqual(flat["question_type"], "true_false")
+        self.assertEqual(len(flat["options"]), 2)
+
+    def test_only_referenced_images_are_stored(self):
+        parse_word_document(make_docx(), image_workers=4)
+        self.assertEqual(len(os.listdir(self.folder.name)), 2)
+
+    def test_threaded_and_inline_images_agree(self):
+        content = make_docx()
+        threaded = parse_word_document(content, image_workers=4)
+        clear_word_parse_cache()
+        self.assertEqual(parse_word_document(content, image_workers=0), threaded)
+
+    def test_same_file_is_not_parsed_again(self):
+        content = make_docx()
+        first = parse_word_document(content)
+        first[0]["question_text"] = "Changed by the caller"
+
+        with mock.patch.object(docx_reader, "_Package") as package:
+            again = parse_word_document(content)
+        package.assert_not_called()
+        self.assertEqual(again[0]["question_text"], "Which shape is shown?")
+
+    def test_corrected_file_only_parses_changed_blocks(self):
+        first = parse_word_document(make_docx())
+
+        with mock.patch.object(docx_reader, "_parse_block",
+                               wraps=docx_reader._parse_block) as parse_block:
+            corrected = parse_word_document(make_docx(capital="Paris, France"))
+
+        self.assertEqual(parse_block.call_count, 1)
+        self.assertEqual(corrected[1]["correct_answer"], "Paris, France")
+        self.assertEqual(corrected[0], first[0])
+        self.assertEqual(corrected[2], first[2])
+
+    def test_invalid_file_reports_an_error(self):
+        questions, error = parse_word_questions(b"not a docx")
+        self.assertIsNone(questions)
+        self.assertIn("Error parsing Word document", error)
+
+
+if __name__ == '__main__':
+    unittest.main()
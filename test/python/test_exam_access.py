@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test cases for the cached exam access check
+"""
+
+import unittest
+
+from sqlalchemy import event
+
+from helpers import (
+    create_test_app, login, seed_school, make_user, make_student, make_exam, make_questions
+)
+from models import db
+from models.associations import class_subject, student_subject
+from models.class_room import ClassRoom
+from routes.admin_action_routes import admin_action_route
+from routes.dashboard import dashboard_route
+from routes.student_routes import student_route
+from services.exam_access import (
+    ALLOWED, COMPLETED, NOT_ENROLLED, check_exam_access, clear_exam_access,
+    invalidate_exam_access
+)
+from services.question_bank import clear_question_banks
+
+
+class TestExamAccess(unittest.TestCase):
+    """Test cases for services.exam_access"""
+
+    def setUp(self):
+        clear_exam_access()
+        clear_question_banks()
+        self.app = create_test_app(student_route, admin_action_route, dashboard_route)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.exam = make_exam(self.seed, number_of_questions=3, max_score=10)
+        make_questions(self.seed, self.exam, 3)
+        self.student = make_student(self.seed, "student1")
+
+        self.extra_users = []
+
+        self.client = self.app.test_client()
+        login(self.client, self.student)
+
+    def tearDown(self):
+        clear_exam_access()
+        clear_question_banks()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_statements(self, func):
+        # Load the rows expired by earlier commits outside the count
+        for row in (self.exam, self.student, *self.extra_users):
+            db.session.refresh(row)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            result = func()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        return result, len(statements)
+
+    def questions(self):
+        return self.client.get(f"/student/exam/{self.exam.id}/questions")
+
+    def test_verdict_is_read_once(self):
+        verdict, queries = self.count_statements(
+            lambda: check_exam_access(self.student, self.exam))
+        self.assertEqual((verdict, queries), (ALLOWED, 1))
+
+        verdict, queries = self.count_statements(
+            lambda: check_exam_access(self.student, self.exam))
+        self.assertEqual((verdict, queries), (ALLOWED, 0))
+
+    def test_class_subject_enrolls_student(self):
+        pupil = make_user("pupil", class_room=self.seed["class_room"])
+        db.session.commit()
+
+        self.assertEqual(check_exam_access(pupil, self.exam), ALLOWED)
+        enrolled = db.session.execute(db.select(student_subject).where(
+            student_subject.c.student_id == pupil.id)).all()
+        self.assertEqual(len(enrolled), 1)
+
+    def test_other_class_is_refused(self):
+        other = ClassRoom(class_room_name="JSS 2")
+        db.session.add(other)
+        db.session.flush()
+        outsider = make_user("outsider", class_room=other)
+        db.session.commit()
+
+        client = self.app.test_client()
+        login(client, outsider)
+        response = client.get(f"/student/exam/{self.exam.id}/questions")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.get_json()["message"], "Not enrolled in this subject")
+
+        page = client.get(f"/student/exam/{self.exam.id}")
+        self.assertEqual(page.status_code, 302)
+
+        # Adding the subject to the class takes effect once the cache is cleared
+        db.session.execute(class_subject.insert().values(
+            class_room_id=other.class_room_id, subject_id=self.seed["subject"].subject_id))
+        db.session.commit()
+        self.assertEqual(check_exam_access(outsider, self.exam), NOT_ENROLLED)
+        clear_exam_access()
+        self.assertEqual(check_exam_access(outsider, self.exam), ALLOWED)
+
+    def test_submit_closes_and_reset_reopens_exam(self):
+        self.assertEqual(self.questions().status_code, 200)
+        response = self.client.post(f"/student/exam/{self.exam.id}/submit",
+                                    json={"answers": {}})
+        self.assertEqual(response.status_code, 200)
+
+        refused = self.questions()
+        self.assertEqual(refused.status_code, 403)
+        self.assertEqual(refused.get_json()["message"], "You have already completed this exam")
+        _, queries = self.count_statements(
+            lambda: self.assertEqual(check_exam_access(self.student, self.exam), COMPLETED))
+        self.assertEqual(queries, 0)
+
+        admin = self.app.test_client()
+        login(admin, self.seed["admin"])
+        reset = admin.post(f"/admin/exam/{self.exam.id}/{self.student.id}/reset")
+        self.assertEqual(reset.status_code, 200)
+        self.assertEqual(self.questions().status_code, 200)
+
+    def test_invalidate_one_student(self):
+        other = make_student(self.seed, "student2")
+        self.extra_users.append(other)
+        check_exam_access(self.student, self.exam)
+        check_exam_access(other, self.exam)
+
+        invalidate_exam_access(student_id=self.student.id)
+        _, queries = self.count_statements(lambda: check_exam_access(other, self.exam))
+        self.assertEqual(queries, 0)
+        _, queries = self.count_statements(lambda: check_exam_access(self.student, self.exam))
+        self.assertEqual(queries, 1)
+
+    def test_demo_user_skips_check(self):
+        demo = make_user("demo_student")
+        db.session.commit()
+        self.extra_users.append(demo)
+        verdict, queries = self.count_statements(lambda: check_exam_access(demo, self.exam))
+        self.assertTrue(verdict.allowed and verdict.is_demo)
+        self.assertEqual(queries, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test cases for the per-student served-question manifest
+"""
+
+import unittest
+
+from helpers import (
+    create_test_app, login, seed_school, make_student, make_exam, make_questions
+)
+from models import db
+from models.exam_session import ExamSession
+from models.exam_record import ExamRecord
+from routes.student_routes import student_route
+from routes.session_monitor_routes import session_monitor_routes
+from services.question_bank import clear_question_banks
+
+
+class TestExamManifest(unittest.TestCase):
+    """Test cases for services.exam_manifest"""
+
+    def setUp(self):
+        clear_question_banks()
+        self.app = create_test_app(student_route, session_monitor_routes)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.exam = make_exam(self.seed, number_of_questions=4, max_score=20)
+        self.questions = make_questions(self.seed, self.exam, 10)
+        self.student = make_student(self.seed, "student1")
+
+        self.client = self.app.test_client()
+        login(self.client, self.student)
+
+    def tearDown(self):
+        clear_question_banks()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def fetch(self):
+        return self.client.get(f"/student/exam/{self.exam.id}/questions").get_json()
+
+    def paper(self, data):
+        return [(q["id"], [o["id"] for o in q["options"]]) for q in data["questions"]]
+
+    def test_refetch_serves_same_paper(self):
+        """Questions and option order are drawn once per student"""
+        first = self.fetch()
+        self.assertEqual(first["total_questions"], 4)
+        for _ in range(3):
+            self.assertEqual(self.paper(self.fetch()), self.paper(first))
+
+        exam_session = ExamSession.query.filter_by(student_id=self.student.id).one()
+        self.assertEqual(
+            exam_session.get_question_order(), [q["id"] for q in first["questions"]]
+        )
+        self.assertEqual(exam_session.time_remaining, 30 * 60)
+
+    def test_save_does_not_replace_manifest(self):
+        """Client-supplied question_order cannot change the recorded manifest"""
+        served = [q["id"] for q in self.fetch()["questions"]]
+        self.client.post(
+            f"/student/exam/{self.exam.id}/session/save",
+            json={
+                "current_question_index": 1,
+                "time_remaining": 100,
+                "answers": {},
+                "question_order": [self.questions[0].id],
+            },
+        )
+        exam_session = ExamSession.query.filter_by(student_id=self.student.id).one()
+        self.assertEqual(exam_session.get_question_order(), served)
+        self.assertEqual(exam_session.current_question_index, 1)
+
+        restored = self.client.get(
+            f"/student/exam/{self.exam.id}/session/restore"
+        ).get_json()
+        self.assertEqual(restored["session"]["question_order"], served)
+
+    def test_submit_only_marks_served_questions(self):
+        """Answers to questions outside the manifest are ignored"""
+        served = [q["id"] for q in self.fetch()["questions"]]
+
+        # Answer every question in the bank correctly
+        answers = {
+            q.id: next(o.id for o in q.options if o.is_correct) for q in self.questions
+        }
+        self.client.post(f"/student/exam/{self.exam.id}/submit", json={"answers": answers})
+
+        record = ExamRecord.query.filter_by(student_id=self.student.id).one()
+        self.assertEqual(record.correct_answers, 4)
+        self.assertEqual(record.total_questions, 4)
+        self.assertEqual(record.raw_score, 20.0)
+        self.assertEqual(set(record.get_answers()), set(served))
+
+    def test_admin_review_reads_manifest(self):
+        """The admin review lists served questions in the student's order"""
+        first = self.fetch()
+        exam_session = ExamSession.query.filter_by(student_id=self.student.id).one()
+
+        admin_client = self.app.test_client()
+        login(admin_client, self.seed["admin"])
+        review = admin_client.get(
+            f"/admin/exam-sessions/{exam_session.id}/review"
+        ).get_json()
+
+        self.assertTrue(review["success"])
+        self.assertEqual(
+            [(q["id"], [o["id"] for o in q["options"]]) for q in review["questions"]],
+            self.paper(first),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test cases for the answer-key based exam scoring engine
+"""
+
+import unittest
+
+from sqlalchemy import event
+
+from helpers import (
+    create_test_app, login, seed_school, make_student, make_exam, make_questions
+)
+from models import db, Permission
+from models.question import Question, Option
+from models.exam_record import ExamRecord
+from models.associations import student_exam
+from routes.student_routes import student_route
+from routes.admin_action_routes import admin_action_route
+from services.question_bank import clear_question_banks, invalidate_question_bank
+from services.exam_scoring import letter_grade_for, score_submission, rescore_exam_records
+
+
+class TestExamScoring(unittest.TestCase):
+    """Test cases for services.exam_scoring"""
+
+    def setUp(self):
+        clear_question_banks()
+        self.app = create_test_app(student_route, admin_action_route)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.exam = make_exam(self.seed, number_of_questions=8, max_score=40)
+        self.questions = make_questions(self.seed, self.exam, 10)
+
+        self.short_answer = Question(
+            question_text="Capital of Nigeria?",
+            question_type="short_answer",
+            correct_answer="Abuja",
+            subject_id=self.seed["subject"].subject_id,
+            teacher_id=self.seed["teacher"].id,
+            class_room_id=self.seed["class_room"].class_room_id,
+            term_id=self.seed["term"].term_id,
+            exam_type_id=self.exam.id,
+        )
+        db.session.add(self.short_answer)
+        db.session.add(Permission(
+            permission_name="show_results_immediately",
+            permission_description="Show results",
+            created_for="student",
+            is_active=True,
+        ))
+        db.session.commit()
+
+    def tearDown(self):
+        clear_question_banks()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def option(self, question, correct):
+        return next(o for o in question.options if o.is_correct == correct)
+
+    def legacy_correct_count(self, answers):
+        """Per-answer Option lookups, as submit_exam used to score"""
+        correct = 0
+        for question in Question.query.all():
+            answer = answers.get(question.id)
+            if not answer:
+                continue
+            if question.question_type in ['mcq', 'true_false']:
+                selected = db.session.get(Option, answer)
+                if selected and selected.is_correct:
+                    correct += 1
+            elif question.question_type == 'short_answer':
+                if answer.lower().strip() == question.correct_answer.lower().strip():
+                    correct += 1
+        return correct
+
+    def sample_answers(self):
+        answers = {}
+        for i, question in enumerate(self.questions[:7]):
+            answers[question.id] = self.option(question, i % 3 != 0).id
+        answers[self.short_answer.id] = "  abuja "
+        return answers
+
+    def test_matches_legacy_scoring(self):
+        """Answer-key scoring gives the same counts as per-option lookups"""
+        answers = self.sample_answers()
+        result = score_submission(self.exam, answers)
+
+        expected = self.legacy_correct_count(answers)
+        self.assertEqual(result.correct_answers, expected)
+        self.assertEqual(result.total_questions, 8)
+        self.assertAlmostEqual(result.score_percentage, expected / 8 * 100)
+        self.assertAlmostEqual(result.raw_score, expected / 8 * 40)
+        self.assertEqual(result.letter_grade, letter_grade_for(result.score_percentage))
+
+    def test_letter_grade_boundaries(self):
+        self.assertEqual(letter_grade_for(70), 'A')
+        self.assertEqual(letter_grade_for(69.99), 'B')
+        self.assertEqual(letter_grade_for(59), 'B')
+        self.assertEqual(letter_grade_for(49), 'C')
+        self.assertEqual(letter_grade_for(40), 'D')
+        self.assertEqual(letter_grade_for(39.9), 'F')
+
+    def test_submit_does_not_query_options(self):
+        """Submitting an exam scores without per-answer option lookups"""
+        student = make_student(self.seed, "student1")
+        answers = self.sample_answers()
+        expected = self.legacy_correct_count(answers)
+
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        client = self.app.test_client()
+        login(client, student)
+        event.listen(db.engine, "before_cursor_execute", before_execute)
+        try:
+            response = client.post(
+                f"/student/exam/{self.exam.id}/submit", json={"answers": answers}
+            )
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_execute)
+
+        data = response.get_json()
+        self.assertTrue(data["success"])
+        self.assertEqual(data["correct_answers"], expected)
+        self.assertEqual(data["total_questions"], 8)
+        self.assertEqual(data["raw_score"], round(expected / 8 * 40, 2))
+
+        option_lookups = [
+            s for s in statements
+            if s.lstrip().upper().startswith("SELECT") and "FROM option" in s
+        ]
+        # Only the one-off batched option load for the question bank snapshot
+        self.assertLessEqual(len(option_lookups), 1)
+
+    def test_rescore_after_key_correction(self):
+        """Fixing the correct option re-scores stored records and student_exam"""
+        student = make_student(self.seed, "student1")
+        question = self.questions[0]
+        wrong = self.option(question, False)
+
+        client = self.app.test_client()
+        login(client, student)
+        client.post(
+            f"/student/exam/{self.exam.id}/submit",
+            json={"answers": {question.id: wrong.id}},
+        )
+        record = ExamRecord.query.filter_by(exam_id=self.exam.id).one()
+        self.assertEqual(record.correct_answers, 0)
+
+        # The teacher marked the wrong option as correct by mistake
+        self.option(question, True).is_correct = False
+        wrong.is_correct = True
+        db.session.commit()
+        invalidate_question_bank(question.subject_id, question.class_room_id)
+
+        stats = rescore_exam_records(self.exam)
+        self.assertEqual(stats, {"total_records": 1, "changed": 1, "unchanged": 0})
+
+        record = db.session.get(ExamRecord, record.id)
+        self.assertEqual(record.correct_answers, 1)
+        self.assertEqual(record.raw_score, 5.0)
+        score = db.session.execute(
+            db.select(student_exam.c.score).where(student_exam.c.student_id == student.id)
+        ).scalar()
+        self.assertEqual(score, 5.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Test cases for the set-based CBT grade sync
+"""
+
+import time
+import unittest
+from datetime import datetime
+
+from sqlalchemy import event
+
+from helpers import (
+    create_test_app, login, seed_school, make_student, make_exam, make_questions
+)
+from models import db
+from models.grade import Grade
+from models.exam_record import ExamRecord
+from models.assessment_type import AssessmentType
+from routes.student_routes import student_route
+from routes.admin_action_routes import admin_action_route
+from services.generate_uuid import generate_uuid
+from services.question_bank import clear_question_banks
+from utils.grade_sync import (
+    sync_all_exam_records, sync_student_exam_records, sync_class_term_if_stale,
+    clear_sync_watermarks
+)
+
+
+class TestGradeSync(unittest.TestCase):
+    """Test cases for utils.grade_sync"""
+
+    def setUp(self):
+        clear_question_banks()
+        clear_sync_watermarks()
+        self.app = create_test_app(student_route, admin_action_route)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        db.session.add_all([
+            AssessmentType(name="First CA", code="first_ca", max_score=20, order=1),
+            AssessmentType(name="Second CA", code="second_ca", max_score=20, order=2),
+            AssessmentType(name="Examination", code="exam", max_score=60, order=3),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        clear_question_banks()
+        clear_sync_watermarks()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_records(self, exam, students, raw_score=12.0, max_score=20.0):
+        rows = [{
+            "id": generate_uuid(),
+            "student_id": student.id,
+            "exam_id": exam.id,
+            "subject_id": exam.subject_id,
+            "class_room_id": exam.class_room_id,
+            "school_term_id": exam.school_term_id,
+            "exam_type": exam.exam_type,
+            "academic_year": "2025-2026",
+            "answers": "{}",
+            "correct_answers": 6,
+            "total_questions": 10,
+            "score_percentage": raw_score / max_score * 100,
+            "raw_score": raw_score,
+            "max_score": max_score,
+            "letter_grade": "B",
+            "started_at": datetime(2025, 10, 1, 9, 0),
+            "submitted_at": datetime(2025, 10, 1, 9, 30),
+        } for student in students]
+        db.session.execute(db.insert(ExamRecord), rows)
+        db.session.commit()
+        return [row["id"] for row in rows]
+
+    def test_creates_grades_with_resolved_assessment(self):
+        """exam_type resolves to an assessment type the same way ilike did"""
+        students = [make_student(self.seed, f"student{i}") for i in range(3)]
+        self.add_records(make_exam(self.seed, exam_type="Exam"), students[:2], 45, 60)
+        self.add_records(make_exam(self.seed, exam_type="first ca"), students[2:])
+        self.add_records(make_exam(self.seed, exam_type="Mid Term Test"), students[:1])
+
+        stats = sync_all_exam_records(None, self.seed["class_room"].class_room_id, None)
+        self.assertEqual(stats, {"total_records": 4, "synced": 4, "updated": 0, "errors": 0})
+
+        grades = {(g.student_id, g.assessment_type): g for g in Grade.query.all()}
+        exam_grade = grades[(students[0].id, "exam")]
+        self.assertEqual(exam_grade.assessment_name, "Examination")
+        self.assertEqual(exam_grade.percentage, 75.0)
+        self.assertEqual(exam_grade.grade_letter, "A")
+        self.assertTrue(exam_grade.is_from_cbt)
+        self.assertEqual(exam_grade.assessment_date.isoformat(), "2025-10-01")
+
+        self.assertEqual(grades[(students[2].id, "first_ca")].assessment_name, "First CA")
+        unmatched = grades[(students[0].id, "mid_term_test")]
+        self.assertEqual(unmatched.assessment_name, "Mid Term Test")
+
+    def test_resync_updates_only_changed_grades(self):
+        """Existing grades count as updated and only changed ones are written"""
+        students = [make_student(self.seed, f"student{i}") for i in range(3)]
+        exam = make_exam(self.seed, exam_type="Second CA")
+        record_ids = self.add_records(exam, students)
+        sync_all_exam_records()
+
+        record = db.session.get(ExamRecord, record_ids[0])
+        record.raw_score = 18.0
+        db.session.commit()
+
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, "before_cursor_execute", before_execute)
+        try:
+            stats = sync_all_exam_records(subject_id=exam.subject_id)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_execute)
+
+        self.assertEqual(stats, {"total_records": 3, "synced": 0, "updated": 3, "errors": 0})
+        writes = [s for s in statements if s[0].lstrip().upper().startswith(("UPDATE", "INSERT"))]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(Grade.query.count(), 3)
+
+        grade = Grade.query.filter_by(exam_record_id=record_ids[0]).one()
+        self.assertEqual(grade.score, 18.0)
+        self.assertEqual(grade.grade_letter, "A")
+
+    def test_student_scope(self):
+        students = [make_student(self.seed, f"student{i}") for i in range(2)]
+        self.add_records(make_exam(self.seed), students)
+
+        stats = sync_student_exam_records(students[0].id)
+        self.assertEqual(stats["total_records"], 1)
+        self.assertEqual(Grade.query.count(), 1)
+
+    def test_thousand_record_term_syncs_quickly(self):
+        """A 1,000-record term syncs in well under a second"""
+        students = []
+        for i in range(200):
+            students.append(make_student(self.seed, f"s{i}"))
+        for exam_type in ["First CA", "Second CA", "Exam", "Quiz", "Project"]:
+            self.add_records(make_exam(self.seed, exam_type=exam_type), students)
+
+        term_id = self.seed["term"].term_id
+        start = time.perf_counter()
+        stats = sync_all_exam_records(term_id=term_id)
+        first_run = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sync_all_exam_records(term_id=term_id)
+        second_run = time.perf_counter() - start
+
+        self.assertEqual(stats["synced"], 1000)
+        self.assertLess(first_run, 1.0)
+        self.assertLess(second_run, 1.0)
+
+    def count_writes(self, func, *args):
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_execute)
+        try:
+            result = func(*args)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_execute)
+        writes = [s for s in statements
+                  if s.lstrip().upper().startswith(("UPDATE", "INSERT", "DELETE"))]
+        return result, len(writes)
+
+    def test_watermark_skips_unchanged_class_term(self):
+        """Read paths only sync when the class's exam records changed"""
+        students = [make_student(self.seed, f"student{i}") for i in range(3)]
+        exam = make_exam(self.seed)
+        self.add_records(exam, students[:2])
+        class_id = self.seed["class_room"].class_room_id
+        term_id = self.seed["term"].term_id
+
+        stats = sync_class_term_if_stale(class_id, term_id)
+        self.assertEqual(stats["synced"], 2)
+
+        result, writes = self.count_writes(sync_class_term_if_stale, class_id, term_id)
+        self.assertIsNone(result)
+        self.assertEqual(writes, 0)
+
+        self.add_records(exam, students[2:])
+        self.assertEqual(sync_class_term_if_stale(class_id, term_id)["synced"], 1)
+        self.assertEqual(Grade.query.count(), 3)
+
+    def test_submit_and_reset_maintain_grade(self):
+        """Submitting creates the grade; resetting the exam removes it"""
+        student = make_student(self.seed, "student1")
+        exam = make_exam(self.seed, exam_type="First CA", max_score=20)
+        questions = make_questions(self.seed, exam, 4)
+
+        client = self.app.test_client()
+        login(client, student)
+        served = client.get(f"/student/exam/{exam.id}/questions").get_json()["questions"]
+        answers = {
+            q.id: next(o.id for o in q.options if o.is_correct) for q in questions
+        }
+        client.post(f"/student/exam/{exam.id}/submit", json={"answers": answers})
+
+        grade = Grade.query.filter_by(student_id=student.id).one()
+        self.assertEqual(grade.assessment_type, "first_ca")
+        self.assertEqual(grade.score, 20.0)
+        self.assertEqual(len(served), 4)
+
+        admin_client = self.app.test_client()
+        login(admin_client, self.seed["admin"])
+        response = admin_client.post(
+            f"/admin/exam/{exam.id}/{student.id}/reset"
+        )
+        self.assertTrue(response.get_json()["success"])
+        self.assertEqual(Grade.query.filter_by(student_id=student.id).count(), 0)
+        self.assertEqual(ExamRecord.query.count(), 0)
+
+    def test_rescore_updates_grades(self):
+        """Re-scoring an exam keeps its CBT grades in step"""
+        from services.exam_scoring import rescore_exam_records
+
+        student = make_student(self.seed, "student1")
+        exam = make_exam(self.seed, max_score=20)
+        make_questions(self.seed, exam, 10)
+        self.add_records(exam, [student])
+        sync_all_exam_records()
+
+        rescore_exam_records(exam)
+        grade = Grade.query.filter_by(student_id=student.id).one()
+        self.assertEqual(grade.score, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
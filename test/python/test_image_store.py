@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test cases for the content-addressed question image store
+"""
+
+import base64
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+
+from docx import Document
+
+from helpers import create_test_app, seed_school, make_exam, make_questions
+from models import db
+from models.question import Option
+from routes.question_image_routes import question_image_routes
+from services.image_store import store_data_uri, store_image
+from utils.math_content_parser import extract_images_from_docx
+from migrations import move_question_images_to_store as migration
+
+
+# A 1x1 transparent PNG
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+PNG_URI = "data:image/png;base64," + base64.b64encode(PNG).decode("ascii")
+PNG_NAME = hashlib.sha256(PNG).hexdigest() + ".png"
+
+
+class TestImageStore(unittest.TestCase):
+    """Test cases for services.image_store and its migration"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.app = create_test_app(question_image_routes, QUESTION_IMAGE_FOLDER=self.folder.name)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.folder.cleanup()
+
+    def test_same_image_is_stored_once(self):
+        first = store_data_uri(PNG_URI)
+        self.assertEqual(first, "/question-images/" + PNG_NAME)
+        self.assertEqual(store_image(PNG, "image/png"), first)
+        self.assertEqual(os.listdir(self.folder.name), [PNG_NAME])
+
+    def test_docx_images_are_stored(self):
+        doc = Document()
+        doc.add_paragraph().add_run().add_picture(io.BytesIO(PNG))
+        doc.add_paragraph().add_run().add_picture(io.BytesIO(PNG))
+
+        images = extract_images_from_docx(doc)
+        self.assertEqual(set(images.values()), {"/question-images/" + PNG_NAME})
+        self.assertEqual(os.listdir(self.folder.name), [PNG_NAME])
+
+    def test_other_values_pass_through(self):
+        self.assertIsNone(store_data_uri(None))
+        self.assertEqual(store_data_uri("/question-images/x.png"), "/question-images/x.png")
+        svg = "data:image/svg+xml;base64,PHN2Zy8+"
+        self.assertEqual(store_data_uri(svg), svg)
+        self.assertEqual(os.listdir(self.folder.name), [])
+
+    def test_images_are_served_immutable(self):
+        url = store_data_uri(PNG_URI)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, PNG)
+        self.assertEqual(response.mimetype, "image/png")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        self.assertIn("max-age=31536000", response.headers["Cache-Control"])
+
+        self.assertEqual(self.client.get("/question-images/../secret.png").status_code, 404)
+        self.assertEqual(self.client.get("/question-images/notahash.png").status_code, 404)
+
+    def test_migration_extracts_inline_images(self):
+        seed = seed_school()
+        exam = make_exam(seed)
+        questions = make_questions(seed, exam, 3)
+        for question in questions:
+            question.question_image = PNG_URI
+        option = Option.query.filter_by(question_id=questions[0].id).first()
+        option.option_image = PNG_URI
+        db.session.commit()
+
+        self.assertEqual(migration.upgrade(),
+                         {"questions.question_image": 3, "options.option_image": 1})
+        db.session.expire_all()
+        self.assertEqual({q.question_image for q in questions}, {"/question-images/" + PNG_NAME})
+        self.assertEqual(option.option_image, "/question-images/" + PNG_NAME)
+        self.assertEqual(os.listdir(self.folder.name), [PNG_NAME])
+
+        # Running again finds nothing left inline
+        self.assertEqual(set(migration.upgrade().values()), {0})
+
+        migration.downgrade()
+        db.session.expire_all()
+        self.assertEqual(option.option_image, PNG_URI)
+
+
+if __name__ == '__main__':
+    unittest.main()
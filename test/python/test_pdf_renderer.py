@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test cases for parallel PDF rendering of report batches
+"""
+
+import io
+import threading
+import time
+import unittest
+
+from pypdf import PdfReader
+
+from helpers import create_test_app, login, seed_school, make_student
+from models import db
+from models.student import Student
+from routes import report_routes
+from services import pdf_renderer
+from services.class_ranking import clear_class_rankings
+from services.pdf_renderer import render_documents, PDFRenderError
+
+
+def document(text):
+    return f"<html><body><p>{text}</p></body></html>"
+
+
+def render_or_fail(html_documents):
+    """Test engine: fails on BAD documents, hangs on SLOW ones and takes a
+    few seconds over WAIT ones
+
+    Module-level, so the spawned workers can import it by name.
+    """
+    if any("BAD" in html for html in html_documents):
+        raise ValueError("broken report")
+    if any("SLOW" in html for html in html_documents):
+        time.sleep(60)
+    if any("WAIT" in html for html in html_documents):
+        time.sleep(5)
+    return pdf_renderer.render_xhtml2pdf(html_documents)
+
+
+def page_texts(pdf):
+    return [page.extract_text().strip() for page in PdfReader(io.BytesIO(pdf)).pages]
+
+
+class TestPDFRenderer(unittest.TestCase):
+    """Test cases for services.pdf_renderer"""
+
+    def test_chunks_merge_in_order(self):
+        docs = [document(f"Student {i}") for i in range(7)]
+        result = render_documents(docs, engine="xhtml2pdf", chunk_size=3, max_workers=2)
+
+        self.assertEqual(result.failed, [])
+        self.assertEqual(page_texts(result.pdf), [f"Student {i}" for i in range(7)])
+
+    def test_pool_is_shared_between_downloads(self):
+        render_documents([document("First")], engine="xhtml2pdf", max_workers=2)
+        pool = pdf_renderer._pool
+        render_documents([document("Second")], engine="xhtml2pdf", max_workers=2)
+
+        self.assertIsNotNone(pool)
+        self.assertIs(pdf_renderer._pool, pool)
+
+    def test_documents_are_read_a_chunk_at_a_time(self):
+        read = []
+
+        def docs():
+            for i in range(6):
+                read.append(i)
+                yield document(f"Student {i}")
+
+        seen = []
+        result = render_documents(docs(), engine="xhtml2pdf", chunk_size=2, max_workers=1,
+                                  progress=lambda done: seen.append(len(read)))
+
+        self.assertEqual(seen, [2, 4, 6])
+        self.assertEqual(page_texts(result.pdf), [f"Student {i}" for i in range(6)])
+
+    def test_bad_report_is_left_out(self):
+        """A failing document is isolated without dropping its chunk-mates"""
+        docs = [document(f"Student {i}") for i in range(6)]
+        docs[4] = document("BAD")
+        result = render_documents(
+            docs, engine=render_or_fail, chunk_size=3, max_workers=2, retries=1
+        )
+
+        self.assertEqual(result.failed, [4])
+        self.assertEqual(
+            page_texts(result.pdf), [f"Student {i}" for i in range(6) if i != 4]
+        )
+
+    def test_hung_chunk_times_out(self):
+        docs = [document("Student 0"), document("SLOW"), document("Student 2")]
+        start = time.perf_counter()
+        result = render_documents(
+            docs, engine=render_or_fail, chunk_size=1, max_workers=3, timeout=10, retries=0
+        )
+
+        self.assertLess(time.perf_counter() - start, 25)
+        self.assertEqual(result.failed, [1])
+        self.assertEqual(page_texts(result.pdf), ["Student 0", "Student 2"])
+
+    def test_hung_chunks_time_out_together(self):
+        """Each chunk has its own deadline; they are not waited on one after another"""
+        docs = [document("SLOW"), document("SLOW"), document("Student 2")]
+        # Start the workers first, so only rendering is timed
+        render_documents([document("Warm")] * 3, engine="xhtml2pdf", chunk_size=1, max_workers=3)
+        timeout = 8
+        start = time.perf_counter()
+        result = render_documents(
+            docs, engine=render_or_fail, chunk_size=1, max_workers=3, timeout=timeout, retries=0
+        )
+
+        # Waiting on the stuck chunks one after another takes two timeouts
+        self.assertLess(time.perf_counter() - start, 2 * timeout)
+        self.assertEqual(result.failed, [0, 1])
+        self.assertEqual(page_texts(result.pdf), ["Student 2"])
+
+    def test_other_downloads_survive_a_terminated_pool(self):
+        """Chunks lost when another download terminates the pool are resubmitted"""
+        render_documents([document("Warm")] * 2, engine="xhtml2pdf", chunk_size=1, max_workers=2)
+        results = []
+        other = threading.Thread(target=lambda: results.append(render_documents(
+            [document("WAIT")], engine=render_or_fail, max_workers=2, timeout=60, retries=0
+        )))
+        other.start()
+        time.sleep(0.5)
+
+        with self.assertRaises(PDFRenderError):
+            render_documents([document("SLOW")], engine=render_or_fail, max_workers=2,
+                             timeout=2, retries=0)
+        other.join(60)
+
+        self.assertEqual(results[0].failed, [])
+        self.assertEqual(page_texts(results[0].pdf), ["WAIT"])
+
+    def test_nothing_rendered_raises(self):
+        with self.assertRaises(PDFRenderError):
+            render_documents([document("BAD")], engine=render_or_fail, retries=0)
+
+
+class TestClassPDFDownload(unittest.TestCase):
+    """Test cases for the class report PDF download"""
+
+    def setUp(self):
+        clear_class_rankings()
+        self.app = create_test_app(
+            lambda app: app.register_blueprint(report_routes.report_bp),
+            REPORT_PDF_WORKERS=2,
+            REPORT_PDF_CHUNK_SIZE=2,
+        )
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        for i in range(3):
+            user = make_student(self.seed, f"student{i}")
+            db.session.add(Student(user_id=user.id, admission_number=f"ADM{i}"))
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        login(self.client, self.seed["admin"])
+
+    def tearDown(self):
+        clear_class_rankings()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    @unittest.skipIf(report_routes.WEASYPRINT_AVAILABLE, "xhtml2pdf path only")
+    @unittest.skipUnless(report_routes.XHTML2PDF_AVAILABLE, "xhtml2pdf is not installed")
+    def test_class_pdf_has_one_report_per_student(self):
+        response = self.client.post("/reports/api/download-class-pdf", json={
+            "class_room_id": self.seed["class_room"].class_room_id,
+            "term_id": self.seed["term"].term_id,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/pdf")
+        self.assertNotIn("X-Failed-Reports", response.headers)
+        texts = page_texts(response.data)
+        for i in range(3):
+            self.assertEqual(sum(f"STUDENT{i}" in text for text in texts), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
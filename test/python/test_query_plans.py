@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Query plan regression tests for the hot tables
+
+Seeds a school-sized volume of grades, questions, exam sessions, exam
+records and attendance, then checks with EXPLAIN QUERY PLAN that each query
+the routes run on them is answered from an index rather than a table scan.
+"""
+
+import unittest
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+from helpers import create_test_app
+from models import db
+from models.attendance import Attendance
+from models.exam_record import ExamRecord
+from models.exam_session import ExamSession
+from models.grade import Grade
+from models.question import Question
+from migrations import add_hot_table_indexes as migration
+
+
+STUDENTS = 300
+SUBJECTS = 12
+CLASSES = 6
+TERMS = 3
+DAYS = 40
+
+
+def ids(prefix, count):
+    return [f"{prefix}-{i}" for i in range(count)]
+
+
+class TestQueryPlans(unittest.TestCase):
+    """EXPLAIN QUERY PLAN checks for the composite indexes"""
+
+    explained = 0
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+        students = ids("student", STUDENTS)
+        subjects = ids("subject", SUBJECTS)
+        classes = ids("class", CLASSES)
+        terms = ids("term", TERMS)
+        cls.student, cls.subject, cls.class_room, cls.term = (
+            students[7], subjects[3], classes[7 % CLASSES], terms[1])
+
+        db.session.execute(insert(Grade), [
+            {"student_id": student, "subject_id": subject, "class_room_id": classes[s % CLASSES],
+             "term_id": term, "assessment_type": assessment, "score": 10.0,
+             "academic_session": "2025-2026"}
+            for s, student in enumerate(students)
+            for subject in subjects
+            for term in terms
+            for assessment in ("ca", "exam")
+        ])
+        db.session.execute(insert(Question), [
+            {"question_text": f"Question {n}", "question_type": "mcq", "subject_id": subject,
+             "teacher_id": "teacher", "class_room_id": class_room, "term_id": terms[0],
+             "exam_type_id": f"exam-{subject}-{class_room}"}
+            for subject in subjects
+            for class_room in classes
+            for n in range(30)
+        ])
+        db.session.execute(insert(ExamSession), [
+            {"student_id": student, "exam_id": f"exam-{subject}", "time_remaining": 600,
+             "is_active": False, "is_completed": True}
+            for student in students
+            for subject in subjects
+        ])
+        db.session.execute(insert(ExamRecord), [
+            {"student_id": student, "exam_id": f"exam-{subject}", "subject_id": subject,
+             "class_room_id": classes[s % CLASSES], "school_term_id": term,
+             "exam_type": "Exam", "academic_year": "2025/2026", "answers": "{}",
+             "correct_answers": 5, "total_questions": 10, "score_percentage": 50.0,
+             "raw_score": 30.0, "max_score": 60.0, "letter_grade": "C"}
+            for s, student in enumerate(students)
+            for subject in subjects
+            for term in terms
+        ])
+        first_day = date(2025, 9, 1)
+        db.session.execute(insert(Attendance), [
+            {"student_id": student, "class_room_id": classes[s % CLASSES],
+             "attendance_date": first_day + timedelta(days=day)}
+            for s, student in enumerate(students)
+            for day in range(DAYS)
+        ])
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+        cls.day = first_day + timedelta(days=11)
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.app_context.pop()
+
+    def plan(self, query):
+        """EXPLAIN QUERY PLAN details for an ORM query"""
+        compiled = query.statement.compile(db.engine)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        # sqlite3 caches prepared statements and an EXPLAIN is never prepared
+        # again after a schema change, so each one gets a text of its own
+        TestQueryPlans.explained += 1
+        rows = db.session.connection().exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled} -- {self.explained}", params).fetchall()
+        return [row[-1] for row in rows]
+
+    def assertUsesIndex(self, query, index):
+        details = self.plan(query)
+        self.assertTrue(any(index in detail for detail in details), details)
+        self.assertFalse(any(detail.startswith("SCAN") for detail in details), details)
+
+    def hot_queries(self):
+        """(query, index) for each lookup the routes and services run"""
+        return [
+            # Student report card
+            (Grade.query.filter_by(student_id=self.student, term_id=self.term,
+                                   class_room_id=self.class_room),
+             "ix_grade_student_term_class"),
+            # Score sheet for a subject
+            (Grade.query.filter_by(subject_id=self.subject, class_room_id=self.class_room,
+                                   term_id=self.term),
+             "ix_grade_class_term_subject"),
+            # Class reports
+            (Grade.query.filter_by(term_id=self.term, class_room_id=self.class_room),
+             "ix_grade_class_term_subject"),
+            # Question bank and question counts
+            (Question.query.filter_by(subject_id=self.subject, class_room_id=self.class_room),
+             "ix_questions_subject_class"),
+            # Active exam session
+            (ExamSession.query.filter_by(student_id=self.student, exam_id="exam-subject-3",
+                                         is_active=True, is_completed=False),
+             "ix_exam_sessions_student_exam_active"),
+            # CBT scores for a subject
+            (ExamRecord.query.filter_by(subject_id=self.subject, class_room_id=self.class_room,
+                                        school_term_id=self.term),
+             "ix_exam_records_subject_class_term"),
+            # Class register for a day, and one student's mark
+            (Attendance.query.filter_by(class_room_id=self.class_room, attendance_date=self.day),
+             "ix_attendance_class_date_student"),
+            (Attendance.query.filter_by(student_id=self.student, class_room_id=self.class_room,
+                                        attendance_date=self.day),
+             "ix_attendance_class_date_student"),
+        ]
+
+    def test_hot_queries_use_an_index(self):
+        for query, index in self.hot_queries():
+            with self.subTest(index=index, query=str(query.statement)):
+                self.assertUsesIndex(query, index)
+
+    def test_migration_matches_models(self):
+        declared = {
+            (index.name, table.name, tuple(column.name for column in index.columns))
+            for table in db.metadata.tables.values()
+            for index in table.indexes
+            if index.name.startswith("ix_")
+        }
+        self.assertEqual(declared, set(migration.INDEXES))
+
+    def test_migration_downgrade_and_upgrade(self):
+        try:
+            migration.downgrade()
+            details = self.plan(Grade.query.filter_by(
+                student_id=self.student, term_id=self.term, class_room_id=self.class_room))
+            self.assertTrue(any(detail.startswith("SCAN") for detail in details), details)
+        finally:
+            migration.upgrade()
+
+        for query, index in self.hot_queries():
+            with self.subTest(index=index):
+                self.assertUsesIndex(query, index)
+        # Upgrading an up-to-date database changes nothing
+        migration.upgrade()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test cases for the per-request query profiler
+"""
+
+import unittest
+
+from flask import jsonify
+
+from helpers import create_test_app, login, seed_school
+from models import db
+from models.subject import Subject
+from routes.admin_action_routes import admin_action_route
+from utils.query_profiler import fingerprint, query_profiler
+
+
+def demo_routes(app):
+    @app.route("/demo/n-plus-one")
+    def n_plus_one():
+        ids = [subject.subject_id for subject in Subject.query.all()]
+        # One lookup per row: the pattern the profiler should flag
+        names = [db.session.query(Subject.subject_name).filter_by(subject_id=i).scalar()
+                 for i in ids * 3]
+        return jsonify(names=names)
+
+    @app.route("/demo/batched")
+    def batched():
+        return jsonify(names=[s.subject_name for s in Subject.query.all()])
+
+
+class TestQueryProfiler(unittest.TestCase):
+    """Test cases for utils.query_profiler"""
+
+    def setUp(self):
+        self.app = create_test_app(
+            admin_action_route, demo_routes,
+            QUERY_PROFILER=True,
+            QUERY_PROFILER_N1_THRESHOLD=3,
+        )
+        query_profiler.init_app(self.app)
+        query_profiler.reset()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        db.session.add(Subject(subject_name="English"))
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        login(self.client, self.seed["admin"])
+
+    def tearDown(self):
+        query_profiler.reset()
+        query_profiler.enabled = False
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def endpoint(self, report, name):
+        return next(e for e in report["endpoints"] if e["endpoint"] == name)
+
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(
+            fingerprint("SELECT *\n  FROM grade WHERE id IN (?, ?, ?)"),
+            fingerprint("SELECT * FROM grade WHERE id IN (?)"),
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM grade WHERE id IN (__[POSTCOMPILE_id_1])"),
+            "SELECT * FROM grade WHERE id IN (?)",
+        )
+
+    def test_server_timing_header(self):
+        response = self.client.get("/demo/batched")
+        timing = response.headers["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="1 queries", app;dur=[\d.]+$')
+
+    def test_n_plus_one_is_flagged(self):
+        with self.assertLogs("utils.query_profiler", level="WARNING"):
+            self.client.get("/demo/n-plus-one")
+        self.client.get("/demo/n-plus-one")
+        self.client.get("/demo/batched")
+
+        report = self.client.get("/admin/perf").get_json()
+        self.assertTrue(report["success"])
+        self.assertEqual(report["endpoints"][0]["endpoint"], "n_plus_one")
+
+        slow = self.endpoint(report, "n_plus_one")
+        self.assertEqual(slow["requests"], 2)
+        self.assertEqual(slow["max_queries"], 7)
+        self.assertEqual(len(slow["n_plus_one"]), 1)
+        self.assertEqual(slow["n_plus_one"][0]["requests"], 2)
+        self.assertIn("subject.subject_name", slow["n_plus_one"][0]["statement"])
+        self.assertEqual(slow["repeated_statements"][0]["max_per_request"], 6)
+
+        fast = self.endpoint(report, "batched")
+        self.assertEqual((fast["queries"], fast["n_plus_one"]), (1, []))
+
+    def test_reset(self):
+        self.client.get("/demo/batched")
+        self.assertEqual(self.client.delete("/admin/perf").status_code, 200)
+        endpoints = self.client.get("/admin/perf").get_json()["endpoints"]
+        self.assertNotIn("batched", [e["endpoint"] for e in endpoints])
+
+    def test_perf_is_admin_only(self):
+        other = self.app.test_client()
+        login(other, self.seed["teacher"])
+        self.assertEqual(other.get("/admin/perf").status_code, 302)
+
+    def test_disabled_profiler_adds_nothing(self):
+        app = create_test_app(demo_routes)
+        query_profiler.init_app(app)
+        with app.app_context():
+            db.create_all()
+            response = app.test_client().get("/demo/batched")
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertEqual(query_profiler.report()["endpoints"], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test cases for the cached exam question bank snapshot
+"""
+
+import unittest
+
+from sqlalchemy import event
+
+from helpers import (
+    create_test_app, login, seed_school, make_student, make_exam, make_questions
+)
+from models import db
+from routes.student_routes import student_route
+from routes.admin_action_routes import admin_action_route
+from services.question_bank import clear_question_banks, get_exam_question_bank
+
+
+class TestQuestionBank(unittest.TestCase):
+    """Test cases for services.question_bank"""
+
+    def setUp(self):
+        clear_question_banks()
+        self.app = create_test_app(student_route, admin_action_route)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.exam = make_exam(self.seed, number_of_questions=5)
+        self.questions = make_questions(self.seed, self.exam, 8)
+        self.students = [make_student(self.seed, f"student{i}") for i in range(3)]
+
+    def tearDown(self):
+        clear_question_banks()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def fetch_questions(self, user):
+        client = self.app.test_client()
+        login(client, user)
+        return client.get(f"/student/exam/{self.exam.id}/questions")
+
+    def count_bank_queries(self, func):
+        """Count SELECTs against the question/option tables while func runs."""
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db.engine
+        event.listen(engine, "before_cursor_execute", before_execute)
+        try:
+            func()
+        finally:
+            event.remove(engine, "before_cursor_execute", before_execute)
+        return [
+            s for s in statements
+            if s.lstrip().upper().startswith("SELECT")
+            and ("FROM question" in s or "FROM option" in s)
+        ]
+
+    def test_snapshot_served_without_bank_queries(self):
+        """Only the first student pays for loading the question bank"""
+        first = self.count_bank_queries(lambda: self.fetch_questions(self.students[0]))
+        self.assertEqual(len(first), 2)  # questions + batched options
+
+        second = self.count_bank_queries(lambda: self.fetch_questions(self.students[1]))
+        self.assertEqual(second, [])
+
+    def test_sampling_and_option_shape(self):
+        """number_of_questions limits the selection and every option is served"""
+        response = self.fetch_questions(self.students[0])
+        data = response.get_json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(data["total_questions"], 5)
+        bank_ids = {q.id for q in self.questions}
+        for question in data["questions"]:
+            self.assertIn(question["id"], bank_ids)
+            self.assertEqual(len(question["options"]), 4)
+            self.assertEqual(
+                sorted(o["order"] for o in question["options"]), [0, 1, 2, 3]
+            )
+            self.assertEqual(sum(o["is_correct"] for o in question["options"]), 1)
+
+    def test_update_invalidates_snapshot(self):
+        """Editing a question through the admin API refreshes the snapshot"""
+        get_exam_question_bank(self.exam)
+
+        client = self.app.test_client()
+        login(client, self.seed["admin"])
+        response = client.put(
+            f"/admin/questions/{self.questions[0].id}",
+            json={"question_text": "Edited question"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        texts = {q.id: q.question_text for q in get_exam_question_bank(self.exam)}
+        self.assertEqual(texts[self.questions[0].id], "Edited question")
+
+    def test_delete_invalidates_snapshot(self):
+        """Deleting a question through the admin API removes it from the snapshot"""
+        self.assertEqual(len(get_exam_question_bank(self.exam)), 8)
+
+        client = self.app.test_client()
+        login(client, self.seed["admin"])
+        response = client.delete(f"/admin/questions/{self.questions[0].id}")
+        self.assertEqual(response.status_code, 200)
+
+        bank = get_exam_question_bank(self.exam)
+        self.assertEqual(len(bank), 7)
+        self.assertNotIn(self.questions[0].id, {q.id for q in bank})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Test cases for the batched question import
+"""
+
+import io
+import json
+import unittest
+from unittest import mock
+
+from sqlalchemy import event
+
+from helpers import create_test_app, login, seed_school, make_exam
+from models import db
+from models.associations import teacher_subject
+from models.question import Question, Option
+from routes.admin_action_routes import admin_action_route
+from routes.staff_routes import staff_routes
+from services import question_import
+from services.question_import import import_questions
+from utils.question_parser import iter_questions_file
+
+
+def mcq(text, **fields):
+    return {
+        "question_text": text,
+        "question_type": "mcq",
+        "options": [{"text": "Yes", "is_correct": True}, {"text": "No", "is_correct": False}],
+        **fields,
+    }
+
+
+class TestQuestionImport(unittest.TestCase):
+    """Test cases for services.question_import"""
+
+    def setUp(self):
+        self.app = create_test_app(admin_action_route, staff_routes)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.exam = make_exam(self.seed)
+        self.defaults = {
+            "subject_id": self.seed["subject"].subject_id,
+            "class_room_id": self.seed["class_room"].class_room_id,
+            "term_id": self.seed["term"].term_id,
+            "exam_type_id": self.exam.id,
+        }
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def rows(self, questions):
+        return ((number, q, None) for number, q in enumerate(questions, 1))
+
+    def count_statements(self, func):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            result = func()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        return result, statements
+
+    def test_batches_use_a_fixed_number_of_statements(self):
+        questions = [mcq(f"Question {i}") for i in range(250)]
+        result, statements = self.count_statements(
+            lambda: import_questions(self.rows(questions), self.defaults, batch_size=100))
+
+        self.assertEqual((result.created, result.errors), (250, []))
+        self.assertEqual(Question.query.count(), 250)
+        self.assertEqual(Option.query.count(), 500)
+
+        inserts = [s for s in statements if s.startswith("INSERT")]
+        selects = [s for s in statements if s.startswith("SELECT")]
+        # One question and one option INSERT per batch of 100
+        self.assertEqual(len(inserts), 6)
+        # References are read for the first batch only
+        self.assertLessEqual(len(selects), 6)
+
+        question = Question.query.filter_by(question_text="Question 7").one()
+        self.assertEqual(question.teacher_id, self.seed["teacher"].id)
+        self.assertEqual([o.text for o in sorted(question.options, key=lambda o: o.order)],
+                         ["Yes", "No"])
+
+    def test_errors_are_reported_per_row(self):
+        questions = [
+            mcq("Fine"),
+            mcq(""),
+            {"question_text": "No options", "question_type": "mcq", "options": []},
+            mcq("Unknown exam", exam_type_id="missing"),
+            {"question_text": "Essay", "question_type": "essay"},
+            {"question_text": "Capital of France?", "question_type": "short_answer",
+             "correct_answer": "Paris"},
+        ]
+        result = import_questions(self.rows(questions), self.defaults, batch_size=2)
+        body = result.to_dict()
+
+        self.assertEqual(body["created_count"], 2)
+        self.assertEqual([e["row"] for e in body["row_errors"]], [2, 3, 4, 5])
+        self.assertEqual(body["errors"][0], "Question 2: Question text is required")
+        self.assertEqual(body["row_errors"][2]["message"], "Invalid exam")
+        self.assertEqual(body["throughput"]["rows"], 6)
+        self.assertEqual(
+            Question.query.filter_by(question_type="short_answer").one().correct_answer, "Paris")
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        import_questions(self.rows([mcq("One")]), self.defaults)
+        existing_id = Question.query.first().id
+
+        # Reusing an existing question id makes the batch INSERT fail
+        ids = iter([existing_id, "option-1", "option-2", "question-2", "option-3", "option-4"])
+        with mock.patch.object(question_import, "generate_uuid", lambda: next(ids)):
+            result = import_questions(self.rows([mcq("Clash"), mcq("Fine")]), self.defaults)
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors[0][0], 1)
+        self.assertIn("Error creating question", result.errors[0][1])
+        self.assertEqual(Question.query.filter_by(question_text="Fine").count(), 1)
+
+    def test_admin_upload_uses_form_defaults(self):
+        login(self.client, self.seed["admin"])
+        response = self.client.post("/admin/bulk_upload_questions", json={
+            "questions": [mcq("From the form"), mcq("Other class", class_room_id="nowhere")],
+            **self.defaults,
+        })
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body["created_count"], 1)
+        self.assertEqual(body["errors"], ["Question 2: Invalid class"])
+
+    def test_staff_csv_upload(self):
+        teacher = self.seed["teacher"]
+        db.session.execute(teacher_subject.insert().values(
+            teacher_id=teacher.id,
+            subject_id=self.seed["subject"].subject_id,
+            class_room_id=self.seed["class_room"].class_room_id,
+        ))
+        db.session.commit()
+        login(self.client, teacher)
+
+        csv_file = (
+            "question_text,question_type,options,correct_answer\n"
+            "2 + 2?,mcq,\"[\"\"3\"\", \"\"4\"\"]\",1\n"
+            "Sky colour?,short_answer,,blue\n"
+            ",mcq,[],0\n"
+        )
+        response = self.client.post(
+            f"/staff/bulk_upload_questions/{teacher.id}",
+            data={
+                "file": (io.BytesIO(csv_file.encode()), "questions.csv"),
+                **self.defaults,
+            },
+        )
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200, body)
+        self.assertEqual(body["created_count"], 2)
+        self.assertEqual(body["errors"], ["Question 3: Question text is required"])
+        option = Option.query.filter_by(text="4").one()
+        self.assertTrue(option.is_correct)
+
+    def test_json_file_is_read_as_rows(self):
+        content = json.dumps([
+            {"question_text": "Q1", "options": ["a", "b"], "answer": 1},
+            {"question_text": "Q2", "question_type": "short_answer", "correct_answer": "x"},
+        ])
+        rows = list(iter_questions_file(content.encode(), "json"))
+        self.assertEqual([number for number, _, _ in rows], [1, 2])
+        self.assertTrue(rows[0][1]["options"][1]["is_correct"])
+        with self.assertRaises(ValueError):
+            list(iter_questions_file(b"{}", "json"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test cases for the dry-run question upload preview
+"""
+
+import io
+import json
+import unittest
+from unittest import mock
+
+from docx import Document
+
+from helpers import create_test_app, login, make_user, seed_school, make_exam
+from models import db
+from models.associations import teacher_subject
+from models.question import Question
+from routes.admin_action_routes import admin_action_route
+from routes.staff_routes import staff_routes
+from services.question_preview import question_preview_store
+
+
+def mcq(text):
+    return {
+        "question_text": text,
+        "question_type": "mcq",
+        "options": [{"text": "Yes", "is_correct": True}, {"text": "No", "is_correct": False}],
+    }
+
+
+def word_file():
+    doc = Document()
+    doc.add_paragraph("Question: Capital of France?")
+    doc.add_paragraph("Type: Short Answer")
+    doc.add_paragraph("Answer: Paris")
+    doc.add_paragraph("Question: The Earth is flat.")
+    doc.add_paragraph("Type: True/False")
+    doc.add_paragraph("Options:")
+    doc.add_paragraph("- True")
+    doc.add_paragraph("- *False")
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+class TestQuestionPreview(unittest.TestCase):
+    """Test cases for services.question_preview and its routes"""
+
+    def setUp(self):
+        self.app = create_test_app(admin_action_route, staff_routes)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.exam = make_exam(self.seed)
+        self.defaults = {
+            "subject_id": self.seed["subject"].subject_id,
+            "class_room_id": self.seed["class_room"].class_room_id,
+            "term_id": self.seed["term"].term_id,
+            "exam_type_id": self.exam.id,
+        }
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_admin_preview_pages_then_imports_by_token(self):
+        login(self.client, self.seed["admin"])
+        questions = [mcq(f"Question {i}") for i in range(1, 121)]
+        questions[9]["question_text"] = ""
+        questions[109]["options"] = []
+
+        response = self.client.post("/admin/questions_preview/upload?limit=50",
+                                    json={"questions": questions, **self.defaults})
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((body["total"], body["valid_count"], body["error_count"]), (120, 118, 2))
+        self.assertEqual(len(body["questions"]), 50)
+        self.assertEqual(body["next_offset"], 50)
+        self.assertEqual(body["questions"][9]["error"], "Question text is required")
+        # Nothing is written by the preview
+        self.assertEqual(Question.query.count(), 0)
+
+        page = self.client.get(f"/admin/questions_preview/{body['token']}?offset=100&limit=50")
+        page = page.get_json()
+        self.assertEqual([item["row"] for item in page["questions"]], list(range(101, 121)))
+        self.assertIsNone(page["next_offset"])
+        self.assertFalse(page["questions"][9]["valid"])
+
+        response = self.client.post("/admin/bulk_upload_questions",
+                                    json={"preview_token": body["token"]})
+        result = response.get_json()
+        self.assertEqual(result["created_count"], 118)
+        self.assertEqual(Question.query.count(), 118)
+
+        # A preview is imported once
+        response = self.client.post("/admin/bulk_upload_questions",
+                                    json={"preview_token": body["token"]})
+        self.assertEqual(response.status_code, 404)
+
+    def test_staff_preview_streams_and_import_skips_the_parser(self):
+        teacher = self.seed["teacher"]
+        db.session.execute(teacher_subject.insert().values(
+            teacher_id=teacher.id,
+            subject_id=self.seed["subject"].subject_id,
+            class_room_id=self.seed["class_room"].class_room_id,
+        ))
+        db.session.commit()
+        login(self.client, teacher)
+
+        csv_file = "question_text,question_type,options,correct_answer\n" + "".join(
+            f"Question {i}?,mcq,\"[\"\"a\"\", \"\"b\"\"]\",0\n" for i in range(250)
+        ) + ",mcq,[],0\n"
+        response = self.client.post(
+            "/staff/questions_preview/upload?format=ndjson",
+            data={"file": (io.BytesIO(csv_file.encode()), "questions.csv"), **self.defaults},
+        )
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        token = lines[0]["preview"]["token"]
+        rows = lines[1:-1]
+        self.assertEqual(len(rows), 251)
+        self.assertEqual(rows[-1]["error"], "Question text is required")
+        self.assertEqual(lines[-1]["summary"]["valid_count"], 250)
+        self.assertTrue(lines[-1]["summary"]["complete"])
+
+        with mock.patch("utils.question_parser.iter_questions_file") as parser:
+            response = self.client.post(f"/staff/bulk_upload_questions/{teacher.id}",
+                                        data={"preview_token": token})
+        parser.assert_not_called()
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200, body)
+        self.assertEqual(body["created_count"], 250)
+        self.assertEqual(Question.query.filter_by(teacher_id=teacher.id).count(), 250)
+
+    def test_previews_belong_to_their_uploader(self):
+        login(self.client, self.seed["admin"])
+        body = self.client.post("/admin/questions_preview/upload",
+                                json={"questions": [mcq("Mine")], **self.defaults}).get_json()
+
+        other = make_user("otheradmin", role="admin")
+        db.session.commit()
+        login(self.client, other)
+        response = self.client.get(f"/admin/questions_preview/{body['token']}")
+        self.assertEqual(response.status_code, 404)
+
+    def test_preview_is_claimed_once(self):
+        """A double-submitted import finds the preview already taken"""
+        login(self.client, self.seed["admin"])
+        body = self.client.post("/admin/questions_preview/upload",
+                                json={"questions": [mcq("Once")], **self.defaults}).get_json()
+        user_id = self.seed["admin"].id
+
+        self.assertIsNotNone(question_preview_store.claim(body["token"], user_id))
+        self.assertIsNone(question_preview_store.claim(body["token"], user_id))
+
+    def test_failed_import_keeps_the_preview(self):
+        login(self.client, self.seed["admin"])
+        body = self.client.post("/admin/questions_preview/upload",
+                                json={"questions": [mcq("Retry")], **self.defaults}).get_json()
+
+        with mock.patch("routes.admin_action_routes.import_questions",
+                        side_effect=RuntimeError("database is locked")):
+            response = self.client.post("/admin/bulk_upload_questions",
+                                        json={"preview_token": body["token"]})
+        self.assertEqual(response.status_code, 500)
+
+        response = self.client.post("/admin/bulk_upload_questions",
+                                    json={"preview_token": body["token"]})
+        self.assertEqual(response.get_json()["created_count"], 1)
+
+    def test_admin_word_upload_matches_preview(self):
+        """A Word file imported directly reads the same questions the preview shows"""
+        login(self.client, self.seed["admin"])
+        preview = self.client.post(
+            "/admin/questions_preview/upload",
+            data={"file": (io.BytesIO(word_file()), "questions.docx"), **self.defaults},
+        ).get_json()
+        response = self.client.post(
+            "/admin/bulk_upload_questions",
+            data={"file": (io.BytesIO(word_file()), "questions.docx"), **self.defaults},
+        )
+
+        self.assertEqual(response.get_json()["created_count"], preview["valid_count"])
+        self.assertEqual(
+            sorted(question.question_text for question in Question.query),
+            sorted(item["question"]["question_text"] for item in preview["questions"]),
+        )
+
+    def test_expired_preview_is_gone(self):
+        login(self.client, self.seed["admin"])
+        body = self.client.post("/admin/questions_preview/upload",
+                                json={"questions": [mcq("Old")], **self.defaults}).get_json()
+        self.app.config["QUESTION_PREVIEW_TTL"] = -1
+        self.assertIsNone(question_preview_store.get(body["token"], self.seed["admin"].id))
+
+    def test_unreadable_file_fails_before_streaming(self):
+        login(self.client, self.seed["admin"])
+        response = self.client.post(
+            "/admin/questions_preview/upload?format=ndjson",
+            data={"file": (io.BytesIO(b"{}"), "questions.json"), **self.defaults},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("array", response.get_json()["message"])
+
+
+if __name__ == '__main__':
+    unittest.main()
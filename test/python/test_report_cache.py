@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test cases for the rendered report cache
+"""
+
+import os
+import tempfile
+import unittest
+
+from helpers import create_test_app, login, seed_school, make_student
+from models import db
+from models.grade import Grade
+from models.student import Student
+from routes import report_routes
+from services.class_ranking import clear_class_rankings
+from services.report_cache import ReportCache, report_cache, report_key
+from services.report_generator import ReportGenerator
+from utils.grade_sync import clear_sync_watermarks
+
+
+class TestReportCacheStore(unittest.TestCase):
+    """Test cases for ReportCache"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.app = create_test_app(
+            REPORT_CACHE_FOLDER=self.folder.name,
+            REPORT_CACHE_MAX_BYTES=25,
+        )
+        self.cache = ReportCache()
+        self.cache.init_app(self.app)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_hits_and_misses_are_counted(self):
+        self.assertIsNone(self.cache.get("a", "pdf"))
+        self.cache.put("a", "pdf", b"report")
+        self.assertEqual(self.cache.get("a", "pdf"), b"report")
+
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["stores"]), (1, 1, 1))
+        self.assertEqual(stats["files"], 1)
+
+    def test_least_recently_used_file_is_evicted(self):
+        self.cache.put("a", "pdf", b"x" * 10)
+        self.cache.put("b", "pdf", b"x" * 10)
+        # Make "a" the older file, then use it so "b" becomes the LRU entry
+        os.utime(os.path.join(self.folder.name, "a.pdf"), (1, 1))
+        os.utime(os.path.join(self.folder.name, "b.pdf"), (2, 2))
+        self.cache.get("a", "pdf")
+
+        self.cache.put("c", "pdf", b"x" * 10)
+        self.assertIsNotNone(self.cache.get("a", "pdf"))
+        self.assertIsNone(self.cache.get("b", "pdf"))
+        self.assertIsNotNone(self.cache.get("c", "pdf"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_disabled_cache_stores_nothing(self):
+        self.cache.max_bytes = 0
+        self.cache.put("a", "pdf", b"report")
+        self.assertIsNone(self.cache.get("a", "pdf"))
+        self.assertEqual(os.listdir(self.folder.name), [])
+
+
+class TestReportCacheDownloads(unittest.TestCase):
+    """Test cases for cached report PDF downloads"""
+
+    def setUp(self):
+        clear_class_rankings()
+        clear_sync_watermarks()
+        self.folder = tempfile.TemporaryDirectory()
+        self.app = create_test_app(
+            lambda app: app.register_blueprint(report_routes.report_bp),
+            REPORT_CACHE_FOLDER=self.folder.name,
+            REPORT_PDF_WORKERS=2,
+        )
+        report_cache.init_app(self.app)
+        report_cache.reset_stats()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.student = make_student(self.seed, "student0")
+        db.session.add(Student(user_id=self.student.id, admission_number="ADM0"))
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        login(self.client, self.seed["admin"])
+
+    def tearDown(self):
+        clear_class_rankings()
+        clear_sync_watermarks()
+        report_cache.folder = None
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.folder.cleanup()
+
+    def report(self):
+        return ReportGenerator.get_student_scores(
+            self.student.id, self.seed["term"].term_id,
+            self.seed["class_room"].class_room_id
+        )
+
+    def add_grade(self, score):
+        db.session.add(Grade(
+            student_id=self.student.id,
+            subject_id=self.seed["subject"].subject_id,
+            class_room_id=self.seed["class_room"].class_room_id,
+            term_id=self.seed["term"].term_id,
+            assessment_type="exam",
+            max_score=60,
+            score=score,
+            academic_session="2025-2026",
+            is_published=True,
+        ))
+        db.session.commit()
+
+    def test_key_follows_report_content(self):
+        key = report_key([self.report()], "xhtml2pdf")
+        self.assertEqual(report_key([self.report()], "xhtml2pdf"), key)
+        self.assertNotEqual(report_key([self.report()], "weasyprint"), key)
+
+        self.add_grade(45)
+        self.assertNotEqual(report_key([self.report()], "xhtml2pdf"), key)
+
+    def test_key_follows_logo_file(self):
+        logo = os.path.join(self.folder.name, "logo.png")
+        with open(logo, "wb") as f:
+            f.write(b"old")
+        self.seed["school"].logo = logo
+        db.session.commit()
+
+        key = report_key([self.report()], "xhtml2pdf")
+        with open(logo, "wb") as f:
+            f.write(b"new logo")
+        self.assertNotEqual(report_key([self.report()], "xhtml2pdf"), key)
+
+    @unittest.skipIf(report_routes.WEASYPRINT_AVAILABLE, "xhtml2pdf path only")
+    @unittest.skipUnless(report_routes.XHTML2PDF_AVAILABLE, "xhtml2pdf is not installed")
+    def test_repeat_download_is_served_from_cache(self):
+        params = {
+            "student_id": self.student.id,
+            "class_room_id": self.seed["class_room"].class_room_id,
+            "term_id": self.seed["term"].term_id,
+        }
+        first = self.client.post("/reports/api/download-pdf", json=params)
+        second = self.client.post("/reports/api/download-pdf", json=params)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.data, first.data)
+
+        stats = self.client.get("/reports/api/report-cache").get_json()["stats"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["files"]), (1, 1, 1))
+
+        # A grade change renders a new file
+        self.add_grade(45)
+        third = self.client.post("/reports/api/download-pdf", json=params)
+        self.assertEqual(third.status_code, 200)
+        stats = report_cache.stats()
+        self.assertEqual((stats["misses"], stats["files"]), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
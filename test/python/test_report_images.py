@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test cases for cached image embedding in report rendering
+"""
+
+import base64
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from services import report_generator
+from services.report_generator import ReportGenerator, clear_image_cache
+
+
+def decode(data_uri):
+    header, b64 = data_uri.split(',', 1)
+    return header, base64.b64decode(b64)
+
+
+@unittest.skipUnless(report_generator.PIL_AVAILABLE, "Pillow is not installed")
+class TestReportImages(unittest.TestCase):
+    """Test cases for ReportGenerator._embed_image"""
+
+    def setUp(self):
+        clear_image_cache()
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        clear_image_cache()
+        self.folder.cleanup()
+
+    def make_image(self, name, size, color="red"):
+        from PIL import Image
+
+        path = os.path.join(self.folder.name, name)
+        Image.new("RGB", size, color).save(path)
+        return path
+
+    def test_same_file_is_encoded_once(self):
+        path = self.make_image("logo.png", (40, 40))
+        with mock.patch.object(ReportGenerator, "_encode_image",
+                               wraps=ReportGenerator._encode_image) as encode:
+            first = ReportGenerator._embed_image(path)
+            second = ReportGenerator._embed_image(path)
+
+        self.assertTrue(first.startswith("data:image/png;base64,"))
+        self.assertEqual(first, second)
+        self.assertEqual(encode.call_count, 1)
+
+    def test_changed_file_is_encoded_again(self):
+        path = self.make_image("logo.png", (40, 40))
+        first = ReportGenerator._embed_image(path)
+
+        self.make_image("logo.png", (40, 40), color="blue")
+        os.utime(path, ns=(1, 1))
+        self.assertNotEqual(ReportGenerator._embed_image(path), first)
+
+    def test_oversized_photo_is_scaled_down(self):
+        from PIL import Image
+
+        path = self.make_image("photo.jpg", (1200, 900))
+        header, data = decode(ReportGenerator._embed_image(path, max_px=150))
+
+        self.assertEqual(header, "data:image/jpeg;base64")
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (150, 113))
+        self.assertLess(len(data), os.path.getsize(path))
+
+        # Without a size the stored file is embedded as is
+        header, data = decode(ReportGenerator._embed_image(path))
+        with open(path, "rb") as f:
+            self.assertEqual(data, f.read())
+
+    def test_cache_is_bounded(self):
+        paths = [self.make_image(f"photo{i}.png", (10, 10)) for i in range(5)]
+        with mock.patch.object(report_generator, "IMAGE_CACHE_SIZE", 3):
+            for path in paths:
+                ReportGenerator._embed_image(path)
+        self.assertEqual(len(report_generator._image_cache), 3)
+
+    def test_missing_file_falls_back_to_url(self):
+        self.assertEqual(
+            ReportGenerator._report_image_src("static/uploads/missing.png", 50),
+            "/missing.png",
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
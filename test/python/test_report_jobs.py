@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test cases for background report jobs
+"""
+
+import io
+import tempfile
+import unittest
+
+from pypdf import PdfReader
+
+from helpers import create_test_app, login, make_user, seed_school, make_student
+from models import db
+from models.student import Student
+from routes import report_routes
+from services.class_ranking import clear_class_rankings
+from services.report_jobs import report_job_queue, DONE, FAILED
+
+
+def failing_job(job, **params):
+    raise ValueError("renderer crashed")
+
+
+class TestReportJobs(unittest.TestCase):
+    """Test cases for services.report_jobs and the job routes"""
+
+    def setUp(self):
+        clear_class_rankings()
+        self.folder = tempfile.TemporaryDirectory()
+        self.app = create_test_app(
+            lambda app: app.register_blueprint(report_routes.report_bp),
+            REPORT_JOB_WORKERS=0,
+            REPORT_JOB_FOLDER=self.folder.name,
+            REPORT_PDF_WORKERS=2,
+        )
+        report_job_queue.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        for i in range(3):
+            user = make_student(self.seed, f"student{i}")
+            db.session.add(Student(user_id=user.id, admission_number=f"ADM{i}"))
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        login(self.client, self.seed["admin"])
+
+    def tearDown(self):
+        clear_class_rankings()
+        report_job_queue.shutdown()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.folder.cleanup()
+
+    def params(self, **extra):
+        return {
+            "class_room_id": self.seed["class_room"].class_room_id,
+            "term_id": self.seed["term"].term_id,
+            "background": True,
+            **extra,
+        }
+
+    @unittest.skipIf(report_routes.WEASYPRINT_AVAILABLE, "xhtml2pdf path only")
+    @unittest.skipUnless(report_routes.XHTML2PDF_AVAILABLE, "xhtml2pdf is not installed")
+    def test_class_pdf_job(self):
+        response = self.client.post("/reports/api/download-class-pdf", json=self.params())
+        self.assertEqual(response.status_code, 202)
+        submitted = response.get_json()
+
+        status = self.client.get(submitted["status_url"]).get_json()["job"]
+        self.assertEqual(status["state"], DONE)
+        self.assertEqual(status["phase"], "rendering")
+        self.assertEqual((status["completed"], status["total"]), (3, 3))
+
+        download = self.client.get(submitted["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download.mimetype, "application/pdf")
+        self.assertEqual(len(PdfReader(io.BytesIO(download.data)).pages), 3)
+
+    def test_broad_sheet_excel_job(self):
+        response = self.client.post("/reports/api/broad-sheet/export/excel", json=self.params())
+        self.assertEqual(response.status_code, 202)
+        submitted = response.get_json()
+
+        download = self.client.get(submitted["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(download.data.startswith(b"PK"))
+        self.assertIn(".xlsx", download.headers["Content-Disposition"])
+
+    def test_other_users_cannot_see_job(self):
+        response = self.client.post("/reports/api/broad-sheet/export/excel", json=self.params())
+        submitted = response.get_json()
+
+        other = self.app.test_client()
+        login(other, make_user("teacher2", role="staff"))
+        self.assertEqual(other.get(submitted["status_url"]).status_code, 404)
+        self.assertEqual(other.get(submitted["download_url"]).status_code, 404)
+
+    def test_failed_job_is_reported(self):
+        job = report_job_queue.submit("test", failing_job, self.seed["admin"].id)
+        self.assertEqual(job.state, FAILED)
+
+        response = self.client.get(f"/reports/api/jobs/{job.job_id}/download")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()["error"], "renderer crashed")
+
+    def test_expired_jobs_are_purged(self):
+        job = report_job_queue.submit(
+            "test", lambda job: (b"data", "file.txt", "text/plain"), self.seed["admin"].id
+        )
+        self.assertEqual(job.state, DONE)
+
+        report_job_queue.ttl = 0
+        job.finished_at -= 1
+        report_job_queue.purge_expired()
+        self.assertIsNone(report_job_queue.get(job.job_id))
+        response = self.client.get(f"/reports/api/jobs/{job.job_id}")
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test cases for the Jinja report card renderer
+"""
+
+import unittest
+from unittest import mock
+
+from services import report_renderer
+from services.pdf_renderer import PAGE_BREAK
+from services.report_generator import ReportGenerator
+from services.report_renderer import (
+    document_frame, get_environment, render_cards, render_document, render_report
+)
+
+
+ASSESSMENT_TYPES = [
+    {'code': 'exam', 'name': 'Examination', 'max_score': 60, 'order': 2},
+    {'code': 'first_ca', 'name': 'First CA', 'max_score': 40, 'order': 1},
+]
+
+
+def make_report(index, name=None):
+    return {
+        'student': {'id': f'student-{index}', 'name': name or f'STUDENT {index}',
+                    'admission_number': f'ADM{index}', 'image': None,
+                    'class_name': 'JSS 1', 'class_id': 'class-1'},
+        'school': {'name': 'Test School', 'logo': None, 'address': '1 Test Road',
+                   'phone': '000', 'motto': None},
+        'sections': [],
+        'formatted_sections': 'Primary and Secondary',
+        'term': {'name': 'First Term', 'session': '2025-2026',
+                 'start_date': '2025-09-01', 'end_date': '2025-12-15'},
+        'assessment_types': ASSESSMENT_TYPES,
+        'scores': {
+            'maths': {
+                'subject_name': 'Mathematics',
+                'assessments': {
+                    'first_ca': {'score': 30, 'max_score': 40, 'percentage': 75, 'is_cbt': True},
+                    'exam': {'score': 45, 'max_score': 60, 'percentage': 75},
+                },
+                'total': 75,
+                'max_total': 100.0,
+            },
+        },
+        'position': index + 1,
+        'total_students': 3,
+        'overall_total': 75,
+        'overall_max': 100.0,
+        'config': None,
+        'grade_scale': None,
+    }
+
+
+class TestReportRenderer(unittest.TestCase):
+    """Test cases for services.report_renderer"""
+
+    def test_environment_is_built_once(self):
+        self.assertIs(get_environment(), get_environment())
+
+    def test_full_card(self):
+        html = ReportGenerator.generate_report_html(make_report(0))
+
+        self.assertTrue(html.lstrip().startswith('<!DOCTYPE html>'))
+        self.assertIn('<div class="school-name">TEST SCHOOL</div>', html)
+        self.assertIn('1st of 3', html)
+        self.assertIn('<td style="font-weight: 600;">30<span class="cbt-badge">CBT</span></td>', html)
+        self.assertIn('<span class="grade-pill grade-A">A</span>', html)
+        self.assertIn('class="remark-excellent">Excellent', html)
+
+    def test_simple_card_orders_columns(self):
+        html = ReportGenerator.generate_simple_report_html(make_report(1))
+
+        self.assertIn('2nd out of 3', html)
+        self.assertLess(html.index('First ca (40) Score'), html.index('Examination (60) Score'))
+        self.assertIn('<td>30.0 (CBT)</td><td>40</td>', html)
+        self.assertIn('<span class="section-badge">Primary</span> and '
+                      '<span class="section-badge">Secondary</span>', html)
+
+    def test_values_are_escaped(self):
+        html = render_report(make_report(0, name='<b>Tom & Jerry</b>'), 'simple')
+        self.assertIn('&lt;B&gt;TOM &amp; JERRY&lt;/B&gt;', html)
+        self.assertNotIn('<B>', html)
+
+    def test_subject_rows_are_escaped(self):
+        report = make_report(0)
+        report['scores']['maths']['subject_name'] = 'Maths & <Stats>'
+        for variant in ('full', 'simple'):
+            html = render_report(report, variant)
+            self.assertIn('Maths &amp; &lt;Stats&gt;', html)
+            self.assertNotIn('<Stats>', html)
+
+    def test_class_parts_are_rendered_once(self):
+        reports = [make_report(i) for i in range(3)]
+        with mock.patch.object(report_renderer, '_class_parts',
+                               wraps=report_renderer._class_parts) as parts:
+            cards = render_cards(reports, 'full')
+
+        self.assertEqual(parts.call_count, 1)
+        for card in cards:
+            self.assertEqual(card.count('grade-item grade-'), 6)
+            self.assertIn('<th style="width: 45px;">Examination</th><th style="width: 45px;">First ca</th>', card)
+
+    def test_class_document_shares_styles_and_header(self):
+        reports = [make_report(i) for i in range(3)]
+        with mock.patch.object(report_renderer, '_header',
+                               wraps=report_renderer._header) as header:
+            html = render_document(reports, 'full')
+
+        self.assertEqual(header.call_count, 1)
+        self.assertEqual(html.count('<style>'), 1)
+        self.assertEqual(html.count('.performance-table {'), 1)
+        self.assertEqual(html.count('class="report-container"'), 3)
+        self.assertEqual(html.count(PAGE_BREAK), 2)
+
+    def test_cards_fit_the_document_frame(self):
+        prefix, suffix = document_frame('simple')
+        cards = render_cards([make_report(0), make_report(1)], 'simple')
+
+        self.assertEqual(len(cards), 2)
+        self.assertIn('<style>', prefix)
+        self.assertTrue(suffix.rstrip().endswith('</html>'))
+        self.assertNotIn('<style>', cards[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
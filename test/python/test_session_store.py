@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Test cases for the write-behind exam session buffer
+"""
+
+import threading
+import unittest
+from unittest import mock
+
+from sqlalchemy import event
+
+from helpers import (
+    create_test_app, login, seed_school, make_student, make_exam, make_questions
+)
+from models import db
+from models.exam_session import ExamSession
+from routes.student_routes import student_route
+from routes.session_monitor_routes import session_monitor_routes
+from services.question_bank import clear_question_banks
+from services.session_store import exam_session_buffer
+
+
+class TestSessionStore(unittest.TestCase):
+    """Test cases for services.session_store"""
+
+    def setUp(self):
+        clear_question_banks()
+        # A long interval keeps the flusher idle so tests flush explicitly
+        self.app = create_test_app(
+            student_route, session_monitor_routes, EXAM_SESSION_FLUSH_INTERVAL=3600
+        )
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.seed = seed_school()
+        self.exam = make_exam(self.seed)
+        self.questions = make_questions(self.seed, self.exam, 5)
+        self.students = [make_student(self.seed, f"student{i}") for i in range(4)]
+
+    def tearDown(self):
+        exam_session_buffer.shutdown()
+        clear_question_banks()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def client_for(self, user):
+        client = self.app.test_client()
+        login(client, user)
+        return client
+
+    def save(self, client, index, answers):
+        return client.post(
+            f"/student/exam/{self.exam.id}/session/save",
+            json={
+                "current_question_index": index,
+                "time_remaining": 1000 - index,
+                "answers": answers,
+                "question_order": [],
+            },
+        )
+
+    def stored_session(self, student):
+        db.session.expire_all()
+        return ExamSession.query.filter_by(student_id=student.id, is_active=True).first()
+
+    def test_saves_are_buffered_and_restore_reads_through(self):
+        """Saves stay in memory until a reader or the flusher needs them"""
+        student = self.students[0]
+        client = self.client_for(student)
+        client.get(f"/student/exam/{self.exam.id}/questions")
+
+        for index in range(3):
+            self.assertTrue(self.save(client, index, {self.questions[index].id: "x"}).get_json()["success"])
+
+        self.assertEqual(self.stored_session(student).current_question_index, 0)
+        self.assertIsNotNone(exam_session_buffer.get_pending(student.id, self.exam.id))
+
+        restored = client.get(f"/student/exam/{self.exam.id}/session/restore").get_json()
+        self.assertEqual(restored["session"]["current_question_index"], 2)
+        self.assertEqual(restored["session"]["time_remaining"], 998)
+        self.assertIsNone(exam_session_buffer.get_pending(student.id, self.exam.id))
+
+    def test_monitor_overlays_pending_saves(self):
+        """The admin monitor shows buffered progress before it is flushed"""
+        student = self.students[0]
+        client = self.client_for(student)
+        client.get(f"/student/exam/{self.exam.id}/questions")
+        self.save(client, 3, {self.questions[0].id: "x", self.questions[1].id: "y"})
+
+        monitor = self.client_for(self.seed["admin"]).get("/admin/exam-sessions/api").get_json()
+        row = monitor["sessions"][0]
+        self.assertEqual(row["current_question"], 4)
+        self.assertEqual(self.stored_session(student).current_question_index, 0)
+
+    def test_flush_coalesces_into_one_batch(self):
+        """Many saves from many students flush as one batched statement each"""
+        for student in self.students:
+            client = self.client_for(student)
+            client.get(f"/student/exam/{self.exam.id}/questions")
+            for index in range(3):
+                self.save(client, index, {})
+
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, executemany))
+
+        event.listen(db.engine, "before_cursor_execute", before_execute)
+        try:
+            written = exam_session_buffer.flush()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_execute)
+
+        self.assertEqual(written, len(self.students))
+        updates = [s for s in statements if s[0].lstrip().upper().startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0][1])
+        for student in self.students:
+            self.assertEqual(self.stored_session(student).current_question_index, 2)
+
+    def test_submit_flushes_and_closes_session(self):
+        """Submitting writes pending progress and leaves no active session behind"""
+        student = self.students[0]
+        client = self.client_for(student)
+        client.get(f"/student/exam/{self.exam.id}/questions")
+        self.save(client, 4, {})
+
+        client.post(f"/student/exam/{self.exam.id}/submit", json={"answers": {}})
+
+        exam_session_buffer.flush()
+        self.assertIsNone(self.stored_session(student))
+        completed = ExamSession.query.filter_by(student_id=student.id).one()
+        self.assertTrue(completed.is_completed)
+        self.assertEqual(completed.current_question_index, 4)
+
+    def test_late_save_does_not_reopen_submitted_exam(self):
+        """A save flushed after submit leaves the exam closed"""
+        student = self.students[0]
+        client = self.client_for(student)
+        client.get(f"/student/exam/{self.exam.id}/questions")
+        client.post(f"/student/exam/{self.exam.id}/submit", json={"answers": {}})
+
+        exam_session_buffer.save(student.id, self.exam.id, 2, 900, {})
+        exam_session_buffer.flush()
+        self.assertIsNone(self.stored_session(student))
+
+    def test_flush_of_key_waits_for_write_in_progress(self):
+        """A reader's flush returns only after a running flush of its key commits"""
+        student = self.students[0]
+        client = self.client_for(student)
+        client.get(f"/student/exam/{self.exam.id}/questions")
+        self.save(client, 3, {})
+
+        started, release = threading.Event(), threading.Event()
+        write = exam_session_buffer._write
+
+        def slow_write(items):
+            started.set()
+            release.wait(5)
+            write(items)
+
+        def background_flush():
+            with self.app.app_context():
+                exam_session_buffer.flush()
+
+        with mock.patch.object(exam_session_buffer, "_write", side_effect=slow_write):
+            flusher = threading.Thread(target=background_flush)
+            flusher.start()
+            self.assertTrue(started.wait(5))
+            reader = threading.Thread(
+                target=exam_session_buffer.flush, args=((student.id, self.exam.id),)
+            )
+            reader.start()
+            reader.join(0.2)
+            self.assertTrue(reader.is_alive())
+            release.set()
+            flusher.join(5)
+            reader.join(5)
+
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(self.stored_session(student).current_question_index, 3)
+
+    def test_discard_during_flush_drops_new_session(self):
+        """A key discarded while a flush is writing it gets no new session"""
+        student = self.students[0]
+        exam_session_buffer.save(student.id, self.exam.id, 1, 900, {})
+        write = exam_session_buffer._write
+
+        def write_after_discard(items):
+            exam_session_buffer.discard(student.id, self.exam.id)
+            write(items)
+
+        with mock.patch.object(exam_session_buffer, "_write", side_effect=write_after_discard):
+            exam_session_buffer.flush()
+
+        self.assertIsNone(self.stored_session(student))
+        self.assertIsNone(exam_session_buffer.get_pending(student.id, self.exam.id))
+
+    def delta(self, client, seq, changes, index=0):
+        return client.post(
+            f"/student/exam/{self.exam.id}/session/delta",
+            json={
+                "seq": seq,
+                "changes": changes,
+                "current_question_index": index,
+                "time_remaining": 500,
+            },
+        )
+
+    def test_delta_merges_changed_answers(self):
+        """Deltas add, replace and clear individual answers"""
+        student = self.students[0]
+        client = self.client_for(student)
+        client.get(f"/student/exam/{self.exam.id}/questions")
+        q1, q2 = self.questions[0].id, self.questions[1].id
+
+        self.assertEqual(self.delta(client, 1, {q1: "a", q2: "b"}).get_json()["seq"], 1)
+        self.assertEqual(self.delta(client, 2, {q1: "c"}, index=1).status_code, 200)
+        self.assertEqual(self.delta(client, 3, {q2: None}, index=2).status_code, 200)
+
+        exam_session_buffer.flush()
+        stored = self.stored_session(student)
+        self.assertEqual(stored.get_answers(), {q1: "c"})
+        self.assertEqual(stored.save_seq, 3)
+        self.assertEqual(stored.current_question_index, 2)
+
+    def test_delta_rejects_out_of_order_sequence(self):
+        """A delta older than the last applied one is refused with 409"""
+        student = self.students[0]
+        client = self.client_for(student)
+        client.get(f"/student/exam/{self.exam.id}/questions")
+        q1 = self.questions[0].id
+
+        self.delta(client, 5, {q1: "new"})
+        exam_session_buffer.flush()
+
+        response = self.delta(client, 4, {q1: "old"})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()["last_seq"], 5)
+
+        restored = client.get(f"/student/exam/{self.exam.id}/session/restore").get_json()
+        self.assertEqual(restored["session"]["answers"], {q1: "new"})
+        self.assertEqual(restored["session"]["save_seq"], 5)
+
+    def test_delta_requires_session(self):
+        """Deltas only apply to a session created when questions were served"""
+        client = self.client_for(self.students[0])
+        self.assertEqual(self.delta(client, 1, {}).status_code, 404)
+        self.assertEqual(
+            client.post(
+                f"/student/exam/{self.exam.id}/session/delta", json={"changes": {}}
+            ).status_code,
+            400,
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+"""
+The logged-in user, loaded once per request.
+
+The role decorators and most handlers need the user behind
+``session["user_id"]``. ``get_current_user`` loads it the first time it is
+asked for - with the class room and student record joined in, since exam
+and dashboard pages read both - and keeps it on ``flask.g`` so the decorator
+and the handler share one object and one query.
+"""
+from flask import g, session
+from sqlalchemy.orm import joinedload
+
+from models import db
+from models.user import User
+
+
+def get_current_user():
+    """The User behind session["user_id"], or None when nobody is logged in"""
+    user_id = session.get("user_id")
+    if user_id is None:
+        return None
+
+    # g can outlive a request when an app context is pushed around several
+    # (tests, CLI), so only reuse the user of the same login and db session
+    cached = g.get("current_user")
+    if cached is not None and g.get("current_user_id") == user_id and cached in db.session:
+        return cached
+
+    user = db.session.get(
+        User, user_id,
+        options=[joinedload(User.class_room), joinedload(User.student)],
+    )
+    g.current_user = user
+    g.current_user_id = user_id
+    return user
@@ -0,0 +1,397 @@
+"""
+Single-pass reader for Word question documents.
+
+``parse_word_document`` reads the same "Question: / Type: / Options: /
+Answer:" layout as before, but
+
+- opens the .docx as a zip and parses only the main document part, in one
+  lxml pass, instead of loading the whole package (every image included)
+  through python-docx;
+- collects each paragraph's text, math and image reference while walking
+  the body once, so empty paragraphs no longer go through the full text and
+  math processing just to look for a picture;
+- reads and stores only the images the questions actually use, after the
+  walk, in a small thread pool (zip inflation, hashing and file writes
+  release the GIL);
+- caches results by content: a whole file by its SHA-256, and each question
+  block by a hash of its XML and of the images it uses, so re-uploading a
+  corrected file only re-parses the questions that changed.
+
+Like the other in-process caches, the cache assumes a single app process.
+"""
+import hashlib
+import io
+import posixpath
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from docx.oxml import parse_xml
+from docx.text.paragraph import Paragraph
+from docx.oxml.ns import qn
+from flask import current_app, has_app_context
+from lxml import etree
+
+from services.image_store import store_image
+from utils.math_content_parser import (
+    extract_math_from_text,
+    paragraph_image_ids,
+    process_paragraph_text
+)
+
+
+RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+OFFICE_DOCUMENT = "/officeDocument"
+
+# Threads that read and store a document's images (0 or 1 stores them inline)
+DEFAULT_IMAGE_WORKERS = 4
+
+# Parsed question blocks and whole documents kept, least recently used first out
+MAX_CACHED_BLOCKS = 5000
+MAX_CACHED_DOCUMENTS = 20
+
+_blocks = OrderedDict()
+_documents = OrderedDict()
+_lock = threading.Lock()
+
+
+class _Image:
+    """Stand-in for an image URL until the document's images are stored"""
+
+    __slots__ = ("rel_id",)
+
+    def __init__(self, rel_id):
+        self.rel_id = rel_id
+
+
+class _Package:
+    """The parts of a .docx the parser needs, read straight from the zip"""
+
+    def __init__(self, content):
+        self.content = content
+        self.archive = zipfile.ZipFile(io.BytesIO(content))
+        self.document_path = self._main_document()
+        self.images = self._image_relationships()
+        self._content_types = None
+
+    def _relationships(self, path):
+        rels = etree.fromstring(self.archive.read(path))
+        return rels.iterfind(f"{{{RELATIONSHIPS_NS}}}Relationship")
+
+    def _main_document(self):
+        for rel in self._relationships("_rels/.rels"):
+            if rel.get("Type", "").endswith(OFFICE_DOCUMENT):
+                return rel.get("Target").lstrip("/")
+        raise ValueError("Not a Word document")
+
+    def _image_relationships(self):
+        """rId -> zip member of each internal image relationship"""
+        folder, name = posixpath.split(self.document_path)
+        rels_path = posixpath.join(folder, "_rels", name + ".rels")
+        if rels_path not in self.archive.namelist():
+            return {}
+
+        images = {}
+        for rel in self._relationships(rels_path):
+            target = rel.get("Target", "")
+            if rel.get("TargetMode") == "External" or "image" not in target:
+                continue
+            if target.startswith("/"):
+                member = target.lstrip("/")
+            else:
+                member = posixpath.normpath(posixpath.join(folder, target))
+            images[rel.get("Id")] = member
+        return images
+
+    def body(self):
+        document = parse_xml(self.archive.read(self.document_path))
+        return document.find(qn("w:body"))
+
+    def image_identity(self, rel_id):
+        """What a block's hash needs to know about an image, without reading it"""
+        info = self.archive.getinfo(self.images[rel_id])
+        return f"{rel_id}:{info.filename}:{info.CRC}:{info.file_size}"
+
+    def image_content_type(self, member):
+        if self._content_types is None:
+            types = etree.fromstring(self.archive.read("[Content_Types].xml"))
+            self._content_types = {
+                "defaults": {
+                    element.get("Extension", "").lower(): element.get("ContentType", "")
+                    for element in types.iterfind(f"{{{CONTENT_TYPES_NS}}}Default")
+                },
+                "overrides": {
+                    element.get("PartName", "").lstrip("/"): element.get("ContentType", "")
+                    for element in types.iterfind(f"{{{CONTENT_TYPES_NS}}}Override")
+                },
+            }
+        content_type = self._content_types["overrides"].get(member) or \
+            self._content_types["defaults"].get(posixpath.splitext(member)[1][1:].lower(), "")
+
+        # Same formats as the data URIs the parser used to build
+        if 'png' in content_type:
+            return "image/png"
+        elif 'jpeg' in content_type or 'jpg' in content_type:
+            return "image/jpeg"
+        elif 'gif' in content_type:
+            return "image/gif"
+        return "image/png"  # Default
+
+
+def _copy(question):
+    """A question the caller can change without touching the cached one"""
+    copied = dict(question)
+    copied["options"] = [dict(option) for option in question.get("options", [])]
+    return copied
+
+
+def _cache_get(cache, key):
+    with _lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+    return value
+
+
+def _cache_put(cache, key, value, limit):
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+
+def clear_word_parse_cache():
+    """Forget every parsed document and question block"""
+    with _lock:
+        _blocks.clear()
+        _documents.clear()
+
+
+def _question_blocks(body):
+    """
+    The body's paragraphs grouped by question.
+
+    Each block starts at a "Question:" paragraph; paragraphs before the first
+    question never produce anything and are dropped.
+    """
+    block = None
+    for p in body.iterchildren(qn("w:p")):
+        paragraph = Paragraph(p, None)
+        text = paragraph.text.strip()
+        if text.lower().startswith("question:"):
+            if block:
+                yield block
+            block = []
+        if block is not None:
+            block.append((paragraph, text))
+    if block:
+        yield block
+
+
+def _first_image(paragraph, package):
+    for rel_id in paragraph_image_ids(paragraph):
+        if rel_id in package.images:
+            return _Image(rel_id)
+    return None
+
+
+def _parse_block(block, package):
+    """One question from its paragraphs (images as _Image placeholders)"""
+    current_question = None
+    current_options = []
+    in_options = False
+
+    for para, text in block:
+        if not text:
+            # Check if paragraph contains only an image
+            image_data = _first_image(para, package)
+            if image_data and current_question:
+                # Attach image to current question or option
+                if in_options and current_options:
+                    current_options[-1]["option_image"] = image_data
+                else:
+                    current_question["question_image"] = image_data
+            continue
+
+        # Check for question start
+        if text.lower().startswith("question:"):
+            # Process question text for math and images
+            question_text = text[9:].strip()  # Remove "Question:" prefix
+            processed_text, has_math = process_paragraph_text(para)
+            image_data = _first_image(para, package)
+            if processed_text and processed_text != text:
+                question_text = processed_text[9:].strip() if processed_text.lower().startswith("question:") else processed_text
+            else:
+                question_text, has_math = extract_math_from_text(question_text)
+
+            # Start new question
+            current_question = {
+                "question_text": question_text,
+                "question_type": "mcq",
+                "options": [],
+                "has_math": has_math
+            }
+
+            if image_data:
+                current_question["question_image"] = image_data
+
+            current_options = []
+            in_options = False
+
+        elif text.lower().startswith("type:") and current_question:
+            q_type = text[5:].strip().lower()
+            if "mcq" in q_type or "multiple" in q_type:
+                current_question["question_type"] = "mcq"
+            elif "true" in q_type or "false" in q_type:
+                current_question["question_type"] = "true_false"
+            elif "short" in q_type:
+                current_question["question_type"] = "short_answer"
+
+        elif text.lower().startswith("options:") and current_question:
+            in_options = True
+
+        elif text.lower().startswith("answer:") and current_question:
+            answer_text = text[7:].strip()
+            # Process answer for math notation
+            answer_text, has_math = extract_math_from_text(answer_text)
+            current_question["correct_answer"] = answer_text
+            if has_math:
+                current_question["has_math"] = True
+            in_options = False
+
+        elif in_options and text.startswith("-"):
+            # Parse option
+            option_text = text[1:].strip()
+            is_correct = option_text.startswith("*")
+            if is_correct:
+                option_text = option_text[1:].strip()
+
+            # Process option text for math and images
+            processed_text, has_math = process_paragraph_text(para)
+            image_data = _first_image(para, package)
+            if processed_text and processed_text != text:
+                option_text = processed_text[1:].strip() if processed_text.startswith("-") else processed_text
+                if option_text.startswith("*"):
+                    option_text = option_text[1:].strip()
+            else:
+                option_text, has_math = extract_math_from_text(option_text)
+
+            option_data = {
+                "text": option_text,
+                "is_correct": is_correct,
+                "has_math": has_math
+            }
+
+            if image_data:
+                option_data["option_image"] = image_data
+
+            current_options.append(option_data)
+
+    if current_question["question_type"] in ["mcq", "true_false"]:
+        current_question["options"] = current_options
+    return current_question
+
+
+def _block_key(block, package):
+    digest = hashlib.sha256()
+    for para, _ in block:
+        digest.update(etree.tostring(para._element))
+        for rel_id in paragraph_image_ids(para):
+            if rel_id in package.images:
+                digest.update(package.image_identity(rel_id).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _image_workers(image_workers):
+    if image_workers is not None:
+        return image_workers
+    if has_app_context():
+        return current_app.config.get("DOCX_IMAGE_WORKERS", DEFAULT_IMAGE_WORKERS)
+    return DEFAULT_IMAGE_WORKERS
+
+
+def _store_images(package, rel_ids, workers):
+    """Read and store the referenced images; rId -> URL"""
+    app = current_app._get_current_object() if has_app_context() else None
+    # Content types are read once, before any thread needs them
+    package.image_content_type(next(iter(package.images.values())))
+    local = threading.local()
+
+    def archive():
+        # A ZipFile is not safe to share, so each thread opens its own
+        if threading.current_thread() is main_thread:
+            return package.archive
+        if not hasattr(local, "archive"):
+            local.archive = zipfile.ZipFile(io.BytesIO(package.content))
+        return local.archive
+
+    def store(rel_id):
+        member = package.images[rel_id]
+        data = archive().read(member)
+        content_type = package.image_content_type(member)
+        if app is None:
+            return rel_id, store_image(data, content_type)
+        with app.app_context():
+            return rel_id, store_image(data, content_type)
+
+    main_thread = threading.current_thread()
+    rel_ids = sorted(rel_ids)
+    if workers <= 1 or len(rel_ids) <= 1:
+        return dict(store(rel_id) for rel_id in rel_ids)
+    with ThreadPoolExecutor(max_workers=min(workers, len(rel_ids))) as pool:
+        return dict(pool.map(store, rel_ids))
+
+
+def _placeholders(question):
+    if isinstance(question.get("question_image"), _Image):
+        yield question, "question_image"
+    for option in question.get("options", []):
+        if isinstance(option.get("option_image"), _Image):
+            yield option, "option_image"
+
+
+def parse_word_document(file_content, image_workers=None):
+    """
+    Parse the questions of a .docx file.
+
+    Args:
+        file_content (bytes): the uploaded file
+        image_workers: threads used to store images (default
+            DOCX_IMAGE_WORKERS, 0 or 1 to store them inline)
+
+    Returns:
+        list of question dicts, as parse_word_questions always returned
+    """
+    document_key = hashlib.sha256(file_content).hexdigest()
+    cached = _cache_get(_documents, document_key)
+    if cached is not None:
+        return [_copy(question) for question in cached]
+
+    package = _Package(file_content)
+    questions = []
+    parsed = []
+    for block in _question_blocks(package.body()):
+        key = _block_key(block, package)
+        question = _cache_get(_blocks, key)
+        if question is None:
+            question = _parse_block(block, package)
+            parsed.append((key, question))
+        questions.append(question)
+
+    # Only the images the newly parsed questions use are read
+    wanted = {
+        target[field].rel_id
+        for _, question in parsed
+        for target, field in _placeholders(question)
+    }
+    urls = _store_images(package, wanted, _image_workers(image_workers)) if wanted else {}
+    for key, question in parsed:
+        for target, field in list(_placeholders(question)):
+            target[field] = urls[target[field].rel_id]
+        _cache_put(_blocks, key, question, MAX_CACHED_BLOCKS)
+
+    _cache_put(_documents, document_key, questions, MAX_CACHED_DOCUMENTS)
+    return [_copy(question) for question in questions]
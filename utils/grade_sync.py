@@ -1,36 +1,86 @@
 """
 Utility functions for syncing exam records to grades
 """
+import re
+import threading
+from functools import lru_cache
+
 from models import db
 from models.grade import Grade
 from models.exam_record import ExamRecord
 from models.assessment_type import AssessmentType
+from services.generate_uuid import generate_uuid
 from datetime import datetime
 
 
+def _ilike_contains(value):
+    """
+    Build a matcher equivalent to SQL ``ILIKE '%value%'``, including the
+    ``%``/``_`` wildcards a value may itself contain.
+    """
+    pattern = "".join(
+        ".*" if char == "%" else "." if char == "_" else re.escape(char)
+        for char in f"%{value}%"
+    )
+    regex = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+    return lambda text: text is not None and regex.fullmatch(text) is not None
+
+
+class AssessmentTypeResolver:
+    """
+    Maps an exam_type to its AssessmentType (name, code) pair.
+
+    Assessment types are read once; each distinct exam_type is matched once
+    with the same rule as the per-record lookup (first type whose name or
+    code contains the exam_type, case-insensitively) and memoized.
+    """
+
+    def __init__(self):
+        self._types = db.session.execute(
+            db.select(AssessmentType.name, AssessmentType.code)
+        ).all()
+        self._resolved = {}
+
+    def resolve(self, exam_type):
+        """Return (assessment_name, assessment_code) for an exam_type."""
+        if exam_type not in self._resolved:
+            matches = _ilike_contains(exam_type)
+            match = next(
+                (t for t in self._types if matches(t.name) or matches(t.code)), None
+            )
+            if match:
+                self._resolved[exam_type] = (match.name, match.code)
+            else:
+                self._resolved[exam_type] = (
+                    exam_type, exam_type.lower().replace(" ", "_")
+                )
+        return self._resolved[exam_type]
+
+
+@lru_cache(maxsize=4096)
+def _percentage_and_letter(score, max_score):
+    """Same results as Grade.calculate_percentage/assign_grade_letter."""
+    grade = Grade(score=score, max_score=max_score)
+    grade.calculate_percentage()
+    grade.assign_grade_letter()
+    return grade.percentage, grade.grade_letter
+
+
 def sync_exam_record_to_grade(exam_record):
     """
     Sync an ExamRecord to the Grade table
     Creates or updates a Grade entry based on the exam record
-    
+
     Args:
         exam_record: ExamRecord instance to sync
-        
+
     Returns:
         Grade instance (created or updated)
     """
-    # Try to find matching assessment type based on exam_type
-    assessment_type = AssessmentType.query.filter(
-        db.or_(
-            AssessmentType.name.ilike(f"%{exam_record.exam_type}%"),
-            AssessmentType.code.ilike(f"%{exam_record.exam_type}%")
-        )
-    ).first()
-    
-    # If no match, use exam_type as assessment name
-    assessment_name = assessment_type.name if assessment_type else exam_record.exam_type
-    assessment_code = assessment_type.code if assessment_type else exam_record.exam_type.lower().replace(" ", "_")
-    
+    assessment_name, assessment_code = AssessmentTypeResolver().resolve(
+        exam_record.exam_type
+    )
+
     # Check if grade already exists
     existing_grade = Grade.query.filter_by(
         student_id=exam_record.student_id,
@@ -39,7 +89,7 @@ def sync_exam_record_to_grade(exam_record):
         term_id=exam_record.school_term_id,
         exam_record_id=exam_record.id
     ).first()
-    
+
     if existing_grade:
         # Only update if there are actual changes
         needs_update = (
@@ -48,7 +98,7 @@ def sync_exam_record_to_grade(exam_record):
             existing_grade.assessment_name != assessment_name or
             existing_grade.assessment_type != assessment_code
         )
-        
+
         if needs_update:
             # Update existing grade (in case exam was retaken)
             existing_grade.score = exam_record.raw_score
@@ -58,11 +108,7 @@ def sync_exam_record_to_grade(exam_record):
             existing_grade.calculate_percentage()
             existing_grade.assign_grade_letter()
             existing_grade.updated_at = datetime.utcnow()
-            grade = existing_grade
-        
-        else:
-            # No changes needed, return existing grade
-            grade = existing_grade
+        grade = existing_grade
     else:
         # Create new grade
         grade = Grade()
@@ -81,96 +127,236 @@ def sync_exam_record_to_grade(exam_record):
         grade.is_from_cbt = True
         grade.calculate_percentage()
         grade.assign_grade_letter()
-        
+
         db.session.add(grade)
-    
-    
+
     return grade
 
 
+def sync_exam_records(record_filter, commit=True):
+    """
+    Set-based sync of every exam record matching a filter to the Grade table
+
+    Reads the records and their existing grades in one query each, then
+    writes all new grades with one bulk INSERT and all changed grades with
+    one bulk UPDATE. Unchanged grades are not written.
+
+    Args:
+        record_filter: list of SQLAlchemy criteria on ExamRecord columns
+        commit: commit the writes; pass False to keep them in the caller's
+            transaction
+
+    Returns:
+        dict with sync statistics: records that got a new grade count as
+        "synced", records whose grade already existed as "updated"
+    """
+    records = db.session.execute(
+        db.select(
+            ExamRecord.id,
+            ExamRecord.student_id,
+            ExamRecord.subject_id,
+            ExamRecord.class_room_id,
+            ExamRecord.school_term_id,
+            ExamRecord.exam_type,
+            ExamRecord.raw_score,
+            ExamRecord.max_score,
+            ExamRecord.academic_year,
+            ExamRecord.submitted_at,
+        ).where(*record_filter)
+    ).all()
+
+    stats = {
+        "total_records": len(records),
+        "synced": 0,
+        "updated": 0,
+        "errors": 0
+    }
+    if not records:
+        return stats
+
+    # Existing grades for every record in scope, keyed by exam_record_id
+    record_ids = db.select(ExamRecord.id).where(*record_filter)
+    existing = {}
+    for grade in db.session.execute(
+        db.select(
+            Grade.grade_id,
+            Grade.exam_record_id,
+            Grade.student_id,
+            Grade.subject_id,
+            Grade.class_room_id,
+            Grade.term_id,
+            Grade.score,
+            Grade.max_score,
+            Grade.assessment_name,
+            Grade.assessment_type,
+        ).where(Grade.exam_record_id.in_(record_ids))
+        .order_by(Grade.created_at)
+    ):
+        existing.setdefault(grade.exam_record_id, []).append(grade)
+
+    resolver = AssessmentTypeResolver()
+    now = datetime.utcnow()
+    inserts = []
+    updates = []
+
+    for record in records:
+        try:
+            assessment_name, assessment_code = resolver.resolve(record.exam_type)
+            percentage, grade_letter = _percentage_and_letter(
+                record.raw_score, record.max_score
+            )
+
+            grade = next(
+                (g for g in existing.get(record.id, [])
+                 if g.student_id == record.student_id
+                 and g.subject_id == record.subject_id
+                 and g.class_room_id == record.class_room_id
+                 and g.term_id == record.school_term_id),
+                None
+            )
+
+            if grade is not None:
+                stats["updated"] += 1
+                if (grade.score != record.raw_score or
+                        grade.max_score != record.max_score or
+                        grade.assessment_name != assessment_name or
+                        grade.assessment_type != assessment_code):
+                    updates.append({
+                        "grade_id": grade.grade_id,
+                        "score": record.raw_score,
+                        "max_score": record.max_score,
+                        "assessment_name": assessment_name,
+                        "assessment_type": assessment_code,
+                        "percentage": percentage,
+                        "grade_letter": grade_letter,
+                        "updated_at": now,
+                    })
+            else:
+                submitted_at = record.submitted_at
+                inserts.append({
+                    "grade_id": generate_uuid(),
+                    "student_id": record.student_id,
+                    "subject_id": record.subject_id,
+                    "class_room_id": record.class_room_id,
+                    "term_id": record.school_term_id,
+                    "teacher_id": None,
+                    "assessment_type": assessment_code,
+                    "assessment_name": assessment_name,
+                    "max_score": record.max_score,
+                    "score": record.raw_score,
+                    "percentage": percentage,
+                    "grade_letter": grade_letter,
+                    "academic_session": record.academic_year,
+                    "assessment_date": submitted_at.date() if submitted_at else None,
+                    "exam_record_id": record.id,
+                    "is_from_cbt": True,
+                    "is_published": False,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+                stats["synced"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+
+    if inserts:
+        db.session.execute(db.insert(Grade), inserts)
+    if updates:
+        db.session.execute(db.update(Grade), updates)
+
+    if commit:
+        db.session.commit()
+    return stats
+
+
+def _record_filter(student_id=None, subject_id=None, class_id=None, term_id=None):
+    criteria = []
+    if student_id:
+        criteria.append(ExamRecord.student_id == student_id)
+    if subject_id:
+        criteria.append(ExamRecord.subject_id == subject_id)
+    if class_id:
+        criteria.append(ExamRecord.class_room_id == class_id)
+    if term_id:
+        criteria.append(ExamRecord.school_term_id == term_id)
+    return criteria
+
+
 def sync_all_exam_records(subject_id=None, class_id=None, term_id=None):
     """
     Sync all exam records to grades
     Optionally filter by subject, class, or term
-    
+
     Returns:
         dict with sync statistics
     """
-    query = ExamRecord.query
-    
-    if subject_id:
-        query = query.filter_by(subject_id=subject_id)
-    if class_id:
-        query = query.filter_by(class_room_id=class_id)
-    if term_id:
-        query = query.filter_by(school_term_id=term_id)
-    
-    exam_records = query.all()
-    
-    synced_count = 0
-    updated_count = 0
-    error_count = 0
-    
-    for record in exam_records:
-        try:
-            grade = sync_exam_record_to_grade(record)
-            if grade.created_at == grade.updated_at:
-                synced_count += 1
-            else:
-                updated_count += 1
-        except Exception as e:
-        
-            error_count += 1
-    
-    db.session.commit()
-    
-    return {
-        "total_records": len(exam_records),
-        "synced": synced_count,
-        "updated": updated_count,
-        "errors": error_count
-    }
+    return sync_exam_records(
+        _record_filter(subject_id=subject_id, class_id=class_id, term_id=term_id)
+    )
 
 
 def sync_student_exam_records(student_id, subject_id=None, class_id=None, term_id=None):
     """
     Sync exam records to grades for a specific student
     Optionally filter by subject, class, or term
-    
+
     Returns:
         dict with sync statistics
     """
-    query = ExamRecord.query.filter_by(student_id=student_id)
-    
-    if subject_id:
-        query = query.filter_by(subject_id=subject_id)
-    if class_id:
-        query = query.filter_by(class_room_id=class_id)
-    if term_id:
-        query = query.filter_by(school_term_id=term_id)
-    
-    exam_records = query.all()
-    
-    synced_count = 0
-    updated_count = 0
-    error_count = 0
-    
-    for record in exam_records:
-        try:
-            grade = sync_exam_record_to_grade(record)
-            if grade.created_at == grade.updated_at:
-                synced_count += 1
-            else:
-                updated_count += 1
-        except Exception as e:
-        
-            error_count += 1
-    
-    db.session.commit()
-    
-    return {
-        "total_records": len(exam_records),
-        "synced": synced_count,
-        "updated": updated_count,
-        "errors": error_count
-    }
+    return sync_exam_records(
+        _record_filter(student_id, subject_id, class_id, term_id)
+    )
+
+
+# In-process sync watermarks: (class_id, term_id) -> signature of the exam
+# records last synced for that class and term
+_sync_watermarks = {}
+_watermark_lock = threading.Lock()
+
+
+def _exam_record_signature(class_id, term_id):
+    """Cheap fingerprint of the exam records for a class and term."""
+    count, last_updated = db.session.execute(
+        db.select(db.func.count(ExamRecord.id), db.func.max(ExamRecord.updated_at))
+        .where(*_record_filter(class_id=class_id, term_id=term_id))
+    ).one()
+    return count, last_updated
+
+
+def sync_class_term_if_stale(class_id, term_id):
+    """
+    Sync a class's exam records for a term only if they changed since the
+    last sync.
+
+    Grades are normally written when an exam is submitted or reset, so read
+    paths call this as a safety net: it costs one aggregate query when
+    nothing is new.
+
+    Returns:
+        dict with sync statistics, or None if the sync was skipped
+    """
+    key = (class_id, term_id)
+    signature = _exam_record_signature(class_id, term_id)
+    with _watermark_lock:
+        if _sync_watermarks.get(key) == signature:
+            return None
+
+    stats = sync_all_exam_records(None, class_id, term_id)
+    with _watermark_lock:
+        _sync_watermarks[key] = signature
+    return stats
+
+
+def clear_sync_watermarks():
+    """Forget all sync watermarks so the next read re-syncs."""
+    with _watermark_lock:
+        _sync_watermarks.clear()
+
+
+def remove_exam_record_grades(exam_record_id):
+    """Delete the CBT grades created from an exam record (no commit)."""
+    return db.session.execute(
+        db.delete(Grade).where(
+            Grade.exam_record_id == exam_record_id,
+            Grade.is_from_cbt == True
+        )
+    ).rowcount
@@ -7,6 +7,7 @@ from models import Permission
 from models.school import School
 from models.class_room import ClassRoom
 from models.user import User
+from services.school_info import invalidate_school_info
 from datetime import date
 import json
 
@@ -79,6 +80,7 @@ def initialize_default_data():
     if school:
         school.current_term = "First Term"
         db.session.commit()
+        invalidate_school_info()
 
     # Create default assessment types (only if none exist)
     existing_assessments = AssessmentType.query.filter_by(
@@ -4,12 +4,12 @@ Handles extraction and conversion of mathematical notation and images from DOCX
 """
 
 import re
-import base64
 from io import BytesIO
 from docx import Document
 from docx.oxml.ns import qn
 from docx.oxml import parse_xml
 from docx.text.paragraph import Paragraph
+from services.image_store import store_image
 
 
 def extract_math_from_text(text):
@@ -61,7 +61,7 @@ def extract_math_from_text(text):
 def extract_images_from_docx(doc):
     """
     Extract all images from a DOCX document
-    Returns a dictionary mapping image IDs to base64-encoded image data
+    Returns a dictionary mapping image IDs to the URLs of the stored images
     """
     images = {}
     
@@ -70,8 +70,6 @@ def extract_images_from_docx(doc):
         for rel in doc.part.rels.values():
             if "image" in rel.target_ref:
                 image_data = rel.target_part.blob
-                # Convert to base64
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
                 
                 # Determine image format from content type
                 content_type = rel.target_part.content_type
@@ -84,34 +82,41 @@ def extract_images_from_docx(doc):
                 else:
                     image_format = 'png'  # Default
                 
-                # Store with data URI format
-                images[rel.rId] = f"data:image/{image_format};base64,{image_base64}"
+                # Written once to the image store; questions keep the URL
+                images[rel.rId] = store_image(image_data, f"image/{image_format}")
     
     except Exception as e:
-    
-    
+        pass
+
     return images
 
 
+def paragraph_image_ids(paragraph):
+    """
+    Relationship ids of the images drawn in a paragraph's runs, in order
+    """
+    # Check for inline images
+    for run in paragraph.runs:
+        # Check for drawing elements (images)
+        for drawing in run._element.findall(qn('w:drawing')):
+            # Find the image reference
+            for blip in drawing.findall('.//' + qn('a:blip')):
+                embed = blip.get(qn('r:embed'))
+                if embed:
+                    yield embed
+
+
 def get_paragraph_image(paragraph, images_dict):
     """
-    Check if a paragraph contains an image and return its base64 data
+    Check if a paragraph contains an image and return its stored URL
     """
     try:
-        # Check for inline images
-        for run in paragraph.runs:
-            # Check for drawing elements (images)
-            drawings = run._element.findall(qn('w:drawing'))
-            for drawing in drawings:
-                # Find the image reference
-                blips = drawing.findall('.//' + qn('a:blip'))
-                for blip in blips:
-                    embed = blip.get(qn('r:embed'))
-                    if embed and embed in images_dict:
-                        return images_dict[embed]
+        for embed in paragraph_image_ids(paragraph):
+            if embed in images_dict:
+                return images_dict[embed]
     except Exception as e:
-    
-    
+        pass
+
     return None
 
 
@@ -212,8 +217,8 @@ def extract_math_ml_from_docx(paragraph):
                 return f'${combined}$', True
                 
     except Exception as e:
-    
-    
+        pass
+
     return None, False
 
 
@@ -274,13 +279,21 @@ def process_question_text(paragraph, images_dict):
     Process a question paragraph to extract text, math, and images
     Returns: (text, has_math, image_data)
     """
+    # Check for images
+    image_data = get_paragraph_image(paragraph, images_dict)
+    
+    text, has_math = process_paragraph_text(paragraph)
+    return text, has_math, image_data
+
+
+def process_paragraph_text(paragraph):
+    """
+    Process a paragraph's text and math (images are left to the caller)
+    Returns: (text, has_math)
+    """
     # Get the full text including equation content
     text = get_full_paragraph_text(paragraph)
     has_math = False
-    image_data = None
-    
-    # Check for images
-    image_data = get_paragraph_image(paragraph, images_dict)
     
     # Check for MathML (Word Equation Editor content)
     math_elements = paragraph._element.findall('.//' + qn('m:oMath'))
@@ -303,4 +316,4 @@ def process_question_text(paragraph, images_dict):
             if has_pattern_math:
                 has_math = True
     
-    return text, has_math, image_data
+    return text, has_math
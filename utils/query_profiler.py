@@ -0,0 +1,224 @@
+"""
+Opt-in per-request SQL profiler and N+1 detector.
+
+With QUERY_PROFILER = True every statement the app sends to the database is
+counted and timed against the request that issued it (SQLAlchemy engine
+events plus Flask request hooks). At the end of each request:
+
+- the response gets a ``Server-Timing`` header with the database time and
+  query count, which browser dev tools show next to the request;
+- the request is added to per-endpoint totals (requests, queries, DB time,
+  worst request);
+- statements repeated QUERY_PROFILER_N1_THRESHOLD times or more in one
+  request are flagged as likely N+1 patterns (a lookup inside a loop, or a
+  lazy load per row) and logged.
+
+Statements are grouped by fingerprint: the SQL text with whitespace
+collapsed and IN lists reduced to one placeholder, so the same lookup with
+different parameters counts as one statement. The totals are kept in the
+web process and can be read from /admin/perf.
+
+When the profiler is off nothing is registered and requests are untouched.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"__\[POSTCOMPILE_\w+\]")
+
+# Fingerprints kept per endpoint, most repeated first
+MAX_FINGERPRINTS = 20
+
+
+def fingerprint(statement):
+    """The shape of a SQL statement, without its parameter values"""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _IN_LIST.sub("IN (?)", statement)
+    return _POSTCOMPILE.sub("?", statement)
+
+
+class EndpointStats:
+    """Totals of the requests one endpoint has served"""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.max_queries = 0
+        self.max_db_time = 0.0
+        self.n_plus_one = Counter()
+        self.repeated = Counter()
+
+    def add(self, queries, db_time, statements, threshold):
+        self.requests += 1
+        self.queries += queries
+        self.db_time += db_time
+        self.max_queries = max(self.max_queries, queries)
+        self.max_db_time = max(self.max_db_time, db_time)
+        for statement, count in statements.items():
+            if count > 1:
+                self.repeated[statement] = max(self.repeated[statement], count)
+            if count >= threshold:
+                self.n_plus_one[statement] += 1
+
+        # Keep the most repeated statements only
+        for counter in (self.repeated, self.n_plus_one):
+            if len(counter) > MAX_FINGERPRINTS:
+                for statement, _ in counter.most_common()[MAX_FINGERPRINTS:]:
+                    del counter[statement]
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "queries": self.queries,
+            "avg_queries": round(self.queries / self.requests, 1) if self.requests else 0,
+            "max_queries": self.max_queries,
+            "db_time_ms": round(self.db_time * 1000, 1),
+            "avg_db_time_ms": round(self.db_time * 1000 / self.requests, 1) if self.requests else 0,
+            "max_db_time_ms": round(self.max_db_time * 1000, 1),
+            # statement -> most executions seen in one request
+            "repeated_statements": [
+                {"statement": statement, "max_per_request": count}
+                for statement, count in self.repeated.most_common()
+            ],
+            # statement -> number of requests in which it looked like an N+1
+            "n_plus_one": [
+                {"statement": statement, "requests": count}
+                for statement, count in self.n_plus_one.most_common()
+            ],
+        }
+
+
+class QueryProfiler:
+    """Per-request query counts and timings, aggregated per endpoint"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.threshold = 5
+        self._listening = False
+
+    def init_app(self, app):
+        """Instrument an application if QUERY_PROFILER is set."""
+        self.enabled = bool(app.config.get("QUERY_PROFILER", False))
+        self.threshold = app.config.get("QUERY_PROFILER_N1_THRESHOLD", 5)
+        app.extensions["query_profiler"] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        if not self._listening:
+            event.listen(Engine, "before_cursor_execute", self._before_execute)
+            event.listen(Engine, "after_cursor_execute", self._after_execute)
+            event.listen(Engine, "handle_error", self._on_error)
+            self._listening = True
+
+    def _active(self):
+        return (
+            self.enabled
+            and has_request_context()
+            and has_app_context()
+            and current_app.extensions.get("query_profiler") is self
+            and "query_profile" in g
+        )
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._active():
+            conn.info.setdefault("query_profiler_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_profiler_start")
+        if not starts or not self._active():
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        profile = g.query_profile
+        profile["queries"] += 1
+        profile["db_time"] += elapsed
+        profile["statements"][fingerprint(statement)] += 1
+
+    def _on_error(self, exception_context):
+        # A failed statement never reaches after_cursor_execute
+        conn = exception_context.connection
+        starts = conn.info.get("query_profiler_start") if conn is not None else None
+        if starts:
+            starts.pop()
+
+    def _start_request(self):
+        g.query_profile = {
+            "queries": 0,
+            "db_time": 0.0,
+            "statements": Counter(),
+            "started": time.perf_counter(),
+        }
+
+    def _finish_request(self, response):
+        profile = g.pop("query_profile", None)
+        if profile is None:
+            return response
+
+        total = time.perf_counter() - profile["started"]
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={profile["db_time"] * 1000:.1f};desc="{profile["queries"]} queries", '
+            f'app;dur={total * 1000:.1f}'
+        )
+
+        endpoint = request.endpoint or request.path
+        if endpoint == "static":
+            return response
+
+        suspects = {
+            statement: count for statement, count in profile["statements"].items()
+            if count >= self.threshold
+        }
+        for statement, count in suspects.items():
+            logger.warning(
+                "Possible N+1 on %s: statement ran %d times in one request: %s",
+                endpoint, count, statement[:200]
+            )
+
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.add(profile["queries"], profile["db_time"], profile["statements"],
+                      self.threshold)
+        return response
+
+    def report(self, sort="queries"):
+        """Per-endpoint totals, the endpoints issuing the most queries first"""
+        with self._lock:
+            endpoints = {name: stats.to_dict() for name, stats in self._stats.items()}
+        key = {
+            "queries": lambda item: item[1]["queries"],
+            "db_time": lambda item: item[1]["db_time_ms"],
+            "avg_queries": lambda item: item[1]["avg_queries"],
+        }.get(sort, lambda item: item[1]["queries"])
+        return {
+            "enabled": self.enabled,
+            "n_plus_one_threshold": self.threshold,
+            "endpoints": [
+                {"endpoint": name, **stats}
+                for name, stats in sorted(endpoints.items(), key=key, reverse=True)
+            ],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_profiler = QueryProfiler()
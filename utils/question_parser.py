@@ -6,12 +6,73 @@ Handles parsing of questions from JSON, CSV, and Word documents
 import json
 import csv
 import io
-from docx import Document
-from utils.math_content_parser import (
-    extract_images_from_docx,
-    process_question_text,
-    extract_math_from_text
-)
+from utils.docx_reader import parse_word_document
+
+
+def json_question(q):
+    """Convert one question of a JSON upload to question data"""
+    question_data = {
+        "question_text": q.get("question_text", "").strip(),
+        "question_type": q.get("question_type", "mcq").lower(),
+    }
+    
+    # Handle different question types
+    if question_data["question_type"] in ["mcq", "true_false"]:
+        options = q.get("options", [])
+        answer_index = q.get("answer", 0)
+        
+        question_data["options"] = [
+            {"text": opt, "is_correct": (i == answer_index)}
+            for i, opt in enumerate(options)
+        ]
+        
+    elif question_data["question_type"] == "short_answer":
+        question_data["correct_answer"] = q.get("correct_answer", "")
+    
+    return question_data
+
+
+def csv_question(row):
+    """Convert one row of a CSV upload to question data"""
+    question_data = {
+        "question_text": (row.get("question_text") or "").strip(),
+        "question_type": (row.get("question_type") or "mcq").lower().strip(),
+    }
+    
+    # Handle different question types
+    if question_data["question_type"] in ["mcq", "true_false"]:
+        options_str = (row.get("options") or "[]").strip()
+        correct_answer_str = (row.get("correct_answer") or "0").strip()
+        
+        # Remove quotes if present
+        if correct_answer_str.startswith('"') and correct_answer_str.endswith('"'):
+            correct_answer_str = correct_answer_str[1:-1]
+        
+        try:
+            options = json.loads(options_str)
+        except:
+            # Try parsing as comma-separated
+            options = [opt.strip() for opt in options_str.split(",")]
+        
+        try:
+            answer_index = int(correct_answer_str)
+        except ValueError:
+
+            answer_index = 0
+        
+        question_data["options"] = [
+            {"text": opt, "is_correct": (i == answer_index)}
+            for i, opt in enumerate(options)
+        ]
+        
+    elif question_data["question_type"] == "short_answer":
+        correct_answer = (row.get("correct_answer") or "").strip()
+        # Remove quotes if present
+        if correct_answer.startswith('"') and correct_answer.endswith('"'):
+            correct_answer = correct_answer[1:-1]
+        question_data["correct_answer"] = correct_answer
+    
+    return question_data
 
 
 def parse_json_questions(file_content):
@@ -40,30 +101,11 @@ def parse_json_questions(file_content):
         parsed_questions = []
         for idx, q in enumerate(questions, 1):
             try:
-                question_data = {
-                    "question_text": q.get("question_text", "").strip(),
-                    "question_type": q.get("question_type", "mcq").lower(),
-                }
-                
+                question_data = json_question(q)
                 if not question_data["question_text"]:
                     continue
-                
-                # Handle different question types
-                if question_data["question_type"] in ["mcq", "true_false"]:
-                    options = q.get("options", [])
-                    answer_index = q.get("answer", 0)
-                    
-                    if not options:
-                        continue
-                    
-                    question_data["options"] = [
-                        {"text": opt, "is_correct": (i == answer_index)}
-                        for i, opt in enumerate(options)
-                    ]
-                    
-                elif question_data["question_type"] == "short_answer":
-                    question_data["correct_answer"] = q.get("correct_answer", "")
-                
+                if question_data["question_type"] in ["mcq", "true_false"] and not question_data["options"]:
+                    continue
                 parsed_questions.append(question_data)
                 
             except Exception as e:
@@ -95,47 +137,9 @@ def parse_csv_questions(file_content):
         parsed_questions = []
         for idx, row in enumerate(reader, 1):
             try:
-                question_data = {
-                    "question_text": row.get("question_text", "").strip(),
-                    "question_type": row.get("question_type", "mcq").lower().strip(),
-                }
-                
+                question_data = csv_question(row)
                 if not question_data["question_text"]:
                     continue
-                
-                # Handle different question types
-                if question_data["question_type"] in ["mcq", "true_false"]:
-                    options_str = row.get("options", "[]").strip()
-                    correct_answer_str = row.get("correct_answer", "0").strip()
-                    
-                    # Remove quotes if present
-                    if correct_answer_str.startswith('"') and correct_answer_str.endswith('"'):
-                        correct_answer_str = correct_answer_str[1:-1]
-                    
-                    try:
-                        options = json.loads(options_str)
-                    except:
-                        # Try parsing as comma-separated
-                        options = [opt.strip() for opt in options_str.split(",")]
-                    
-                    try:
-                        answer_index = int(correct_answer_str)
-                    except ValueError:
-
-                        answer_index = 0
-                    
-                    question_data["options"] = [
-                        {"text": opt, "is_correct": (i == answer_index)}
-                        for i, opt in enumerate(options)
-                    ]
-                    
-                elif question_data["question_type"] == "short_answer":
-                    correct_answer = row.get("correct_answer", "").strip()
-                    # Remove quotes if present
-                    if correct_answer.startswith('"') and correct_answer.endswith('"'):
-                        correct_answer = correct_answer[1:-1]
-                    question_data["correct_answer"] = correct_answer
-                
                 parsed_questions.append(question_data)
                 
             except Exception as e:
@@ -173,134 +177,12 @@ def parse_word_questions(file_content):
     - Mathematical notation (LaTeX, Unicode symbols)
     - Embedded images in questions and options
     - Rich text formatting
+    The document is read in one pass and cached by content (see
+    utils.docx_reader), so uploading the same or a corrected file again only
+    re-parses the questions that changed.
     """
     try:
-        doc = Document(io.BytesIO(file_content))
-        
-        # Extract all images from the document first
-        images_dict = extract_images_from_docx(doc)
-    
-        
-        parsed_questions = []
-        current_question = None
-        current_options = []
-        in_options = False
-        
-    
-        for idx, para in enumerate(doc.paragraphs):
-            text = para.text.strip()
-            # print(f"Paragraph {idx}: '{text}'")
-            
-            if not text:
-                # Check if paragraph contains only an image
-                image_data = process_question_text(para, images_dict)[2]
-                if image_data and current_question:
-                    # Attach image to current question or option
-                    if in_options and current_options:
-                        current_options[-1]["option_image"] = image_data
-                        # print(f"  -> Attached image to last option")
-                    else:
-                        current_question["question_image"] = image_data
-                        # print(f"  -> Attached image to question")
-                continue
-            
-            # Check for question start
-            if text.lower().startswith("question:"):
-                # print(f"  -> Found question start")
-                # Save previous question if exists
-                if current_question:
-                    if current_question["question_type"] in ["mcq", "true_false"]:
-                        current_question["options"] = current_options
-                        # print(f"  -> Saved previous question with {len(current_options)} options")
-                    parsed_questions.append(current_question)
-                
-                # Process question text for math and images
-                question_text = text[9:].strip()  # Remove "Question:" prefix
-                processed_text, has_math, image_data = process_question_text(para, images_dict)
-                if processed_text and processed_text != text:
-                    question_text = processed_text[9:].strip() if processed_text.lower().startswith("question:") else processed_text
-                else:
-                    question_text, has_math = extract_math_from_text(question_text)
-                
-                # Start new question
-                current_question = {
-                    "question_text": question_text,
-                    "question_type": "mcq",
-                    "options": [],
-                    "has_math": has_math
-                }
-                
-                if image_data:
-                    current_question["question_image"] = image_data
-                
-                current_options = []
-                in_options = False
-                
-            elif text.lower().startswith("type:") and current_question:
-                q_type = text[5:].strip().lower()
-                # print(f"  -> Found type: {q_type}")
-                if "mcq" in q_type or "multiple" in q_type:
-                    current_question["question_type"] = "mcq"
-                elif "true" in q_type or "false" in q_type:
-                    current_question["question_type"] = "true_false"
-                elif "short" in q_type:
-                    current_question["question_type"] = "short_answer"
-                    
-            elif text.lower().startswith("options:") and current_question:
-                # print(f"  -> Found options marker")
-                in_options = True
-                
-            elif text.lower().startswith("answer:") and current_question:
-                answer_text = text[7:].strip()
-                # Process answer for math notation
-                answer_text, has_math = extract_math_from_text(answer_text)
-                current_question["correct_answer"] = answer_text
-                if has_math:
-                    current_question["has_math"] = True
-                # print(f"  -> Found answer: {answer_text}")
-                in_options = False
-                
-            elif in_options and text.startswith("-"):
-                # Parse option
-                option_text = text[1:].strip()
-                is_correct = option_text.startswith("*")
-                if is_correct:
-                    option_text = option_text[1:].strip()
-                
-                # Process option text for math and images
-                processed_text, has_math, image_data = process_question_text(para, images_dict)
-                if processed_text and processed_text != text:
-                    option_text = processed_text[1:].strip() if processed_text.startswith("-") else processed_text
-                    if option_text.startswith("*"):
-                        option_text = option_text[1:].strip()
-                else:
-                    option_text, has_math = extract_math_from_text(option_text)
-                
-                option_data = {
-                    "text": option_text,
-                    "is_correct": is_correct,
-                    "has_math": has_math
-                }
-                
-                if image_data:
-                    option_data["option_image"] = image_data
-                
-                # print(f"  -> Found option: {option_text} (correct: {is_correct}, has_math: {has_math})")
-                current_options.append(option_data)
-        
-        # Save last question
-        if current_question:
-            if current_question["question_type"] in ["mcq", "true_false"]:
-                current_question["options"] = current_options
-                # print(f"  -> Saved last question with {len(current_options)} options")
-            parsed_questions.append(current_question)
-        
-        # print(f"=== Total questions parsed: {len(parsed_questions)} ===")
-        for idx, q in enumerate(parsed_questions):
-            has_image = "question_image" in q
-            # print(f"Question {idx + 1}: {q['question_type']}, options: {len(q.get('options', []))}, has_math: {q.get('has_math', False)}, has_image: {has_image}")
-        
-        return parsed_questions, None
+        return parse_word_document(file_content), None
         
     except Exception as e:
         import traceback
@@ -308,6 +190,87 @@ def parse_word_questions(file_content):
         return None, f"Error parsing Word document: {str(e)}"
 
 
+def detect_file_type(filename):
+    """'json', 'csv' or 'word' from an upload's file name (None if unsupported)"""
+    if filename.endswith('.json'):
+        return 'json'
+    elif filename.endswith('.csv'):
+        return 'csv'
+    elif filename.endswith('.docx'):
+        return 'word'
+    return None
+
+
+def iter_questions_file(file, file_type=None):
+    """
+    Questions of an uploaded file, one at a time
+    
+    CSV rows are read from the upload as they are consumed. JSON and Word
+    files are parsed whole (their parsers need the complete document) and
+    then handed out one question at a time.
+    
+    Args:
+        file: File object or file content
+        file_type: 'json', 'csv', or 'word' (auto-detected if None)
+    
+    Yields:
+        tuple: (number, question_data, error) - question_data is None and
+        error a message when the entry could not be read
+    
+    Raises:
+        ValueError: if the file cannot be read at all
+    """
+    filename = getattr(file, 'filename', '') or ''
+    file_type = file_type or detect_file_type(filename)
+    if not file_type:
+        raise ValueError("Unsupported file format. Please use JSON, CSV, or DOCX files.")
+    
+    if file_type == 'csv':
+        if hasattr(file, 'read'):
+            stream = getattr(file, 'stream', file)
+            text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        else:
+            content = file.decode('utf-8') if isinstance(file, bytes) else file
+            text = io.StringIO(content)
+        try:
+            for number, row in enumerate(csv.DictReader(text), 1):
+                try:
+                    yield number, csv_question(row), None
+                except Exception as e:
+                    yield number, None, f"Could not read row: {str(e)}"
+        finally:
+            if isinstance(text, io.TextIOWrapper):
+                # Leave the upload's own stream open for its owner
+                text.detach()
+        return
+    
+    content = file.read() if hasattr(file, 'read') else file
+    if file_type == 'json':
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        try:
+            questions = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON format: {str(e)}")
+        if not isinstance(questions, list):
+            raise ValueError("JSON must contain an array of questions")
+        for number, q in enumerate(questions, 1):
+            try:
+                yield number, json_question(q), None
+            except Exception as e:
+                yield number, None, f"Could not read question: {str(e)}"
+    
+    elif file_type == 'word':
+        questions, error = parse_word_questions(content)
+        if error:
+            raise ValueError(error)
+        for number, question_data in enumerate(questions, 1):
+            yield number, question_data, None
+    
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+
 def parse_questions_file(file, file_type=None):
     """
     Main function to parse questions from any supported file format
@@ -330,13 +293,8 @@ def parse_questions_file(file, file_type=None):
         
         # Auto-detect file type if not provided
         if not file_type:
-            if filename.endswith('.json'):
-                file_type = 'json'
-            elif filename.endswith('.csv'):
-                file_type = 'csv'
-            elif filename.endswith('.docx'):
-                file_type = 'word'
-            else:
+            file_type = detect_file_type(filename)
+            if not file_type:
                 return None, "Unsupported file format. Please use JSON, CSV, or DOCX files."
         
         # Parse based on file type